@@ -58,17 +58,73 @@ class Settings(BaseSettings):
     # --- LLM Upstream ---
     LLM_PRIMARY_BASE_URL: str = "https://llm.ycc.club"
     LLM_PRIMARY_PATH: str = "/api/generate"
+    LLM_PRIMARY_KIND: str = "ollama"  # ollama | openai_compatible (경로는 .../chat/completions)
     LLM_FALLBACK_BASE_URL: str | None = None
     LLM_FALLBACK_PATH: str = "/api/generate"
     LLM_FALLBACK_KIND: str = "same_as_primary"  # same_as_primary | ollama | openai_compatible
+    LLM_OPENAI_API_KEY: str | None = None  # openai_compatible 업스트림 인증(없으면 생략)
+    # 모델명(또는 접두사) -> "gemini" | "upstream"(primary/fallback), JSON. 기본: gemini-* -> gemini
+    LLM_MODEL_ROUTES: dict[str, str] = Field(default_factory=dict)
     LLM_FALLBACK_MODEL: str | None = None
     LLM_REQUEST_TIMEOUT_SECS: int = 60
     LLM_TLS_VERIFY: bool = True
     LLM_CONNECT_TIMEOUT: float = 5.0
     LLM_READ_TIMEOUT: float = 120.0
     LLM_MAX_RETRIES: int = 2
+    # 업스트림별(base URL, TLS verify) 프로세스 공유 커넥션 풀
+    LLM_HTTP_MAX_CONNECTIONS: int = 50
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    LLM_HTTP_KEEPALIVE_EXPIRY_SECS: float = 60.0
+    # 헤징: primary가 최근 p95보다 늦으면 fallback도 동시에 보내 먼저 온 응답 사용
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 0.95
+    LLM_HEDGE_WINDOW: int = 200  # 최근 성공 응답 수
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # 이보다 적으면 MAX_DELAY 사용
+    LLM_HEDGE_MIN_DELAY_SECS: float = 1.0
+    LLM_HEDGE_MAX_DELAY_SECS: float = 20.0
+    # 서킷 브레이커: 연속 실패 시 해당 업스트림을 잠시 건너뛰고 백그라운드 프로브로 복구 확인
+    LLM_BREAKER_ENABLED: bool = True
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 3  # 연속 실패(연결 오류/타임아웃/5xx) 횟수
+    LLM_BREAKER_OPEN_SECS: float = 30.0  # open 상태 유지 후 half-open 시험 요청 허용
+    LLM_BREAKER_PROBE_INTERVAL_SECS: float = 15.0
+    # 업스트림별 동시 생성 수 제한 + 우선순위 대기열(채팅 > 브랜치 요약 > 헬스 프로브)
+    LLM_ADMISSION_ENABLED: bool = True
+    LLM_ADMISSION_PRIMARY_CONCURRENCY: int = 4
+    LLM_ADMISSION_FALLBACK_CONCURRENCY: int = 8
+    LLM_ADMISSION_GEMINI_CONCURRENCY: int = 8
+    LLM_ADMISSION_QUEUE_SIZE: int = 32  # 가득 차면 즉시 503 + Retry-After
+    LLM_ADMISSION_QUEUE_TIMEOUT_SECS: float = 30.0
+    # 채팅 컨텍스트 토큰 예산(추정치): 최신 턴은 그대로, 오래된 턴은 요약 발췌 후 제외
+    LLM_CONTEXT_TOKEN_BUDGET: int = 6000
+    GEMINI_CONTEXT_TOKEN_BUDGET: int = 32000
+    LLM_CONTEXT_TOKEN_BUDGETS: dict[str, int] = Field(default_factory=dict)  # 모델명(접두사) -> 예산, JSON
+    LLM_CONTEXT_COMPRESSED_TURN_TOKENS: int = 200  # 발췌로 줄인 오래된 턴의 최대 토큰
+    # 용도별 생성 프로필(chat/branch_summary/conversation_summary/health/title) 덮어쓰기, JSON
+    LLM_PROFILES: dict[str, dict] = Field(default_factory=dict)  # {"branch_summary": {"max_output_tokens": 64}}
+    # 긴 스레드: 최근 N개 메시지보다 오래된 대화는 숨김 마커의 누적 요약으로 대체
+    CHAT_SUMMARY_ENABLED: bool = True
+    CHAT_SUMMARY_RECENT_MESSAGES: int = 20  # 요약하지 않고 그대로 보내는 최근 메시지 수
+    CHAT_SUMMARY_MIN_NEW_MESSAGES: int = 10  # 이만큼 쌓이면 요약 갱신(배치)
+    CHAT_SUMMARY_BATCH_MESSAGES: int = 40  # 요약 1회 호출에 넣는 메시지 수
+    CHAT_SUMMARY_MAX_CHARS: int = 1500
+    # 생성 중단: 클라이언트 연결 끊김 확인 주기, 끊겼을 때 스트리밍된 부분 응답 저장 여부
+    CHAT_DISCONNECT_POLL_SECS: float = 0.5
+    CHAT_KEEP_PARTIAL_ON_DISCONNECT: bool = False
+    BRANCH_SUMMARY_CACHE_MAX_ENTRIES: int = 512  # (부모 스레드, 마지막 index, 모델)별 브랜치 요약 LRU
+    # 응답이 질문을 이만큼(정규화 문자 수) 그대로 반복하며 시작하면 스트림을 끊고 즉시 재시도
+    LLM_ECHO_PROBE_CHARS: int = 48
     CHAT_DEBUG_ASSERTS: bool = False
     LLM_MODE: str = "chat"  # "chat" | "generate"
+    # generate 모드 Ollama: 응답의 context(KV 토큰)를 스레드별로 보관해 다음 턴에 재사용
+    OLLAMA_CONTEXT_ENABLED: bool = True
+    OLLAMA_CONTEXT_CACHE_MAX_THREADS: int = 256
+    OLLAMA_CONTEXT_PERSIST: bool = False  # 예약 index 행에도 저장(워커 간 공유, 재시작 후 유지). 20261017000100 마이그레이션 필요
+    # Ollama 모델 메모리 유지 시간(초). None이면 Ollama 기본값(5분), 음수는 무기한
+    OLLAMA_KEEP_ALIVE_SECS: int | None = None
+    # 워밍업: 시작 시 primary/fallback 모델 로드, 최근 트래픽이 있으면 keep-alive 만료 전 재요청
+    LLM_WARMUP_ENABLED: bool = True
+    LLM_WARMUP_IDLE_SECS: float = 1800.0  # 이 시간 동안 요청이 없으면 언로드되도록 둠
+    LLM_WARMUP_MARGIN_SECS: float = 30.0  # keep-alive 만료 몇 초 전에 재요청할지
 
     # --- Supabase ---
     SUPABASE_URL: str = Field(
@@ -87,6 +143,30 @@ class Settings(BaseSettings):
     # (선택) iss/aud 검증 커스터마이즈 시
     SUPABASE_JWT_AUD: str = "authenticated"
 
+    # 액세스 토큰 검증 방식
+    # - remote: 요청마다 Supabase /auth/v1/user 호출 (로그아웃 즉시 반영)
+    # - local: JWKS(또는 레거시 JWT secret)로 서명·exp·aud를 직접 검증하고,
+    #   모르는 kid일 때만 remote로 확인합니다.
+    SUPABASE_AUTH_VERIFY_MODE: str = "remote"  # remote | local
+    SUPABASE_JWT_SECRET: str | None = None  # HS256 레거시 프로젝트용
+    SUPABASE_JWKS_TTL_SECS: float = 600.0
+    SUPABASE_JWT_LEEWAY_SECS: float = 5.0
+    # remote 검증 결과 캐시 (토큰 digest 기준 LRU, TTL은 토큰 exp를 넘지 않음)
+    # 0이면 캐시하지 않습니다. 캐시된 동안은 Supabase 쪽 로그아웃이 늦게 반영됩니다.
+    SUPABASE_TOKEN_CACHE_TTL_SECS: float = 30.0
+    SUPABASE_TOKEN_CACHE_MAX_ENTRIES: int = 10_000
+    # 거절된 토큰을 다시 묻지 않는 시간 (401/403 응답만)
+    SUPABASE_TOKEN_NEGATIVE_TTL_SECS: float = 5.0
+
+    # Supabase REST/Auth 호출은 프로세스 단위 커넥션 풀을 공유합니다.
+    SUPABASE_HTTP_TIMEOUT_SECS: float = 15.0
+    SUPABASE_HTTP_MAX_CONNECTIONS: int = 100
+    SUPABASE_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    SUPABASE_HTTP_KEEPALIVE_EXPIRY_SECS: float = 30.0
+    SUPABASE_HTTP2: bool = False
+    # 한 요청 안에서 동시에 보낼 수 있는 독립 조회 수의 상한입니다.
+    SUPABASE_QUERY_CONCURRENCY: int = 4
+
 
     # --- LLM ---
     LLM_BASE_URL: str = "https://llm.ycc.club:443"
@@ -100,6 +180,11 @@ class Settings(BaseSettings):
     # 이전 프론트/로컬 저장소가 2.5 Flash를 요청할 때 사용할 대체 모델입니다.
     GEMINI_2_5_COMPAT_MODEL: str = "gemini-3.6-flash"
     GEMINI_TIMEOUT_SECS: float = 120.0
+    # Gemini 명시적 컨텍스트 캐시: 긴 스레드의 고정 앞부분(시스템 프롬프트+이전 대화)을 CachedContent로 재사용
+    GEMINI_CACHE_ENABLED: bool = False
+    GEMINI_CACHE_MIN_TOKENS: int = 1024  # 새로 캐시할 미캐시 토큰 하한(모델별 최소 캐시 크기 이상)
+    GEMINI_CACHE_TTL_SECS: int = 600
+    GEMINI_CACHE_MAX_THREADS: int = 256
 
     # --- 쿠키/도메인 (프록시형 API 만들 때 사용) ---
     # 비워 두면 host-only 쿠키가 되어 localhost에서도 정상 동작합니다.
@@ -50,7 +50,7 @@ class RequestGuardMiddleware(BaseHTTPMiddleware):
         if request.method == "POST" and path == "/auth/refresh":
             return 60, "refresh"
         if request.method == "POST" and (
-            path.endswith("/chat") or path.endswith("/branch")
+            path.endswith("/chat") or path.endswith("/chat/stream") or path.endswith("/branch")
         ):
             return settings.LLM_RATE_LIMIT_PER_MINUTE, "llm"
         if path.startswith("/health/llm"):
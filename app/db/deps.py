@@ -5,7 +5,8 @@ from typing import Any, Dict
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from app.db.supabase import SupabaseAuthError, SupabaseUnavailableError, get_user_from_access_token
+from app.db.supabase import SupabaseAuthError, SupabaseUnavailableError
+from app.db.supabase_auth import authenticate_access_token
 
 # Swagger/OpenAPI에서 Bearer 인증 스킴을 인식시키기 위해 HTTPBearer 사용
 _bearer_scheme = HTTPBearer(auto_error=False)
@@ -47,14 +48,15 @@ async def get_current_user(
     access_token: str = Depends(get_access_token),
 ) -> Dict[str, Any]:
     """
-    Validate Supabase access_token via Supabase Auth (/auth/v1/user)
-    and return a normalized user payload.
+    Validate Supabase access_token (locally or via Supabase Auth
+    /auth/v1/user, see SUPABASE_AUTH_VERIFY_MODE) and return a normalized
+    user payload.
 
     This function must NOT parse headers/cookies directly.
     Token extraction responsibility is in get_access_token().
     """
     try:
-        supabase_user = await get_user_from_access_token(access_token)
+        supabase_user = await authenticate_access_token(access_token)
     except SupabaseUnavailableError:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
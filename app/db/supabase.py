@@ -1,14 +1,18 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 from functools import lru_cache
+from threading import Lock
 from typing import Any, Dict, List, Optional
 
 import httpx
-import requests
 from supabase import Client, create_client
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 
 class ConfigError(RuntimeError):
     """환경 설정 관련 오류"""
@@ -17,6 +21,11 @@ class ConfigError(RuntimeError):
 class SupabaseAuthError(Exception):
     """Supabase 토큰 검증 실패용 커스텀 예외"""
 
+    def __init__(self, message: str = "", status_code: Optional[int] = None):
+        super().__init__(message)
+        # Supabase Auth가 돌려준 HTTP 상태 (응답이 없었으면 None)
+        self.status_code = status_code
+
 
 class SupabaseUnavailableError(SupabaseAuthError):
     """Supabase Auth endpoint is unreachable from the backend."""
@@ -55,6 +64,105 @@ def get_supabase(service_role: bool = False) -> Client:
     return create_client(url, key)
 
 
+# ===== Pooled HTTP clients =====
+# Every REST/Auth call reuses keep-alive connections instead of paying a fresh
+# TCP+TLS handshake. The sync client serves threadpool routes; the async client
+# is owned by the app lifespan (see app.main) and closed on shutdown.
+
+_client_lock = Lock()
+_sync_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+# Closes of clients left behind by a previous loop, still in progress.
+_retiring: set = set()
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max(1, int(settings.SUPABASE_HTTP_MAX_CONNECTIONS)),
+        max_keepalive_connections=max(0, int(settings.SUPABASE_HTTP_MAX_KEEPALIVE_CONNECTIONS)),
+        keepalive_expiry=float(settings.SUPABASE_HTTP_KEEPALIVE_EXPIRY_SECS),
+    )
+
+
+def _http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(float(settings.SUPABASE_HTTP_TIMEOUT_SECS))
+
+
+def get_http_client() -> httpx.Client:
+    """Process-wide pooled client for synchronous callers."""
+    global _sync_client
+    with _client_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(
+                limits=_http_limits(),
+                timeout=_http_timeout(),
+                http2=settings.SUPABASE_HTTP2,
+            )
+        return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Pooled async client bound to the running event loop."""
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if (
+        _async_client is None
+        or _async_client.is_closed
+        # Pooled connections belong to the loop that opened them. A new loop
+        # (test clients, reloaders) must not reuse them.
+        or _async_client_loop is not loop
+    ):
+        if _async_client is not None and not _async_client.is_closed:
+            _retire_async_client(_async_client, _async_client_loop, loop)
+        _async_client = httpx.AsyncClient(
+            limits=_http_limits(),
+            timeout=_http_timeout(),
+            http2=settings.SUPABASE_HTTP2,
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+async def _close_retired(client: httpx.AsyncClient) -> None:
+    try:
+        await client.aclose()
+    except Exception as exc:
+        # Its connections may belong to a loop that is already closed.
+        logger.debug("Failed to close a retired Supabase client", extra={"error": repr(exc)})
+
+
+def _retire_async_client(
+    client: httpx.AsyncClient,
+    owner: Optional[asyncio.AbstractEventLoop],
+    loop: asyncio.AbstractEventLoop,
+) -> None:
+    """Close a client replaced because the serving loop changed, so its pool doesn't leak."""
+    if owner is not None and owner.is_running() and not owner.is_closed():
+        # Still serving in another thread: close it there.
+        asyncio.run_coroutine_threadsafe(_close_retired(client), owner)
+        return
+    task = loop.create_task(_close_retired(client))
+    _retiring.add(task)
+    task.add_done_callback(_retiring.discard)
+
+
+async def aclose_http_clients() -> None:
+    """Close pooled clients. Called from the app lifespan on shutdown."""
+    global _sync_client, _async_client, _async_client_loop
+    async_client, _async_client, _async_client_loop = _async_client, None, None
+    with _client_lock:
+        sync_client, _sync_client = _sync_client, None
+    if async_client is not None and not async_client.is_closed:
+        await async_client.aclose()
+    loop = asyncio.get_running_loop()
+    retiring = [task for task in _retiring if task.get_loop() is loop]
+    if retiring:
+        await asyncio.gather(*retiring, return_exceptions=True)
+    if sync_client is not None and not sync_client.is_closed:
+        sync_client.close()
+
+
 # ===== Auth / token helpers =====
 
 def exchange_google_id_token(id_token: str, nonce: Optional[str] = None) -> Dict[str, Any]:
@@ -62,7 +170,7 @@ def exchange_google_id_token(id_token: str, nonce: Optional[str] = None) -> Dict
     payload = {"provider": "google", "id_token": id_token}
     if nonce:
         payload["nonce"] = nonce
-    r = requests.post(url, headers=_base_headers(), json=payload, timeout=15)
+    r = get_http_client().post(url, headers=_base_headers(), json=payload)
     r.raise_for_status()
     return r.json()
 
@@ -72,7 +180,7 @@ def exchange_pkce_code(code: str, code_verifier: str, redirect_to: Optional[str]
     payload: Dict[str, Any] = {"code": code, "code_verifier": code_verifier}
     if redirect_to:
         payload["redirect_to"] = redirect_to
-    r = requests.post(url, headers=_base_headers(), json=payload, timeout=15)
+    r = get_http_client().post(url, headers=_base_headers(), json=payload)
     r.raise_for_status()
     return r.json()
 
@@ -80,7 +188,7 @@ def exchange_pkce_code(code: str, code_verifier: str, redirect_to: Optional[str]
 def refresh_with_token(refresh_token: str) -> Dict[str, Any]:
     url = f"{_base_url()}/auth/v1/token?grant_type=refresh_token"
     payload = {"refresh_token": refresh_token}
-    r = requests.post(url, headers=_base_headers(), json=payload, timeout=15)
+    r = get_http_client().post(url, headers=_base_headers(), json=payload)
     r.raise_for_status()
     return r.json()
 
@@ -92,7 +200,7 @@ def signup_with_password(email: str, password: str, nickname: str) -> Dict[str,
         "password": password,
         "data": {"nickname": nickname},
     }
-    r = requests.post(url, headers=_base_headers(), json=payload, timeout=15)
+    r = get_http_client().post(url, headers=_base_headers(), json=payload)
     r.raise_for_status()
     return r.json()
 
@@ -100,7 +208,7 @@ def signup_with_password(email: str, password: str, nickname: str) -> Dict[str,
 def get_userinfo(access_token: str) -> Dict[str, Any]:
     url = f"{_base_url()}/auth/v1/user"
     headers = {**_base_headers(), "Authorization": f"Bearer {access_token}"}
-    r = requests.get(url, headers=headers, timeout=15)
+    r = get_http_client().get(url, headers=headers)
     r.raise_for_status()
     return r.json()
 
@@ -108,7 +216,7 @@ def get_userinfo(access_token: str) -> Dict[str, Any]:
 def logout(access_token: str) -> None:
     url = f"{_base_url()}/auth/v1/logout"
     headers = {**_base_headers(), "Authorization": f"Bearer {access_token}"}
-    r = requests.post(url, headers=headers, timeout=15)
+    r = get_http_client().post(url, headers=headers)
     r.raise_for_status()
 
 
@@ -116,18 +224,90 @@ def _auth_headers(access_token: str) -> Dict[str, str]:
     return {**_base_headers(), "Authorization": f"Bearer {access_token}"}
 
 
-# ===== REST helpers =====
+def _delete_count(r: httpx.Response) -> int:
+    if not r.text:
+        return 0
+    try:
+        data = r.json()
+        if isinstance(data, list):
+            return len(data)
+    except Exception:
+        pass
+    return 0
 
-def rest_insert(table: str, rows: List[Dict[str, Any]], access_token: str) -> Dict[str, Any]:
+
+def _update_rows(r: httpx.Response) -> Dict[str, Any]:
+    try:
+        return r.json()
+    except Exception:
+        return {}
+
+
+def _insert_request(
+    table: str,
+    access_token: str,
+    returning: bool,
+    on_conflict: Optional[str],
+    select: Optional[str],
+    ignore_duplicates: bool = False,
+) -> tuple[str, Dict[str, str]]:
+    """
+    Build the URL and headers for an insert.
+
+    - returning: ask PostgREST to send the written rows back
+      (Prefer: return=representation), optionally narrowed by ``select``.
+    - on_conflict: comma-separated unique columns; turns the insert into an
+      upsert that merges into the existing row instead of failing with 409.
+    - ignore_duplicates: with ``on_conflict``, skip conflicting rows instead
+      of merging (no UPDATE, so no UPDATE policy needed); skipped rows are
+      not returned.
+    """
+    params = []
+    prefer = []
+    if on_conflict:
+        params.append(f"on_conflict={on_conflict}")
+        prefer.append("resolution=ignore-duplicates" if ignore_duplicates else "resolution=merge-duplicates")
+    if returning:
+        prefer.append("return=representation")
+        if select:
+            params.append(f"select={select}")
     url = f"{_base_url()}/rest/v1/{table}"
-    r = requests.post(url, headers=_auth_headers(access_token), json=rows, timeout=15)
-    r.raise_for_status()
+    if params:
+        url += "?" + "&".join(params)
+    headers = _auth_headers(access_token)
+    if prefer:
+        headers["Prefer"] = ",".join(prefer)
+    return url, headers
+
+
+def _insert_result(r: httpx.Response, returning: bool) -> Any:
+    if returning:
+        data = r.json() if r.text else []
+        return data if isinstance(data, list) else [data]
     return r.json() if r.text else {}
 
 
+# ===== REST helpers =====
+
+def rest_insert(
+    table: str,
+    rows: List[Dict[str, Any]],
+    access_token: str,
+    *,
+    returning: bool = False,
+    on_conflict: Optional[str] = None,
+    select: Optional[str] = None,
+    ignore_duplicates: bool = False,
+) -> Any:
+    url, headers = _insert_request(table, access_token, returning, on_conflict, select, ignore_duplicates)
+    r = get_http_client().post(url, headers=headers, json=rows)
+    r.raise_for_status()
+    return _insert_result(r, returning)
+
+
 def rest_select(table: str, query: str, access_token: str) -> List[Dict[str, Any]]:
     url = f"{_base_url()}/rest/v1/{table}?{query}"
-    r = requests.get(url, headers=_auth_headers(access_token), timeout=15)
+    r = get_http_client().get(url, headers=_auth_headers(access_token))
     r.raise_for_status()
     return r.json()
 
@@ -135,17 +315,9 @@ def rest_select(table: str, query: str, access_token: str) -> List[Dict[str, Any
 def rest_delete(table: str, query: str, access_token: str) -> int:
     url = f"{_base_url()}/rest/v1/{table}?{query}"
     headers = {**_auth_headers(access_token), "Prefer": "return=representation"}
-    r = requests.delete(url, headers=headers, timeout=15)
+    r = get_http_client().delete(url, headers=headers)
     r.raise_for_status()
-    if not r.text:
-        return 0
-    try:
-        data = r.json()
-        if isinstance(data, list):
-            return len(data)
-    except Exception:
-        pass
-    return 0
+    return _delete_count(r)
 
 
 def rest_update(table: str, query: str, values: Dict[str, Any], access_token: str) -> Dict[str, Any]:
@@ -158,12 +330,74 @@ def rest_update(table: str, query: str, values: Dict[str, Any], access_token: st
         "Prefer": "return=representation",
         "Content-Type": "application/json",
     }
-    r = requests.patch(url, headers=headers, json=values, timeout=15)
+    r = get_http_client().patch(url, headers=headers, json=values)
     r.raise_for_status()
-    try:
-        return r.json()
-    except Exception:
-        return {}
+    return _update_rows(r)
+
+
+# ===== Async REST helpers (pooled, event-loop friendly) =====
+
+async def rest_insert_async(
+    table: str,
+    rows: List[Dict[str, Any]],
+    access_token: str,
+    *,
+    returning: bool = False,
+    on_conflict: Optional[str] = None,
+    select: Optional[str] = None,
+    ignore_duplicates: bool = False,
+) -> Any:
+    """
+    Insert rows (RLS applies). With ``returning=True`` the written rows come
+    back in the same response as a list, so callers need not re-select them.
+    """
+    url, headers = _insert_request(table, access_token, returning, on_conflict, select, ignore_duplicates)
+    r = await get_async_http_client().post(url, headers=headers, json=rows)
+    r.raise_for_status()
+    return _insert_result(r, returning)
+
+
+async def rest_select_async(table: str, query: str, access_token: str) -> List[Dict[str, Any]]:
+    url = f"{_base_url()}/rest/v1/{table}?{query}"
+    r = await get_async_http_client().get(url, headers=_auth_headers(access_token))
+    r.raise_for_status()
+    return r.json()
+
+
+async def rest_delete_async(table: str, query: str, access_token: str) -> int:
+    url = f"{_base_url()}/rest/v1/{table}?{query}"
+    headers = {**_auth_headers(access_token), "Prefer": "return=representation"}
+    r = await get_async_http_client().delete(url, headers=headers)
+    r.raise_for_status()
+    return _delete_count(r)
+
+
+async def rest_update_async(
+    table: str,
+    query: str,
+    values: Dict[str, Any],
+    access_token: str,
+) -> Dict[str, Any]:
+    url = f"{_base_url()}/rest/v1/{table}?{query}"
+    headers = {
+        **_auth_headers(access_token),
+        "Prefer": "return=representation",
+        "Content-Type": "application/json",
+    }
+    r = await get_async_http_client().patch(url, headers=headers, json=values)
+    r.raise_for_status()
+    return _update_rows(r)
+
+
+async def rest_rpc_async(function: str, params: Dict[str, Any], access_token: str) -> Any:
+    """
+    Call a Postgres function exposed by PostgREST (POST /rest/v1/rpc/<function>).
+    A missing function surfaces as a 404 HTTPStatusError.
+    """
+    url = f"{_base_url()}/rest/v1/rpc/{function}"
+    r = await get_async_http_client().post(url, headers=_auth_headers(access_token), json=params)
+    r.raise_for_status()
+    return r.json() if r.text else None
 
 
 # ===== Access token validation =====
@@ -181,12 +415,14 @@ async def get_user_from_access_token(access_token: str) -> Dict[str, Any]:
     headers = {"apikey": api_key, "Authorization": f"Bearer {access_token}"}
 
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            resp = await client.get(url, headers=headers)
+        resp = await get_async_http_client().get(url, headers=headers, timeout=10)
     except httpx.RequestError as exc:
         raise SupabaseUnavailableError(f"Supabase Auth에 연결할 수 없습니다: {exc}") from exc
 
     if resp.status_code != 200:
-        raise SupabaseAuthError(f"Supabase /auth/v1/user 호출 실패: {resp.status_code} {resp.text}")
+        raise SupabaseAuthError(
+            f"Supabase /auth/v1/user 호출 실패: {resp.status_code} {resp.text}",
+            status_code=resp.status_code,
+        )
 
     return resp.json()
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import jwt
+
+from app.core.config import settings
+from app.db import supabase as sb
+from app.db.supabase import SupabaseAuthError
+
+logger = logging.getLogger(__name__)
+
+ASYMMETRIC_ALGORITHMS = {"RS256", "ES256", "EdDSA"}
+# An unknown kid triggers at most one JWKS refetch per interval, so forged
+# kids cannot be used to hammer the Supabase JWKS endpoint.
+JWKS_MISS_REFRESH_INTERVAL_SECS = 30.0
+
+
+class JWKSCache:
+    """Supabase signing keys (/auth/v1/.well-known/jwks.json), refreshed on a TTL."""
+
+    def __init__(self) -> None:
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._fetched_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def clear(self) -> None:
+        self._keys = {}
+        self._fetched_at = None
+
+    def _age(self) -> float:
+        if self._fetched_at is None:
+            return float("inf")
+        return time.monotonic() - self._fetched_at
+
+    async def _refresh(self) -> None:
+        url = f"{sb._base_url()}/auth/v1/.well-known/jwks.json"
+        headers = {"apikey": settings.SUPABASE_ANON_KEY}
+        try:
+            resp = await sb.get_async_http_client().get(url, headers=headers, timeout=10)
+            resp.raise_for_status()
+            payload = resp.json()
+        except Exception as exc:
+            # Keep serving the last good key set; callers fall back to remote
+            # validation for anything it cannot verify.
+            logger.warning("Failed to refresh Supabase JWKS", extra={"error": str(exc)})
+            self._fetched_at = time.monotonic()
+            return
+
+        keys: Dict[str, jwt.PyJWK] = {}
+        for entry in payload.get("keys") or []:
+            kid = entry.get("kid")
+            if not kid:
+                continue
+            try:
+                keys[kid] = jwt.PyJWK(entry)
+            except jwt.PyJWKError:
+                continue
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+
+    async def get(self, kid: str) -> Optional[jwt.PyJWK]:
+        if self._age() >= float(settings.SUPABASE_JWKS_TTL_SECS):
+            async with self._lock:
+                if self._age() >= float(settings.SUPABASE_JWKS_TTL_SECS):
+                    await self._refresh()
+        key = self._keys.get(kid)
+        if key is None and self._age() >= JWKS_MISS_REFRESH_INTERVAL_SECS:
+            # Possibly a freshly rotated key.
+            async with self._lock:
+                if kid not in self._keys and self._age() >= JWKS_MISS_REFRESH_INTERVAL_SECS:
+                    await self._refresh()
+            key = self._keys.get(kid)
+        return key
+
+
+jwks_cache = JWKSCache()
+
+
+def _user_from_claims(claims: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape verified claims like the /auth/v1/user payload."""
+    return {
+        "id": claims.get("sub"),
+        "aud": claims.get("aud"),
+        "role": claims.get("role"),
+        "email": claims.get("email"),
+        "phone": claims.get("phone"),
+        "app_metadata": claims.get("app_metadata") or {},
+        "user_metadata": claims.get("user_metadata") or {},
+        "is_anonymous": bool(claims.get("is_anonymous")),
+    }
+
+
+async def verify_access_token_locally(access_token: str) -> Optional[Dict[str, Any]]:
+    """
+    Verify signature, exp, aud and iss of a Supabase access token without a
+    network round trip.
+
+    Returns the user payload, or None when the token cannot be checked
+    locally (unknown kid, or an HS256 token without SUPABASE_JWT_SECRET) and
+    the caller should ask Supabase instead. Raises SupabaseAuthError for
+    tokens that are verifiably invalid.
+    """
+    try:
+        header = jwt.get_unverified_header(access_token)
+    except jwt.InvalidTokenError as exc:
+        raise SupabaseAuthError(f"malformed access token: {exc}") from exc
+
+    algorithm = header.get("alg")
+    if algorithm == "HS256":
+        key: Any = (settings.SUPABASE_JWT_SECRET or "").strip()
+        if not key:
+            return None
+    elif algorithm in ASYMMETRIC_ALGORITHMS:
+        jwk = await jwks_cache.get(str(header.get("kid") or ""))
+        if jwk is None:
+            return None
+        key = jwk.key
+    else:
+        raise SupabaseAuthError(f"unsupported token algorithm: {algorithm}")
+
+    try:
+        claims = jwt.decode(
+            access_token,
+            key,
+            algorithms=[algorithm],
+            audience=settings.SUPABASE_JWT_AUD,
+            issuer=f"{sb._base_url()}/auth/v1",
+            leeway=float(settings.SUPABASE_JWT_LEEWAY_SECS),
+            options={"require": ["exp", "sub"]},
+        )
+    except jwt.InvalidTokenError as exc:
+        raise SupabaseAuthError(f"access token rejected: {exc}") from exc
+    return _user_from_claims(claims)
+
+
+@dataclass
+class _CachedValidation:
+    expires_at: float
+    user: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+
+
+def _token_digest(access_token: str) -> str:
+    # Raw bearer tokens never stay in memory as cache keys.
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+
+
+def _unverified_exp(access_token: str) -> Optional[float]:
+    try:
+        claims = jwt.decode(access_token, options={"verify_signature": False})
+    except jwt.InvalidTokenError:
+        return None
+    exp = claims.get("exp")
+    return float(exp) if isinstance(exp, (int, float)) else None
+
+
+class TokenValidationCache:
+    """
+    LRU of remote /auth/v1/user results keyed by token digest.
+
+    Entries live for SUPABASE_TOKEN_CACHE_TTL_SECS but never past the token's
+    own exp. Concurrent lookups of the same token share one upstream call,
+    and tokens Supabase rejected (401/403) are remembered for
+    SUPABASE_TOKEN_NEGATIVE_TTL_SECS. Outages are never cached.
+    """
+
+    def __init__(self) -> None:
+        self._entries: "OrderedDict[str, _CachedValidation]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.negative_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._inflight.clear()
+        self.hits = self.negative_hits = self.coalesced = self.misses = self.evictions = 0
+
+    def invalidate(self, access_token: str) -> None:
+        self._entries.pop(_token_digest(access_token), None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.coalesced + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": int(settings.SUPABASE_TOKEN_CACHE_MAX_ENTRIES),
+            "lookups": lookups,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            # 업스트림 호출 없이 끝난 조회의 비율
+            "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+        }
+
+    def _store(self, digest: str, entry: _CachedValidation) -> None:
+        max_entries = int(settings.SUPABASE_TOKEN_CACHE_MAX_ENTRIES)
+        self._entries[digest] = entry
+        self._entries.move_to_end(digest)
+        while len(self._entries) > max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _lookup(self, digest: str) -> Optional[_CachedValidation]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[digest]
+            return None
+        self._entries.move_to_end(digest)
+        return entry
+
+    async def _validate(
+        self,
+        digest: str,
+        access_token: str,
+        validate: Callable[[str], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        try:
+            user = await validate(access_token)
+        except SupabaseAuthError as exc:
+            negative_ttl = float(settings.SUPABASE_TOKEN_NEGATIVE_TTL_SECS)
+            if exc.status_code in (401, 403) and negative_ttl > 0:
+                self._store(
+                    digest,
+                    _CachedValidation(
+                        expires_at=time.monotonic() + negative_ttl,
+                        error=str(exc),
+                        status_code=exc.status_code,
+                    ),
+                )
+            raise
+
+        ttl = float(settings.SUPABASE_TOKEN_CACHE_TTL_SECS)
+        exp = _unverified_exp(access_token)
+        if exp is not None:
+            ttl = min(ttl, exp - time.time())
+        if ttl > 0:
+            self._store(digest, _CachedValidation(expires_at=time.monotonic() + ttl, user=user))
+        return user
+
+    async def get_or_validate(
+        self,
+        access_token: str,
+        validate: Callable[[str], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        if float(settings.SUPABASE_TOKEN_CACHE_TTL_SECS) <= 0 or int(settings.SUPABASE_TOKEN_CACHE_MAX_ENTRIES) <= 0:
+            return await validate(access_token)
+
+        digest = _token_digest(access_token)
+        entry = self._lookup(digest)
+        if entry is not None:
+            if entry.user is None:
+                self.negative_hits += 1
+                raise SupabaseAuthError(entry.error or "", status_code=entry.status_code)
+            self.hits += 1
+            return dict(entry.user)
+
+        task = self._inflight.get(digest)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._validate(digest, access_token, validate))
+            self._inflight[digest] = task
+
+            def _done(finished: asyncio.Future) -> None:
+                if self._inflight.get(digest) is finished:
+                    del self._inflight[digest]
+                if not finished.cancelled():
+                    # 모든 대기자가 취소된 경우에도 "exception never retrieved" 경고를 막습니다.
+                    finished.exception()
+
+            task.add_done_callback(_done)
+        # A caller that disconnects must not cancel the lookup other requests share.
+        user = await asyncio.shield(task)
+        return dict(user)
+
+
+token_cache = TokenValidationCache()
+
+
+async def authenticate_access_token(access_token: str) -> Dict[str, Any]:
+    """Resolve the Supabase user for an access token per SUPABASE_AUTH_VERIFY_MODE."""
+    if settings.SUPABASE_AUTH_VERIFY_MODE.strip().lower() == "local":
+        user = await verify_access_token_locally(access_token)
+        if user is not None:
+            return user
+    return await token_cache.get_or_validate(access_token, sb.get_user_from_access_token)
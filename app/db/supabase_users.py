@@ -1,10 +1,9 @@
 from __future__ import annotations
 
-from typing import Dict, Optional
-
-import requests
+from typing import Any, Dict, Optional
 
 from app.core.config import settings
+from app.db.supabase import get_async_http_client, get_http_client
 
 
 def _service_headers() -> Dict[str, str]:
@@ -17,6 +16,29 @@ def _service_headers() -> Dict[str, str]:
     }
 
 
+def _admin_users_url() -> str:
+    base = settings.SUPABASE_URL.rstrip("/")
+    return f"{base}/auth/v1/admin/users"
+
+
+def _match_user_id(payload: Any, email: str) -> Optional[str]:
+    users = payload.get("users") if isinstance(payload, dict) else []
+    for user in users or []:
+        if (user.get("email") or "").lower() == email.lower():
+            return user.get("id")
+    return None
+
+
+def _users_by_id(payload: Any) -> Dict[str, Dict[str, str]]:
+    out: Dict[str, Dict[str, str]] = {}
+    users = payload.get("users") if isinstance(payload, dict) else []
+    for user in users or []:
+        uid = user.get("id")
+        if uid:
+            out[uid] = {"id": uid, "email": user.get("email")}
+    return out
+
+
 def get_user_id_by_email(email: str) -> Optional[str]:
     """
     Look up a Supabase auth user id by email using the admin endpoint.
@@ -24,16 +46,10 @@ def get_user_id_by_email(email: str) -> Optional[str]:
     """
     if not email:
         return None
-    base = settings.SUPABASE_URL.rstrip("/")
-    url = f"{base}/auth/v1/admin/users"
     headers = _service_headers()
-    resp = requests.get(f"{url}?email={email}", headers=headers, timeout=10)
+    resp = get_http_client().get(f"{_admin_users_url()}?email={email}", headers=headers, timeout=10)
     resp.raise_for_status()
-    users = resp.json().get("users") if resp.text else []
-    for user in users or []:
-        if (user.get("email") or "").lower() == email.lower():
-            return user.get("id")
-    return None
+    return _match_user_id(resp.json() if resp.text else {}, email)
 
 
 def get_users_by_ids(user_ids: list[str]) -> Dict[str, Dict[str, str]]:
@@ -43,17 +59,36 @@ def get_users_by_ids(user_ids: list[str]) -> Dict[str, Dict[str, str]]:
     """
     if not user_ids:
         return {}
-    base = settings.SUPABASE_URL.rstrip("/")
-    url = f"{base}/auth/v1/admin/users"
     headers = _service_headers()
-    out: Dict[str, Dict[str, str]] = {}
     # Supabase admin users endpoint allows filtering with id.in
     query = ",".join(user_ids)
-    resp = requests.get(f"{url}?id=in.({query})", headers=headers, timeout=10)
+    resp = get_http_client().get(f"{_admin_users_url()}?id=in.({query})", headers=headers, timeout=10)
     resp.raise_for_status()
-    users = resp.json().get("users") if resp.text else []
-    for user in users or []:
-        uid = user.get("id")
-        if uid:
-            out[uid] = {"id": uid, "email": user.get("email")}
-    return out
+    return _users_by_id(resp.json() if resp.text else {})
+
+
+async def get_user_id_by_email_async(email: str) -> Optional[str]:
+    if not email:
+        return None
+    headers = _service_headers()
+    resp = await get_async_http_client().get(
+        f"{_admin_users_url()}?email={email}",
+        headers=headers,
+        timeout=10,
+    )
+    resp.raise_for_status()
+    return _match_user_id(resp.json() if resp.text else {}, email)
+
+
+async def get_users_by_ids_async(user_ids: list[str]) -> Dict[str, Dict[str, str]]:
+    if not user_ids:
+        return {}
+    headers = _service_headers()
+    query = ",".join(user_ids)
+    resp = await get_async_http_client().get(
+        f"{_admin_users_url()}?id=in.({query})",
+        headers=headers,
+        timeout=10,
+    )
+    resp.raise_for_status()
+    return _users_by_id(resp.json() if resp.text else {})
@@ -1,4 +1,6 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -6,7 +8,9 @@ from starlette.middleware.trustedhost import TrustedHostMiddleware
 
 from app.core.config import settings
 from app.core.middleware import RequestGuardMiddleware, SecurityHeadersMiddleware
+from app.db import supabase as sb
 from app.routes import auth, comment, health, thread, user, debug
+from app.services import background, llm_breaker, llm_client, llm_warmup
 
 missing_required_settings = settings.missing_required_settings
 if missing_required_settings:
@@ -15,6 +19,33 @@ if missing_required_settings:
         ", ".join(missing_required_settings),
     )
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Open the pooled Supabase client on the serving loop so the first request
+    # does not pay for it, and release keep-alive connections on shutdown.
+    sb.get_async_http_client()
+    # Re-admit tripped LLM upstreams from the background instead of user requests.
+    stop_prober = asyncio.Event()
+    prober = asyncio.create_task(llm_breaker.run_prober(llm_client.probe_upstream, stop_prober))
+    # Load Ollama models now and keep them loaded while they see traffic.
+    warmer = asyncio.create_task(
+        llm_warmup.run_warmer(llm_client.warm_model, llm_client.warmup_targets(), stop_prober)
+    )
+    try:
+        yield
+    finally:
+        stop_prober.set()
+        await prober
+        # A warm-up can be waiting on a model load; do not hold shutdown for it.
+        warmer.cancel()
+        with suppress(asyncio.CancelledError):
+            await warmer
+        await background.drain(cancel=True)
+        await sb.aclose_http_clients()
+        await llm_client.aclose_llm_clients()
+
+
 production_docs_enabled = settings.APP_ENV.value != "prod" or settings.ENABLE_PRODUCTION_API_DOCS
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -23,6 +54,7 @@ app = FastAPI(
     docs_url="/docs" if production_docs_enabled else None,
     redoc_url="/redoc" if production_docs_enabled else None,
     openapi_url="/openapi.json" if production_docs_enabled else None,
+    lifespan=lifespan,
 )
 
 
@@ -6,6 +6,7 @@ from typing import Any, Dict, Optional, Tuple
 from fastapi import HTTPException
 
 from app.db import supabase as sb
+from app.db.supabase_auth import token_cache
 from app.schemas.auth import AccessOnlyResp, GoogleExchangeResp, MeResp
 
 
@@ -80,6 +81,7 @@ def current_user_profile(user_json: Dict[str, Any]) -> MeResp:
 def revoke_if_possible(access_token: Optional[str]) -> None:
     if not access_token:
         return
+    token_cache.invalidate(access_token)
     try:
         sb.logout(access_token)
     except Exception:
@@ -4,9 +4,10 @@ import json
 import math
 from typing import Any, Dict, Iterable, List, Optional
 from urllib.parse import quote
-from uuid import uuid4
+from uuid import NAMESPACE_URL, uuid4, uuid5
 
 from app.db import supabase as sb
+from app.repository.concurrency import gather_queries
 
 
 BRANCH_COMMENT_MESSAGE_INDEX = 2_147_483_647
@@ -107,7 +108,7 @@ def _decode_branch_comment(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     }
 
 
-def _accessible_thread_ids(
+async def _accessible_thread_ids(
     user_id: str,
     thread_ids: Iterable[str],
     access_token: str,
@@ -117,26 +118,28 @@ def _accessible_thread_ids(
         return []
 
     safe_ids = ",".join(quote(thread_id) for thread_id in unique_ids[:100])
-    thread_rows = sb.rest_select(
-        "threads",
-        "&".join(
-            [
-                f"id=in.({safe_ids})",
-                "select=id,owner_id,is_workspace",
-            ]
+    thread_rows, member_rows = await gather_queries(
+        sb.rest_select_async(
+            "threads",
+            "&".join(
+                [
+                    f"id=in.({safe_ids})",
+                    "select=id,owner_id,is_workspace",
+                ]
+            ),
+            access_token,
         ),
-        access_token,
-    )
-    member_rows = sb.rest_select(
-        "thread_members",
-        "&".join(
-            [
-                f"thread_id=in.({safe_ids})",
-                f"user_id=eq.{quote(user_id)}",
-                "select=thread_id",
-            ]
+        sb.rest_select_async(
+            "thread_members",
+            "&".join(
+                [
+                    f"thread_id=in.({safe_ids})",
+                    f"user_id=eq.{quote(user_id)}",
+                    "select=thread_id",
+                ]
+            ),
+            access_token,
         ),
-        access_token,
     )
     member_ids = {
         str(row["thread_id"]) for row in member_rows if row.get("thread_id")
@@ -152,17 +155,17 @@ def _accessible_thread_ids(
     ]
 
 
-def list_branch_comments(
+async def list_branch_comments(
     owner_id: str,
     thread_ids: Iterable[str],
     access_token: str,
 ) -> List[Dict[str, Any]]:
-    accessible_ids = _accessible_thread_ids(owner_id, thread_ids, access_token)
+    accessible_ids = await _accessible_thread_ids(owner_id, thread_ids, access_token)
     if not accessible_ids:
         return []
 
     safe_ids = ",".join(quote(thread_id) for thread_id in accessible_ids)
-    rows = sb.rest_select(
+    rows = await sb.rest_select_async(
         "comments",
         "&".join(
             [
@@ -178,7 +181,7 @@ def list_branch_comments(
     return [comment for comment in decoded if comment is not None]
 
 
-def create_branch_comment(
+async def create_branch_comment(
     owner_id: str,
     thread_id: str,
     content: str,
@@ -187,7 +190,7 @@ def create_branch_comment(
     access_token: str,
     author_id: Optional[str] = None,
 ) -> Dict[str, Any]:
-    if not _accessible_thread_ids(owner_id, [thread_id], access_token):
+    if not await _accessible_thread_ids(owner_id, [thread_id], access_token):
         raise BranchCommentForbiddenError
 
     comment_id = str(uuid4())
@@ -197,7 +200,7 @@ def create_branch_comment(
         position_y,
         author_id=author_id or owner_id,
     )
-    sb.rest_insert(
+    rows = await sb.rest_insert_async(
         "comments",
         [
             {
@@ -209,18 +212,8 @@ def create_branch_comment(
             }
         ],
         access_token,
-    )
-    rows = sb.rest_select(
-        "comments",
-        "&".join(
-            [
-                "select=id,thread_id,user_id,content,created_at",
-                f"id=eq.{quote(comment_id)}",
-                f"user_id=eq.{quote(owner_id)}",
-                "limit=1",
-            ]
-        ),
-        access_token,
+        returning=True,
+        select="id,thread_id,user_id,content,created_at",
     )
     if not rows:
         raise BranchCommentNotFoundError
@@ -230,7 +223,7 @@ def create_branch_comment(
     return decoded
 
 
-def update_branch_comment(
+async def update_branch_comment(
     owner_id: str,
     comment_id: str,
     access_token: str,
@@ -240,7 +233,7 @@ def update_branch_comment(
     position_y: Optional[float] = None,
     author_id: Optional[str] = None,
 ) -> Dict[str, Any]:
-    rows = sb.rest_select(
+    rows = await sb.rest_select_async(
         "comments",
         "&".join(
             [
@@ -266,7 +259,7 @@ def update_branch_comment(
         next_y,
         author_id=author_id or existing["author_id"],
     )
-    updated_rows = sb.rest_update(
+    updated_rows = await sb.rest_update_async(
         "comments",
         "&".join(
             [
@@ -285,12 +278,12 @@ def update_branch_comment(
     return decoded
 
 
-def delete_branch_comment(
+async def delete_branch_comment(
     owner_id: str,
     comment_id: str,
     access_token: str,
 ) -> bool:
-    deleted = sb.rest_delete(
+    deleted = await sb.rest_delete_async(
         "comments",
         "&".join(
             [
@@ -304,17 +297,17 @@ def delete_branch_comment(
     return deleted > 0
 
 
-def list_branch_positions(
+async def list_branch_positions(
     owner_id: str,
     thread_ids: Iterable[str],
     access_token: str,
 ) -> List[Dict[str, Any]]:
-    accessible_ids = _accessible_thread_ids(owner_id, thread_ids, access_token)
+    accessible_ids = await _accessible_thread_ids(owner_id, thread_ids, access_token)
     if not accessible_ids:
         return []
 
     safe_ids = ",".join(quote(thread_id) for thread_id in accessible_ids)
-    rows = sb.rest_select(
+    rows = await sb.rest_select_async(
         "comments",
         "&".join(
             [
@@ -327,79 +320,49 @@ def list_branch_positions(
         ),
         access_token,
     )
-    decoded = (_decode_branch_position(row) for row in rows)
-    return [position for position in decoded if position is not None]
+    # Rows saved before positions were keyed by _branch_position_id may
+    # coexist with the keyed row; the most recently created one wins.
+    latest: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        position = _decode_branch_position(row)
+        if position is not None:
+            latest.pop(position["thread_id"], None)
+            latest[position["thread_id"]] = position
+    return list(latest.values())
+
+
+def _branch_position_id(owner_id: str, thread_id: str) -> str:
+    # One stable row id per (user, node) lets saves upsert on the primary key.
+    return str(uuid5(NAMESPACE_URL, f"branch-node-position:{owner_id}:{thread_id}"))
 
 
-def save_branch_position(
+async def save_branch_position(
     owner_id: str,
     thread_id: str,
     position_x: float,
     position_y: float,
     access_token: str,
 ) -> Dict[str, Any]:
-    if not _accessible_thread_ids(owner_id, [thread_id], access_token):
+    if not await _accessible_thread_ids(owner_id, [thread_id], access_token):
         raise BranchCommentForbiddenError
 
-    filters = "&".join(
+    rows = await sb.rest_insert_async(
+        "comments",
         [
-            "select=id,thread_id,content,created_at",
-            f"thread_id=eq.{quote(thread_id)}",
-            f"user_id=eq.{quote(owner_id)}",
-            f"message_index=eq.{BRANCH_NODE_POSITION_MESSAGE_INDEX}",
-            "limit=1",
-        ]
+            {
+                "id": _branch_position_id(owner_id, thread_id),
+                "thread_id": thread_id,
+                "message_index": BRANCH_NODE_POSITION_MESSAGE_INDEX,
+                "user_id": owner_id,
+                "content": _encode_branch_position(position_x, position_y),
+            }
+        ],
+        access_token,
+        returning=True,
+        on_conflict="id",
+        select="id,thread_id,content,created_at",
     )
-    rows = sb.rest_select("comments", filters, access_token)
-    encoded = _encode_branch_position(position_x, position_y)
-
-    if rows:
-        position_id = str(rows[0]["id"])
-        updated_rows = sb.rest_update(
-            "comments",
-            "&".join(
-                [
-                    f"id=eq.{quote(position_id)}",
-                    f"user_id=eq.{quote(owner_id)}",
-                    f"message_index=eq.{BRANCH_NODE_POSITION_MESSAGE_INDEX}",
-                ]
-            ),
-            {"content": encoded},
-            access_token,
-        )
-        row = (
-            updated_rows[0]
-            if isinstance(updated_rows, list) and updated_rows
-            else None
-        )
-    else:
-        position_id = str(uuid4())
-        sb.rest_insert(
-            "comments",
-            [
-                {
-                    "id": position_id,
-                    "thread_id": thread_id,
-                    "message_index": BRANCH_NODE_POSITION_MESSAGE_INDEX,
-                    "user_id": owner_id,
-                    "content": encoded,
-                }
-            ],
-            access_token,
-        )
-        inserted_rows = sb.rest_select(
-            "comments",
-            "&".join(
-                [
-                    "select=id,thread_id,content,created_at",
-                    f"id=eq.{quote(position_id)}",
-                    f"user_id=eq.{quote(owner_id)}",
-                    "limit=1",
-                ]
-            ),
-            access_token,
-        )
-        row = inserted_rows[0] if inserted_rows else None
+    row = rows[0] if rows else None
 
     decoded = _decode_branch_position(row) if row else None
     if decoded is None:
@@ -407,20 +370,20 @@ def save_branch_position(
     return decoded
 
 
-def delete_branch_positions(
+async def delete_branch_positions(
     owner_id: str,
     thread_ids: Iterable[str],
     access_token: str,
 ) -> int:
     unique_ids = list(dict.fromkeys(str(thread_id) for thread_id in thread_ids))
-    accessible_ids = _accessible_thread_ids(owner_id, unique_ids, access_token)
+    accessible_ids = await _accessible_thread_ids(owner_id, unique_ids, access_token)
     if len(accessible_ids) != len(unique_ids):
         raise BranchCommentForbiddenError
     if not accessible_ids:
         return 0
 
     safe_ids = ",".join(quote(thread_id) for thread_id in accessible_ids)
-    return sb.rest_delete(
+    return await sb.rest_delete_async(
         "comments",
         "&".join(
             [
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+from typing import Any, Awaitable, List, Optional
+
+from app.core.config import settings
+
+
+async def gather_queries(*queries: Awaitable[Any], limit: Optional[int] = None) -> List[Any]:
+    """
+    Await independent Supabase reads concurrently and return their results in
+    argument order.
+
+    At most ``limit`` (default SUPABASE_QUERY_CONCURRENCY) queries are in
+    flight at once, so a single request cannot monopolize the shared pool.
+    If one query fails, the others are cancelled and the error is re-raised.
+    """
+    if not queries:
+        return []
+    semaphore = asyncio.Semaphore(max(1, limit or settings.SUPABASE_QUERY_CONCURRENCY))
+
+    async def run(query: Awaitable[Any]) -> Any:
+        async with semaphore:
+            return await query
+
+    tasks = [asyncio.ensure_future(run(query)) for query in queries]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Tasks cancelled before their first step never awaited their query.
+        for query in queries:
+            if inspect.iscoroutine(query) and inspect.getcoroutinestate(query) == inspect.CORO_CREATED:
+                query.close()
+        raise
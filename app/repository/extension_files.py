@@ -3,12 +3,12 @@ from __future__ import annotations
 from typing import Any, Dict, List
 from urllib.parse import quote
 
-import requests
+import httpx
 
 from app.db import supabase as sb
 
 
-def list_extension_files_for_user(user_id: str, access_token: str) -> List[Dict[str, Any]]:
+async def list_extension_files_for_user(user_id: str, access_token: str) -> List[Dict[str, Any]]:
     """
     Fetch all extension file records for the given user_id from Supabase.
     """
@@ -24,10 +24,10 @@ def list_extension_files_for_user(user_id: str, access_token: str) -> List[Dict[
     )
 
     try:
-        rows = sb.rest_select("extension_files", query, access_token)
-    except requests.HTTPError as exc:
+        rows = await sb.rest_select_async("extension_files", query, access_token)
+    except httpx.HTTPStatusError as exc:
         # If the table does not exist or is not exposed, Supabase returns 404.
-        if exc.response is not None and exc.response.status_code == 404:
+        if exc.response.status_code == 404:
             return []
         raise
 
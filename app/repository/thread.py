@@ -1,14 +1,17 @@
 from __future__ import annotations
-from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Tuple
 from uuid import uuid4
 from datetime import datetime, timedelta, timezone
 from urllib.parse import quote
+import asyncio
 import json
 import re
-import requests
+import httpx
 
 from app.db import supabase as sb
-from app.services import llm_client
+from app.repository.concurrency import gather_queries
+from app.services import background, llm_admission, llm_client, llm_profiles
 from app.core.config import settings
 import logging
 
@@ -19,6 +22,16 @@ BRANCH_META_PREFIX = "__BRANCH_META__:"
 # Reserve the maximum signed int32 value and exclude it from every public and
 # LLM-context query, avoiding a database migration.
 BRANCH_META_INDEX = 2_147_483_647
+# The index below it holds the persisted Ollama context (see
+# store_ollama_context), which is too large for the shared marker.
+OLLAMA_CONTEXT_INDEX = BRANCH_META_INDEX - 1
+OLLAMA_CONTEXT_PREFIX = "__OLLAMA_CONTEXT__:"
+# The rolling conversation summary gets its own row as well, so its text is
+# not rewritten (or sent in a PATCH filter) with every metadata update.
+CONVERSATION_SUMMARY_INDEX = OLLAMA_CONTEXT_INDEX - 1
+CONVERSATION_SUMMARY_PREFIX = "__CONVERSATION_SUMMARY__:"
+# Visible messages stay below every reserved index.
+RESERVED_INDEX_START = CONVERSATION_SUMMARY_INDEX
 TUTORIAL_TITLE = "tutorial branch"
 TUTORIAL_LEGACY_TITLE = "test branch"
 
@@ -42,7 +55,7 @@ def _normalize_role(role: str) -> str:
     return "assistant"
 
 
-def _can_access_thread(user_id: str, thread_id: str, access_token: str) -> bool:
+async def _can_access_thread(user_id: str, thread_id: str, access_token: str) -> bool:
     """
     접근 허용 조건
     1) threads.owner_id == user_id
@@ -59,7 +72,7 @@ def _can_access_thread(user_id: str, thread_id: str, access_token: str) -> bool:
         "select=id",
         "limit=1",
     ])
-    owner_rows = sb.rest_select("threads", q_owner, access_token)
+    owner_rows = await sb.rest_select_async("threads", q_owner, access_token)
     if owner_rows:
         return True
 
@@ -71,11 +84,11 @@ def _can_access_thread(user_id: str, thread_id: str, access_token: str) -> bool:
         "select=thread_id",
         "limit=1",
     ])
-    mrows = sb.rest_select("thread_members", q_member, access_token)
+    mrows = await sb.rest_select_async("thread_members", q_member, access_token)
     return bool(mrows)
 
 # 스레드 생성 + 초기 메시지 삽입
-def create_thread_with_messages(owner_id: str, payload: Dict[str, Any], access_token: str) -> str:
+async def create_thread_with_messages(owner_id: str, payload: Dict[str, Any], access_token: str) -> str:
     thread_id = str(uuid4())
     now = datetime.now(timezone.utc).isoformat()
     t = [{
@@ -84,7 +97,7 @@ def create_thread_with_messages(owner_id: str, payload: Dict[str, Any], access_t
         "owner_id": owner_id,
         "created_at": now,
     }]
-    sb.rest_insert("threads", t, access_token=access_token)
+    await sb.rest_insert_async("threads", t, access_token=access_token)
 
     msgs = payload.get("messages") or []
     if msgs:
@@ -101,7 +114,7 @@ def create_thread_with_messages(owner_id: str, payload: Dict[str, Any], access_t
                 }
             )
             next_index += 1
-        sb.rest_insert("messages", rows, access_token=access_token)
+        await sb.rest_insert_async("messages", rows, access_token=access_token)
 
     return thread_id
 
@@ -120,8 +133,8 @@ def _decode_branch_metadata(content: str) -> Optional[Dict[str, Any]]:
     return value if isinstance(value, dict) else None
 
 
-def _get_thread_metadata(thread_id: str, access_token: str) -> Optional[Dict[str, Any]]:
-    rows = sb.rest_select(
+async def _get_thread_metadata(thread_id: str, access_token: str) -> Optional[Dict[str, Any]]:
+    rows = await sb.rest_select_async(
         "messages",
         "&".join(
             [
@@ -138,28 +151,28 @@ def _get_thread_metadata(thread_id: str, access_token: str) -> Optional[Dict[str
     return _decode_branch_metadata(rows[0].get("content") or "")
 
 
-def get_branch_root_id(thread_id: str, access_token: str) -> str:
-    metadata = _get_thread_metadata(thread_id, access_token) or {}
+async def get_branch_root_id(thread_id: str, access_token: str) -> str:
+    metadata = await _get_thread_metadata(thread_id, access_token) or {}
     return str(metadata.get("root_thread_id") or thread_id)
 
 
-def is_branch_root(thread_id: str, access_token: str) -> bool:
-    metadata = _get_thread_metadata(thread_id, access_token) or {}
+async def is_branch_root(thread_id: str, access_token: str) -> bool:
+    metadata = await _get_thread_metadata(thread_id, access_token) or {}
     return (
         not metadata.get("parent_thread_id")
         or metadata.get("root_thread_id") == thread_id
     )
 
 
-def branch_lineage_thread_ids(
+async def branch_lineage_thread_ids(
     owner_id: str,
     root_thread_id: str,
     access_token: str,
 ) -> List[str]:
     """Return a root and every owned branch descendant in its lineage."""
-    owned_threads = _owned_thread_rows(owner_id, access_token)
+    owned_threads = await _owned_thread_rows(owner_id, access_token)
     owned_ids = [str(row["id"]) for row in owned_threads if row.get("id")]
-    metadata_by_id = _metadata_for_thread_ids(owned_ids, access_token)
+    metadata_by_id = await _metadata_for_thread_ids(owned_ids, access_token)
     lineage_ids = [
         thread_id
         for thread_id in owned_ids
@@ -172,7 +185,7 @@ def branch_lineage_thread_ids(
     return list(dict.fromkeys(lineage_ids))
 
 
-def _persist_thread_metadata(
+async def _persist_thread_metadata(
     thread_id: str,
     metadata: Dict[str, Any],
     access_token: str,
@@ -184,16 +197,18 @@ def _persist_thread_metadata(
             f"index=eq.{BRANCH_META_INDEX}",
         ]
     )
-    existing = sb.rest_select(
+    # PATCH returns the matched rows; only a thread without a marker yet
+    # needs the follow-up insert.
+    updated = await sb.rest_update_async(
         "messages",
-        query + "&select=index&limit=1",
+        query + "&select=index",
+        {"role": "assistant", "content": content},
         access_token,
     )
-    if existing:
-        sb.rest_update("messages", query, {"role": "assistant", "content": content}, access_token)
+    if isinstance(updated, list) and updated:
         return
 
-    sb.rest_insert(
+    await sb.rest_insert_async(
         "messages",
         [
             {
@@ -208,8 +223,134 @@ def _persist_thread_metadata(
     )
 
 
-def _owned_thread_rows(owner_id: str, access_token: str) -> List[Dict[str, Any]]:
-    return sb.rest_select(
+# Set once the merge_thread_metadata RPC is known to be missing on this
+# database (migration not applied yet), so later merges go straight to the
+# compare-and-swap fallback.
+_merge_rpc_missing = False
+
+# Conditional PATCHes tried before a contended fallback merge gives up.
+METADATA_MERGE_ATTEMPTS = 5
+
+
+def _apply_metadata_patch(
+    metadata: Dict[str, Any],
+    patch: Dict[str, Any],
+    order_key: Optional[str],
+) -> Optional[Dict[str, Any]]:
+    """``metadata`` with ``patch`` merged in, or None when every key was newer already."""
+    accepted = {}
+    for key, value in patch.items():
+        stored = metadata.get(key)
+        if order_key and isinstance(stored, dict) and isinstance(stored.get(order_key), (int, float)):
+            incoming = value.get(order_key, -1) if isinstance(value, dict) else -1
+            if stored[order_key] > incoming:
+                continue
+        accepted[key] = value
+    return {**metadata, **accepted} if accepted else None
+
+
+async def _merge_thread_metadata(
+    thread_id: str,
+    patch: Dict[str, Any],
+    access_token: str,
+    *,
+    create: bool = True,
+    order_key: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Set top-level keys of the thread's metadata marker, leaving the others
+    as they are when the write lands (concurrent jobs own different keys).
+
+    - create: without a marker, start from _default_thread_metadata;
+      otherwise write nothing.
+    - order_key: keep a stored key whose ``order_key`` number is larger than
+      the incoming one, so a late job cannot overwrite newer state.
+
+    Deleted threads are never written. Returns the merged metadata, or None
+    when nothing was written for the reasons above.
+
+    Uses the merge_thread_metadata Postgres function (supabase/migrations);
+    until it is applied, falls back to a PATCH filtered on the content that
+    was read, retried while other writers get in first.
+    """
+    global _merge_rpc_missing
+    if not _merge_rpc_missing:
+        try:
+            merged = await sb.rest_rpc_async(
+                "merge_thread_metadata",
+                {
+                    "p_thread_id": thread_id,
+                    "p_patch": patch,
+                    "p_create": create,
+                    "p_order_key": order_key,
+                },
+                access_token,
+            )
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code != 404:
+                raise
+            _merge_rpc_missing = True
+            logger.warning("merge_thread_metadata RPC is not deployed; using conditional PATCH")
+        else:
+            return merged if isinstance(merged, dict) else None
+
+    query = "&".join(
+        [
+            f"thread_id=eq.{quote(thread_id)}",
+            f"index=eq.{BRANCH_META_INDEX}",
+        ]
+    )
+    for _ in range(METADATA_MERGE_ATTEMPTS):
+        rows = await sb.rest_select_async("messages", query + "&select=content&limit=1", access_token)
+        current = rows[0].get("content") if rows else None
+        metadata = _decode_branch_metadata(current or "")
+        if metadata is None:
+            if not create:
+                return None
+            metadata = _default_thread_metadata(thread_id)
+        if metadata.get("is_deleted"):
+            return None
+        merged = _apply_metadata_patch(metadata, patch, order_key)
+        if merged is None:
+            return metadata
+        content = _encode_branch_metadata(merged)
+
+        if not rows:
+            try:
+                await sb.rest_insert_async(
+                    "messages",
+                    [
+                        {
+                            "thread_id": thread_id,
+                            "role": "assistant",
+                            "content": content,
+                            "index": BRANCH_META_INDEX,
+                            "created_at": datetime.now(timezone.utc).isoformat(),
+                        }
+                    ],
+                    access_token,
+                )
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code != 409:
+                    raise
+                continue
+            return merged
+
+        # Lands only if nobody rewrote the marker since it was read.
+        unchanged = "content=is.null" if current is None else f"content=eq.{quote(current, safe='')}"
+        updated = await sb.rest_update_async(
+            "messages",
+            f"{query}&{unchanged}&select=index",
+            {"role": "assistant", "content": content},
+            access_token,
+        )
+        if isinstance(updated, list) and updated:
+            return merged
+    raise RuntimeError(f"Thread metadata for {thread_id} kept changing; gave up merging {sorted(patch)}")
+
+
+async def _owned_thread_rows(owner_id: str, access_token: str) -> List[Dict[str, Any]]:
+    return await sb.rest_select_async(
         "threads",
         "&".join(
             [
@@ -222,14 +363,14 @@ def _owned_thread_rows(owner_id: str, access_token: str) -> List[Dict[str, Any]]
     )
 
 
-def _metadata_for_thread_ids(
+async def _metadata_for_thread_ids(
     thread_ids: List[str],
     access_token: str,
 ) -> Dict[str, Dict[str, Any]]:
     if not thread_ids:
         return {}
     safe_ids = ",".join(quote(thread_id) for thread_id in thread_ids)
-    rows = sb.rest_select(
+    rows = await sb.rest_select_async(
         "messages",
         "&".join(
             [
@@ -249,11 +390,11 @@ def _metadata_for_thread_ids(
     return result
 
 
-def _ensure_tutorial_branch(owner_id: str, access_token: str) -> None:
+async def _ensure_tutorial_branch(owner_id: str, access_token: str) -> None:
     """Create one private tutorial copy per account, or adopt the legacy demo."""
-    owned_threads = _owned_thread_rows(owner_id, access_token)
+    owned_threads = await _owned_thread_rows(owner_id, access_token)
     owned_ids = [str(row["id"]) for row in owned_threads if row.get("id")]
-    metadata_by_id = _metadata_for_thread_ids(owned_ids, access_token)
+    metadata_by_id = await _metadata_for_thread_ids(owned_ids, access_token)
     thread_by_id = {
         str(row["id"]): row for row in owned_threads if row.get("id")
     }
@@ -280,7 +421,7 @@ def _ensure_tutorial_branch(owner_id: str, access_token: str) -> None:
             ).strip().lower()
             == TUTORIAL_LEGACY_TITLE
         ):
-            sb.rest_update(
+            await sb.rest_update_async(
                 "threads",
                 f"id=eq.{quote(active_root_id)}&owner_id=eq.{quote(owner_id)}",
                 {"title": TUTORIAL_TITLE},
@@ -308,7 +449,7 @@ def _ensure_tutorial_branch(owner_id: str, access_token: str) -> None:
         None,
     )
     if legacy_root_id:
-        sb.rest_update(
+        await sb.rest_update_async(
             "threads",
             f"id=eq.{quote(legacy_root_id)}&owner_id=eq.{quote(owner_id)}",
             {"title": TUTORIAL_TITLE},
@@ -319,7 +460,7 @@ def _ensure_tutorial_branch(owner_id: str, access_token: str) -> None:
                 thread_id == legacy_root_id
                 or metadata.get("root_thread_id") == legacy_root_id
             ):
-                _persist_thread_metadata(
+                await _persist_thread_metadata(
                     thread_id,
                     {**metadata, "is_tutorial": True},
                     access_token,
@@ -383,13 +524,13 @@ def _ensure_tutorial_branch(owner_id: str, access_token: str) -> None:
             }
         )
 
-    sb.rest_insert("threads", thread_rows, access_token)
+    await sb.rest_insert_async("threads", thread_rows, access_token)
     try:
-        sb.rest_insert("messages", message_rows, access_token)
+        await sb.rest_insert_async("messages", message_rows, access_token)
     except Exception:
         for thread_id in reversed(node_ids):
             try:
-                sb.rest_delete(
+                await sb.rest_delete_async(
                     "threads",
                     f"id=eq.{quote(thread_id)}&owner_id=eq.{quote(owner_id)}",
                     access_token,
@@ -399,7 +540,16 @@ def _ensure_tutorial_branch(owner_id: str, access_token: str) -> None:
         raise
 
 
-def remember_thread_model(
+def _default_thread_metadata(thread_id: str) -> Dict[str, Any]:
+    return {
+        "version": 1,
+        "parent_thread_id": None,
+        "root_thread_id": thread_id,
+        "context_preview": None,
+    }
+
+
+async def remember_thread_model(
     owner_id: str,
     thread_id: str,
     model: str,
@@ -409,7 +559,7 @@ def remember_thread_model(
     if not (model or "").lower().startswith("gemini-"):
         return False
 
-    rows = sb.rest_select(
+    rows = await sb.rest_select_async(
         "threads",
         "&".join(
             [
@@ -424,14 +574,7 @@ def remember_thread_model(
     if not rows:
         return False
 
-    metadata = _get_thread_metadata(thread_id, access_token) or {
-        "version": 1,
-        "parent_thread_id": None,
-        "root_thread_id": thread_id,
-        "context_preview": None,
-    }
-    metadata["model"] = model
-    _persist_thread_metadata(thread_id, metadata, access_token)
+    await _merge_thread_metadata(thread_id, {"model": model}, access_token)
     return True
 
 
@@ -472,10 +615,11 @@ def _single_sentence_summary(text: str) -> str:
     return summary
 
 
-async def _summarize_branch_context(
+async def _generate_branch_summary(
     messages: List[Dict[str, Any]],
     model: str,
 ) -> str:
+    """One-sentence LLM summary of the last 20 visible messages; raises on failure."""
     visible = [
         {
             "role": _normalize_role(row.get("role") or ""),
@@ -503,12 +647,373 @@ async def _summarize_branch_context(
             "content": f"요약할 이전 대화:\n{transcript}",
         },
     ]
+    # Banner summaries yield to interactive chat when the upstream is busy.
+    generated = await llm_client.generate(
+        model=model,
+        messages=prompt,
+        priority=llm_admission.SUMMARY,
+        profile=llm_profiles.BRANCH_SUMMARY,
+    )
+    return _single_sentence_summary(generated)
+
+
+# The branch banner depends only on the parent's recent messages and the
+# model, so fanning out several branches from one point reuses one summary.
+# The latest one is also kept in the parent's metadata marker under this key,
+# which survives restarts and is visible to every worker.
+BRANCH_SUMMARY_KEY = "branch_summary"
+
+BranchSummaryKey = Tuple[str, int, str]
+
+
+class BranchSummaryCache:
+    """
+    LRU of branch summaries keyed by (parent thread id, last message index,
+    effective model). Concurrent misses for the same key share one LLM call;
+    failed summaries are never cached.
+    """
+
+    def __init__(self) -> None:
+        self._entries: "OrderedDict[BranchSummaryKey, str]" = OrderedDict()
+        self._inflight: Dict[BranchSummaryKey, "asyncio.Future[str]"] = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._inflight.clear()
+        self.hits = self.coalesced = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": int(settings.BRANCH_SUMMARY_CACHE_MAX_ENTRIES),
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def get(self, key: BranchSummaryKey) -> Optional[str]:
+        preview = self._entries.get(key)
+        if preview is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return preview
+
+    def put(self, key: BranchSummaryKey, preview: str) -> None:
+        max_entries = int(settings.BRANCH_SUMMARY_CACHE_MAX_ENTRIES)
+        if max_entries <= 0:
+            return
+        self._entries[key] = preview
+        self._entries.move_to_end(key)
+        while len(self._entries) > max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_create(
+        self,
+        key: BranchSummaryKey,
+        create: Callable[[], Awaitable[str]],
+    ) -> str:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future: "asyncio.Future[str]" = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            preview = await create()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Nobody else may be waiting; don't log "exception never retrieved".
+            future.exception()
+            raise
+        else:
+            self.put(key, preview)
+            future.set_result(preview)
+            return preview
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+
+branch_summary_cache = BranchSummaryCache()
+
+
+def _branch_summary_key(
+    parent_thread_id: str,
+    messages: List[Dict[str, Any]],
+    model: str,
+) -> Optional[BranchSummaryKey]:
+    if not any((row.get("content") or "").strip() for row in messages):
+        return None
+    last_index = max(int(row.get("index") or 0) for row in messages)
+    summary_model = llm_profiles.get_profile(llm_profiles.BRANCH_SUMMARY).resolve_model(model) or model
+    return (parent_thread_id, last_index, llm_client.resolve_gemini_model(summary_model))
+
+
+def _stored_branch_summary(
+    key: BranchSummaryKey,
+    metadata: Optional[Dict[str, Any]],
+) -> Optional[str]:
+    """The summary persisted in the parent's marker, if it matches ``key``."""
+    stored = (metadata or {}).get(BRANCH_SUMMARY_KEY)
+    if not isinstance(stored, dict):
+        return None
+    if (stored.get("last_index"), stored.get("model")) != (key[1], key[2]):
+        return None
+    preview = stored.get("preview")
+    return preview if isinstance(preview, str) and preview else None
+
+
+async def _read_conversation_summary(
+    thread_id: str, access_token: str
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Return the stored summary and its row's created_at (the write stamp)."""
+    rows = await sb.rest_select_async(
+        "messages",
+        "&".join(
+            [
+                f"thread_id=eq.{quote(thread_id)}",
+                f"index=eq.{CONVERSATION_SUMMARY_INDEX}",
+                "select=content,created_at",
+                "order=created_at.desc",
+                "limit=1",
+            ]
+        ),
+        access_token,
+    )
+    if not rows:
+        return None, None
+    content = rows[0].get("content") or ""
+    stamp = rows[0].get("created_at")
+    if not content.startswith(CONVERSATION_SUMMARY_PREFIX):
+        return None, stamp
     try:
-        generated = await llm_client.generate(model=model, messages=prompt)
-        return _single_sentence_summary(generated)
-    except Exception:
-        logger.exception("Failed to summarize branch context; using a local fallback")
-        return _single_sentence_summary(_context_preview(messages))
+        summary = json.loads(content[len(CONVERSATION_SUMMARY_PREFIX):])
+    except (TypeError, ValueError):
+        return None, stamp
+    return (summary if isinstance(summary, dict) else None), stamp
+
+
+async def get_conversation_summary(thread_id: str, access_token: str) -> Optional[Dict[str, Any]]:
+    """Return {"text", "through_index", "updated_at"} or None."""
+    summary, _ = await _read_conversation_summary(thread_id, access_token)
+    if not isinstance(summary, dict) or not (summary.get("text") or "").strip():
+        return None
+    return summary
+
+
+async def _store_conversation_summary(
+    thread_id: str, summary: Dict[str, Any], access_token: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Write ``summary`` unless the stored one already covers more messages.
+
+    The row's created_at is rewritten on every store and doubles as a version:
+    the PATCH only applies while it still matches what was read, so a
+    concurrent writer is detected without sending the summary text back in
+    the filter. Returns the summary that ended up stored.
+    """
+    content = CONVERSATION_SUMMARY_PREFIX + json.dumps(summary, ensure_ascii=False, separators=(",", ":"))
+    for _ in range(METADATA_MERGE_ATTEMPTS):
+        stored, stamp = await _read_conversation_summary(thread_id, access_token)
+        if stored is not None and int(stored.get("through_index", -1)) > int(summary["through_index"]):
+            return stored
+        now = datetime.now(timezone.utc).isoformat()
+        if stamp is None:
+            await sb.rest_insert_async(
+                "messages",
+                [
+                    {
+                        "thread_id": thread_id,
+                        "role": "assistant",
+                        "content": content,
+                        "index": CONVERSATION_SUMMARY_INDEX,
+                        "created_at": now,
+                    }
+                ],
+                access_token,
+            )
+            return summary
+        updated = await sb.rest_update_async(
+            "messages",
+            "&".join(
+                [
+                    f"thread_id=eq.{quote(thread_id)}",
+                    f"index=eq.{CONVERSATION_SUMMARY_INDEX}",
+                    f"created_at=eq.{quote(str(stamp), safe='')}",
+                    "select=index",
+                ]
+            ),
+            {"role": "assistant", "content": content, "created_at": now},
+            access_token,
+        )
+        if isinstance(updated, list) and updated:
+            return summary
+    logger.warning("Conversation summary kept changing; dropping this update", extra={"thread_id": thread_id})
+    return None
+
+
+async def _list_messages_in_range(
+    thread_id: str,
+    after_index: int,
+    through_index: int,
+    limit: int,
+    access_token: str,
+) -> List[Dict[str, Any]]:
+    return await sb.rest_select_async(
+        "messages",
+        "&".join(
+            [
+                f"thread_id=eq.{quote(thread_id)}",
+                f"index=gt.{after_index}",
+                f"index=lte.{through_index}",
+                f"index=lt.{RESERVED_INDEX_START}",
+                "select=index,role,content",
+                "order=index.asc",
+                f"limit={limit}",
+            ]
+        ),
+        access_token,
+    )
+
+
+async def _fold_into_summary(summary: str, rows: List[Dict[str, Any]], model: str) -> str:
+    transcript = "\n".join(
+        f"{_normalize_role(row.get('role') or '')}: {(row.get('content') or '').strip()[:2000]}"
+        for row in rows
+        if (row.get("content") or "").strip()
+    )
+    prompt = [
+        {
+            "role": "system",
+            "content": (
+                "당신은 대화 기록을 관리합니다. 기존 요약에 새 대화 내용을 반영해 "
+                "'지금까지의 대화' 요약을 갱신하세요. 사실, 결정, 사용자의 요구와 선호, "
+                "미해결 질문을 보존하고, 대화와 같은 언어로 "
+                f"{settings.CHAT_SUMMARY_MAX_CHARS}자 이내의 평문으로만 답하세요."
+            ),
+        },
+        {
+            "role": "user",
+            "content": f"기존 요약:\n{summary or '(없음)'}\n\n새 대화:\n{transcript}",
+        },
+    ]
+    generated = await llm_client.generate(
+        model=model,
+        messages=prompt,
+        priority=llm_admission.SUMMARY,
+        profile=llm_profiles.CONVERSATION_SUMMARY,
+    )
+    return (generated or "").strip()[: settings.CHAT_SUMMARY_MAX_CHARS]
+
+
+async def refresh_conversation_summary(
+    thread_id: str,
+    latest_index: int,
+    model: str,
+    access_token: str,
+) -> Optional[Dict[str, Any]]:
+    """
+    Fold messages older than the recent window into the thread's rolling
+    summary. Work is batched: nothing happens until at least
+    CHAT_SUMMARY_MIN_NEW_MESSAGES messages have left the window.
+    """
+    target = latest_index - int(settings.CHAT_SUMMARY_RECENT_MESSAGES)
+    summary = await get_conversation_summary(thread_id, access_token) or {}
+    through = int(summary.get("through_index", -1))
+    if target - through < int(settings.CHAT_SUMMARY_MIN_NEW_MESSAGES):
+        return summary or None
+
+    text = summary.get("text") or ""
+    batch = max(1, int(settings.CHAT_SUMMARY_BATCH_MESSAGES))
+    while through < target:
+        rows = await _list_messages_in_range(thread_id, through, target, batch, access_token)
+        if not rows:
+            break
+        text = await _fold_into_summary(text, rows, model) or text
+        through = int(rows[-1]["index"])
+
+    summary = {
+        "text": text,
+        "through_index": through,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    await _store_conversation_summary(thread_id, summary, access_token)
+    return summary
+
+
+async def get_ollama_context(thread_id: str, access_token: str) -> Optional[Dict[str, Any]]:
+    """Return {"model", "through_index", "context"} or None."""
+    rows = await sb.rest_select_async(
+        "messages",
+        "&".join(
+            [
+                f"thread_id=eq.{quote(thread_id)}",
+                f"index=eq.{OLLAMA_CONTEXT_INDEX}",
+                "select=content",
+                "limit=1",
+            ]
+        ),
+        access_token,
+    )
+    content = (rows[0].get("content") or "") if rows else ""
+    if not content.startswith(OLLAMA_CONTEXT_PREFIX):
+        return None
+    try:
+        entry = json.loads(content[len(OLLAMA_CONTEXT_PREFIX):])
+    except (TypeError, ValueError):
+        return None
+    return entry if isinstance(entry, dict) else None
+
+
+async def store_ollama_context(thread_id: str, entry: Dict[str, Any], access_token: str) -> None:
+    """
+    Persist the last Ollama generate-mode ``context`` for the thread (see
+    ollama_context) in its own reserved row; only used with
+    OLLAMA_CONTEXT_PERSIST. The latest turn wins.
+    """
+    content = OLLAMA_CONTEXT_PREFIX + json.dumps(entry, separators=(",", ":"))
+    query = "&".join(
+        [
+            f"thread_id=eq.{quote(thread_id)}",
+            f"index=eq.{OLLAMA_CONTEXT_INDEX}",
+        ]
+    )
+    updated = await sb.rest_update_async(
+        "messages",
+        query + "&select=index",
+        {"role": "assistant", "content": content},
+        access_token,
+    )
+    if isinstance(updated, list) and updated:
+        return
+
+    await sb.rest_insert_async(
+        "messages",
+        [
+            {
+                "thread_id": thread_id,
+                "role": "assistant",
+                "content": content,
+                "index": OLLAMA_CONTEXT_INDEX,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            }
+        ],
+        access_token,
+    )
 
 
 async def create_thread_branch(
@@ -517,7 +1022,7 @@ async def create_thread_branch(
     access_token: str,
     requested_model: Optional[str] = None,
 ) -> Dict[str, Any]:
-    parent_rows = sb.rest_select(
+    parent_rows = await sb.rest_select_async(
         "threads",
         "&".join(
             [
@@ -534,7 +1039,7 @@ async def create_thread_branch(
     if parent.get("owner_id") != owner_id:
         raise BranchForbiddenError("Only the thread owner can create a branch")
 
-    metadata = _get_thread_metadata(parent_thread_id, access_token)
+    metadata = await _get_thread_metadata(parent_thread_id, access_token)
     if (metadata or {}).get("is_deleted"):
         raise BranchNotFoundError("Thread has been deleted")
     stored_model = (metadata or {}).get("model")
@@ -549,27 +1054,44 @@ async def create_thread_branch(
         if stored_effective_model != requested_effective_model:
             raise BranchModelError("Requested model does not match the thread model")
 
-    messages = sb.rest_select(
+    messages = await sb.rest_select_async(
         "messages",
         "&".join(
             [
                 f"thread_id=eq.{quote(parent_thread_id)}",
                 "index=gte.0",
-                f"index=lt.{BRANCH_META_INDEX}",
+                f"index=lt.{RESERVED_INDEX_START}",
                 "select=index,role,content,created_at",
                 "order=index.asc",
             ]
         ),
         access_token,
     )
-    preview = await _summarize_branch_context(messages, str(model))
+    # An LLM summary costs a full completion: reuse one made for the same
+    # parent state, otherwise answer with the local preview now and let a
+    # background task patch the marker when it is ready.
+    summary_key = _branch_summary_key(parent_thread_id, messages, str(model))
+    cached_preview = None
+    if summary_key is not None:
+        cached_preview = branch_summary_cache.get(summary_key)
+        if cached_preview is None:
+            cached_preview = _stored_branch_summary(summary_key, metadata)
+            if cached_preview is not None:
+                branch_summary_cache.put(summary_key, cached_preview)
+    provisional = summary_key is not None and cached_preview is None
+    if cached_preview is not None:
+        preview = cached_preview
+    elif provisional:
+        preview = _single_sentence_summary(_context_preview(messages))
+    else:
+        preview = "이전 대화 내용이 없습니다."
     child_thread_id = str(uuid4())
     now = datetime.now(timezone.utc).isoformat()
     title = (parent.get("title") or "").strip()
     root_thread_id = (metadata or {}).get("root_thread_id") or parent_thread_id
     root = parent
     if root_thread_id != parent_thread_id:
-        root_rows = sb.rest_select(
+        root_rows = await sb.rest_select_async(
             "threads",
             "&".join(
                 [
@@ -588,7 +1110,7 @@ async def create_thread_branch(
     # Mark the original/root thread as Gemini as well. This also makes legacy
     # Gemini threads branchable after the first explicit branch request.
     if metadata is None:
-        _persist_thread_metadata(
+        await _persist_thread_metadata(
             parent_thread_id,
             {
                 "version": 1,
@@ -600,7 +1122,7 @@ async def create_thread_branch(
             access_token,
         )
 
-    sb.rest_insert(
+    await sb.rest_insert_async(
         "threads",
         [
             {
@@ -615,7 +1137,7 @@ async def create_thread_branch(
     )
     try:
         if root_is_workspace:
-            root_members = sb.rest_select(
+            root_members = await sb.rest_select_async(
                 "thread_members",
                 "&".join(
                     [
@@ -626,7 +1148,7 @@ async def create_thread_branch(
                 access_token,
             )
             if root_members:
-                sb.rest_insert(
+                await sb.rest_insert_async(
                     "thread_members",
                     [
                         {
@@ -645,6 +1167,7 @@ async def create_thread_branch(
             "parent_thread_id": parent_thread_id,
             "root_thread_id": root_thread_id,
             "context_preview": preview,
+            "context_preview_provisional": provisional,
             "model": model,
         }
         rows = [
@@ -656,35 +1179,124 @@ async def create_thread_branch(
                 "created_at": now,
             }
         ]
-        sb.rest_insert("messages", rows, access_token)
+        await sb.rest_insert_async("messages", rows, access_token)
     except Exception:
         # Avoid leaving an empty child if branch metadata persistence fails.
         try:
-            sb.rest_delete("threads", f"id=eq.{quote(child_thread_id)}", access_token)
+            await sb.rest_delete_async("threads", f"id=eq.{quote(child_thread_id)}", access_token)
         except Exception:
             pass
         raise
 
+    if provisional:
+        background.spawn(
+            f"branch-summary:{child_thread_id}",
+            lambda: _finalize_branch_preview(
+                child_thread_id, summary_key, messages, str(model), access_token
+            ),
+        )
+
     return {
         "thread_id": child_thread_id,
         "title": title,
         "parent_thread_id": parent_thread_id,
         "context_preview": preview,
+        "context_preview_provisional": provisional,
         "status": "saved",
     }
 
 
-def list_branch_trees(owner_id: str, access_token: str) -> List[Dict[str, Any]]:
-    _ensure_tutorial_branch(owner_id, access_token)
-    member_rows = sb.rest_select(
-        "thread_members",
-        "&".join(
-            [
-                f"user_id=eq.{quote(owner_id)}",
-                "select=thread_id,role",
-            ]
-        ),
+async def _finalize_branch_preview(
+    child_thread_id: str,
+    summary_key: BranchSummaryKey,
+    messages: List[Dict[str, Any]],
+    model: str,
+    access_token: str,
+) -> None:
+    """Replace a branch's provisional preview with the LLM summary."""
+    generated = False
+
+    async def create() -> str:
+        nonlocal generated
+        preview = await _generate_branch_summary(messages, model)
+        generated = True
+        return preview
+
+    try:
+        preview = await branch_summary_cache.get_or_create(summary_key, create)
+    except Exception:
+        logger.exception("Failed to summarize branch context; using a local fallback")
+        preview = _single_sentence_summary(_context_preview(messages))
+
+    # The branch's first chat may be writing its model hint right now: set
+    # only the preview keys.
+    await _merge_thread_metadata(
+        child_thread_id,
+        {"context_preview": preview, "context_preview_provisional": False},
         access_token,
+        create=False,
+    )
+
+    if generated:
+        await _remember_branch_summary(summary_key, preview, access_token)
+
+
+async def _remember_branch_summary(
+    summary_key: BranchSummaryKey,
+    preview: str,
+    access_token: str,
+) -> None:
+    """Persist the latest branch summary in the parent's marker for other workers."""
+    parent_thread_id, last_index, effective_model = summary_key
+    try:
+        # Only this key is written, so a concurrent model hint or preview
+        # update isn't lost; a summary of a later parent state is kept.
+        await _merge_thread_metadata(
+            parent_thread_id,
+            {
+                BRANCH_SUMMARY_KEY: {
+                    "last_index": last_index,
+                    "model": effective_model,
+                    "preview": preview,
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                }
+            },
+            access_token,
+            create=False,
+            order_key="last_index",
+        )
+    except Exception:
+        logger.warning(
+            "Failed to persist branch summary cache",
+            extra={"thread_id": parent_thread_id},
+            exc_info=True,
+        )
+
+
+async def list_branch_trees(owner_id: str, access_token: str) -> List[Dict[str, Any]]:
+    await _ensure_tutorial_branch(owner_id, access_token)
+    member_rows, owned_threads = await gather_queries(
+        sb.rest_select_async(
+            "thread_members",
+            "&".join(
+                [
+                    f"user_id=eq.{quote(owner_id)}",
+                    "select=thread_id,role",
+                ]
+            ),
+            access_token,
+        ),
+        sb.rest_select_async(
+            "threads",
+            "&".join(
+                [
+                    f"owner_id=eq.{quote(owner_id)}",
+                    "select=id",
+                    "order=created_at.asc",
+                ]
+            ),
+            access_token,
+        ),
     )
     member_thread_ids = list(
         dict.fromkeys(
@@ -698,17 +1310,6 @@ def list_branch_trees(owner_id: str, access_token: str) -> List[Dict[str, Any]]:
         for row in member_rows
         if row.get("thread_id")
     }
-    owned_threads = sb.rest_select(
-        "threads",
-        "&".join(
-            [
-                f"owner_id=eq.{quote(owner_id)}",
-                "select=id",
-                "order=created_at.asc",
-            ]
-        ),
-        access_token,
-    )
     accessible_ids = list(
         dict.fromkeys(
             [
@@ -721,32 +1322,34 @@ def list_branch_trees(owner_id: str, access_token: str) -> List[Dict[str, Any]]:
         return []
 
     safe_accessible_ids = ",".join(quote(thread_id) for thread_id in accessible_ids)
-    threads = sb.rest_select(
-        "threads",
-        "&".join(
-            [
-                f"id=in.({safe_accessible_ids})",
-                "select=id,title,created_at,is_workspace,owner_id",
-                "order=created_at.asc",
-            ]
+    threads, markers = await gather_queries(
+        sb.rest_select_async(
+            "threads",
+            "&".join(
+                [
+                    f"id=in.({safe_accessible_ids})",
+                    "select=id,title,created_at,is_workspace,owner_id",
+                    "order=created_at.asc",
+                ]
+            ),
+            access_token,
+        ),
+        sb.rest_select_async(
+            "messages",
+            "&".join(
+                [
+                    f"thread_id=in.({safe_accessible_ids})",
+                    f"index=eq.{BRANCH_META_INDEX}",
+                    "select=thread_id,content",
+                ]
+            ),
+            access_token,
         ),
-        access_token,
     )
     by_id = {str(row.get("id")): row for row in threads if row.get("id")}
     if not by_id:
         return []
 
-    markers = sb.rest_select(
-        "messages",
-        "&".join(
-            [
-                f"thread_id=in.({safe_accessible_ids})",
-                f"index=eq.{BRANCH_META_INDEX}",
-                "select=thread_id,content",
-            ]
-        ),
-        access_token,
-    )
     metadata_by_id: Dict[str, Dict[str, Any]] = {}
     for row in markers:
         thread_id = str(row.get("thread_id") or "")
@@ -802,6 +1405,7 @@ def list_branch_trees(owner_id: str, access_token: str) -> List[Dict[str, Any]]:
             "title": thread.get("title") or "",
             "parent_thread_id": metadata.get("parent_thread_id"),
             "context_preview": metadata.get("context_preview"),
+            "context_preview_provisional": bool(metadata.get("context_preview_provisional")),
             "created_at": thread.get("created_at") or "",
             "is_deleted": bool(metadata.get("is_deleted")),
             "is_tutorial": bool(metadata.get("is_tutorial")),
@@ -831,7 +1435,7 @@ def list_branch_trees(owner_id: str, access_token: str) -> List[Dict[str, Any]]:
     return roots
 
 # 스레드 목록 조회 (owner이거나 member인 스레드 모두)
-def list_threads_for_owner(
+async def list_threads_for_owner(
     owner_id: str,
     access_token: str,
     limit: int = 20,
@@ -845,7 +1449,7 @@ def list_threads_for_owner(
     order = "desc" if str(order).lower() != "asc" else "asc"
 
     # Step 1: collect thread_ids where user is a member
-    member_rows = sb.rest_select(
+    member_rows = await sb.rest_select_async(
         "thread_members",
         "&".join(
             [
@@ -884,15 +1488,15 @@ def list_threads_for_owner(
         f"order=created_at.{order}",
         f"limit={limit}",
         f"offset={offset}",
-        f"messages.index=lt.{BRANCH_META_INDEX}",
-        f"last.index=lt.{BRANCH_META_INDEX}",
+        f"messages.index=lt.{RESERVED_INDEX_START}",
+        f"last.index=lt.{RESERVED_INDEX_START}",
         "last.order=created_at.desc",
         "last.limit=1",
     ]
     query = "&".join(filters)
-    rows = sb.rest_select("threads", query, access_token)
+    rows = await sb.rest_select_async("threads", query, access_token)
     listed_ids = [str(row["id"]) for row in rows if row.get("id")]
-    listed_metadata = _metadata_for_thread_ids(listed_ids, access_token)
+    listed_metadata = await _metadata_for_thread_ids(listed_ids, access_token)
 
     out: List[Dict[str, Any]] = []
     for r in rows:
@@ -925,26 +1529,27 @@ def list_threads_for_owner(
         })
     return out
 
-def _hard_delete_thread(thread_id: str, access_token: str) -> int:
+async def _hard_delete_thread(thread_id: str, access_token: str) -> int:
     """Delete one physical thread row and its directly stored children."""
+    llm_client.drop_gemini_cache(thread_id)
     for table in ("comments", "bookmarks"):
         try:
-            sb.rest_delete(table, f"thread_id=eq.{quote(thread_id)}", access_token)
+            await sb.rest_delete_async(table, f"thread_id=eq.{quote(thread_id)}", access_token)
         except Exception:
             pass
     try:
-        sb.rest_delete("messages", f"thread_id=eq.{quote(thread_id)}", access_token)
+        await sb.rest_delete_async("messages", f"thread_id=eq.{quote(thread_id)}", access_token)
     except Exception:
         pass
     try:
-        sb.rest_delete("thread_members", f"thread_id=eq.{quote(thread_id)}", access_token)
+        await sb.rest_delete_async("thread_members", f"thread_id=eq.{quote(thread_id)}", access_token)
     except Exception:
         pass
-    return sb.rest_delete("threads", f"id=eq.{quote(thread_id)}", access_token)
+    return await sb.rest_delete_async("threads", f"id=eq.{quote(thread_id)}", access_token)
 
 
-def _all_branch_metadata(access_token: str) -> Dict[str, Dict[str, Any]]:
-    rows = sb.rest_select(
+async def _all_branch_metadata(access_token: str) -> Dict[str, Dict[str, Any]]:
+    rows = await sb.rest_select_async(
         "messages",
         "&".join(
             [
@@ -964,7 +1569,7 @@ def _all_branch_metadata(access_token: str) -> Dict[str, Dict[str, Any]]:
 
 
 # 스레드 삭제
-def delete_thread_by_id(user_id: str, thread_id: str, access_token: str) -> int:
+async def delete_thread_by_id(user_id: str, thread_id: str, access_token: str) -> int:
     # Load thread info
     q_thread = "&".join(
         [
@@ -973,7 +1578,7 @@ def delete_thread_by_id(user_id: str, thread_id: str, access_token: str) -> int:
             "limit=1",
         ]
     )
-    trows = sb.rest_select("threads", q_thread, access_token)
+    trows = await sb.rest_select_async("threads", q_thread, access_token)
     if not trows:
         return 0
     thread = trows[0]
@@ -984,11 +1589,11 @@ def delete_thread_by_id(user_id: str, thread_id: str, access_token: str) -> int:
     if owner_id != user_id:
         return 0
 
-    metadata = _get_thread_metadata(thread_id, access_token)
+    metadata = await _get_thread_metadata(thread_id, access_token)
     if not metadata:
-        return _hard_delete_thread(thread_id, access_token)
+        return await _hard_delete_thread(thread_id, access_token)
 
-    metadata_by_id = _all_branch_metadata(access_token)
+    metadata_by_id = await _all_branch_metadata(access_token)
     children = [
         child_id
         for child_id, child_metadata in metadata_by_id.items()
@@ -1011,10 +1616,10 @@ def delete_thread_by_id(user_id: str, thread_id: str, access_token: str) -> int:
         if metadata.get("is_tutorial"):
             for candidate_id in lineage_ids:
                 if candidate_id != thread_id:
-                    deleted += _hard_delete_thread(candidate_id, access_token)
+                    deleted += await _hard_delete_thread(candidate_id, access_token)
             for table in ("comments", "bookmarks"):
                 try:
-                    sb.rest_delete(
+                    await sb.rest_delete_async(
                         table,
                         f"thread_id=eq.{quote(thread_id)}",
                         access_token,
@@ -1022,7 +1627,7 @@ def delete_thread_by_id(user_id: str, thread_id: str, access_token: str) -> int:
                 except Exception:
                     pass
             try:
-                sb.rest_delete(
+                await sb.rest_delete_async(
                     "messages",
                     "&".join(
                         [
@@ -1034,7 +1639,8 @@ def delete_thread_by_id(user_id: str, thread_id: str, access_token: str) -> int:
                 )
             except Exception:
                 pass
-            _persist_thread_metadata(
+            llm_client.drop_gemini_cache(thread_id)
+            await _persist_thread_metadata(
                 thread_id,
                 {
                     **metadata,
@@ -1047,7 +1653,7 @@ def delete_thread_by_id(user_id: str, thread_id: str, access_token: str) -> int:
             return deleted + 1
 
         for candidate_id in lineage_ids:
-            deleted += _hard_delete_thread(candidate_id, access_token)
+            deleted += await _hard_delete_thread(candidate_id, access_token)
         return deleted
 
     if children:
@@ -1056,9 +1662,9 @@ def delete_thread_by_id(user_id: str, thread_id: str, access_token: str) -> int:
             "is_deleted": True,
             "deleted_at": datetime.now(timezone.utc).isoformat(),
         }
-        _persist_thread_metadata(thread_id, tombstone, access_token)
+        await _persist_thread_metadata(thread_id, tombstone, access_token)
         try:
-            sb.rest_delete(
+            await sb.rest_delete_async(
                 "messages",
                 "&".join(
                     [
@@ -1070,12 +1676,13 @@ def delete_thread_by_id(user_id: str, thread_id: str, access_token: str) -> int:
             )
         except Exception:
             pass
+        llm_client.drop_gemini_cache(thread_id)
         return 1
 
-    return _hard_delete_thread(thread_id, access_token)
+    return await _hard_delete_thread(thread_id, access_token)
 
 
-def update_thread_title(
+async def update_thread_title(
     owner_id: str,
     thread_id: str,
     title: str,
@@ -1085,7 +1692,7 @@ def update_thread_title(
     if not normalized_title:
         raise ValueError("Thread title cannot be empty")
 
-    rows = sb.rest_select(
+    rows = await sb.rest_select_async(
         "threads",
         "&".join(
             [
@@ -1100,7 +1707,7 @@ def update_thread_title(
     if not rows:
         return None
 
-    sb.rest_update(
+    await sb.rest_update_async(
         "threads",
         "&".join(
             [
@@ -1114,7 +1721,7 @@ def update_thread_title(
     return normalized_title
 
 
-def get_thread_detail(user_id: str, thread_id: str, access_token: str):
+async def get_thread_detail(user_id: str, thread_id: str, access_token: str):
     q = "&".join(
         [
             f"id=eq.{quote(thread_id)}",
@@ -1122,40 +1729,36 @@ def get_thread_detail(user_id: str, thread_id: str, access_token: str):
             "limit=1",
         ]
     )
-    rows = sb.rest_select("threads", q, access_token)
+    q_member = "&".join([
+        f"thread_id=eq.{quote(thread_id)}",
+        f"user_id=eq.{quote(user_id)}",
+        "select=role",
+        "limit=1",
+    ])
+    # The membership row is only needed for non-owners, but fetching it
+    # alongside the other reads keeps the detail view to one round trip.
+    # Access is decided from the thread row itself, so the messages can be
+    # read without re-running _can_access_thread.
+    rows, metadata, m, messages = await gather_queries(
+        sb.rest_select_async("threads", q, access_token),
+        _get_thread_metadata(thread_id, access_token),
+        sb.rest_select_async("thread_members", q_member, access_token),
+        _select_thread_messages(thread_id, access_token, limit=200, offset=0, order="asc"),
+    )
     if not rows:
         return None
 
     thread = rows[0]
-    metadata = _get_thread_metadata(thread_id, access_token) or {}
+    metadata = metadata or {}
     if metadata.get("is_deleted"):
         return None
 
     member_role = None
     if thread["owner_id"] != user_id:
-        m = sb.rest_select(
-            "thread_members",
-            "&".join([
-                f"thread_id=eq.{quote(thread_id)}",
-                f"user_id=eq.{quote(user_id)}",
-                "select=role",
-                "limit=1",
-            ]),
-            access_token,
-        )
         if not m:
             return None
         member_role = str(m[0].get("role") or "member")
 
-    _, messages = list_thread_messages(
-        owner_id=thread["owner_id"],
-        thread_id=thread_id,
-        access_token=access_token,
-        limit=200,
-        offset=0,
-        order="asc",
-    )
-
     thread["messages"] = messages
     thread["can_rename"] = thread["owner_id"] == user_id
     thread["parent_thread_id"] = metadata.get("parent_thread_id")
@@ -1185,7 +1788,7 @@ def _normalize_bookmark_row(row: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def _message_exists(thread_id: str, message_index: int, access_token: str) -> bool:
+async def _message_exists(thread_id: str, message_index: int, access_token: str) -> bool:
     q = "&".join(
         [
             f"thread_id=eq.{quote(thread_id)}",
@@ -1194,16 +1797,16 @@ def _message_exists(thread_id: str, message_index: int, access_token: str) -> bo
             "limit=1",
         ]
     )
-    rows = sb.rest_select("messages", q, access_token)
+    rows = await sb.rest_select_async("messages", q, access_token)
     return bool(rows)
 
 
-def list_thread_bookmarks(
+async def list_thread_bookmarks(
     owner_id: str,
     thread_id: str,
     access_token: str,
 ) -> Tuple[bool, List[Dict[str, Any]]]:
-    if not _can_access_thread(owner_id, thread_id, access_token):
+    if not await _can_access_thread(owner_id, thread_id, access_token):
         return (False, [])
 
     q = "&".join(
@@ -1214,52 +1817,57 @@ def list_thread_bookmarks(
             "order=message_index.asc",
         ]
     )
-    rows = sb.rest_select("bookmarks", q, access_token)
+    rows = await sb.rest_select_async("bookmarks", q, access_token)
     return (True, [_normalize_bookmark_row(r) for r in rows])
 
 
-def add_thread_bookmark(
+async def add_thread_bookmark(
     owner_id: str,
     thread_id: str,
     message_index: int,
     access_token: str,
 ) -> Tuple[bool, Dict[str, Any] | None]:
-    if not _can_access_thread(owner_id, thread_id, access_token):
+    can_access, message_exists = await gather_queries(
+        _can_access_thread(owner_id, thread_id, access_token),
+        _message_exists(thread_id, message_index, access_token),
+    )
+    if not can_access:
         return (False, None)
-
-    if not _message_exists(thread_id, message_index, access_token):
+    if not message_exists:
         raise ValueError("Message not found for this thread")
 
-    q_existing = "&".join(
+    # ignore-duplicates keeps a repeated bookmark from failing with 409
+    # without needing an UPDATE policy on bookmarks; only then is the
+    # existing row (and its original created_at) read back.
+    rows = await sb.rest_insert_async(
+        "bookmarks",
         [
-            f"user_id=eq.{quote(owner_id)}",
-            f"thread_id=eq.{quote(thread_id)}",
-            f"message_index=eq.{message_index}",
-            "select=thread_id,message_index,created_at",
-            "limit=1",
-        ]
+            {
+                "user_id": owner_id,
+                "thread_id": thread_id,
+                "message_index": message_index,
+            }
+        ],
+        access_token,
+        returning=True,
+        on_conflict="user_id,thread_id,message_index",
+        select="thread_id,message_index,created_at",
+        ignore_duplicates=True,
     )
-    existing = sb.rest_select("bookmarks", q_existing, access_token)
-    if existing:
-        return (True, _normalize_bookmark_row(existing[0]))
-
-    try:
-        sb.rest_insert(
+    if not rows:
+        rows = await sb.rest_select_async(
             "bookmarks",
-            [
-                {
-                    "user_id": owner_id,
-                    "thread_id": thread_id,
-                    "message_index": message_index,
-                }
-            ],
+            "&".join(
+                [
+                    f"user_id=eq.{quote(owner_id)}",
+                    f"thread_id=eq.{quote(thread_id)}",
+                    f"message_index=eq.{message_index}",
+                    "select=thread_id,message_index,created_at",
+                    "limit=1",
+                ]
+            ),
             access_token,
         )
-    except requests.HTTPError as exc:
-        if exc.response is None or exc.response.status_code != 409:
-            raise
-
-    rows = sb.rest_select("bookmarks", q_existing, access_token)
     if not rows:
         return (
             True,
@@ -1272,13 +1880,13 @@ def add_thread_bookmark(
     return (True, _normalize_bookmark_row(rows[0]))
 
 
-def remove_thread_bookmark(
+async def remove_thread_bookmark(
     owner_id: str,
     thread_id: str,
     message_index: int,
     access_token: str,
 ) -> Tuple[bool, bool]:
-    if not _can_access_thread(owner_id, thread_id, access_token):
+    if not await _can_access_thread(owner_id, thread_id, access_token):
         return (False, False)
 
     q = "&".join(
@@ -1288,11 +1896,11 @@ def remove_thread_bookmark(
             f"message_index=eq.{message_index}",
         ]
     )
-    deleted = sb.rest_delete("bookmarks", q, access_token)
+    deleted = await sb.rest_delete_async("bookmarks", q, access_token)
     return (True, deleted > 0)
 
 
-def list_thread_messages(
+async def list_thread_messages(
     owner_id: str,
     thread_id: str,
     access_token: str,
@@ -1300,21 +1908,30 @@ def list_thread_messages(
     offset: int = 0,
     order: str = "asc",
 ) -> Tuple[bool, list[dict]]:
-    if not _can_access_thread(owner_id, thread_id, access_token):
+    if not await _can_access_thread(owner_id, thread_id, access_token):
         return (False, [])
+    return (True, await _select_thread_messages(thread_id, access_token, limit, offset, order))
+
 
+async def _select_thread_messages(
+    thread_id: str,
+    access_token: str,
+    limit: int = 50,
+    offset: int = 0,
+    order: str = "asc",
+) -> list[dict]:
     order = "asc" if str(order).lower() != "desc" else "desc"
 
     q_msgs = "&".join([
         f"thread_id=eq.{quote(thread_id)}",
         "index=gte.0",
-        f"index=lt.{BRANCH_META_INDEX}",
+        f"index=lt.{RESERVED_INDEX_START}",
         "select=index,role,content,created_at",
         f"order=index.{order}",
         f"limit={limit}",
         f"offset={offset}",
     ])
-    mrows = sb.rest_select("messages", q_msgs, access_token)
+    mrows = await sb.rest_select_async("messages", q_msgs, access_token)
 
     rows = [{
         "index": int(m.get("index", 0)),
@@ -1323,51 +1940,111 @@ def list_thread_messages(
         "created_at": m.get("created_at") or "",
     } for m in mrows]
 
-    return (True, rows)
+    return rows
 
 
 # 스레드에 메시지 추가
-def add_messages_to_thread(
+async def add_messages_to_thread(
     owner_id: str,
     thread_id: str,
     messages: List[Dict[str, str]],
     access_token: str,
 ) -> Tuple[bool, int]:
-    if not _can_access_thread(owner_id, thread_id, access_token):
+    if not await _can_access_thread(owner_id, thread_id, access_token):
         return (False, 0)
 
-    now = datetime.now(timezone.utc).isoformat()
-    next_index = _get_max_index(thread_id, access_token) + 1
-
     rows = []
     for m in messages:
         content = (m.get("content") or "").strip()
         if not content:
             raise ValueError("Message content cannot be empty")
+        rows.append({"role": _normalize_role(m.get("role", "")), "content": content})
+
+    inserted = await append_messages(thread_id, rows, access_token)
+    return (True, len(inserted))
 
-        rows.append(
-            {
-                "thread_id": thread_id,
-                "role": _normalize_role(m.get("role", "")),
-                "content": content,
-                "index": next_index,
-                "created_at": now,
-            }
-        )
-        next_index += 1
 
-    sb.rest_insert("messages", rows, access_token)
-    return (True, len(rows))
+# Set once the append_messages RPC is known to be missing on this database
+# (migration not applied yet), so later writes skip straight to the fallback.
+_append_rpc_missing = False
 
 
-def _get_max_index(thread_id: str, access_token: str) -> int:
-    rows = sb.rest_select(
+async def append_messages(
+    thread_id: str,
+    messages: List[Dict[str, str]],
+    access_token: str,
+) -> List[Dict[str, Any]]:
+    """
+    Append messages after the thread's last index and return the stored rows
+    in index order.
+
+    Uses the append_messages Postgres function (supabase/migrations), which
+    allocates indexes under a per-thread lock in a single round trip. Until
+    that migration is applied, falls back to the select-max-then-insert path.
+    """
+    global _append_rpc_missing
+    if not messages:
+        return []
+
+    if not _append_rpc_missing:
+        try:
+            rows = await sb.rest_rpc_async(
+                "append_messages",
+                {"p_thread_id": thread_id, "p_messages": messages},
+                access_token,
+            )
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code != 404:
+                raise
+            _append_rpc_missing = True
+            logger.warning("append_messages RPC is not deployed; using legacy append")
+        else:
+            return _normalize_appended_rows(rows or [])
+
+    now = datetime.now(timezone.utc).isoformat()
+    next_index = await _get_max_index(thread_id, access_token) + 1
+    rows = [
+        {
+            "thread_id": thread_id,
+            "role": m["role"],
+            "content": m["content"],
+            "index": next_index + offset,
+            "created_at": now,
+        }
+        for offset, m in enumerate(messages)
+    ]
+    inserted = await sb.rest_insert_async(
+        "messages",
+        rows,
+        access_token,
+        returning=True,
+        select="index,role,content,created_at",
+    )
+    return _normalize_appended_rows(inserted or rows)
+
+
+def _normalize_appended_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    out = [
+        {
+            "index": int(row.get("index", 0)),
+            "role": row.get("role") or "assistant",
+            "content": row.get("content") or "",
+            "created_at": row.get("created_at") or "",
+        }
+        for row in rows
+    ]
+    out.sort(key=lambda row: row["index"])
+    return out
+
+
+async def _get_max_index(thread_id: str, access_token: str) -> int:
+    rows = await sb.rest_select_async(
         "messages",
         "&".join(
             [
                 f"thread_id=eq.{quote(thread_id)}",
                 "index=not.is.null",
-                f"index=lt.{BRANCH_META_INDEX}",
+                f"index=lt.{RESERVED_INDEX_START}",
                 "select=index",
                 "order=index.desc",
                 "limit=1",
@@ -1383,57 +2060,30 @@ def _get_max_index(thread_id: str, access_token: str) -> int:
         return -1
 
 
-def insert_and_fetch_message(
+async def insert_and_fetch_message(
     thread_id: str,
     role: str,
     content: str,
     access_token: str,
 ) -> Dict[str, Any]:
-    now = datetime.now(timezone.utc).isoformat()
-    last_idx = _get_max_index(thread_id, access_token)
-    new_index = last_idx + 1
-    sb.rest_insert(
-        "messages",
-        [
-            {
-                "thread_id": thread_id,
-                "role": role,
-                "content": content.strip(),
-                "index": new_index,
-                "created_at": now,
-            }
-        ],
-        access_token,
-    )
-    # Fetch back deterministically
-    rows = sb.rest_select(
-        "messages",
-        "&".join(
-            [
-                f"thread_id=eq.{quote(thread_id)}",
-                f"index=eq.{new_index}",
-                "select=index,role,content,created_at",
-                "order=created_at.desc",
-                "limit=1",
-            ]
-        ),
+    rows = await append_messages(
+        thread_id,
+        [{"role": role, "content": content.strip()}],
         access_token,
     )
     if not rows:
         raise RuntimeError("Inserted message not found")
-    row = rows[0]
-    row["index"] = int(row.get("index", new_index))
-    return row
+    return rows[0]
 
 
-def list_recent_messages(thread_id: str, limit: int, access_token: str) -> List[Dict[str, Any]]:
-    rows = sb.rest_select(
+async def list_recent_messages(thread_id: str, limit: int, access_token: str) -> List[Dict[str, Any]]:
+    rows = await sb.rest_select_async(
         "messages",
         "&".join(
             [
                 f"thread_id=eq.{quote(thread_id)}",
                 "index=gte.0",
-                f"index=lt.{BRANCH_META_INDEX}",
+                f"index=lt.{RESERVED_INDEX_START}",
                 "select=index,role,content,created_at",
                 "order=index.desc",
                 f"limit={limit}",
@@ -1444,17 +2094,17 @@ def list_recent_messages(thread_id: str, limit: int, access_token: str) -> List[
     return rows
 
 
-def list_messages_before_index(thread_id: str, before_index: int, limit: int, access_token: str) -> List[Dict[str, Any]]:
+async def list_messages_before_index(thread_id: str, before_index: int, limit: int, access_token: str) -> List[Dict[str, Any]]:
     """
     Fetch messages with index < before_index ordered desc, limited.
     """
-    rows = sb.rest_select(
+    rows = await sb.rest_select_async(
         "messages",
         "&".join(
             [
                 f"thread_id=eq.{quote(thread_id)}",
                 "index=gte.0",
-                f"index=lt.{BRANCH_META_INDEX}",
+                f"index=lt.{RESERVED_INDEX_START}",
                 f"index=lt.{before_index}",
                 "select=index,role,content,created_at",
                 "order=index.desc",
@@ -1466,14 +2116,14 @@ def list_messages_before_index(thread_id: str, before_index: int, limit: int, ac
     return rows
 
 
-def get_first_assistant_message(thread_id: str, access_token: str) -> Dict[str, Any] | None:
-    rows = sb.rest_select(
+async def get_first_assistant_message(thread_id: str, access_token: str) -> Dict[str, Any] | None:
+    rows = await sb.rest_select_async(
         "messages",
         "&".join(
             [
                 f"thread_id=eq.{quote(thread_id)}",
                 "role=eq.assistant",
-                f"index=lt.{BRANCH_META_INDEX}",
+                f"index=lt.{RESERVED_INDEX_START}",
                 "select=index,role,content",
                 "order=index.asc",
                 "limit=1",
@@ -1504,13 +2154,13 @@ async def chat_with_llm(
             "limit=1",
         ]
     )
-    trows = sb.rest_select("threads", q_check, access_token)
+    trows = await sb.rest_select_async("threads", q_check, access_token)
     if not trows:
         return {}
 
     now = datetime.now(timezone.utc).isoformat()
     # 1) Insert user message
-    user_row = insert_and_fetch_message(thread_id, "user", content, access_token)
+    user_row = await insert_and_fetch_message(thread_id, "user", content, access_token)
     incoming = content.strip()
     saved = (user_row.get("content") or "").strip()
     if saved != incoming and settings.CHAT_DEBUG_ASSERTS:
@@ -1526,7 +2176,7 @@ async def chat_with_llm(
         )
 
     # 2) Fetch recent messages for context (including the new one) AFTER insert
-    recent_desc = list_recent_messages(thread_id, context_limit, access_token)
+    recent_desc = await list_recent_messages(thread_id, context_limit, access_token)
     chron = list(reversed(recent_desc))  # to chronological order
     llm_messages = [
         {"role": m.get("role", "assistant"), "content": m.get("content", ""), "index": int(m.get("index", 0))}
@@ -1652,7 +2302,7 @@ async def chat_with_llm(
         )
         assistant_content = await llm_client.generate(model=model, messages=payload_messages)
 
-    assistant_row = insert_and_fetch_message(thread_id, "assistant", assistant_content, access_token)
+    assistant_row = await insert_and_fetch_message(thread_id, "assistant", assistant_content, access_token)
     saved_assistant = (assistant_row.get("content") or "").strip()
     if saved_assistant != assistant_content.strip() and settings.CHAT_DEBUG_ASSERTS:
         from fastapi import HTTPException
@@ -1666,7 +2316,7 @@ async def chat_with_llm(
             },
         )
 
-    first_asst = get_first_assistant_message(thread_id, access_token)
+    first_asst = await get_first_assistant_message(thread_id, access_token)
     if (
         first_asst
         and assistant_row.get("index") != first_asst.get("index")
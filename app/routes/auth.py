@@ -3,7 +3,6 @@ from __future__ import annotations
 from typing import Any, Dict, Optional
 from urllib.parse import urlencode, urlsplit
 
-import httpx
 from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
 from fastapi.responses import RedirectResponse
 from pydantic import BaseModel, EmailStr, Field
@@ -11,6 +10,7 @@ from pydantic import BaseModel, EmailStr, Field
 from app.core.config import settings
 from app.core.security import clear_refresh_cookie, require_trusted_origin, set_refresh_cookie
 from app.db.deps import get_access_token, get_current_user
+from app.db.supabase import get_async_http_client
 from app.repository.auth import (
     current_user_profile,
     exchange_google_id_token,
@@ -222,8 +222,7 @@ async def login_with_password(payload: PasswordLoginRequest, request: Request, r
 
     json_body = {"email": payload.email, "password": payload.password}
 
-    async with httpx.AsyncClient(timeout=15) as client:
-        resp = await client.post(url, headers=headers, json=json_body)
+    resp = await get_async_http_client().post(url, headers=headers, json=json_body)
 
     if resp.status_code >= 400:
         raise HTTPException(
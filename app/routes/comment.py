@@ -29,7 +29,7 @@ from app.repository.comment import (
 )
 from app.db import supabase as sb
 from app.db.deps import get_access_token, get_current_user
-from app.db.supabase_users import get_users_by_ids
+from app.db.supabase_users import get_users_by_ids_async
 
 router = APIRouter(prefix="/threads", tags=["comments"])
 branch_router = APIRouter(prefix="/branch-comments", tags=["branch-comments"])
@@ -59,7 +59,7 @@ def _author_id(user) -> str:
     return _email_id(user.get("email")) or "사용자"
 
 
-def _normalize_comment_authors(comments, user) -> None:
+async def _normalize_comment_authors(comments, user) -> None:
     current_user_id = _owner_id(user)
     current_author_id = _author_id(user)
     other_user_ids = list(
@@ -71,7 +71,7 @@ def _normalize_comment_authors(comments, user) -> None:
         }
     )
     try:
-        user_map = get_users_by_ids(other_user_ids) if other_user_ids else {}
+        user_map = await get_users_by_ids_async(other_user_ids) if other_user_ids else {}
     except Exception:
         # New comments already carry the display id in their encoded payload.
         # Keep listing available if the optional admin lookup is unavailable.
@@ -91,20 +91,20 @@ def _normalize_comment_authors(comments, user) -> None:
 
 
 @branch_router.get("", response_model=List[BranchCommentResponse])
-def get_branch_comments(
+async def get_branch_comments(
     thread_id: List[UUID] = Query(..., min_length=1, max_length=100),
     user=Depends(get_current_user),
     access_token: str = Depends(get_access_token),
 ):
     owner_id = _owner_id(user)
-    comments = list_branch_comments(
+    comments = await list_branch_comments(
         owner_id,
         [str(value) for value in thread_id],
         access_token,
     )
     for comment in comments:
         comment["can_edit"] = comment["user_id"] == owner_id
-    _normalize_comment_authors(comments, user)
+    await _normalize_comment_authors(comments, user)
     return comments
 
 
@@ -113,13 +113,13 @@ def get_branch_comments(
     response_model=BranchCommentResponse,
     status_code=status.HTTP_201_CREATED,
 )
-def add_branch_comment(
+async def add_branch_comment(
     body: BranchCommentCreate,
     user=Depends(get_current_user),
     access_token: str = Depends(get_access_token),
 ):
     try:
-        comment = create_branch_comment(
+        comment = await create_branch_comment(
             _owner_id(user),
             body.thread_id,
             body.content,
@@ -149,14 +149,14 @@ def add_branch_comment(
 
 
 @branch_router.patch("/{comment_id}", response_model=BranchCommentResponse)
-def edit_branch_comment(
+async def edit_branch_comment(
     comment_id: UUID,
     body: BranchCommentUpdate,
     user=Depends(get_current_user),
     access_token: str = Depends(get_access_token),
 ):
     try:
-        comment = update_branch_comment(
+        comment = await update_branch_comment(
             _owner_id(user),
             str(comment_id),
             access_token,
@@ -178,12 +178,12 @@ def edit_branch_comment(
 
 
 @branch_router.delete("/{comment_id}")
-def remove_branch_comment(
+async def remove_branch_comment(
     comment_id: UUID,
     user=Depends(get_current_user),
     access_token: str = Depends(get_access_token),
 ):
-    if not delete_branch_comment(
+    if not await delete_branch_comment(
         _owner_id(user),
         str(comment_id),
         access_token,
@@ -199,12 +199,12 @@ def remove_branch_comment(
 
 
 @position_router.get("", response_model=List[BranchPositionResponse])
-def get_branch_positions(
+async def get_branch_positions(
     thread_id: List[UUID] = Query(..., min_length=1, max_length=100),
     user=Depends(get_current_user),
     access_token: str = Depends(get_access_token),
 ):
-    return list_branch_positions(
+    return await list_branch_positions(
         _owner_id(user),
         [str(value) for value in thread_id],
         access_token,
@@ -212,14 +212,14 @@ def get_branch_positions(
 
 
 @position_router.put("/{thread_id}", response_model=BranchPositionResponse)
-def put_branch_position(
+async def put_branch_position(
     thread_id: UUID,
     body: BranchPositionUpdate,
     user=Depends(get_current_user),
     access_token: str = Depends(get_access_token),
 ):
     try:
-        return save_branch_position(
+        return await save_branch_position(
             _owner_id(user),
             str(thread_id),
             body.position_x,
@@ -245,13 +245,13 @@ def put_branch_position(
 
 
 @position_router.delete("")
-def reset_branch_positions(
+async def reset_branch_positions(
     thread_id: List[UUID] = Query(..., min_length=1, max_length=100),
     user=Depends(get_current_user),
     access_token: str = Depends(get_access_token),
 ):
     try:
-        deleted_count = delete_branch_positions(
+        deleted_count = await delete_branch_positions(
             _owner_id(user),
             [str(value) for value in thread_id],
             access_token,
@@ -267,9 +267,9 @@ def reset_branch_positions(
     return {"ok": True, "deleted_count": deleted_count}
 
 
-def _normalize_message_comments(comments, user) -> None:
+async def _normalize_message_comments(comments, user) -> None:
     current_user_id = _owner_id(user)
-    _normalize_comment_authors(comments, user)
+    await _normalize_comment_authors(comments, user)
     for comment in comments:
         comment["can_edit"] = str(comment.get("user_id") or "") == current_user_id
 
@@ -279,17 +279,17 @@ def _normalize_message_comments(comments, user) -> None:
     response_model=CommentResponse,
     status_code=status.HTTP_201_CREATED,
 )
-def create_comment(
+async def create_comment(
     thread_id: str,
     body: CommentCreate,
     user=Depends(get_current_user),
     access_token: str = Depends(get_access_token),
 ):
     owner_id = _owner_id(user)
-    if not _accessible_thread_ids(owner_id, [thread_id], access_token):
+    if not await _accessible_thread_ids(owner_id, [thread_id], access_token):
         raise HTTPException(status_code=404, detail="Thread not found")
     comment_id = str(uuid4())
-    sb.rest_insert(
+    await sb.rest_insert_async(
         "comments",
         [{
             "id": comment_id,
@@ -300,7 +300,7 @@ def create_comment(
         }],
         access_token,
     )
-    comments = sb.rest_select(
+    comments = await sb.rest_select_async(
         "comments",
         "&".join(
             [
@@ -317,12 +317,12 @@ def create_comment(
         raise HTTPException(status_code=400, detail="코멘트 생성 실패")
 
     comment = comments[0]
-    _normalize_message_comments([comment], user)
+    await _normalize_message_comments([comment], user)
     return comment
 
 
 @router.get("/{thread_id}/comments", response_model=List[CommentResponse])
-def get_comments(
+async def get_comments(
     thread_id: str,
     message_index: int | None = Query(
         default=None,
@@ -333,7 +333,7 @@ def get_comments(
     access_token: str = Depends(get_access_token),
 ):
     owner_id = _owner_id(user)
-    if not _accessible_thread_ids(owner_id, [thread_id], access_token):
+    if not await _accessible_thread_ids(owner_id, [thread_id], access_token):
         raise HTTPException(status_code=404, detail="Thread not found")
     filters = [
         f"thread_id=eq.{quote(thread_id)}",
@@ -343,12 +343,12 @@ def get_comments(
     ]
     if message_index is not None:
         filters.insert(1, f"message_index=eq.{message_index}")
-    comments = sb.rest_select(
+    comments = await sb.rest_select_async(
         "comments",
         "&".join(filters),
         access_token,
     )
-    _normalize_message_comments(comments, user)
+    await _normalize_message_comments(comments, user)
     return comments
 
 
@@ -356,7 +356,7 @@ def get_comments(
     "/{thread_id}/comments/{comment_id}",
     response_model=CommentResponse,
 )
-def update_comment(
+async def update_comment(
     thread_id: str,
     comment_id: UUID,
     body: CommentUpdate,
@@ -364,9 +364,9 @@ def update_comment(
     access_token: str = Depends(get_access_token),
 ):
     owner_id = _owner_id(user)
-    if not _accessible_thread_ids(owner_id, [thread_id], access_token):
+    if not await _accessible_thread_ids(owner_id, [thread_id], access_token):
         raise HTTPException(status_code=404, detail="Thread not found")
-    updated = sb.rest_update(
+    updated = await sb.rest_update_async(
         "comments",
         "&".join(
             [
@@ -382,18 +382,18 @@ def update_comment(
     comment = updated[0] if isinstance(updated, list) and updated else None
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
-    _normalize_message_comments([comment], user)
+    await _normalize_message_comments([comment], user)
     return comment
 
 
 @router.delete("/{thread_id}/comments/{comment_id}")
-def delete_comment(
+async def delete_comment(
     thread_id: str,
     comment_id: str,
     user=Depends(get_current_user),
     access_token: str = Depends(get_access_token),
 ):
-    result = sb.rest_delete(
+    result = await sb.rest_delete_async(
         "comments",
         "&".join([
             f"id=eq.{quote(comment_id)}",
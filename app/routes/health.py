@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends
 
 from app.core.config import settings
 from app.db.deps import get_current_user
+from app.db.supabase_auth import token_cache
 from app.services import llm_client
 
 router = APIRouter(prefix="/health", tags=["health"])
@@ -25,3 +26,11 @@ async def llm_health(_user=Depends(get_current_user)):
 @router.get("/llm/config")
 def llm_config(_user=Depends(get_current_user)):
     return llm_client.describe_llm_config()
+
+
+@router.get("/auth")
+def auth_cache_stats(_user=Depends(get_current_user)):
+    return {
+        "verify_mode": settings.SUPABASE_AUTH_VERIFY_MODE,
+        "token_cache": token_cache.stats(),
+    }
@@ -1,15 +1,20 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import json
 import logging
-import requests
+import uuid
 from urllib.parse import quote
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query
+import httpx
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query, Request
+from fastapi.responses import StreamingResponse
 
 from app.db import supabase as sb
 from app.db.deps import get_access_token, get_current_user
-from app.db.supabase_users import get_user_id_by_email, get_users_by_ids
+from app.db.supabase_users import get_user_id_by_email_async, get_users_by_ids_async
+from app.repository.concurrency import gather_queries
 from app.repository.thread import (
     BranchForbiddenError,
     BranchModelError,
@@ -19,6 +24,8 @@ from app.repository.thread import (
     branch_lineage_thread_ids,
     create_thread_with_messages,
     delete_thread_by_id,
+    get_conversation_summary,
+    get_ollama_context,
     get_thread_detail,
     is_branch_root,
     list_thread_messages,
@@ -29,8 +36,10 @@ from app.repository.thread import (
     list_messages_before_index,
     list_branch_trees,
     create_thread_branch,
+    refresh_conversation_summary,
     remember_thread_model,
     remove_thread_bookmark,
+    store_ollama_context,
     update_thread_title,
     _can_access_thread,
 )
@@ -44,6 +53,7 @@ from app.schemas.thread import (
     BranchCreate,
     BranchCreateResp,
     BranchesResp,
+    ChatCancelIn,
     MessagesResp,
     ThreadCreate,
     ThreadCreateResp,
@@ -55,7 +65,8 @@ from app.schemas.thread import (
     ChatResponse,
 )
 from app.schemas.workspace import WorkspaceCreatedOut, WorkspaceMembersIn
-from app.services import llm_client
+from app.services import background, generations, llm_client, llm_context
+from app.services.ollama_context import ContextSession, context_cache, entry_matches
 from app.services.llm_client import LLMUpstreamError
 from app.core.config import settings
 
@@ -63,17 +74,8 @@ router = APIRouter(prefix="/threads", tags=["threads"])
 logger = logging.getLogger(__name__)
 
 
-def _is_echo(text: str, user_text: str) -> bool:
-    import re
-
-    def norm(s: str) -> str:
-        return re.sub(r"\W+", "", (s or "").lower())
-
-    return norm(text) == norm(user_text) or norm(user_text) and norm(user_text) in norm(text)
-
-
 @router.post("", response_model=ThreadCreateResp, status_code=200)
-def create_thread(
+async def create_thread(
     body: ThreadCreate,
     user: Dict[str, Any] = Depends(get_current_user),
     access_token: str = Depends(get_access_token),
@@ -87,7 +89,7 @@ def create_thread(
             "title": body.title,
             "messages": [{"role": m.role, "content": m.content} for m in body.messages],
         }
-        thread_id = create_thread_with_messages(owner_id, payload, access_token)
+        thread_id = await create_thread_with_messages(owner_id, payload, access_token)
         return {"thread_id": thread_id, "status": "saved"}
     except HTTPException:
         raise
@@ -99,7 +101,7 @@ def create_thread(
 
 
 @router.get("", response_model=ThreadsListResp)
-def get_threads(
+async def get_threads(
     user: Dict[str, Any] = Depends(get_current_user),
     access_token: str = Depends(get_access_token),
     limit: int = Query(20, ge=1, le=100),
@@ -111,7 +113,7 @@ def get_threads(
         if not owner_id:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        rows = list_threads_for_owner(
+        rows = await list_threads_for_owner(
             owner_id=owner_id,
             access_token=access_token,
             limit=limit,
@@ -129,7 +131,7 @@ def get_threads(
 
 
 @router.get("/branches", response_model=BranchesResp)
-def get_branch_trees(
+async def get_branch_trees(
     user: Dict[str, Any] = Depends(get_current_user),
     access_token: str = Depends(get_access_token),
 ):
@@ -137,7 +139,7 @@ def get_branch_trees(
     if not owner_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
     try:
-        return {"roots": list_branch_trees(owner_id, access_token)}
+        return {"roots": await list_branch_trees(owner_id, access_token)}
     except Exception:
         raise HTTPException(
             status_code=500,
@@ -146,7 +148,7 @@ def get_branch_trees(
 
 
 @router.delete("/{thread_id}")
-def delete_thread(
+async def delete_thread(
     thread_id: str = Path(..., min_length=10),
     user: Dict[str, Any] = Depends(get_current_user),
     access_token: str = Depends(get_access_token),
@@ -156,7 +158,7 @@ def delete_thread(
         if not current_id:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        deleted = delete_thread_by_id(current_id, thread_id, access_token)
+        deleted = await delete_thread_by_id(current_id, thread_id, access_token)
 
         if deleted == 0:
             raise HTTPException(
@@ -176,7 +178,7 @@ def delete_thread(
 
 
 @router.patch("/{thread_id}", response_model=ThreadTitleUpdateResp)
-def rename_thread(
+async def rename_thread(
     body: ThreadTitleUpdate,
     thread_id: str = Path(..., min_length=10),
     user: Dict[str, Any] = Depends(get_current_user),
@@ -187,7 +189,7 @@ def rename_thread(
         raise HTTPException(status_code=401, detail="Not authenticated")
 
     try:
-        title = update_thread_title(owner_id, thread_id, body.title, access_token)
+        title = await update_thread_title(owner_id, thread_id, body.title, access_token)
     except ValueError as exc:
         raise HTTPException(
             status_code=422,
@@ -247,7 +249,7 @@ async def create_branch(
 
 
 @router.get("/{thread_id}", response_model=ThreadDetailResp)
-def get_thread_by_id(
+async def get_thread_by_id(
     thread_id: str = Path(..., min_length=10),
     user: Dict[str, Any] = Depends(get_current_user),
     access_token: str = Depends(get_access_token),
@@ -257,7 +259,7 @@ def get_thread_by_id(
         if not owner_id:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        data = get_thread_detail(owner_id, thread_id, access_token)
+        data = await get_thread_detail(owner_id, thread_id, access_token)
         if not data:
             # Ownership mismatch or missing thread is treated as 404
             raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": "Thread not found"})
@@ -273,7 +275,7 @@ def get_thread_by_id(
 
 
 @router.get("/{thread_id}/messages", response_model=MessagesResp)
-def get_thread_messages(
+async def get_thread_messages(
     thread_id: str = Path(..., min_length=10),
     user: Dict[str, Any] = Depends(get_current_user),
     access_token: str = Depends(get_access_token),
@@ -289,7 +291,7 @@ def get_thread_messages(
                 detail={"code": "UNAUTHORIZED", "message": "Missing or invalid access token"},
             )
 
-        owned, rows = list_thread_messages(
+        owned, rows = await list_thread_messages(
             owner_id=owner_id,
             thread_id=thread_id,
             access_token=access_token,
@@ -309,7 +311,7 @@ def get_thread_messages(
 
 
 @router.post("/{thread_id}/messages", response_model=AddMessagesResp, status_code=200)
-def add_messages(
+async def add_messages(
     thread_id: str = Path(..., min_length=10),
     body: AddMessagesBody = Body(...),
     user: Dict[str, Any] = Depends(get_current_user),
@@ -331,7 +333,7 @@ def add_messages(
                     detail={"code": "VALIDATION_ERROR", "message": "Message content cannot be empty"},
                 )
 
-        owned, added = add_messages_to_thread(
+        owned, added = await add_messages_to_thread(
             owner_id=owner_id,
             thread_id=thread_id,
             messages=[{"role": m.role, "content": m.content} for m in body.messages],
@@ -354,7 +356,7 @@ def add_messages(
         )
 
 @router.post("/{thread_id}/workspace", response_model=WorkspaceCreatedOut)
-def convert_to_workspace(
+async def convert_to_workspace(
     thread_id: str = Path(..., min_length=10),
     payload: WorkspaceMembersIn = Body(...),
     user: Dict[str, Any] = Depends(get_current_user),
@@ -375,14 +377,17 @@ def convert_to_workspace(
             "limit=1",
         ]
     )
-    rows = sb.rest_select("threads", q_thread, access_token)
+    rows, is_root = await gather_queries(
+        sb.rest_select_async("threads", q_thread, access_token),
+        is_branch_root(thread_id, access_token),
+    )
     if not rows:
         raise HTTPException(status_code=404, detail="Thread not found")
     thread = rows[0]
     if thread.get("owner_id") != owner_id:
         raise HTTPException(status_code=403, detail="Only the owner can convert to workspace.")
 
-    if not is_branch_root(thread_id, access_token):
+    if not is_root:
         raise HTTPException(
             status_code=409,
             detail={
@@ -392,12 +397,20 @@ def convert_to_workspace(
         )
 
     # 2) Mark as workspace (RLS-enforced via caller token)
-    sb.rest_update("threads", f"id=eq.{quote(thread_id)}", {"is_workspace": True}, access_token)
+    await sb.rest_update_async("threads", f"id=eq.{quote(thread_id)}", {"is_workspace": True}, access_token)
 
-    # 3) Existing members to avoid duplicates
-    member_rows = sb.rest_select(
-        "thread_members", f"thread_id=eq.{quote(thread_id)}&select=user_id", access_token
-    )
+    # 3) Existing members to avoid duplicates, looked up together with the
+    #    invited emails and the branch lineage.
+    try:
+        member_rows, lineage_ids, *member_ids = await gather_queries(
+            sb.rest_select_async(
+                "thread_members", f"thread_id=eq.{quote(thread_id)}&select=user_id", access_token
+            ),
+            branch_lineage_thread_ids(owner_id, thread_id, access_token),
+            *(get_user_id_by_email_async(email) for email in payload.emails),
+        )
+    except RuntimeError:
+        raise HTTPException(status_code=500, detail="Unable to look up workspace member")
     existing_ids = {m.get("user_id") for m in member_rows if m.get("user_id")}
 
     rows_to_add: List[Dict[str, Any]] = []
@@ -410,11 +423,7 @@ def convert_to_workspace(
         existing_ids.add(owner_id)
 
     # Add members by email lookup
-    for email in payload.emails:
-        try:
-            uid = get_user_id_by_email(email)
-        except RuntimeError:
-            raise HTTPException(status_code=500, detail="Unable to look up workspace member")
+    for email, uid in zip(payload.emails, member_ids):
         if not uid:
             not_found.append(email)
             continue
@@ -427,37 +436,38 @@ def convert_to_workspace(
 
     if rows_to_add:
         try:
-            sb.rest_insert("thread_members", rows_to_add, access_token)
-        except requests.HTTPError as exc:
+            await sb.rest_insert_async("thread_members", rows_to_add, access_token)
+        except httpx.HTTPStatusError as exc:
             # Ignore conflict duplicates; re-raise others.
-            if not exc.response or exc.response.status_code != 409:
+            if exc.response.status_code != 409:
                 raise
 
     # Every workspace member receives an inherited membership row on existing
     # descendants. The descendants remain ordinary branch threads
     # (is_workspace=false), but RLS can still grant the whole team access.
-    lineage_ids = branch_lineage_thread_ids(owner_id, thread_id, access_token)
     if len(lineage_ids) > 1:
         safe_lineage_ids = ",".join(quote(value) for value in lineage_ids)
-        root_members = sb.rest_select(
-            "thread_members",
-            "&".join(
-                [
-                    f"thread_id=eq.{quote(thread_id)}",
-                    "select=user_id,role",
-                ]
+        root_members, inherited_rows = await gather_queries(
+            sb.rest_select_async(
+                "thread_members",
+                "&".join(
+                    [
+                        f"thread_id=eq.{quote(thread_id)}",
+                        "select=user_id,role",
+                    ]
+                ),
+                access_token,
             ),
-            access_token,
-        )
-        inherited_rows = sb.rest_select(
-            "thread_members",
-            "&".join(
-                [
-                    f"thread_id=in.({safe_lineage_ids})",
-                    "select=thread_id,user_id",
-                ]
+            sb.rest_select_async(
+                "thread_members",
+                "&".join(
+                    [
+                        f"thread_id=in.({safe_lineage_ids})",
+                        "select=thread_id,user_id",
+                    ]
+                ),
+                access_token,
             ),
-            access_token,
         )
         existing_pairs = {
             (str(row.get("thread_id")), str(row.get("user_id")))
@@ -478,9 +488,9 @@ def convert_to_workspace(
         ]
         if rows_to_inherit:
             try:
-                sb.rest_insert("thread_members", rows_to_inherit, access_token)
-            except requests.HTTPError as exc:
-                if not exc.response or exc.response.status_code != 409:
+                await sb.rest_insert_async("thread_members", rows_to_inherit, access_token)
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code != 409:
                     raise
 
     return {
@@ -492,7 +502,7 @@ def convert_to_workspace(
 
 
 @router.get("/{thread_id}/members")
-def list_thread_members(
+async def list_thread_members(
     thread_id: str = Path(..., min_length=10),
     user: Dict[str, Any] = Depends(get_current_user),
     access_token: str = Depends(get_access_token),
@@ -504,7 +514,7 @@ def list_thread_members(
     if not current_user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    if not is_branch_root(thread_id, access_token):
+    if not await is_branch_root(thread_id, access_token):
         raise HTTPException(
             status_code=409,
             detail={
@@ -515,17 +525,17 @@ def list_thread_members(
 
     # Check ownership/membership
     q_thread = "&".join([f"id=eq.{quote(thread_id)}", "select=owner_id", "limit=1"])
-    thread_rows = sb.rest_select("threads", q_thread, access_token)
+    thread_rows = await sb.rest_select_async("threads", q_thread, access_token)
     if not thread_rows:
         raise HTTPException(status_code=404, detail="Thread not found")
     is_owner = thread_rows[0].get("owner_id") == current_user_id
     if not is_owner:
         q_member = f"thread_id=eq.{quote(thread_id)}&user_id=eq.{quote(current_user_id)}&select=id&limit=1"
-        membership = sb.rest_select("thread_members", q_member, access_token)
+        membership = await sb.rest_select_async("thread_members", q_member, access_token)
         if not membership:
             raise HTTPException(status_code=403, detail="Not allowed")
 
-    members = sb.rest_select(
+    members = await sb.rest_select_async(
         "thread_members",
         "&".join(
             [
@@ -537,7 +547,7 @@ def list_thread_members(
         access_token,
     )
     ids = [m.get("user_id") for m in members if m.get("user_id")]
-    user_map = get_users_by_ids(ids) if ids else {}
+    user_map = await get_users_by_ids_async(ids) if ids else {}
     for m in members:
         uid = m.get("user_id")
         m["email"] = user_map.get(uid, {}).get("email")
@@ -545,7 +555,7 @@ def list_thread_members(
 
 
 @router.get("/{thread_id}/bookmarks", response_model=BookmarksResp)
-def get_thread_bookmarks(
+async def get_thread_bookmarks(
     thread_id: str = Path(..., min_length=10),
     user: Dict[str, Any] = Depends(get_current_user),
     access_token: str = Depends(get_access_token),
@@ -555,14 +565,14 @@ def get_thread_bookmarks(
         if not owner_id:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        owned, rows = list_thread_bookmarks(owner_id, thread_id, access_token)
+        owned, rows = await list_thread_bookmarks(owner_id, thread_id, access_token)
         if not owned:
             raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": "Thread not found"})
         return {"bookmarks": rows}
     except HTTPException:
         raise
-    except requests.HTTPError as exc:
-        status_code = exc.response.status_code if exc.response is not None else None
+    except httpx.HTTPStatusError as exc:
+        status_code = exc.response.status_code
         code = "BOOKMARKS_TABLE_MISSING" if status_code == 404 else "BOOKMARKS_QUERY_FAILED"
         raise HTTPException(
             status_code=500,
@@ -573,7 +583,7 @@ def get_thread_bookmarks(
 
 
 @router.post("/{thread_id}/bookmarks", response_model=BookmarkOut, status_code=200)
-def create_thread_bookmark(
+async def create_thread_bookmark(
     thread_id: str = Path(..., min_length=10),
     body: BookmarkIn = Body(...),
     user: Dict[str, Any] = Depends(get_current_user),
@@ -584,7 +594,7 @@ def create_thread_bookmark(
         if not owner_id:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        owned, bookmark = add_thread_bookmark(owner_id, thread_id, body.message_index, access_token)
+        owned, bookmark = await add_thread_bookmark(owner_id, thread_id, body.message_index, access_token)
         if not owned:
             raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": "Thread not found"})
         return bookmark
@@ -592,8 +602,8 @@ def create_thread_bookmark(
         raise
     except ValueError as exc:
         raise HTTPException(status_code=404, detail={"code": "MESSAGE_NOT_FOUND", "message": str(exc)})
-    except requests.HTTPError as exc:
-        status_code = exc.response.status_code if exc.response is not None else None
+    except httpx.HTTPStatusError as exc:
+        status_code = exc.response.status_code
         code = "BOOKMARKS_TABLE_MISSING" if status_code == 404 else "BOOKMARKS_INSERT_FAILED"
         raise HTTPException(
             status_code=500,
@@ -604,7 +614,7 @@ def create_thread_bookmark(
 
 
 @router.delete("/{thread_id}/bookmarks/{message_index}", response_model=BookmarkDeleteResp, status_code=200)
-def delete_thread_bookmark(
+async def delete_thread_bookmark(
     thread_id: str = Path(..., min_length=10),
     message_index: int = Path(..., ge=0),
     user: Dict[str, Any] = Depends(get_current_user),
@@ -615,14 +625,14 @@ def delete_thread_bookmark(
         if not owner_id:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        owned, removed = remove_thread_bookmark(owner_id, thread_id, message_index, access_token)
+        owned, removed = await remove_thread_bookmark(owner_id, thread_id, message_index, access_token)
         if not owned:
             raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": "Thread not found"})
         return {"ok": removed, "message_index": message_index}
     except HTTPException:
         raise
-    except requests.HTTPError as exc:
-        status_code = exc.response.status_code if exc.response is not None else None
+    except httpx.HTTPStatusError as exc:
+        status_code = exc.response.status_code
         code = "BOOKMARKS_TABLE_MISSING" if status_code == 404 else "BOOKMARKS_DELETE_FAILED"
         raise HTTPException(
             status_code=500,
@@ -632,17 +642,22 @@ def delete_thread_bookmark(
         raise HTTPException(status_code=500, detail={"code": "BOOKMARKS_DELETE_FAILED", "message": "Failed to delete bookmark"})
 
 
-@router.post("/{thread_id}/chat", response_model=ChatResponse, status_code=200)
-async def chat_with_thread(
-    thread_id: str = Path(..., min_length=10),
-    body: ChatRequest = Body(...),
-    user: Dict[str, Any] = Depends(get_current_user),
-    access_token: str = Depends(get_access_token),
-):
+async def _prepare_chat_turn(
+    thread_id: str,
+    body: ChatRequest,
+    user: Dict[str, Any],
+    access_token: str,
+) -> Tuple[str, str, List[Dict[str, Any]], Dict[str, Any], Optional[ContextSession]]:
+    """
+    Shared first half of a chat turn: access check, user message persistence
+    and context assembly. Returns (incoming, model, payload_messages, context,
+    session) where context describes the token-budgeted prompt (see
+    llm_context) and session carries Ollama's generate-mode KV context, if any.
+    """
     owner_id = user.get("id")
     if not owner_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    if not _can_access_thread(owner_id, thread_id, access_token):
+    if not await _can_access_thread(owner_id, thread_id, access_token):
         raise HTTPException(status_code=404, detail="Thread not found")
 
     incoming = (body.content or "").strip()
@@ -656,7 +671,7 @@ async def chat_with_thread(
     # The marker is excluded from all chat/message queries.
     if model.lower().startswith("gemini-"):
         try:
-            remember_thread_model(owner_id, thread_id, model, access_token)
+            await remember_thread_model(owner_id, thread_id, model, access_token)
         except Exception as exc:
             # Metadata is an enhancement; never block the actual chat if a
             # deployed database has an unexpected legacy constraint.
@@ -666,7 +681,7 @@ async def chat_with_thread(
             )
 
     # 1) Persist incoming user message (dedupe first-turn duplicate posts)
-    recent_desc = list_recent_messages(thread_id, 2, access_token)
+    recent_desc = await list_recent_messages(thread_id, 2, access_token)
     latest = recent_desc[0] if recent_desc else None
     latest_role = str((latest or {}).get("role") or "").lower() if latest else ""
     latest_content = ((latest or {}).get("content") or "").strip() if latest else ""
@@ -683,11 +698,23 @@ async def chat_with_thread(
             "created_at": latest.get("created_at") or "",
         }
     else:
-        user_row = insert_and_fetch_message(thread_id, "user", incoming, access_token)
+        user_row = await insert_and_fetch_message(thread_id, "user", incoming, access_token)
 
     # 2) Build context in memory
     prior_limit = max(0, context_limit - 1)
-    before_rows = list_messages_before_index(thread_id, int(user_row.get("index", 0)), prior_limit, access_token)
+    user_index = int(user_row.get("index", 0))
+    summary = None
+    if settings.CHAT_SUMMARY_ENABLED and user_index > int(settings.CHAT_SUMMARY_RECENT_MESSAGES):
+        before_rows, summary = await gather_queries(
+            list_messages_before_index(thread_id, user_index, prior_limit, access_token),
+            get_conversation_summary(thread_id, access_token),
+        )
+    else:
+        before_rows = await list_messages_before_index(thread_id, user_index, prior_limit, access_token)
+    summary_through = int(summary.get("through_index", -1)) if summary else None
+    if summary_through is not None:
+        # Turns the rolling summary already covers are not sent again.
+        before_rows = [row for row in before_rows if int(row.get("index", 0)) > summary_through]
     chron = list(reversed(before_rows)) + [user_row]
 
     if settings.CHAT_DEBUG_ASSERTS:
@@ -704,33 +731,204 @@ async def chat_with_thread(
                 detail={"code": "CHAT_LAST_USER_WRONG", "incoming": incoming[:60]},
             )
 
-    payload_messages = [{"role": m.get("role"), "content": m.get("content")} for m in chron]
-    if not any((m.get("role") or "").lower() == "system" for m in payload_messages):
-        payload_messages = [
+    history = [{"role": m.get("role"), "content": m.get("content")} for m in chron[:-1]]
+    system = []
+    if not any((m.get("role") or "").lower() == "system" for m in history):
+        system = [
             {"role": "system", "content": settings.LLM_SYSTEM_PROMPT + " Never repeat the user's question; answer directly."}
-        ] + payload_messages
+        ]
+    if summary:
+        system.append({"role": "system", "content": "Summary of the earlier conversation:\n" + summary["text"]})
+    # context_limit caps how many rows are fetched; the token budget decides what is sent.
+    payload_messages, context = llm_context.fit_to_budget(
+        system,
+        history,
+        {"role": user_row.get("role") or "user", "content": user_row.get("content")},
+        llm_context.token_budget(model),
+    )
+    context["summary_through_index"] = summary_through
+    session = await _open_context_session(thread_id, model, user_index, access_token)
+    if session is not None:
+        context["ollama_context_reused"] = session.reused
+    return incoming, model, payload_messages, context, session
+
+
+async def _open_context_session(
+    thread_id: str,
+    model: str,
+    user_index: int,
+    access_token: str,
+) -> Optional[ContextSession]:
+    """Pick up the context the previous turn left, if it ends right before this one."""
+    if not llm_client.uses_ollama_context(model):
+        return None
+    session = ContextSession(thread_id=thread_id, model=model)
+    entry = context_cache.get(thread_id)
+    if not entry_matches(entry, user_index, model) and settings.OLLAMA_CONTEXT_PERSIST:
+        try:
+            entry = await get_ollama_context(thread_id, access_token)
+        except Exception as exc:
+            logger.warning("Failed to load Ollama context", extra={"thread_id": thread_id, "error": str(exc)})
+            entry = None
+    if entry_matches(entry, user_index, model):
+        session.context = entry["context"]
+    return session
+
+
+def _remember_context(
+    thread_id: str,
+    session: Optional[ContextSession],
+    assistant_index: Any,
+    access_token: str,
+) -> None:
+    """Keep the context Ollama returned for the next turn, or drop a stale one."""
+    if session is None:
+        return
+    if not session.returned or not isinstance(assistant_index, int):
+        # Answered by the fallback host, or no context came back.
+        context_cache.forget(thread_id)
+        return
+    entry = {"model": session.model, "through_index": assistant_index, "context": session.returned}
+    context_cache.put(thread_id, entry)
+    if settings.OLLAMA_CONTEXT_PERSIST:
+        # Last write wins: a newer turn's context must not be dropped while
+        # the previous store is still running.
+        background.spawn_latest(
+            f"ollama-context:{thread_id}",
+            lambda: store_ollama_context(thread_id, entry, access_token),
+        )
 
-    try:
-        assistant_content = await llm_client.generate(model=model, messages=payload_messages)
-        # If the model echoed the user, retry once with a stricter instruction.
-        if _is_echo(assistant_content, incoming):
-            payload_messages.append(
-                {
-                    "role": "system",
-                    "content": "Do not repeat the user's question. Provide a concise answer now.",
-                }
-            )
-            assistant_content = await llm_client.generate(model=model, messages=payload_messages)
-    except LLMUpstreamError as exc:
-        raise HTTPException(
-            status_code=502,
+
+def _schedule_summary_refresh(
+    thread_id: str,
+    assistant_index: Any,
+    model: str,
+    access_token: str,
+    summary_through: Optional[int],
+) -> None:
+    """After an assistant turn, fold messages leaving the recent window into the summary."""
+    if not settings.CHAT_SUMMARY_ENABLED or not isinstance(assistant_index, int):
+        return
+    covered = -1 if summary_through is None else summary_through
+    if assistant_index - int(settings.CHAT_SUMMARY_RECENT_MESSAGES) - covered < int(settings.CHAT_SUMMARY_MIN_NEW_MESSAGES):
+        return
+    background.spawn(
+        f"conversation-summary:{thread_id}",
+        lambda: refresh_conversation_summary(thread_id, assistant_index, model, access_token),
+    )
+
+
+def _llm_failed_exception(exc: LLMUpstreamError) -> HTTPException:
+    if exc.retry_after is not None:
+        # Shed by admission control: a retryable 503 rather than a bad gateway.
+        return HTTPException(
+            status_code=503,
+            headers={"Retry-After": str(exc.retry_after)},
             detail={
-                "code": exc.code or "LLM_FAILED",
-                "message": "The language model request failed.",
+                "code": exc.code,
+                "message": "The language model is busy. Try again shortly.",
                 "provider": exc.provider,
-                "status": exc.status,
+                "retry_after": exc.retry_after,
             },
         )
+    return HTTPException(
+        status_code=502,
+        detail={
+            "code": exc.code or "LLM_FAILED",
+            "message": "The language model request failed.",
+            "provider": exc.provider,
+            "status": exc.status,
+        },
+    )
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _start_generation(
+    request_id: Optional[str],
+    thread_id: str,
+    user: Dict[str, Any],
+    job: Callable[[generations.Generation], Awaitable[Any]],
+) -> generations.Generation:
+    try:
+        return generations.start(request_id or uuid.uuid4().hex, thread_id, str(user.get("id")), job)
+    except generations.DuplicateGeneration:
+        raise HTTPException(
+            status_code=409,
+            detail={"code": "GENERATION_IN_PROGRESS", "message": "A generation with this request_id is running"},
+        )
+
+
+async def _keep_partial_answer(generation: generations.Generation, access_token: str) -> None:
+    """On cancel with keep_partial, save what was streamed so far as the assistant message."""
+    text = generation.partial
+    if not generation.keep_partial or not text.strip():
+        return
+    try:
+        generation.saved = await insert_and_fetch_message(generation.thread_id, "assistant", text, access_token)
+    except Exception as exc:
+        logger.warning(
+            "Failed to persist partial assistant message",
+            extra={"thread_id": generation.thread_id, "error": str(exc)},
+        )
+
+
+def _cancelled_turn(generation: generations.Generation, incoming: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    saved = generation.saved or {}
+    return {
+        "thread_id": generation.thread_id,
+        "user_content": incoming,
+        "assistant_content": saved.get("content") or generation.partial,
+        "assistant_index": saved.get("index"),
+        "status": "cancelled",
+        "context": context,
+        "request_id": generation.request_id,
+    }
+
+
+@router.post("/{thread_id}/chat", response_model=ChatResponse, status_code=200)
+async def chat_with_thread(
+    request: Request,
+    thread_id: str = Path(..., min_length=10),
+    body: ChatRequest = Body(...),
+    user: Dict[str, Any] = Depends(get_current_user),
+    access_token: str = Depends(get_access_token),
+):
+    incoming, model, payload_messages, context, session = await _prepare_chat_turn(
+        thread_id, body, user, access_token
+    )
+
+    async def produce(generation: generations.Generation) -> str:
+        try:
+            # An answer that just repeats the user is retried once with a nudge.
+            # Streamed deltas are collected so a cancel can keep them.
+            return await llm_client.generate(
+                model=model,
+                messages=payload_messages,
+                echo_of=incoming,
+                session=session,
+                thread_id=thread_id,
+                on_delta=generation.parts.append,
+            )
+        except asyncio.CancelledError:
+            await _keep_partial_answer(generation, access_token)
+            raise
+
+    generation = _start_generation(body.request_id, thread_id, user, produce)
+    # Nobody will read the answer once the client is gone: stop paying for it.
+    watcher = asyncio.ensure_future(generations.cancel_on_disconnect(generation, request.is_disconnected))
+    try:
+        assistant_content = await generation.task
+    except asyncio.CancelledError:
+        if not generation.cancelled:
+            raise
+        return _cancelled_turn(generation, incoming, context)
+    except LLMUpstreamError as exc:
+        raise _llm_failed_exception(exc)
+    finally:
+        watcher.cancel()
 
     if not assistant_content or not assistant_content.strip():
         raise HTTPException(
@@ -738,7 +936,11 @@ async def chat_with_thread(
             detail={"code": "EMPTY_COMPLETION", "message": "LLM returned empty completion"},
         )
 
-    assistant_row = insert_and_fetch_message(thread_id, "assistant", assistant_content, access_token)
+    assistant_row = await insert_and_fetch_message(thread_id, "assistant", assistant_content, access_token)
+    _remember_context(thread_id, session, assistant_row.get("index"), access_token)
+    _schedule_summary_refresh(
+        thread_id, assistant_row.get("index"), model, access_token, context["summary_through_index"]
+    )
 
     return {
         "thread_id": thread_id,
@@ -746,4 +948,172 @@ async def chat_with_thread(
         "assistant_content": assistant_row.get("content"),
         "assistant_index": assistant_row.get("index"),
         "status": "saved",
+        "context": context,
+        "request_id": generation.request_id,
     }
+
+
+# Markers the streaming producer puts after the last delta.
+_STREAM_END = object()
+_STREAM_CANCELLED = object()
+
+
+@router.post("/{thread_id}/chat/stream", status_code=200)
+async def chat_with_thread_stream(
+    request: Request,
+    thread_id: str = Path(..., min_length=10),
+    body: ChatRequest = Body(...),
+    user: Dict[str, Any] = Depends(get_current_user),
+    access_token: str = Depends(get_access_token),
+):
+    """
+    Server-Sent Events variant of POST /{thread_id}/chat.
+
+    Emits ``delta`` events ({"content": "..."}) as the model produces text,
+    then a single ``done`` event shaped like ChatResponse once the assistant
+    message is saved. Failures before the first token return a normal 502;
+    later failures end the stream with an ``error`` event and nothing is saved.
+    A cancelled generation (see cancel_chat_generation) ends with a
+    ``cancelled`` event instead of ``done``.
+    """
+    incoming, model, payload_messages, context, session = await _prepare_chat_turn(
+        thread_id, body, user, access_token
+    )
+    deltas: "asyncio.Queue[Any]" = asyncio.Queue()
+
+    async def produce(generation: generations.Generation) -> None:
+        stream = llm_client.generate_stream(
+            model=model, messages=payload_messages, echo_of=incoming, session=session, thread_id=thread_id
+        )
+        try:
+            async for chunk in stream:
+                generation.parts.append(chunk)
+                deltas.put_nowait(chunk)
+        except asyncio.CancelledError:
+            await _keep_partial_answer(generation, access_token)
+            deltas.put_nowait(_STREAM_CANCELLED)
+            raise
+        except Exception as exc:
+            deltas.put_nowait(exc)
+        else:
+            deltas.put_nowait(_STREAM_END)
+        finally:
+            await stream.aclose()
+
+    generation = _start_generation(body.request_id, thread_id, user, produce)
+    watcher = asyncio.ensure_future(generations.cancel_on_disconnect(generation, request.is_disconnected))
+    try:
+        # Wait for the first token so upstream failures still surface as 502.
+        first = await deltas.get()
+    except asyncio.CancelledError:
+        generation.cancel(generations.DISCONNECT)
+        raise
+    finally:
+        # From here on StreamingResponse notices the disconnect itself.
+        watcher.cancel()
+    if first is _STREAM_END:
+        raise HTTPException(
+            status_code=502,
+            detail={"code": "EMPTY_COMPLETION", "message": "LLM returned empty completion"},
+        )
+    if isinstance(first, LLMUpstreamError):
+        raise _llm_failed_exception(first)
+    if isinstance(first, Exception):
+        raise first
+
+    async def events():
+        item = first
+        relayed = False
+        try:
+            while isinstance(item, str):
+                yield _sse_event("delta", {"content": item})
+                item = await deltas.get()
+            relayed = True
+        finally:
+            if not relayed:
+                # The client went away mid-stream: abort the upstream call too.
+                generation.cancel(generations.DISCONNECT, keep_partial=settings.CHAT_KEEP_PARTIAL_ON_DISCONNECT)
+
+        if item is _STREAM_CANCELLED:
+            yield _sse_event("cancelled", _cancelled_turn(generation, incoming, context))
+            return
+        if isinstance(item, LLMUpstreamError):
+            yield _sse_event(
+                "error",
+                {
+                    "code": item.code or "LLM_FAILED",
+                    "message": "The language model request failed.",
+                    "provider": item.provider,
+                    "status": item.status,
+                },
+            )
+            return
+        if isinstance(item, Exception):
+            raise item
+
+        assistant_content = generation.partial
+        if not assistant_content.strip():
+            yield _sse_event("error", {"code": "EMPTY_COMPLETION", "message": "LLM returned empty completion"})
+            return
+        try:
+            assistant_row = await insert_and_fetch_message(thread_id, "assistant", assistant_content, access_token)
+        except Exception as exc:
+            logger.warning(
+                "Failed to persist streamed assistant message",
+                extra={"thread_id": thread_id, "error": str(exc)},
+            )
+            yield _sse_event("error", {"code": "SAVE_FAILED", "message": "Failed to save the assistant message"})
+            return
+        _remember_context(thread_id, session, assistant_row.get("index"), access_token)
+        _schedule_summary_refresh(
+            thread_id, assistant_row.get("index"), model, access_token, context["summary_through_index"]
+        )
+        yield _sse_event(
+            "done",
+            {
+                "thread_id": thread_id,
+                "user_content": incoming,
+                "assistant_content": assistant_row.get("content"),
+                "assistant_index": assistant_row.get("index"),
+                "status": "saved",
+                "context": context,
+                "request_id": generation.request_id,
+            },
+        )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Proxies (nginx) must not buffer the token stream.
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Chat-Request-ID": generation.request_id,
+        },
+    )
+
+
+@router.post("/{thread_id}/chat/{request_id}/cancel")
+async def cancel_chat_generation(
+    thread_id: str = Path(..., min_length=10),
+    request_id: str = Path(..., min_length=8, max_length=64),
+    body: Optional[ChatCancelIn] = Body(default=None),
+    user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Stop a running chat turn started with ``request_id``. The upstream call is
+    aborted; the chat request answers with status "cancelled" (or a
+    ``cancelled`` SSE event). With keep_partial the text streamed so far is
+    saved as the assistant message.
+    """
+    owner_id = user.get("id")
+    if not owner_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    generation = generations.get(request_id)
+    if generation is None or generation.thread_id != thread_id or generation.owner_id != str(owner_id):
+        raise HTTPException(
+            status_code=404,
+            detail={"code": "GENERATION_NOT_FOUND", "message": "No running generation with this request_id"},
+        )
+    cancelled = generation.cancel(generations.USER, keep_partial=bool(body and body.keep_partial))
+    return {"ok": True, "request_id": request_id, "cancelled": cancelled}
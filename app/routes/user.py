@@ -35,7 +35,7 @@ async def list_extension_files(
         raise HTTPException(status_code=401, detail="Not authenticated")
 
     try:
-        items = list_extension_files_for_user(user_id, access_token)
+        items = await list_extension_files_for_user(user_id, access_token)
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to load extension files")
     return {"items": items}
@@ -77,11 +77,25 @@ class ChatBody(BaseModel):
     /threads/{thread_id}/chat 요청 바디
     - content: 유저가 새로 보내는 메시지(1건)
     - model: (선택) 기본 모델(settings.LLM_MODEL) 대신 특정 모델로 호출
-    - context_limit: (선택) 최근 N개 메시지를 컨텍스트로 사용
+    - context_limit: (선택) 최근 N개 메시지까지만 불러와 컨텍스트 후보로 사용
+      (실제 전송량은 모델별 토큰 예산으로 다시 제한)
     """
     content: str = Field(..., min_length=1, max_length=32_000)
     model: Optional[str] = Field(default=None, max_length=100)
     context_limit: int = Field(default=50, ge=1, le=200)
+    # 클라이언트가 정하는 생성 ID: POST /threads/{thread_id}/chat/{request_id}/cancel 로 중단
+    request_id: Optional[str] = Field(default=None, min_length=8, max_length=64, pattern=r"^[A-Za-z0-9_-]+$")
+
+
+class ChatContextUsage(BaseModel):
+    """LLM에 실제로 보낸 프롬프트 크기(로컬 추정 토큰 수)"""
+    prompt_tokens: int
+    token_budget: int
+    messages: int
+    compressed: int = 0  # 발췌로 줄여 보낸 이전 턴 수
+    dropped: int = 0  # 예산 초과로 제외한 이전 턴 수
+    summary_through_index: Optional[int] = None  # 누적 요약이 대신한 마지막 메시지 index
+    ollama_context_reused: Optional[bool] = None  # Ollama generate 모드: 이전 턴 KV context 재사용 여부
 
 
 class ChatResp(BaseModel):
@@ -89,7 +103,10 @@ class ChatResp(BaseModel):
     user_content: str
     assistant_content: str
     assistant_index: Optional[int] = None
-    status: Literal["saved"] = "saved"
+    # cancelled: 사용자가 중단(assistant_content는 부분 응답, 저장했으면 assistant_index 포함)
+    status: Literal["saved", "cancelled"] = "saved"
+    context: Optional[ChatContextUsage] = None
+    request_id: Optional[str] = None
 
 # Backward-compatible aliases
 class ChatRequest(ChatBody):
@@ -99,6 +116,10 @@ class ChatResponse(ChatResp):
     pass
 
 
+class ChatCancelIn(BaseModel):
+    keep_partial: bool = False  # 지금까지 생성된 부분 응답을 assistant 메시지로 저장(Gemini·hedge 요청은 제외)
+
+
 class BranchCreate(BaseModel):
     model: Optional[str] = Field(default=None, max_length=100)
 
@@ -108,6 +129,8 @@ class BranchCreateResp(BaseModel):
     title: str
     parent_thread_id: str
     context_preview: str = Field(..., max_length=20)
+    # True while the LLM summary is still being generated in the background
+    context_preview_provisional: bool = False
     status: Literal["saved"] = "saved"
 
 
@@ -117,6 +140,7 @@ class BranchNode(BaseModel):
     title: str
     parent_thread_id: Optional[str] = None
     context_preview: Optional[str] = Field(default=None, max_length=20)
+    context_preview_provisional: bool = False
     created_at: str
     is_deleted: bool = False
     is_tutorial: bool = False
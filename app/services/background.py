@@ -0,0 +1,80 @@
+# app/services/background.py
+"""
+Fire-and-forget work that should not hold up a response (summaries etc.).
+
+Jobs are keyed: while a job for a key is running, further requests for the
+same key are dropped, so a busy thread schedules at most one refresh at a
+time. ``spawn_latest`` is for writes where the newest value must land: a
+request made while its key is busy waits, replacing any older waiting one,
+and runs right after. References are kept until the task finishes and
+failures are logged.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+_jobs: Dict[str, "asyncio.Task[Any]"] = {}
+# spawn_latest: the newest job waiting for its key's running task.
+_waiting: Dict[str, Callable[[], Awaitable[Any]]] = {}
+
+
+def spawn(key: str, job: Callable[[], Awaitable[Any]]) -> bool:
+    """Start ``job()`` unless a job with ``key`` is still running."""
+    running = _jobs.get(key)
+    if running is not None and not running.done():
+        return False
+
+    async def run() -> Any:
+        try:
+            return await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Background job failed", extra={"job": key})
+        finally:
+            if _jobs.get(key) is task:
+                del _jobs[key]
+
+    task = asyncio.ensure_future(run())
+    _jobs[key] = task
+    return True
+
+
+def spawn_latest(key: str, job: Callable[[], Awaitable[Any]]) -> None:
+    """Run ``job()`` once the job for ``key`` is done; a newer call replaces it while it waits."""
+    _waiting[key] = job
+    running = _jobs.get(key)
+    if running is not None and not running.done():
+        return
+
+    async def run_waiting() -> None:
+        while key in _waiting:
+            latest = _waiting.pop(key)
+            try:
+                await latest()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Background job failed", extra={"job": key})
+
+    spawn(key, run_waiting)
+
+
+def pending() -> int:
+    return sum(1 for task in _jobs.values() if not task.done())
+
+
+async def drain(cancel: bool = False) -> None:
+    """Wait for (or cancel) outstanding jobs; used on shutdown and in tests."""
+    tasks = [task for task in _jobs.values() if not task.done()]
+    if cancel:
+        _waiting.clear()
+        for task in tasks:
+            task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    _jobs.clear()
@@ -0,0 +1,137 @@
+# app/services/gemini_cache.py
+"""
+Gemini explicit context caching for long threads.
+
+Every Gemini turn resends the whole history, and in a long thread almost all
+of it (system prompt included) is the same as last turn. After a turn whose
+uncached history reaches GEMINI_CACHE_MIN_TOKENS, the history plus the new
+answer is stored as a Gemini ``CachedContent`` in the background. The next
+turn sends only the messages after that prefix and points
+``cached_content`` at it; cached input tokens are billed at the reduced rate.
+
+Handles are tracked per thread with their TTL. A handle is used only while
+it is unexpired, for the same model and when its digest still matches the
+start of the request (same system instruction, same leading messages), so
+an edited summary or a trimmed history simply falls back to a plain request.
+Deleting a thread's messages drops its handle and deletes the remote cache.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+# Stop using a handle this long before Gemini expires it.
+EXPIRY_SLACK_SECS = 15.0
+
+
+@dataclass
+class CachedPrefix:
+    name: str  # Gemini resource name, "cachedContents/..."
+    model: str
+    digest: str
+    length: int  # number of leading contents the cache covers
+    tokens: int
+    expires_at: float  # monotonic
+
+
+def content_text(content: Any) -> str:
+    return "".join(getattr(part, "text", None) or "" for part in (getattr(content, "parts", None) or []))
+
+
+def prefix_digest(model: str, system_instruction: Optional[str], contents: List[Any]) -> str:
+    rows = [[getattr(content, "role", None), content_text(content)] for content in contents]
+    blob = json.dumps([model, system_instruction or "", rows], ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class GeminiCacheRegistry:
+    """Per-thread cache handles (LRU, GEMINI_CACHE_MAX_THREADS) and token counters."""
+
+    def __init__(self) -> None:
+        self._entries: "OrderedDict[str, CachedPrefix]" = OrderedDict()
+        self.clear()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.creates = 0
+        self.invalidations = 0
+        self.cached_input_tokens = 0
+        self.uncached_input_tokens = 0
+
+    def lookup(
+        self,
+        thread_id: str,
+        model: str,
+        system_instruction: Optional[str],
+        contents: List[Any],
+    ) -> Optional[CachedPrefix]:
+        """The thread's handle if it covers the start of ``contents``."""
+        entry = self._entries.get(thread_id)
+        if entry is not None and entry.expires_at - EXPIRY_SLACK_SECS <= time.monotonic():
+            # Gemini deletes expired caches itself.
+            del self._entries[thread_id]
+            entry = None
+        if (
+            entry is None
+            or entry.model != model
+            or entry.length >= len(contents)
+            or entry.digest != prefix_digest(model, system_instruction, contents[: entry.length])
+        ):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(thread_id)
+        return entry
+
+    def peek(self, thread_id: str) -> Optional[CachedPrefix]:
+        return self._entries.get(thread_id)
+
+    def put(self, thread_id: str, entry: CachedPrefix) -> List[CachedPrefix]:
+        """Store ``entry``; returns handles that are no longer tracked (to delete remotely)."""
+        dropped = []
+        previous = self._entries.pop(thread_id, None)
+        if previous is not None and previous.name != entry.name:
+            dropped.append(previous)
+        self._entries[thread_id] = entry
+        self.creates += 1
+        while len(self._entries) > max(1, int(settings.GEMINI_CACHE_MAX_THREADS)):
+            dropped.append(self._entries.popitem(last=False)[1])
+        return dropped
+
+    def invalidate(self, thread_id: str) -> Optional[CachedPrefix]:
+        entry = self._entries.pop(thread_id, None)
+        if entry is not None:
+            self.invalidations += 1
+        return entry
+
+    def record_usage(self, usage: Any) -> Dict[str, int]:
+        """Split a response's prompt tokens into cached and uncached."""
+        prompt = int(getattr(usage, "prompt_token_count", None) or 0)
+        cached = int(getattr(usage, "cached_content_token_count", None) or 0)
+        counts = {"cached": cached, "uncached": max(0, prompt - cached)}
+        self.cached_input_tokens += counts["cached"]
+        self.uncached_input_tokens += counts["uncached"]
+        return counts
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.GEMINI_CACHE_ENABLED,
+            "threads": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "creates": self.creates,
+            "invalidations": self.invalidations,
+            "cached_input_tokens": self.cached_input_tokens,
+            "uncached_input_tokens": self.uncached_input_tokens,
+        }
+
+
+registry = GeminiCacheRegistry()
@@ -0,0 +1,117 @@
+# app/services/generations.py
+"""
+In-flight chat generations, so a user can stop one.
+
+Each chat turn runs its upstream call in its own task, registered under the
+turn's request id. Cancelling that task (POST .../chat/{request_id}/cancel,
+or the client disconnecting) unwinds the call like any other cancellation:
+the httpx stream or Gemini request is closed, the admission slot is
+released and the breaker records no verdict. Deltas received so far stay in
+``parts`` so the route can keep them as a partial answer.
+
+The registry is per process: a cancel request must reach the worker that
+runs the generation.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+USER = "user"
+DISCONNECT = "disconnect"
+
+
+class DuplicateGeneration(Exception):
+    """A generation with this request id is still running."""
+
+
+@dataclass
+class Generation:
+    request_id: str
+    thread_id: str
+    owner_id: str
+    task: Optional["asyncio.Task[Any]"] = None
+    parts: List[str] = field(default_factory=list)
+    cancel_reason: Optional[str] = None  # USER | DISCONNECT once cancelled
+    keep_partial: bool = False
+    saved: Optional[Dict[str, Any]] = None  # the partial answer's message row, if kept
+
+    @property
+    def partial(self) -> str:
+        return "".join(self.parts)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_reason is not None
+
+    def cancel(self, reason: str, keep_partial: bool = False) -> bool:
+        if self.task is None or self.task.done() or self.cancelled:
+            return False
+        self.cancel_reason = reason
+        self.keep_partial = keep_partial
+        self.task.cancel()
+        logger.info(
+            "Chat generation cancelled",
+            extra={"request_id": self.request_id, "thread_id": self.thread_id, "reason": reason},
+        )
+        return True
+
+
+_active: Dict[str, Generation] = {}
+
+
+def start(
+    request_id: str,
+    thread_id: str,
+    owner_id: str,
+    job: Callable[[Generation], Awaitable[Any]],
+) -> Generation:
+    """Run ``job(generation)`` in a task registered under ``request_id``."""
+    running = _active.get(request_id)
+    if running is not None and running.task is not None and not running.task.done():
+        raise DuplicateGeneration(request_id)
+    generation = Generation(request_id=request_id, thread_id=thread_id, owner_id=owner_id)
+    generation.task = asyncio.ensure_future(job(generation))
+    _active[request_id] = generation
+
+    def finished(_task: "asyncio.Task[Any]") -> None:
+        if _active.get(request_id) is generation:
+            del _active[request_id]
+
+    generation.task.add_done_callback(finished)
+    return generation
+
+
+def get(request_id: str) -> Optional[Generation]:
+    return _active.get(request_id)
+
+
+def active() -> int:
+    return len(_active)
+
+
+async def cancel_on_disconnect(
+    generation: Generation,
+    is_disconnected: Callable[[], Awaitable[bool]],
+) -> None:
+    """Poll the client connection until the generation ends; cancel it if the client left."""
+    interval = max(0.01, float(settings.CHAT_DISCONNECT_POLL_SECS))
+    task = generation.task
+    while task is not None and not task.done():
+        if await is_disconnected():
+            generation.cancel(DISCONNECT, keep_partial=settings.CHAT_KEEP_PARTIAL_ON_DISCONNECT)
+            return
+        await asyncio.wait({task}, timeout=interval)
+
+
+def reset() -> None:
+    for generation in _active.values():
+        if generation.task is not None:
+            generation.task.cancel()
+    _active.clear()
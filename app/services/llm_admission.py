@@ -0,0 +1,186 @@
+# app/services/llm_admission.py
+"""
+Per-provider admission control for outbound LLM calls.
+
+Each upstream (primary, fallback, gemini) admits at most its configured
+number of concurrent generations. Callers beyond that wait in a bounded queue
+ordered by priority class (interactive chat, then branch summaries, then
+health probes). A full queue sheds the lowest-priority waiter, or rejects the
+newcomer if nothing queued ranks below it, so overload turns into a fast 503
+with Retry-After instead of every request slowing down together.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+
+INTERACTIVE = 0
+SUMMARY = 1
+PROBE = 2
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", SUMMARY: "summary", PROBE: "probe"}
+
+_SAMPLES = 200
+
+
+class Overloaded(Exception):
+    def __init__(self, provider: str, reason: str, retry_after: int) -> None:
+        super().__init__(f"{provider} LLM upstream is overloaded ({reason}); retry in {retry_after}s.")
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "future", "queued_at")
+
+    def __init__(self, priority: int, seq: int, future: "asyncio.Future[None]") -> None:
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+        self.queued_at = time.monotonic()
+
+    def rank(self) -> tuple:
+        return (self.priority, self.seq)
+
+
+class AdmissionController:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.reset()
+
+    def reset(self) -> None:
+        self.active = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.max_queue_depth = 0
+        self._waits: Deque[float] = deque(maxlen=_SAMPLES)
+        self._holds: Deque[float] = deque(maxlen=_SAMPLES)
+
+    @property
+    def limit(self) -> int:
+        return max(1, int(getattr(settings, f"LLM_ADMISSION_{self.name.upper()}_CONCURRENCY")))
+
+    def _admit(self, waited: float) -> float:
+        self.admitted += 1
+        self._waits.append(waited)
+        return time.monotonic()
+
+    def retry_after(self) -> int:
+        """Rough seconds until a queued request would be served."""
+        hold = _percentile(self._holds, 0.5) or 1.0
+        backlog = len(self._waiters) / self.limit + 1
+        return max(1, min(60, math.ceil(hold * backlog)))
+
+    def _overloaded(self, reason: str) -> Overloaded:
+        self.shed += 1
+        return Overloaded(self.name, reason, self.retry_after())
+
+    async def acquire(self, priority: int) -> Optional[float]:
+        """Wait for a slot; returns the admission timestamp to pass to release()."""
+        if not settings.LLM_ADMISSION_ENABLED:
+            return None
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return self._admit(0.0)
+
+        if len(self._waiters) >= max(0, int(settings.LLM_ADMISSION_QUEUE_SIZE)):
+            worst = max(self._waiters, key=_Waiter.rank, default=None)
+            if worst is None or worst.priority <= priority:
+                raise self._overloaded("queue full")
+            # Make room by shedding a queued request of a lower class.
+            self._waiters.remove(worst)
+            worst.future.set_exception(self._overloaded("preempted by higher-priority request"))
+
+        waiter = _Waiter(priority, next(self._seq), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        try:
+            await asyncio.wait_for(waiter.future, timeout=float(settings.LLM_ADMISSION_QUEUE_TIMEOUT_SECS))
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.timed_out += 1
+            raise self._overloaded("queue wait timed out") from None
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                # The slot was handed over just as we were cancelled.
+                self.release(time.monotonic())
+            self._discard(waiter)
+            raise
+        return self._admit(time.monotonic() - waiter.queued_at)
+
+    def release(self, admitted_at: Optional[float]) -> None:
+        if admitted_at is None:
+            return
+        self._holds.append(time.monotonic() - admitted_at)
+        while self._waiters:
+            waiter = min(self._waiters, key=_Waiter.rank)
+            self._waiters.remove(waiter)
+            if not waiter.future.done():
+                # Hand the slot straight to the best waiter; active stays the same.
+                waiter.future.set_result(None)
+                return
+        self.active = max(0, self.active - 1)
+
+    def _discard(self, waiter: _Waiter) -> None:
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+
+    def snapshot(self) -> Dict[str, Any]:
+        queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        for waiter in self._waiters:
+            queued[PRIORITY_NAMES.get(waiter.priority, str(waiter.priority))] += 1
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue_depth": len(self._waiters),
+            "queued_by_priority": queued,
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+            "wait_p50_ms": _ms(_percentile(self._waits, 0.5)),
+            "wait_p95_ms": _ms(_percentile(self._waits, 0.95)),
+        }
+
+
+def _percentile(samples: Deque[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1))]
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+controllers: Dict[str, AdmissionController] = {
+    name: AdmissionController(name) for name in ("primary", "fallback", "gemini")
+}
+
+
+def get_controller(provider: str) -> AdmissionController:
+    return controllers[provider]
+
+
+def reset_controllers() -> None:
+    for controller in controllers.values():
+        controller.reset()
+
+
+def snapshot() -> Dict[str, Any]:
+    return {
+        "enabled": bool(settings.LLM_ADMISSION_ENABLED),
+        "queue_size": int(settings.LLM_ADMISSION_QUEUE_SIZE),
+        "providers": {name: controller.snapshot() for name, controller in controllers.items()},
+    }
@@ -0,0 +1,206 @@
+# app/services/llm_breaker.py
+"""
+Per-provider circuit breakers for the LLM upstreams (primary, fallback, gemini).
+
+closed     -> requests flow; LLM_BREAKER_FAILURE_THRESHOLD consecutive upstream
+              failures open the breaker.
+open       -> requests skip the provider (primary traffic goes straight to the
+              fallback) until LLM_BREAKER_OPEN_SECS have passed.
+half_open  -> one trial request (or a background probe) decides: success
+              closes the breaker, failure re-opens it.
+
+Only failures that say the provider itself is unhealthy count: connection
+errors/timeouts and 5xx. Any other answer (4xx, missing models, empty
+completions) proves the provider is reachable and counts as a success.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+# Errors that say nothing about the provider's health.
+_CLIENT_SIDE_CODES = {
+    "CIRCUIT_OPEN",
+    "EMPTY_COMPLETION",
+    "EMPTY_PROMPT",
+    "GEMINI_AUTH_FAILED",
+    "GEMINI_NOT_CONFIGURED",
+    "MODEL_NOT_AVAILABLE",
+}
+
+
+def is_provider_failure(status: Optional[int], code: Optional[str]) -> bool:
+    if code in _CLIENT_SIDE_CODES:
+        return False
+    if code == "HTTP_ERROR":
+        return True
+    return status is None or status >= 500
+
+
+class CircuitBreaker:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.reset()
+
+    def reset(self) -> None:
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.last_error: Optional[str] = None
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.LLM_BREAKER_ENABLED)
+
+    def _cooled_down(self) -> bool:
+        return (
+            self.opened_at is not None
+            and time.monotonic() - self.opened_at >= float(settings.LLM_BREAKER_OPEN_SECS)
+        )
+
+    def is_open(self) -> bool:
+        """True while requests should avoid this provider (no side effects)."""
+        if not self.enabled:
+            return False
+        if self.state == OPEN:
+            return not self._cooled_down()
+        return self.state == HALF_OPEN and self.trial_in_flight
+
+    def allow_request(self) -> bool:
+        """Admit a request; in half-open state only a single trial at a time."""
+        if not self.enabled or self.state == CLOSED:
+            return True
+        if self.state == OPEN and self._cooled_down():
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self.trial_in_flight = False
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self, status: Optional[int], code: Optional[str], error: str = "") -> None:
+        if not is_provider_failure(status, code):
+            # The provider answered; the request itself was the problem.
+            self.record_success()
+            return
+        self.trial_in_flight = False
+        self.consecutive_failures += 1
+        self.last_error = error[:200] or f"status={status} code={code}"
+        threshold = max(1, int(settings.LLM_BREAKER_FAILURE_THRESHOLD))
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= threshold):
+            self._transition(OPEN)
+        elif self.state == OPEN:
+            # A failed probe restarts the cool-down.
+            self.opened_at = time.monotonic()
+
+    def record_cancelled(self) -> None:
+        self.trial_in_flight = False
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        logger.warning(
+            "LLM circuit breaker state change",
+            extra={"provider": self.name, "from": self.state, "to": state, "error": self.last_error},
+        )
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+        elif state == CLOSED:
+            self.opened_at = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = None
+        if self.state == OPEN and self.opened_at is not None:
+            retry_in = max(0.0, float(settings.LLM_BREAKER_OPEN_SECS) - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state if self.enabled else "disabled",
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+            "retry_in_secs": None if retry_in is None else round(retry_in, 1),
+        }
+
+
+breakers: Dict[str, CircuitBreaker] = {
+    name: CircuitBreaker(name) for name in ("primary", "fallback", "gemini")
+}
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    return breakers[provider]
+
+
+def reset_breakers() -> None:
+    for breaker in breakers.values():
+        breaker.reset()
+
+
+def snapshot() -> Dict[str, Any]:
+    return {name: breaker.snapshot() for name, breaker in breakers.items()}
+
+
+async def run_prober(probe: Callable[[str], Awaitable[None]], stop: asyncio.Event) -> None:
+    """
+    Background loop: every LLM_BREAKER_PROBE_INTERVAL_SECS, probe each
+    non-closed HTTP provider so a recovered upstream is readmitted without
+    sacrificing a user request. ``probe(provider)`` records its own outcome.
+    """
+    interval = max(0.01, float(settings.LLM_BREAKER_PROBE_INTERVAL_SECS))
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+            return
+        except asyncio.TimeoutError:
+            pass
+        for name in ("primary", "fallback"):
+            breaker = breakers[name]
+            if not breaker.enabled or breaker.state == CLOSED:
+                continue
+            try:
+                await probe(name)
+            except Exception as exc:  # the probe records failures itself
+                logger.debug("LLM breaker probe failed", extra={"provider": name, "error": repr(exc)})
+
+
+@contextmanager
+def track(provider: str) -> Iterator[CircuitBreaker]:
+    """Record the outcome of one upstream call on ``provider``'s breaker."""
+    breaker = breakers[provider]
+    try:
+        yield breaker
+    except Exception as exc:
+        if hasattr(exc, "status") and hasattr(exc, "code"):
+            breaker.record_failure(exc.status, exc.code, repr(exc))
+        else:
+            breaker.record_cancelled()
+        raise
+    except BaseException:
+        # Cancelled, or the consumer stopped reading a stream: no verdict.
+        breaker.record_cancelled()
+        raise
+    else:
+        breaker.record_success()
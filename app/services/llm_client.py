@@ -1,18 +1,36 @@
 # app/services/llm_client.py
 from __future__ import annotations
 
+import abc
 import asyncio
+import io
 import json
 import logging
+import time
 import uuid
-from typing import Any, Dict, List, Optional, Tuple
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import httpx
+import openai
 from google import genai
 from google.genai import types
 
 from app.core.config import settings
+from app.services import (
+    background,
+    gemini_cache,
+    llm_admission,
+    llm_breaker,
+    llm_context,
+    llm_echo,
+    llm_hedge,
+    llm_profiles,
+    llm_warmup,
+)
+from app.services.ollama_context import ContextSession, context_cache
 
 logger = logging.getLogger(__name__)
 
@@ -28,12 +46,15 @@ class LLMUpstreamError(RuntimeError):
         message: str = "",
         body_snippet: Optional[str] = None,
         code: str = "LLM_FAILED",
+        retry_after: Optional[int] = None,
     ):
         super().__init__(message)
         self.provider = provider
         self.status = status
         self.body_snippet = body_snippet
         self.code = code
+        # Seconds the caller should wait before retrying (load shedding)
+        self.retry_after = retry_after
 
     def __repr__(self) -> str:
         parts = [f"provider={self.provider}"]
@@ -73,6 +94,7 @@ def describe_llm_config(model: Optional[str] = None) -> Dict[str, Any]:
             "base_url": settings.LLM_PRIMARY_BASE_URL,
             "path": settings.LLM_PRIMARY_PATH,
             "host": _safe_host(settings.LLM_PRIMARY_BASE_URL),
+            "kind": (settings.LLM_PRIMARY_KIND or "ollama"),
         },
         "fallback": {
             "model": fallback_model,
@@ -86,6 +108,18 @@ def describe_llm_config(model: Optional[str] = None) -> Dict[str, Any]:
             "effective_model": resolve_gemini_model(settings.GEMINI_MODEL),
             "configured": bool((settings.GEMINI_API_KEY or "").strip()),
         },
+        "hedging": llm_hedge.hedge_stats.snapshot(llm_hedge.primary_latency),
+        "admission": llm_admission.snapshot(),
+        "profiles": llm_profiles.describe(),
+        "providers": sorted(_providers),
+        "routes": _route_table(),
+        "warmup": llm_warmup.snapshot(),
+        "gemini_cache": gemini_cache.registry.stats(),
+        "ollama_context": {
+            "enabled": settings.OLLAMA_CONTEXT_ENABLED,
+            "persist": settings.OLLAMA_CONTEXT_PERSIST,
+            **context_cache.stats(),
+        },
     }
 
 
@@ -99,7 +133,7 @@ def validate_llm_config() -> None:
 
 
 def _is_gemini_model(model: str) -> bool:
-    return (model or "").lower().startswith("gemini-")
+    return resolve_route(model) == GEMINI_ROUTE
 
 
 def resolve_gemini_model(model: str) -> str:
@@ -148,10 +182,116 @@ def _build_gemini_contents(
     return contents, system_instruction
 
 
-async def _generate_gemini(
+# ===== Pooled provider clients =====
+# One client per upstream, created on first use and reused by every call so
+# requests skip TCP+TLS setup. Keys include the settings that shape the
+# client (base URL, TLS verify flag, Gemini API key); changing a setting
+# builds a new client and closes the stale one. Closed by the app lifespan.
+
+_llm_http_clients: Dict[Tuple[str, bool], httpx.AsyncClient] = {}
+_gemini_clients: Dict[str, Any] = {}
+_llm_clients_loop: Optional[asyncio.AbstractEventLoop] = None
+_llm_clients_lock: Optional[asyncio.Lock] = None
+
+
+def _llm_http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max(1, int(settings.LLM_HTTP_MAX_CONNECTIONS)),
+        max_keepalive_connections=max(0, int(settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS)),
+        keepalive_expiry=float(settings.LLM_HTTP_KEEPALIVE_EXPIRY_SECS),
+    )
+
+
+def _llm_client_lock() -> asyncio.Lock:
+    """Lock guarding client creation, reset when the serving loop changes."""
+    global _llm_clients_loop, _llm_clients_lock
+    loop = asyncio.get_running_loop()
+    if _llm_clients_loop is not loop or _llm_clients_lock is None:
+        # Pooled connections belong to the loop that opened them.
+        _llm_http_clients.clear()
+        _gemini_clients.clear()
+        _llm_clients_loop = loop
+        _llm_clients_lock = asyncio.Lock()
+    return _llm_clients_lock
+
+
+async def _close_gemini_client(client: Any) -> None:
+    try:
+        await client.aio.aclose()
+        close = getattr(client, "close", None)
+        if close is not None:
+            close()
+    except Exception as exc:
+        logger.warning("Failed to close Gemini client", extra={"error": repr(exc)})
+
+
+def _configured_llm_upstreams() -> set:
+    verify = bool(settings.LLM_TLS_VERIFY)
+    bases = {settings.LLM_PRIMARY_BASE_URL, settings.LLM_FALLBACK_BASE_URL}
+    return {(base.rstrip("/"), verify) for base in bases if base}
+
+
+async def get_llm_http_client(base: str, verify: bool) -> httpx.AsyncClient:
+    """Pooled client for one LLM upstream (keyed by base URL and TLS verify flag)."""
+    lock = _llm_client_lock()
+    key = ((base or "").rstrip("/"), bool(verify))
+    client = _llm_http_clients.get(key)
+    if client is not None and not client.is_closed:
+        return client
+    async with lock:
+        client = _llm_http_clients.get(key)
+        if client is None or client.is_closed:
+            # Client construction builds a TLS context from the CA bundle on
+            # disk; keep that synchronous work off the event loop.
+            client = await asyncio.to_thread(httpx.AsyncClient, verify=verify, limits=_llm_http_limits())
+            _llm_http_clients[key] = client
+            # Upstreams no longer in settings (changed URL or verify flag).
+            wanted = _configured_llm_upstreams() | {key}
+            for stale_key in [k for k in _llm_http_clients if k not in wanted]:
+                await _llm_http_clients.pop(stale_key).aclose()
+    return client
+
+
+async def get_gemini_client(api_key: str) -> Any:
+    """Pooled google-genai client for the configured API key."""
+    lock = _llm_client_lock()
+    client = _gemini_clients.get(api_key)
+    if client is not None:
+        return client
+    async with lock:
+        client = _gemini_clients.get(api_key)
+        if client is None:
+            client = await asyncio.to_thread(genai.Client, api_key=api_key)
+            # A rotated key replaces the old client.
+            for stale in list(_gemini_clients.values()):
+                await _close_gemini_client(stale)
+            _gemini_clients.clear()
+            _gemini_clients[api_key] = client
+    return client
+
+
+async def aclose_llm_clients() -> None:
+    """Close pooled LLM clients. Called from the app lifespan on shutdown."""
+    global _llm_clients_loop, _llm_clients_lock
+    http_clients = list(_llm_http_clients.values())
+    gemini_clients = list(_gemini_clients.values())
+    _llm_http_clients.clear()
+    _gemini_clients.clear()
+    _llm_clients_loop = None
+    _llm_clients_lock = None
+    for client in http_clients:
+        if not client.is_closed:
+            await client.aclose()
+    for client in gemini_clients:
+        await _close_gemini_client(client)
+    for provider in list(_providers.values()):
+        await provider.aclose()
+
+
+def _prepare_gemini_request(
     model: str,
     messages: List[Dict[str, str]],
-) -> str:
+) -> Tuple[str, str, List[types.Content], Optional[str]]:
     api_key = (settings.GEMINI_API_KEY or "").strip()
     if not api_key:
         raise LLMUpstreamError(
@@ -174,80 +314,373 @@ async def _generate_gemini(
             "Gemini compatibility model override",
             extra={"requested_model": model, "effective_model": effective_model},
         )
+    return api_key, effective_model, contents, system_instruction
+
+
+def _gemini_error(exc: Exception, effective_model: str) -> LLMUpstreamError:
+    """Map a google-genai exception to a safe LLMUpstreamError."""
+    message = str(exc)
+    status = getattr(exc, "status_code", None)
+    if not isinstance(status, int):
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    if not isinstance(status, int):
+        status = 401 if "401 UNAUTHENTICATED" in message else None
+
+    if status == 401 or "UNAUTHENTICATED" in message:
+        code = "GEMINI_AUTH_FAILED"
+        safe_message = (
+            "Gemini API key was rejected. Create a Gemini API Auth Key in "
+            "Google AI Studio, update GEMINI_API_KEY, and restart the backend."
+        )
+    elif status == 404 and "no longer available to new users" in message:
+        code = "MODEL_NOT_AVAILABLE"
+        safe_message = f"Gemini model {effective_model} is not available for this API key."
+    else:
+        code = "GEMINI_FAILED"
+        safe_message = f"Gemini request failed: {message[:200]}"
+
+    return LLMUpstreamError(
+        provider="gemini",
+        status=status,
+        message=safe_message,
+        code=code,
+    )
 
-    client = genai.Client(api_key=api_key)
-    async_client = client.aio
-    try:
-        response = await asyncio.wait_for(
-            async_client.models.generate_content(
-                model=effective_model,
-                contents=contents,
-                config=types.GenerateContentConfig(
-                    system_instruction=system_instruction,
-                ),
+
+def _gemini_timeout(profile: llm_profiles.GenerationProfile) -> float:
+    return float(profile.timeout_secs or settings.GEMINI_TIMEOUT_SECS)
+
+
+def _gemini_timeout_error(timeout: float) -> LLMUpstreamError:
+    return LLMUpstreamError(
+        provider="gemini",
+        message=f"Gemini request timed out after {timeout:g}s.",
+        code="HTTP_ERROR",
+    )
+
+
+def _gemini_config(
+    system_instruction: Optional[str],
+    profile: llm_profiles.GenerationProfile,
+    cached_content: Optional[str] = None,
+) -> types.GenerateContentConfig:
+    thinking_config = None
+    if profile.thinking_budget is not None:
+        thinking_config = types.ThinkingConfig(thinking_budget=int(profile.thinking_budget))
+    return types.GenerateContentConfig(
+        system_instruction=system_instruction,
+        cached_content=cached_content,
+        max_output_tokens=profile.max_output_tokens,
+        temperature=profile.temperature,
+        thinking_config=thinking_config,
+    )
+
+
+# ===== Gemini context caching (see gemini_cache) =====
+
+
+def _gemini_cached_prefix(
+    thread_id: Optional[str],
+    model: str,
+    system_instruction: Optional[str],
+    contents: List[types.Content],
+) -> Optional[gemini_cache.CachedPrefix]:
+    if not thread_id or not settings.GEMINI_CACHE_ENABLED:
+        return None
+    return gemini_cache.registry.lookup(thread_id, model, system_instruction, contents)
+
+
+def _gemini_request(
+    contents: List[types.Content],
+    system_instruction: Optional[str],
+    profile: llm_profiles.GenerationProfile,
+    cached: Optional[gemini_cache.CachedPrefix],
+) -> Dict[str, Any]:
+    """generate_content arguments; with a cache only the uncovered tail is sent."""
+    if cached is None:
+        return {"contents": contents, "config": _gemini_config(system_instruction, profile)}
+    # The system instruction is part of the cached content.
+    return {"contents": contents[cached.length :], "config": _gemini_config(None, profile, cached.name)}
+
+
+def _stale_gemini_cache(exc: Exception) -> bool:
+    # An expired or deleted handle: 403/404 naming the CachedContent.
+    return "cachedcontent" in str(exc).lower().replace(" ", "")
+
+
+def _schedule_gemini_cache(
+    client: Any,
+    thread_id: Optional[str],
+    model: str,
+    system_instruction: Optional[str],
+    contents: List[types.Content],
+    answer: str,
+    cached: Optional[gemini_cache.CachedPrefix],
+) -> None:
+    """Cache this turn plus its answer (the next turn's prefix) once enough is uncached."""
+    answer = (answer or "").strip()
+    if not thread_id or not settings.GEMINI_CACHE_ENABLED or not answer:
+        return
+    prefix = contents + [types.Content(role="model", parts=[types.Part.from_text(text=answer)])]
+    covered = cached.length if cached else 0
+    uncached = sum(llm_context.estimate_tokens(gemini_cache.content_text(c)) for c in prefix[covered:])
+    if cached is None:
+        uncached += llm_context.estimate_tokens(system_instruction)
+    if uncached < int(settings.GEMINI_CACHE_MIN_TOKENS):
+        return
+    background.spawn(
+        f"gemini-cache:{thread_id}",
+        lambda: _create_gemini_cache(client, thread_id, model, system_instruction, prefix),
+    )
+
+
+async def _create_gemini_cache(
+    client: Any,
+    thread_id: str,
+    model: str,
+    system_instruction: Optional[str],
+    prefix: List[types.Content],
+) -> None:
+    ttl = max(60, int(settings.GEMINI_CACHE_TTL_SECS))
+    async with _upstream_call("gemini", llm_admission.SUMMARY):
+        cache = await client.aio.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                contents=prefix,
+                system_instruction=system_instruction,
+                ttl=f"{ttl}s",
+                display_name=f"thread-{thread_id}",
             ),
-            timeout=float(settings.GEMINI_TIMEOUT_SECS),
         )
-        text = (response.text or "").strip()
-        if not text:
-            raise LLMUpstreamError(
-                provider="gemini",
-                message="Gemini returned an empty completion.",
-                code="EMPTY_COMPLETION",
-            )
-        return text
-    except asyncio.TimeoutError as exc:
-        raise LLMUpstreamError(
-            provider="gemini",
-            message=f"Gemini request timed out after {settings.GEMINI_TIMEOUT_SECS:g}s.",
-            code="HTTP_ERROR",
-        ) from exc
-    except LLMUpstreamError:
-        raise
+    usage = getattr(cache, "usage_metadata", None)
+    entry = gemini_cache.CachedPrefix(
+        name=cache.name,
+        model=model,
+        digest=gemini_cache.prefix_digest(model, system_instruction, prefix),
+        length=len(prefix),
+        tokens=int(getattr(usage, "total_token_count", None) or 0),
+        expires_at=time.monotonic() + ttl,
+    )
+    for stale in gemini_cache.registry.put(thread_id, entry):
+        await _delete_gemini_cache(stale, client)
+
+
+async def _delete_gemini_cache(entry: gemini_cache.CachedPrefix, client: Any = None) -> None:
+    try:
+        if client is None:
+            client = await get_gemini_client((settings.GEMINI_API_KEY or "").strip())
+        await client.aio.caches.delete(name=entry.name)
     except Exception as exc:
-        message = str(exc)
-        status = getattr(exc, "status_code", None)
-        if not isinstance(status, int):
-            response = getattr(exc, "response", None)
-            status = getattr(response, "status_code", None)
-        if not isinstance(status, int):
-            status = 401 if "401 UNAUTHENTICATED" in message else None
-
-        if status == 401 or "UNAUTHENTICATED" in message:
-            code = "GEMINI_AUTH_FAILED"
-            safe_message = (
-                "Gemini API key was rejected. Create a Gemini API Auth Key in "
-                "Google AI Studio, update GEMINI_API_KEY, and restart the backend."
-            )
-        elif status == 404 and "no longer available to new users" in message:
-            code = "MODEL_NOT_AVAILABLE"
-            safe_message = f"Gemini model {effective_model} is not available for this API key."
-        else:
-            code = "GEMINI_FAILED"
-            safe_message = f"Gemini request failed: {message[:200]}"
+        # It expires on its own after the TTL.
+        logger.warning("Failed to delete Gemini cache", extra={"cache": entry.name, "error": repr(exc)})
+
+
+def drop_gemini_cache(thread_id: str) -> None:
+    """Forget the thread's cached prefix (its messages were deleted) and delete it remotely."""
+    entry = gemini_cache.registry.invalidate(thread_id)
+    if entry is not None:
+        background.spawn(f"gemini-cache-delete:{entry.name}", lambda: _delete_gemini_cache(entry))
+
 
+@asynccontextmanager
+async def _upstream_call(provider: str, priority: int) -> AsyncIterator[None]:
+    """Hold an admission slot and record the outcome on the provider's breaker."""
+    controller = llm_admission.get_controller(provider)
+    try:
+        admitted_at = await controller.acquire(priority)
+    except BaseException as exc:
+        # A half-open trial that never reached the provider says nothing
+        # about it; give the trial slot back or the breaker stays shut.
+        llm_breaker.get_breaker(provider).record_cancelled()
+        if not isinstance(exc, llm_admission.Overloaded):
+            raise
         raise LLMUpstreamError(
-            provider="gemini",
-            status=status,
-            message=safe_message,
-            code=code,
-        ) from exc
+            provider=provider,
+            status=503,
+            message=str(exc),
+            code="LLM_OVERLOADED",
+            retry_after=exc.retry_after,
+        ) from None
+    try:
+        with llm_breaker.track(provider):
+            yield
     finally:
-        await async_client.aclose()
+        controller.release(admitted_at)
+
 
+def _circuit_open_error(provider: str) -> LLMUpstreamError:
+    return LLMUpstreamError(
+        provider=provider,
+        status=503,
+        message=f"{provider} LLM upstream is cooling down after repeated failures (circuit open).",
+        code="CIRCUIT_OPEN",
+    )
+
+
+async def _generate_gemini(
+    model: str,
+    messages: List[Dict[str, str]],
+    priority: int = llm_admission.INTERACTIVE,
+    profile: Optional[llm_profiles.GenerationProfile] = None,
+    thread_id: Optional[str] = None,
+) -> str:
+    profile = profile or llm_profiles.get_profile(llm_profiles.CHAT)
+    api_key, effective_model, contents, system_instruction = _prepare_gemini_request(model, messages)
+    if not llm_breaker.get_breaker("gemini").allow_request():
+        raise _circuit_open_error("gemini")
+    cached = _gemini_cached_prefix(thread_id, effective_model, system_instruction, contents)
+
+    async with _upstream_call("gemini", priority):
+        client = await get_gemini_client(api_key)
+        async_client = client.aio
+        timeout = _gemini_timeout(profile)
+
+        async def call(prefix: Optional[gemini_cache.CachedPrefix]) -> Any:
+            return await asyncio.wait_for(
+                async_client.models.generate_content(
+                    model=effective_model,
+                    **_gemini_request(contents, system_instruction, profile, prefix),
+                ),
+                timeout=timeout,
+            )
 
-def _build_payload(kind: str, model: str, messages: List[Dict[str, str]], endpoint_path: Optional[str] = None) -> Dict[str, Any]:
+        try:
+            try:
+                response = await call(cached)
+            except Exception as exc:
+                if cached is None or not _stale_gemini_cache(exc):
+                    raise
+                drop_gemini_cache(thread_id)
+                cached = None
+                response = await call(None)
+            gemini_cache.registry.record_usage(getattr(response, "usage_metadata", None))
+            text = (response.text or "").strip()
+            if not text:
+                raise LLMUpstreamError(
+                    provider="gemini",
+                    message="Gemini returned an empty completion.",
+                    code="EMPTY_COMPLETION",
+                )
+            _schedule_gemini_cache(client, thread_id, effective_model, system_instruction, contents, text, cached)
+            return text
+        except asyncio.TimeoutError as exc:
+            raise _gemini_timeout_error(timeout) from exc
+        except LLMUpstreamError:
+            raise
+        except Exception as exc:
+            raise _gemini_error(exc, effective_model) from exc
+
+
+async def _stream_gemini(
+    model: str,
+    messages: List[Dict[str, str]],
+    priority: int = llm_admission.INTERACTIVE,
+    profile: Optional[llm_profiles.GenerationProfile] = None,
+    thread_id: Optional[str] = None,
+) -> AsyncIterator[str]:
+    profile = profile or llm_profiles.get_profile(llm_profiles.CHAT)
+    api_key, effective_model, contents, system_instruction = _prepare_gemini_request(model, messages)
+    if not llm_breaker.get_breaker("gemini").allow_request():
+        raise _circuit_open_error("gemini")
+    cached = _gemini_cached_prefix(thread_id, effective_model, system_instruction, contents)
+
+    async with _upstream_call("gemini", priority):
+        client = await get_gemini_client(api_key)
+        # The timeout bounds the wait for each chunk, not the whole answer.
+        timeout = _gemini_timeout(profile)
+
+        async def next_chunk(iterator: AsyncIterator[Any]) -> Any:
+            try:
+                return await asyncio.wait_for(iterator.__anext__(), timeout=timeout)
+            except StopAsyncIteration:
+                return None
+
+        async def open_stream(prefix: Optional[gemini_cache.CachedPrefix]) -> Tuple[AsyncIterator[Any], Any]:
+            chunks = await asyncio.wait_for(
+                client.aio.models.generate_content_stream(
+                    model=effective_model,
+                    **_gemini_request(contents, system_instruction, profile, prefix),
+                ),
+                timeout=timeout,
+            )
+            iterator = chunks.__aiter__()
+            # A stale cache handle fails the request before the first chunk.
+            return iterator, await next_chunk(iterator)
+
+        try:
+            try:
+                iterator, chunk = await open_stream(cached)
+            except Exception as exc:
+                if cached is None or not _stale_gemini_cache(exc):
+                    raise
+                drop_gemini_cache(thread_id)
+                cached = None
+                iterator, chunk = await open_stream(None)
+            parts: List[str] = []
+            usage = None
+            while chunk is not None:
+                # Usage is reported on the last chunk(s).
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                text = getattr(chunk, "text", None) or ""
+                if text:
+                    parts.append(text)
+                    yield text
+                chunk = await next_chunk(iterator)
+            gemini_cache.registry.record_usage(usage)
+            _schedule_gemini_cache(
+                client, thread_id, effective_model, system_instruction, contents, "".join(parts), cached
+            )
+        except asyncio.TimeoutError as exc:
+            raise _gemini_timeout_error(timeout) from exc
+        except LLMUpstreamError:
+            raise
+        except Exception as exc:
+            raise _gemini_error(exc, effective_model) from exc
+
+
+def _build_payload(
+    kind: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    endpoint_path: Optional[str] = None,
+    stream: bool = False,
+    profile: Optional[llm_profiles.GenerationProfile] = None,
+) -> Dict[str, Any]:
     """
     Adapter for upstream payloads.
     - mode chat: {"model": "...", "messages": [...], "stream": false}
     - mode generate (internal/ollama-generate-like): {"model": "...", "prompt": "...", "stream": false}
+    With stream=True the upstream answers with NDJSON (Ollama) or SSE
+    (OpenAI-compatible) frames, see _stream_llm. Profile limits are added
+    with _apply_profile; Ollama payloads also carry OLLAMA_KEEP_ALIVE_SECS.
     """
-    mode = (settings.LLM_MODE or "chat").lower()
+    payload = _base_payload(kind, model, messages, endpoint_path, stream)
+    if profile is not None:
+        _apply_profile(kind, payload, profile)
+    if kind == "ollama" and settings.OLLAMA_KEEP_ALIVE_SECS is not None:
+        payload["keep_alive"] = int(settings.OLLAMA_KEEP_ALIVE_SECS)
+    return payload
+
+
+def _payload_mode(endpoint_path: Optional[str]) -> str:
+    """"generate" (single prompt) or "chat" (message list) for an endpoint."""
     path = (endpoint_path or "").lower()
     if path.endswith("/generate"):
-        mode = "generate"
-    elif path.endswith("/chat"):
-        mode = "chat"
+        return "generate"
+    if path.endswith("/chat"):
+        return "chat"
+    return (settings.LLM_MODE or "chat").lower()
+
+
+def _base_payload(
+    kind: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    endpoint_path: Optional[str],
+    stream: bool,
+) -> Dict[str, Any]:
+    mode = _payload_mode(endpoint_path)
 
     def to_prompt(msgs: List[Dict[str, str]]) -> str:
         last_user = next((m for m in reversed(msgs) if m.get("role") == "user"), None)
@@ -255,13 +688,27 @@ def _build_payload(kind: str, model: str, messages: List[Dict[str, str]], endpoi
 
     if kind == "ollama":
         if mode == "generate":
-            return {"model": model, "prompt": to_prompt(messages), "stream": False}
-        return {"model": model, "messages": messages, "stream": False}
+            return {"model": model, "prompt": to_prompt(messages), "stream": stream}
+        return {"model": model, "messages": messages, "stream": stream}
 
     if mode == "generate":
-        return {"model": model, "prompt": to_prompt(messages), "stream": False}
+        return {"model": model, "prompt": to_prompt(messages), "stream": stream}
+
+    return {"model": model, "messages": messages, "stream": stream}
 
-    return {"model": model, "messages": messages, "stream": False}
+
+def _apply_profile(kind: str, payload: Dict[str, Any], profile: llm_profiles.GenerationProfile) -> None:
+    # Ollama: sampling limits go in "options"; there is no thinking budget,
+    # only on/off.
+    options: Dict[str, Any] = {}
+    if profile.max_output_tokens is not None:
+        options["num_predict"] = int(profile.max_output_tokens)
+    if profile.temperature is not None:
+        options["temperature"] = float(profile.temperature)
+    if options:
+        payload["options"] = options
+    if profile.thinking_budget == 0:
+        payload["think"] = False
 
 
 def _extract_assistant(kind: str, data: Any) -> str:
@@ -298,6 +745,11 @@ def _extract_assistant(kind: str, data: Any) -> str:
         for choice in reversed(choices):
             if not isinstance(choice, dict):
                 continue
+            # Streaming chunk: {"choices":[{"delta":{"content":...}}]}
+            d = choice.get("delta")
+            if isinstance(d, dict):
+                c = d.get("content")
+                return c if isinstance(c, str) else ("" if c is None else str(c))
             m = choice.get("message")
             if isinstance(m, dict) and "content" in m:
                 c = m.get("content")
@@ -342,96 +794,217 @@ def _looks_like_stream(text: str, content_type: str) -> bool:
     return False
 
 
-def _iter_stream_frames(raw_text: str) -> List[str]:
+class _StreamFrameParser:
     """
-    Supports:
-      - SSE frames: lines like 'data: {json}'
-      - NDJSON: one JSON object per line
-      - Loose: ignores blank lines
+    Incremental parser for streamed upstream bodies, fed one line at a time.
+
+    Supports SSE frames (``data: {json}``), NDJSON (one JSON object per line)
+    and ignores blank, non-JSON and non-object lines. Assistant text follows
+    _extract_assistant; only the extracted deltas are kept, so memory grows
+    with the answer rather than with the body. ``finished`` turns true at
+    ``done: true`` or ``[DONE]``.
     """
-    frames: List[str] = []
-    for line in (raw_text or "").splitlines():
-        s = line.strip()
-        if not s:
-            continue
-        if s.startswith("data:"):
-            s = s[len("data:") :].strip()
-        if s in ("[DONE]", "DONE"):
-            continue
-        frames.append(s)
-    return frames
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.parts: List[str] = []
+        self.parsed_frames = 0
+        self.last_obj: Optional[Dict[str, Any]] = None
+        self.done: Any = None
+        self.done_reason: Any = None
+        self.error: Any = None
+        self.finished = False
+
+    def feed(self, line: str) -> str:
+        """Consume one line and return the assistant delta it carried ("" if none)."""
+        frame = line.strip()
+        if frame.startswith("data:"):
+            frame = frame[len("data:") :].strip()
+        if not frame:
+            return ""
+        if frame in ("[DONE]", "DONE"):
+            self.finished = True
+            return ""
+        if frame[0] != "{":
+            return ""
+        try:
+            obj = json.loads(frame)
+        except ValueError:
+            return ""
+        if not isinstance(obj, dict):
+            return ""
+
+        self.parsed_frames += 1
+        self.last_obj = obj
+        if obj.get("error"):
+            self.error = obj.get("error")
+        if "done" in obj:
+            self.done = obj.get("done")
+            if obj.get("done") is True:
+                self.finished = True
+        if "done_reason" in obj:
+            self.done_reason = obj.get("done_reason")
+
+        try:
+            chunk = _extract_assistant(self.kind, obj)
+        except ValueError:
+            chunk = ""  # heartbeat / metadata frame
+        if chunk:
+            self.parts.append(chunk)
+        return chunk
+
+    def debug(self) -> Dict[str, Any]:
+        debug: Dict[str, Any] = {"mode": "stream_aggregate", "parsed_frames": self.parsed_frames}
+        if self.last_obj is not None:
+            debug["last_keys"] = list(self.last_obj.keys())
+            debug["done"] = self.done
+            debug["done_reason"] = self.done_reason
+            # Ollama's done frame carries context and prefill stats.
+            debug["final_frame"] = self.last_obj
+        return debug
+
+    def result(self) -> Tuple[str, Dict[str, Any]]:
+        if self.parts:
+            return "".join(self.parts), self.debug()
+        # Frames but no text: fall back to the last frame's response-like fields (even if empty)
+        if self.last_obj is not None:
+            try:
+                return _extract_assistant(self.kind, self.last_obj), self.debug()
+            except Exception:
+                pass
+        raise ValueError("No parsable assistant content found in stream-like response.")
 
 
 def _parse_one_or_stream_json(kind: str, text: str, content_type: str) -> Tuple[str, Dict[str, Any]]:
     """
-    Returns (assistant_text, debug_info).
+    Returns (assistant_text, debug_info) for a fully buffered body.
     If response is streaming-like, aggregates assistant text across frames.
     """
-    debug: Dict[str, Any] = {}
-
     # First, try single JSON
     try:
         data = json.loads(text)
         assistant = _extract_assistant(kind, data)
-        debug["mode"] = "single_json"
-        debug["keys"] = list(data.keys()) if isinstance(data, dict) else type(data)
-        return assistant, debug
+        return assistant, {
+            "final_frame": data,
+            "mode": "single_json",
+            "keys": list(data.keys()) if isinstance(data, dict) else type(data),
+        }
     except Exception as single_exc:
-        debug["single_json_error"] = repr(single_exc)
+        single_error = repr(single_exc)
 
     # If not single JSON, attempt stream aggregation
-    frames = _iter_stream_frames(text)
-    aggregated: List[str] = []
-    last_obj: Any = None
-    done = None
-    done_reason = None
-    parsed_frames = 0
-
-    for frame in frames:
-        try:
-            obj = json.loads(frame)
-        except Exception:
-            # ignore non-json lines
-            continue
+    parser = _StreamFrameParser(kind)
+    for line in io.StringIO(text or ""):
+        parser.feed(line)
+        if parser.finished:
+            break
+    assistant, debug = parser.result()
+    debug["single_json_error"] = single_error
+    return assistant, debug
+
+
+# Content types whose body is one JSON document (NDJSON is handled line by line).
+def _is_single_json_content_type(content_type: str) -> bool:
+    ct = (content_type or "").lower()
+    return "json" in ct and "ndjson" not in ct and "jsonl" not in ct
 
-        parsed_frames += 1
-        last_obj = obj
 
-        # accumulate text chunks (can be empty for heartbeat frames)
-        try:
-            chunk = _extract_assistant(kind, obj)
-        except ValueError:
-            chunk = ""  # schema mismatch inside stream: ignore for aggregation
+async def _read_llm_response(kind: str, resp: httpx.Response) -> Tuple[str, Dict[str, Any], str]:
+    """
+    Parse an upstream body as it arrives. Returns (assistant_text, debug, head)
+    where head is the first few hundred characters for logs and errors.
+
+    Streamed bodies (NDJSON/SSE) are parsed frame by frame and the connection
+    is released as soon as the final frame arrives. Single JSON documents,
+    including pretty-printed ones without a JSON content type, are buffered.
+    """
+    ct = resp.headers.get("content-type", "")
+    if _is_single_json_content_type(ct):
+        text = (await resp.aread()).decode(resp.encoding or "utf-8", errors="replace")
+        assistant, debug = _parse_one_or_stream_json(kind, text, ct)
+        return assistant, debug, text[:300]
+
+    parser = _StreamFrameParser(kind)
+    # Lines are kept only until the first frame parses, in case the body is a
+    # single multi-line JSON document.
+    pending: List[str] = []
+    head: List[str] = []
+    head_len = 0
+    async for line in resp.aiter_lines():
+        if head_len < 300:
+            head.append(line[: 300 - head_len])
+            head_len += len(head[-1]) + 1
+        parser.feed(line)
+        if parser.parsed_frames == 0:
+            pending.append(line)
+        elif pending:
+            pending = []
+        if parser.finished:
+            break
+
+    head_text = "\n".join(head)[:300]
+    if parser.parsed_frames == 0:
+        assistant, debug = _parse_one_or_stream_json(kind, "\n".join(pending), ct)
+        return assistant, debug, head_text
+    assistant, debug = parser.result()
+    return assistant, debug, head_text
+
+
+def _upstream_status_error(provider: str, kind: str, url: str, status: int, text: str) -> LLMUpstreamError:
+    logger.warning(
+        "LLM provider error",
+        extra={"provider": provider, "url": url, "status": status},
+    )
+    snippet = text[:200]
+    msg = f"status={status}"
+    code = "LLM_FAILED"
+    if status == 404:
+        code = "MODEL_NOT_AVAILABLE"
+        msg = (
+            f"Ollama model not available on the {provider} host. Run: ollama pull <model>"
+            if kind == "ollama"
+            else "Model not available on current provider"
+        )
+    return LLMUpstreamError(provider=provider, status=status, message=msg, body_snippet=snippet, code=code)
 
-        if chunk:
-            aggregated.append(chunk)
-
-        if isinstance(obj, dict):
-            if "done" in obj:
-                done = obj.get("done")
-            if "done_reason" in obj:
-                done_reason = obj.get("done_reason")
-
-    debug["mode"] = "stream_aggregate"
-    debug["parsed_frames"] = parsed_frames
-    if isinstance(last_obj, dict):
-        debug["last_keys"] = list(last_obj.keys())
-        debug["done"] = done
-        debug["done_reason"] = done_reason
-
-    if aggregated:
-        return "".join(aggregated), debug
-
-    # If we parsed frames but got no text, try last_obj's response-like fields (even if empty)
-    if last_obj is not None:
-        try:
-            last_text = _extract_assistant(kind, last_obj)
-            return last_text, debug
-        except Exception:
-            pass
 
-    # Nothing usable
-    raise ValueError("No parsable assistant content found in stream-like response.")
+def _httpx_upstream_error(provider: str, url: str, exc: httpx.HTTPError) -> LLMUpstreamError:
+    logger.warning(
+        "LLM provider httpx error",
+        extra={"provider": provider, "url": url, "exc": repr(exc)},
+    )
+    status = exc.response.status_code if getattr(exc, "response", None) is not None else None
+    return LLMUpstreamError(provider=provider, status=status, message=repr(exc), code="HTTP_ERROR")
+
+
+def _log_llm_request(
+    provider: str,
+    url: str,
+    payload: Dict[str, Any],
+    status: int,
+    content_type: str,
+    snippet: str,
+) -> None:
+    if settings.APP_ENV != "dev":
+        return
+    last_user = (
+        next((m for m in reversed(payload.get("messages", [])) if m.get("role") == "user"), None)
+        if isinstance(payload, dict)
+        else None
+    )
+    logger.info(
+        "LLM request debug",
+        extra={
+            "provider": provider,
+            "url": url,
+            "model": payload.get("model") if isinstance(payload, dict) else None,
+            "msg_count": len(payload.get("messages", [])) if isinstance(payload, dict) else None,
+            "last_user_len": len(last_user.get("content", "")) if last_user else None,
+            "resp_status": status,
+            "resp_ct": content_type,
+            "resp_snippet": snippet,
+        },
+    )
 
 
 async def _post_llm(
@@ -443,258 +1016,905 @@ async def _post_llm(
     timeout: httpx.Timeout,
     verify: bool,
     request_id: str,
+    priority: int = llm_admission.INTERACTIVE,
+    session: Optional[ContextSession] = None,
 ) -> str:
     url = _build_url(base, path)
     headers = {"Cache-Control": "no-store", "X-Request-ID": request_id}
 
-    try:
-        async with httpx.AsyncClient(timeout=timeout, verify=verify) as client:
-            resp = await client.post(url, json=payload, headers=headers)
-
-        status = resp.status_code
-        text = resp.text or ""
-        ct = resp.headers.get("content-type", "")
-
-        if settings.APP_ENV == "dev":
-            last_user = (
-                next((m for m in reversed(payload.get("messages", [])) if m.get("role") == "user"), None)
-                if isinstance(payload, dict)
-                else None
-            )
-            logger.info(
-                "LLM request debug",
-                extra={
-                    "provider": provider,
-                    "url": url,
-                    "model": payload.get("model") if isinstance(payload, dict) else None,
-                    "msg_count": len(payload.get("messages", [])) if isinstance(payload, dict) else None,
-                    "last_user_len": len(last_user.get("content", "")) if last_user else None,
-                    "resp_status": status,
-                    "resp_ct": ct,
-                    "resp_snippet": text[:300],
-                },
-            )
+    async with _upstream_call(provider, priority):
+        try:
+            client = await get_llm_http_client(base, verify)
+            async with client.stream("POST", url, json=payload, headers=headers, timeout=timeout) as resp:
+                status = resp.status_code
+                ct = resp.headers.get("content-type", "")
+
+                if status >= 400:
+                    text = (await resp.aread()).decode("utf-8", errors="replace")
+                    _log_llm_request(provider, url, payload, status, ct, text[:300])
+                    raise _upstream_status_error(provider, kind, url, status, text)
+
+                # Parse single JSON or aggregate stream frames as they arrive
+                try:
+                    assistant, parse_debug, head = await _read_llm_response(kind, resp)
+                except ValueError as exc:
+                    # Schema mismatch / stream parse failure: 502 (bad gateway)
+                    raise LLMUpstreamError(
+                        provider=provider,
+                        status=502,
+                        message=f"LLM response parse failed: {exc}",
+                        body_snippet=None,
+                        code="BAD_UPSTREAM_SCHEMA",
+                    )
+            _log_llm_request(provider, url, payload, status, ct, head)
+            if session is not None:
+                session.record(parse_debug.get("final_frame"))
+            if kind == "ollama":
+                llm_warmup.observe(provider, payload.get("model"), parse_debug.get("final_frame"))
+
+            if settings.APP_ENV == "dev":
+                logger.info(
+                    "LLM response parse debug",
+                    extra={
+                        "provider": provider,
+                        "parse_mode": parse_debug.get("mode"),
+                        "parsed_frames": parse_debug.get("parsed_frames"),
+                        "done": parse_debug.get("done"),
+                        "done_reason": parse_debug.get("done_reason"),
+                        "resp_keys": parse_debug.get("keys") or parse_debug.get("last_keys"),
+                        "assistant_len": len(assistant or ""),
+                        "assistant_preview": (assistant or "")[:120],
+                    },
+                )
+
+            # Empty completion → classify properly so retry/fallback works
+            if assistant is None or not str(assistant).strip():
+                raise LLMUpstreamError(
+                    provider=provider,
+                    status=status,
+                    message="empty assistant_content",
+                    body_snippet=head or None,
+                    code="EMPTY_COMPLETION",
+                )
+
+            return assistant
+
+        except httpx.HTTPError as exc:
+            raise _httpx_upstream_error(provider, url, exc)
+
+
+async def _stream_llm(
+    provider: str,
+    base: str,
+    path: str,
+    payload: Dict[str, Any],
+    kind: str,
+    timeout: httpx.Timeout,
+    verify: bool,
+    request_id: str,
+    priority: int = llm_admission.INTERACTIVE,
+    session: Optional[ContextSession] = None,
+) -> AsyncIterator[str]:
+    """
+    Relay assistant deltas from a streaming upstream (payload built with
+    stream=True). Accepts NDJSON (Ollama) and SSE ``data:`` frames
+    (OpenAI-compatible) and stops at ``done: true`` or ``[DONE]``.
+    """
+    url = _build_url(base, path)
+    headers = {
+        "Cache-Control": "no-store",
+        "X-Request-ID": request_id,
+        "Accept": "application/x-ndjson, text/event-stream",
+    }
 
-        if status >= 400:
-            logger.warning(
-                "LLM provider error",
-                extra={"provider": provider, "url": url, "status": status},
-            )
-            snippet = text[:200]
-            msg = f"status={status}"
-            code = "LLM_FAILED"
-            if status == 404:
-                code = "MODEL_NOT_AVAILABLE"
-                msg = "Model not available on current provider" if kind != "ollama" else "Fallback Ollama model not available. Run: ollama pull <model>"
-            raise LLMUpstreamError(provider=provider, status=status, message=msg, body_snippet=snippet, code=code)
-
-        # Parse single JSON or aggregate stream
+    async with _upstream_call(provider, priority):
         try:
-            assistant, parse_debug = _parse_one_or_stream_json(kind, text, ct)
-        except ValueError as exc:
-            # Schema mismatch / stream parse failure: 502 (bad gateway)
-            raise LLMUpstreamError(
-                provider=provider,
-                status=502,
-                message=f"LLM response parse failed: {exc}",
-                body_snippet=(text[:300] if text else None),
-                code="BAD_UPSTREAM_SCHEMA",
-            )
+            client = await get_llm_http_client(base, verify)
+            async with client.stream("POST", url, json=payload, headers=headers, timeout=timeout) as resp:
+                if resp.status_code >= 400:
+                    body = (await resp.aread()).decode("utf-8", errors="replace")
+                    raise _upstream_status_error(provider, kind, url, resp.status_code, body)
+
+                parser = _StreamFrameParser(kind)
+                async for line in resp.aiter_lines():
+                    chunk = parser.feed(line)
+                    if parser.error is not None:
+                        raise LLMUpstreamError(
+                            provider=provider,
+                            status=502,
+                            message="upstream reported an error mid-stream",
+                            body_snippet=str(parser.error)[:200],
+                            code="LLM_FAILED",
+                        )
+                    if chunk:
+                        yield chunk
+                    if parser.finished:
+                        break
+                if session is not None:
+                    session.record(parser.last_obj)
+                if kind == "ollama":
+                    llm_warmup.observe(provider, payload.get("model"), parser.last_obj)
+        except httpx.HTTPError as exc:
+            raise _httpx_upstream_error(provider, url, exc)
+
+
+# ===== Provider registry =====
+# A provider speaks one upstream protocol: it builds the request on a pooled
+# client, parses whole and streamed answers and maps failures to
+# LLMUpstreamError. Hosts name their provider by kind (LLM_PRIMARY_KIND,
+# LLM_FALLBACK_KIND); models are routed either to Gemini or to the
+# primary/fallback chain by a prefix table, resolved once per model.
+
+GEMINI_KIND = "gemini"
+
+
+@dataclass(frozen=True)
+class Upstream:
+    name: str  # breaker/admission key: primary | fallback | gemini
+    kind: str  # as configured; same_as_primary resolves to the primary's kind
+    base: str = ""
+    path: str = ""
+
+
+def _upstream(name: str) -> Upstream:
+    if name == "primary":
+        return Upstream(
+            "primary",
+            (settings.LLM_PRIMARY_KIND or "ollama").lower(),
+            settings.LLM_PRIMARY_BASE_URL,
+            settings.LLM_PRIMARY_PATH,
+        )
+    if name == "fallback":
+        return Upstream(
+            "fallback",
+            (settings.LLM_FALLBACK_KIND or "same_as_primary").lower(),
+            settings.LLM_FALLBACK_BASE_URL or "",
+            settings.LLM_FALLBACK_PATH,
+        )
+    return Upstream(GEMINI_KIND, GEMINI_KIND)
 
-        if settings.APP_ENV == "dev":
-            logger.info(
-                "LLM response parse debug",
-                extra={
-                    "provider": provider,
-                    "parse_mode": parse_debug.get("mode"),
-                    "parsed_frames": parse_debug.get("parsed_frames"),
-                    "done": parse_debug.get("done"),
-                    "done_reason": parse_debug.get("done_reason"),
-                    "resp_keys": parse_debug.get("keys") or parse_debug.get("last_keys"),
-                    "assistant_len": len(assistant or ""),
-                    "assistant_preview": (assistant or "")[:120],
-                },
-            )
 
-        # Empty completion → classify properly so retry/fallback works
-        if assistant is None or not str(assistant).strip():
-            raise LLMUpstreamError(
-                provider=provider,
-                status=status,
-                message="empty assistant_content",
-                body_snippet=(text[:300] if text else None),
-                code="EMPTY_COMPLETION",
-            )
+class LLMProvider(abc.ABC):
+    """One upstream protocol. Subclasses are registered with register_provider()."""
 
-        return assistant
+    kind = ""
 
-    except httpx.HTTPError as exc:
-        logger.warning(
-            "LLM provider httpx error",
-            extra={"provider": provider, "url": url, "exc": repr(exc)},
+    @abc.abstractmethod
+    async def complete(
+        self,
+        upstream: Upstream,
+        model: str,
+        messages: List[Dict[str, str]],
+        *,
+        timeout: httpx.Timeout,
+        request_id: str,
+        priority: int,
+        profile: llm_profiles.GenerationProfile,
+        session: Optional[ContextSession] = None,
+        thread_id: Optional[str] = None,
+    ) -> str:
+        """The whole completion text."""
+
+    @abc.abstractmethod
+    def stream(
+        self,
+        upstream: Upstream,
+        model: str,
+        messages: List[Dict[str, str]],
+        *,
+        timeout: httpx.Timeout,
+        request_id: str,
+        priority: int,
+        profile: llm_profiles.GenerationProfile,
+        session: Optional[ContextSession] = None,
+        thread_id: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """Assistant text deltas as the upstream produces them."""
+
+    async def aclose(self) -> None:
+        return None
+
+
+class OllamaProvider(LLMProvider):
+    """Ollama /api/chat and /api/generate (and hosts shaped like them)."""
+
+    kind = "ollama"
+
+    def _payload(
+        self,
+        upstream: Upstream,
+        model: str,
+        messages: List[Dict[str, str]],
+        stream: bool,
+        profile: llm_profiles.GenerationProfile,
+        session: Optional[ContextSession],
+    ) -> Dict[str, Any]:
+        payload = _build_payload(self.kind, model, messages, upstream.path, stream=stream, profile=profile)
+        if session is not None and session.context and "prompt" in payload:
+            # The previous turn's KV state: only the new prompt is prefilled.
+            payload["context"] = session.context
+        return payload
+
+    async def complete(
+        self, upstream, model, messages, *, timeout, request_id, priority, profile, session=None, thread_id=None
+    ) -> str:
+        return await _post_llm(
+            provider=upstream.name,
+            base=upstream.base,
+            path=upstream.path,
+            payload=self._payload(upstream, model, messages, False, profile, session),
+            kind=upstream.kind,
+            timeout=timeout,
+            verify=settings.LLM_TLS_VERIFY,
+            request_id=request_id,
+            priority=priority,
+            session=session,
         )
-        status = exc.response.status_code if getattr(exc, "response", None) is not None else None
-        raise LLMUpstreamError(provider=provider, status=status, message=repr(exc), code="HTTP_ERROR")
 
+    async def stream(
+        self, upstream, model, messages, *, timeout, request_id, priority, profile, session=None, thread_id=None
+    ) -> AsyncIterator[str]:
+        async for chunk in _stream_llm(
+            provider=upstream.name,
+            base=upstream.base,
+            path=upstream.path,
+            payload=self._payload(upstream, model, messages, True, profile, session),
+            kind=upstream.kind,
+            timeout=timeout,
+            verify=settings.LLM_TLS_VERIFY,
+            request_id=request_id,
+            priority=priority,
+            session=session,
+        ):
+            yield chunk
 
-async def generate(model: Optional[str], messages: List[Dict[str, str]]) -> str:
-    requested_model = model or settings.LLM_MODEL
-    if not requested_model:
-        raise RuntimeError("LLM_MODEL must be configured (env LLM_MODEL).")
 
-    if _is_gemini_model(requested_model):
-        return await _generate_gemini(requested_model, messages)
+_OPENAI_CHAT_SUFFIX = "/chat/completions"
+
+
+def _openai_base_url(base: str, path: str) -> str:
+    """SDK base URL: the configured path without its /chat/completions tail."""
+    prefix = (path or "").rstrip("/")
+    if prefix.endswith(_OPENAI_CHAT_SUFFIX):
+        prefix = prefix[: -len(_OPENAI_CHAT_SUFFIX)]
+    return _build_url(base, prefix) if prefix else (base or "").rstrip("/")
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """
+    Chat Completions through the openai SDK (vLLM, LM Studio, llama.cpp,
+    Ollama's /v1). The SDK client wraps the pooled httpx client for the host
+    and never retries on its own: retries, hedging and fallback stay here.
+    """
+
+    kind = "openai_compatible"
+
+    def __init__(self) -> None:
+        self._clients: Dict[Tuple[str, bool, str], Tuple[httpx.AsyncClient, openai.AsyncOpenAI]] = {}
+
+    async def _client(self, upstream: Upstream) -> openai.AsyncOpenAI:
+        verify = bool(settings.LLM_TLS_VERIFY)
+        http_client = await get_llm_http_client(upstream.base, verify)
+        api_key = (settings.LLM_OPENAI_API_KEY or "").strip() or "unused"
+        key = (_openai_base_url(upstream.base, upstream.path), verify, api_key)
+        cached = self._clients.get(key)
+        if cached is not None and cached[0] is http_client:
+            return cached[1]
+        client = openai.AsyncOpenAI(api_key=api_key, base_url=key[0], http_client=http_client, max_retries=0)
+        self._clients[key] = (http_client, client)
+        return client
+
+    def _request(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        timeout: httpx.Timeout,
+        request_id: str,
+        profile: llm_profiles.GenerationProfile,
+    ) -> Dict[str, Any]:
+        request: Dict[str, Any] = {
+            "model": model,
+            "messages": messages,
+            "timeout": timeout,
+            "extra_headers": {"Cache-Control": "no-store", "X-Request-ID": request_id},
+        }
+        if profile.max_output_tokens is not None:
+            request["max_tokens"] = int(profile.max_output_tokens)
+        if profile.temperature is not None:
+            request["temperature"] = float(profile.temperature)
+        return request
+
+    def _error(self, upstream: Upstream, exc: openai.APIError) -> LLMUpstreamError:
+        url = _build_url(upstream.base, upstream.path)
+        if isinstance(exc, openai.APIStatusError):
+            body = exc.body if exc.body is not None else exc.message
+            return _upstream_status_error(upstream.name, upstream.kind, url, exc.status_code, str(body))
+        if isinstance(exc, openai.APIResponseValidationError):
+            return LLMUpstreamError(
+                provider=upstream.name,
+                status=502,
+                message=f"LLM response parse failed: {exc}",
+                code="BAD_UPSTREAM_SCHEMA",
+            )
+        logger.warning(
+            "LLM provider connection error",
+            extra={"provider": upstream.name, "url": url, "exc": repr(exc)},
+        )
+        return LLMUpstreamError(provider=upstream.name, message=repr(exc), code="HTTP_ERROR")
+
+    async def complete(
+        self, upstream, model, messages, *, timeout, request_id, priority, profile, session=None, thread_id=None
+    ) -> str:
+        client = await self._client(upstream)
+        async with _upstream_call(upstream.name, priority):
+            try:
+                completion = await client.chat.completions.create(
+                    **self._request(model, messages, timeout, request_id, profile)
+                )
+            except openai.APIError as exc:
+                raise self._error(upstream, exc) from exc
+            choices = completion.choices or []
+            text = choices[0].message.content if choices and choices[0].message else None
+            if not text or not text.strip():
+                raise LLMUpstreamError(
+                    provider=upstream.name,
+                    status=200,
+                    message="empty assistant_content",
+                    code="EMPTY_COMPLETION",
+                )
+            return text
+
+    async def stream(
+        self, upstream, model, messages, *, timeout, request_id, priority, profile, session=None, thread_id=None
+    ) -> AsyncIterator[str]:
+        client = await self._client(upstream)
+        async with _upstream_call(upstream.name, priority):
+            try:
+                chunks = await client.chat.completions.create(
+                    **self._request(model, messages, timeout, request_id, profile), stream=True
+                )
+                try:
+                    async for chunk in chunks:
+                        delta = chunk.choices[0].delta if chunk.choices else None
+                        if delta is not None and delta.content:
+                            yield delta.content
+                finally:
+                    await chunks.close()
+            except openai.APIError as exc:
+                raise self._error(upstream, exc) from exc
+
+    async def aclose(self) -> None:
+        # The wrapped httpx clients belong to the pool and are closed there.
+        self._clients.clear()
+
+
+class GeminiProvider(LLMProvider):
+    """google-genai; the per-call timeout comes from the generation profile."""
+
+    kind = GEMINI_KIND
+
+    async def complete(
+        self, upstream, model, messages, *, timeout, request_id, priority, profile, session=None, thread_id=None
+    ) -> str:
+        return await _generate_gemini(model, messages, priority, profile, thread_id)
+
+    async def stream(
+        self, upstream, model, messages, *, timeout, request_id, priority, profile, session=None, thread_id=None
+    ) -> AsyncIterator[str]:
+        async for chunk in _stream_gemini(model, messages, priority, profile, thread_id):
+            yield chunk
+
+
+_providers: Dict[str, LLMProvider] = {}
+
+
+def register_provider(provider: LLMProvider) -> None:
+    _providers[provider.kind] = provider
+
+
+def get_provider(kind: str) -> LLMProvider:
+    resolved = (kind or "").lower()
+    if resolved == "same_as_primary":
+        resolved = (settings.LLM_PRIMARY_KIND or "ollama").lower()
+    provider = _providers.get(resolved)
+    if provider is None:
+        raise RuntimeError(f"Unknown LLM provider kind {kind!r}; registered: {', '.join(sorted(_providers))}")
+    return provider
+
+
+for _provider in (OllamaProvider(), OpenAICompatibleProvider(), GeminiProvider()):
+    register_provider(_provider)
+
+
+# Model routing: exact name or longest prefix -> "gemini" (direct) or
+# "upstream" (primary/fallback chain). LLM_MODEL_ROUTES extends the table.
+GEMINI_ROUTE = GEMINI_KIND
+UPSTREAM_ROUTE = "upstream"
+_DEFAULT_ROUTES: Dict[str, str] = {"gemini-": GEMINI_ROUTE}
+_route_cache: Dict[str, str] = {}
+_route_cache_table: Optional[Dict[str, str]] = None
+
+
+def _route_table() -> Dict[str, str]:
+    table = dict(_DEFAULT_ROUTES)
+    table.update({key.lower(): value.lower() for key, value in (settings.LLM_MODEL_ROUTES or {}).items()})
+    return table
+
+
+def resolve_route(model: Optional[str]) -> str:
+    """Route for ``model``, matched once and cached until the table changes."""
+    global _route_cache_table
+    table = _route_table()
+    if table != _route_cache_table:
+        _route_cache.clear()
+        _route_cache_table = table
+    name = (model or "").strip().lower()
+    route = _route_cache.get(name)
+    if route is None:
+        route = table.get(name)
+        if route is None:
+            prefix = next((key for key in sorted(table, key=len, reverse=True) if name.startswith(key)), None)
+            route = table[prefix] if prefix is not None else UPSTREAM_ROUTE
+        if route not in (GEMINI_ROUTE, UPSTREAM_ROUTE):
+            raise RuntimeError(f"LLM_MODEL_ROUTES maps {name!r} to unknown route {route!r}")
+        _route_cache[name] = route
+    return route
+
+
+def uses_ollama_context(model: Optional[str]) -> bool:
+    """Whether ``model`` goes to an Ollama /api/generate primary that returns ``context``."""
+    if not settings.OLLAMA_CONTEXT_ENABLED:
+        return False
+    requested_model = model or settings.LLM_MODEL
+    if not requested_model or _is_gemini_model(requested_model):
+        return False
+    primary = _upstream("primary")
+    return primary.kind == "ollama" and _payload_mode(primary.path) == "generate"
 
-    validate_llm_config()
 
+def _with_system_prompt(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
     # Ensure a system prompt to reduce echoing user input on minimal models.
     msgs = list(messages) if messages else []
     has_system = any((m.get("role") or "").lower() == "system" for m in msgs)
     if not has_system:
         msgs = [{"role": "system", "content": settings.LLM_SYSTEM_PROMPT}] + msgs
+    return msgs
 
-    timeout = httpx.Timeout(
+
+def _llm_timeout(profile: Optional[llm_profiles.GenerationProfile] = None) -> httpx.Timeout:
+    read = float((profile.timeout_secs if profile else None) or settings.LLM_READ_TIMEOUT)
+    return httpx.Timeout(
         connect=float(settings.LLM_CONNECT_TIMEOUT),
-        read=float(settings.LLM_READ_TIMEOUT),
-        write=float(settings.LLM_READ_TIMEOUT),
+        read=read,
+        write=read,
         pool=5.0,
     )
-    verify_flag = settings.LLM_TLS_VERIFY
+
+
+_RETRY_BACKOFFS = [0.5, 1.5, 3.0]
+
+
+def _should_retry(exc: LLMUpstreamError) -> bool:
+    # Retry on transient connectivity and on empty completions (common with stream end frames / flaky upstream)
+    if exc.code == "LLM_OVERLOADED":
+        # Shed by admission control: go to the fallback (or the client) now.
+        return False
+    return _should_fallback(exc) or exc.code == "EMPTY_COMPLETION"
+
+
+async def generate(
+    model: Optional[str],
+    messages: List[Dict[str, str]],
+    priority: int = llm_admission.INTERACTIVE,
+    profile: str = llm_profiles.CHAT,
+    echo_of: Optional[str] = None,
+    session: Optional[ContextSession] = None,
+    thread_id: Optional[str] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> str:
+    """
+    Whole completion for ``messages``.
+
+    With ``echo_of`` (the user's message) an answer that merely repeats it is
+    retried once with llm_echo.NUDGE. Where possible the completion is
+    streamed internally so the echo is caught on its first tokens; Gemini and
+    hedged requests only see whole answers and are checked afterwards.
+    ``on_delta`` is called with each internally streamed delta (e.g. to keep
+    a partial answer when the caller is cancelled).
+
+    ``session`` carries an Ollama generate-mode context in and out (primary
+    host only; see ollama_context); ``thread_id`` lets Gemini reuse the
+    thread's cached prefix (see gemini_cache).
+    """
+    if echo_of is None:
+        return await _complete(model, messages, priority, profile, session, thread_id)
+
+    requested_model = llm_profiles.get_profile(profile).resolve_model(model) or settings.LLM_MODEL
+    hedged = settings.LLM_HEDGE_ENABLED and settings.LLM_FALLBACK_BASE_URL
+    if requested_model and not _is_gemini_model(requested_model) and not hedged:
+        chunks: List[str] = []
+        async for chunk in generate_stream(
+            model, messages, priority, profile, echo_of=echo_of, session=session, thread_id=thread_id
+        ):
+            chunks.append(chunk)
+            if on_delta is not None:
+                on_delta(chunk)
+        return "".join(chunks)
+
+    text = await _complete(model, messages, priority, profile, session, thread_id)
+    if llm_echo.is_echo(text, echo_of):
+        logger.info("LLM echoed the user's message; retrying", extra={"model": requested_model})
+        text = await _complete(model, _with_echo_nudge(messages), priority, profile, session, thread_id)
+    return text
+
+
+def _with_echo_nudge(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    return list(messages) + [{"role": "system", "content": llm_echo.NUDGE}]
+
+
+async def _complete(
+    model: Optional[str],
+    messages: List[Dict[str, str]],
+    priority: int,
+    profile: str,
+    session: Optional[ContextSession] = None,
+    thread_id: Optional[str] = None,
+) -> str:
+    generation = llm_profiles.get_profile(profile)
+    requested_model = generation.resolve_model(model) or settings.LLM_MODEL
+    if not requested_model:
+        raise RuntimeError("LLM_MODEL must be configured (env LLM_MODEL).")
+
+    timeout = _llm_timeout(generation)
     request_id = uuid.uuid4().hex
 
-    primary_payload = _build_payload(
-        "same_as_primary",
-        requested_model,
-        msgs,
-        settings.LLM_PRIMARY_PATH,
+    if _is_gemini_model(requested_model):
+        gemini = _upstream(GEMINI_KIND)
+        return await get_provider(gemini.kind).complete(
+            gemini,
+            requested_model,
+            messages,
+            timeout=timeout,
+            request_id=request_id,
+            priority=priority,
+            profile=generation,
+            thread_id=thread_id,
+        )
+
+    validate_llm_config()
+
+    msgs = _with_system_prompt(messages)
+    primary = _upstream("primary")
+    primary_provider = get_provider(primary.kind)
+    primary_breaker = llm_breaker.get_breaker("primary")
+
+    async def call_primary() -> str:
+        max_retries = max(0, int(settings.LLM_MAX_RETRIES))
+        attempt = 0
+        backoffs = _RETRY_BACKOFFS
+        while True:
+            try:
+                return await llm_hedge.timed_primary(
+                    lambda: primary_provider.complete(
+                        primary,
+                        requested_model,
+                        msgs,
+                        timeout=timeout,
+                        request_id=request_id,
+                        priority=priority,
+                        profile=generation,
+                        session=session,
+                    )
+                )
+            except LLMUpstreamError as exc:
+                # Stop retrying once the failures have opened the breaker.
+                if attempt >= max_retries or not _should_retry(exc) or primary_breaker.is_open():
+                    raise
+                await asyncio.sleep(backoffs[min(attempt, len(backoffs) - 1)])
+                attempt += 1
+
+    async def call_fallback() -> str:
+        if not llm_breaker.get_breaker("fallback").allow_request():
+            raise _circuit_open_error("fallback")
+        fallback = _upstream("fallback")
+        fallback_model = settings.LLM_FALLBACK_MODEL or settings.LLM_MODEL or requested_model
+
+        if settings.APP_ENV in ("dev", "local") and fallback_model != requested_model:
+            logger.warning("Fallback model override", extra={"requested": requested_model, "using": fallback_model})
+
+        return await get_provider(fallback.kind).complete(
+            fallback,
+            fallback_model,
+            msgs,
+            timeout=timeout,
+            request_id=request_id,
+            priority=priority,
+            profile=generation,
+        )
+
+    if not primary_breaker.allow_request():
+        # Primary is cooling down: send the request straight to the fallback.
+        primary_error = _circuit_open_error("primary")
+    elif settings.LLM_HEDGE_ENABLED and settings.LLM_FALLBACK_BASE_URL:
+        # Don't wait for the primary's retries to run out: race the fallback
+        # once the primary is slower than it usually is.
+        return await llm_hedge.race(
+            call_primary,
+            call_fallback,
+            is_failure=lambda exc: isinstance(exc, LLMUpstreamError) and _should_fallback(exc),
+            combine=_both_upstreams_failed,
+        )
+    else:
+        try:
+            return await call_primary()
+        except LLMUpstreamError as exc:
+            primary_error = exc
+
+    # Fallback
+    if not _should_fallback(primary_error) or not settings.LLM_FALLBACK_BASE_URL:
+        raise primary_error
+
+    try:
+        return await call_fallback()
+    except LLMUpstreamError as fallback_error:
+        raise _both_upstreams_failed(primary_error, fallback_error)
+
+
+def _both_upstreams_failed(primary_error: LLMUpstreamError, fallback_error: LLMUpstreamError) -> LLMUpstreamError:
+    if fallback_error.code == "LLM_OVERLOADED":
+        # The last resort is saturated: tell the client when to come back.
+        return fallback_error
+    msg = f"Upstream LLM unavailable (primary status={primary_error.status}, fallback status={fallback_error.status})"
+    return LLMUpstreamError(
+        provider="fallback",
+        status=fallback_error.status,
+        message=msg,
+        body_snippet=fallback_error.body_snippet,
+        code="LLM_FAILED",
     )
 
-    def should_retry(exc: LLMUpstreamError) -> bool:
-        # Retry on transient connectivity and on empty completions (common with stream end frames / flaky upstream)
-        return _should_fallback(exc) or exc.code == "EMPTY_COMPLETION"
 
+async def generate_stream(
+    model: Optional[str],
+    messages: List[Dict[str, str]],
+    priority: int = llm_admission.INTERACTIVE,
+    profile: str = llm_profiles.CHAT,
+    echo_of: Optional[str] = None,
+    session: Optional[ContextSession] = None,
+    thread_id: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Streaming counterpart of generate(): yields assistant text deltas as the
+    upstream produces them.
+
+    Retries and the fallback host apply only until the first delta arrives;
+    once text has been relayed, an upstream failure propagates to the caller.
+
+    With ``echo_of`` the opening deltas are held back while they repeat the
+    user's message; an echo aborts the upstream call and the answer is
+    regenerated once with llm_echo.NUDGE.
+    """
+    if echo_of is None:
+        async for chunk in _stream_completion(model, messages, priority, profile, session, thread_id):
+            yield chunk
+        return
+
+    guard = llm_echo.EchoGuard(echo_of)
+    stream = _stream_completion(model, messages, priority, profile, session, thread_id)
+    try:
+        async for chunk in stream:
+            released = guard.feed(chunk)
+            if guard.echoed:
+                break
+            if released:
+                yield released
+        else:
+            rest = guard.flush()
+            if rest:
+                yield rest
+            return
+    finally:
+        # Closing the generator cancels the upstream request mid-echo.
+        await stream.aclose()
+
+    logger.info("LLM echoed the user's message; retrying", extra={"model": model})
+    async for chunk in _stream_completion(model, _with_echo_nudge(messages), priority, profile, session, thread_id):
+        yield chunk
+
+
+async def _stream_completion(
+    model: Optional[str],
+    messages: List[Dict[str, str]],
+    priority: int,
+    profile: str,
+    session: Optional[ContextSession] = None,
+    thread_id: Optional[str] = None,
+) -> AsyncIterator[str]:
+    generation = llm_profiles.get_profile(profile)
+    requested_model = generation.resolve_model(model) or settings.LLM_MODEL
+    if not requested_model:
+        raise RuntimeError("LLM_MODEL must be configured (env LLM_MODEL).")
+
+    timeout = _llm_timeout(generation)
+    request_id = uuid.uuid4().hex
+
+    if _is_gemini_model(requested_model):
+        gemini = _upstream(GEMINI_KIND)
+        async for chunk in get_provider(gemini.kind).stream(
+            gemini,
+            requested_model,
+            messages,
+            timeout=timeout,
+            request_id=request_id,
+            priority=priority,
+            profile=generation,
+            thread_id=thread_id,
+        ):
+            yield chunk
+        return
+
+    validate_llm_config()
+
+    msgs = _with_system_prompt(messages)
+
+    async def relay(
+        upstream: Upstream, payload_model: str, session: Optional[ContextSession] = None
+    ) -> AsyncIterator[str]:
+        started = False
+        async for chunk in get_provider(upstream.kind).stream(
+            upstream,
+            payload_model,
+            msgs,
+            timeout=timeout,
+            request_id=request_id,
+            priority=priority,
+            profile=generation,
+            session=session,
+        ):
+            # Like _complete's strip(): leading whitespace is not an answer yet,
+            # so a blank completion can still be retried or sent to the fallback.
+            if not started and not chunk.strip():
+                continue
+            started = True
+            yield chunk
+        if not started:
+            raise LLMUpstreamError(provider=upstream.name, message="empty assistant_content", code="EMPTY_COMPLETION")
+
+    primary_breaker = llm_breaker.get_breaker("primary")
     max_retries = max(0, int(settings.LLM_MAX_RETRIES))
     attempt = 0
-    backoffs = [0.5, 1.5, 3.0]
-
     primary_error: LLMUpstreamError | None = None
+    try_primary = primary_breaker.allow_request()
+    if not try_primary:
+        # Primary is cooling down: stream from the fallback straight away.
+        primary_error = _circuit_open_error("primary")
 
-    while True:
+    while try_primary:
+        started = False
         try:
-            return await _post_llm(
-                provider="primary",
-                base=settings.LLM_PRIMARY_BASE_URL,
-                path=settings.LLM_PRIMARY_PATH,
-                payload=primary_payload,
-                kind="same_as_primary",
-                timeout=timeout,
-                verify=verify_flag,
-                request_id=request_id,
-            )
+            async for chunk in relay(_upstream("primary"), requested_model, session):
+                started = True
+                yield chunk
+            return
         except LLMUpstreamError as exc:
+            if started:
+                raise
             primary_error = exc
-            if attempt >= max_retries or not should_retry(exc):
+            if attempt >= max_retries or not _should_retry(exc) or primary_breaker.is_open():
                 break
-            await asyncio.sleep(backoffs[min(attempt, len(backoffs) - 1)])
+            await asyncio.sleep(_RETRY_BACKOFFS[min(attempt, len(_RETRY_BACKOFFS) - 1)])
             attempt += 1
 
-    if not primary_error:
-        raise LLMUpstreamError(provider="primary", status=None, message="unknown LLM failure", code="LLM_FAILED")
-
-    # Fallback
     if not _should_fallback(primary_error) or not settings.LLM_FALLBACK_BASE_URL:
         raise primary_error
 
-    fallback_kind = (settings.LLM_FALLBACK_KIND or "same_as_primary").lower()
+    if not llm_breaker.get_breaker("fallback").allow_request():
+        raise _both_upstreams_failed(primary_error, _circuit_open_error("fallback"))
+
     fallback_model = settings.LLM_FALLBACK_MODEL or settings.LLM_MODEL or requested_model
+    started = False
+    try:
+        async for chunk in relay(_upstream("fallback"), fallback_model):
+            started = True
+            yield chunk
+    except LLMUpstreamError as fallback_error:
+        if started:
+            raise
+        raise _both_upstreams_failed(primary_error, fallback_error)
+
+
+def _health_timeout() -> httpx.Timeout:
+    read = float(llm_profiles.get_profile(llm_profiles.HEALTH).timeout_secs or 3.0)
+    return httpx.Timeout(connect=2.0, read=read, write=read, pool=read)
 
-    if settings.APP_ENV in ("dev", "local") and fallback_model != requested_model:
-        logger.warning("Fallback model override", extra={"requested": requested_model, "using": fallback_model})
 
-    fallback_payload = _build_payload(
-        fallback_kind,
-        fallback_model,
-        msgs,
-        settings.LLM_FALLBACK_PATH,
+async def _ping_upstream(provider: str, timeout: httpx.Timeout, request_id: str) -> None:
+    """Send the tiny health-check prompt to the primary or fallback host."""
+    upstream = _upstream(provider)
+    if provider == "primary":
+        model = settings.LLM_MODEL or "health-check"
+    else:
+        model = settings.LLM_FALLBACK_MODEL or "health-check"
+
+    await get_provider(upstream.kind).complete(
+        upstream,
+        model,
+        [{"role": "user", "content": "ping"}],
+        timeout=timeout,
+        request_id=request_id,
+        priority=llm_admission.PROBE,
+        profile=llm_profiles.get_profile(llm_profiles.HEALTH),
     )
 
-    try:
-        return await _post_llm(
-            provider="fallback",
-            base=settings.LLM_FALLBACK_BASE_URL,
-            path=settings.LLM_FALLBACK_PATH,
-            payload=fallback_payload,
-            kind=fallback_kind,
-            timeout=timeout,
-            verify=verify_flag,
-            request_id=request_id,
-        )
-    except LLMUpstreamError as fallback_error:
-        msg = f"Upstream LLM unavailable (primary status={primary_error.status}, fallback status={fallback_error.status})"
-        raise LLMUpstreamError(
-            provider="fallback",
-            status=fallback_error.status,
-            message=msg,
-            body_snippet=fallback_error.body_snippet,
-            code="LLM_FAILED",
-        )
 
+def warmup_targets() -> List[Tuple[str, str]]:
+    """(provider, model) pairs served by Ollama hosts, for llm_warmup."""
+    targets = []
+    primary_model = settings.LLM_MODEL
+    if primary_model and not _is_gemini_model(primary_model):
+        targets.append(("primary", primary_model))
+    if settings.LLM_FALLBACK_BASE_URL:
+        targets.append(("fallback", settings.LLM_FALLBACK_MODEL or primary_model))
+    return [
+        (name, model)
+        for name, model in targets
+        if model and get_provider(_upstream(name).kind).kind == OllamaProvider.kind
+    ]
 
-async def health_check() -> Dict[str, Any]:
-    timeout = httpx.Timeout(connect=2.0, read=3.0, write=3.0, pool=3.0)
-    verify_flag = settings.LLM_TLS_VERIFY
-    request_id = uuid.uuid4().hex
 
-    payload = _build_payload(
-        "same_as_primary",
-        settings.LLM_MODEL or "health-check",
-        [{"role": "user", "content": "ping"}],
-        settings.LLM_PRIMARY_PATH,
+async def warm_model(provider: str, model: str) -> Optional[float]:
+    """
+    Load ``model`` on an Ollama host without generating anything (a request
+    with no prompt/messages), resetting its keep-alive. Returns the
+    load_duration Ollama reports, in ms.
+    """
+    upstream = _upstream(provider)
+    payload: Dict[str, Any] = {"model": model, "stream": False}
+    if settings.OLLAMA_KEEP_ALIVE_SECS is not None:
+        payload["keep_alive"] = int(settings.OLLAMA_KEEP_ALIVE_SECS)
+    client = await get_llm_http_client(upstream.base, settings.LLM_TLS_VERIFY)
+    resp = await client.post(
+        _build_url(upstream.base, upstream.path),
+        json=payload,
+        headers={"Cache-Control": "no-store", "X-Request-ID": uuid.uuid4().hex},
+        timeout=_llm_timeout(),
     )
+    resp.raise_for_status()
+    return llm_warmup.load_ms(resp.json())
+
+
+async def probe_upstream(provider: str) -> None:
+    """Breaker prober hook: _post_llm records the ping's outcome on the breaker."""
+    if provider == "fallback" and not settings.LLM_FALLBACK_BASE_URL:
+        return
+    await _ping_upstream(provider, _health_timeout(), uuid.uuid4().hex)
+
+
+async def health_check() -> Dict[str, Any]:
+    timeout = _health_timeout()
+    request_id = uuid.uuid4().hex
 
     def ok_dict(ok: bool, status: Optional[int], error: Optional[str]):
         return {"ok": ok, "status": status, "error": error}
 
     primary_status: Dict[str, Any]
     try:
-        await _post_llm(
-            provider="primary",
-            base=settings.LLM_PRIMARY_BASE_URL,
-            path=settings.LLM_PRIMARY_PATH,
-            payload=payload,
-            kind="same_as_primary",
-            timeout=timeout,
-            verify=verify_flag,
-            request_id=request_id,
-        )
+        await _ping_upstream("primary", timeout, request_id)
         primary_status = ok_dict(True, 200, None)
     except LLMUpstreamError as exc:
         primary_status = ok_dict(False, exc.status, repr(exc))
 
     fallback_status: Dict[str, Any] = ok_dict(False, None, "not configured")
     if settings.LLM_FALLBACK_BASE_URL:
-        fallback_kind = (settings.LLM_FALLBACK_KIND or "same_as_primary").lower()
-        fb_model = settings.LLM_FALLBACK_MODEL or "health-check"
-        fb_payload = _build_payload(
-            fallback_kind,
-            fb_model,
-            [{"role": "user", "content": "ping"}],
-            settings.LLM_FALLBACK_PATH,
-        )
-
         try:
-            await _post_llm(
-                provider="fallback",
-                base=settings.LLM_FALLBACK_BASE_URL,
-                path=settings.LLM_FALLBACK_PATH,
-                payload=fb_payload,
-                kind=fallback_kind,
-                timeout=timeout,
-                verify=verify_flag,
-                request_id=request_id,
-            )
+            await _ping_upstream("fallback", timeout, request_id)
             fallback_status = ok_dict(True, 200, None)
         except LLMUpstreamError as exc:
             fallback_status = ok_dict(False, exc.status, repr(exc))
 
-    return {"primary": primary_status, "fallback": fallback_status, "config": describe_llm_config()}
+    return {
+        "primary": primary_status,
+        "fallback": fallback_status,
+        "breakers": llm_breaker.snapshot(),
+        "config": describe_llm_config(),
+    }
@@ -0,0 +1,112 @@
+# app/services/llm_context.py
+"""
+Token-budgeted context assembly for chat turns.
+
+The prompt sent upstream is bounded by a per-model token budget instead of a
+message count: the system prompt and the new user message are always sent,
+then earlier turns are added newest-first verbatim while they fit. A turn
+that no longer fits is compressed to its head and tail; once not even that
+fits, it and everything older is dropped.
+
+Token counts come from a local estimate (no tokenizer round-trip): Hangul,
+kana and CJK ideographs count about one token per character, other text about
+four characters per token, plus a small per-message overhead.
+"""
+from __future__ import annotations
+
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+MESSAGE_OVERHEAD_TOKENS = 4
+# Older turns shorter than this are not worth sending as an excerpt.
+MIN_EXCERPT_TOKENS = 32
+ELLIPSIS = "\n…(중략)…\n"
+
+_WIDE_CHARS = re.compile(r"[\u1100-\u11ff\u3040-\u30ff\u3130-\u318f\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    wide = len(_WIDE_CHARS.findall(text))
+    return wide + math.ceil((len(text) - wide) / 4)
+
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    return estimate_tokens(message.get("content")) + MESSAGE_OVERHEAD_TOKENS
+
+
+def token_budget(model: Optional[str]) -> int:
+    """Prompt budget for ``model``: exact or prefix override, else the provider default."""
+    name = (model or "").lower()
+    overrides = {key.lower(): value for key, value in (settings.LLM_CONTEXT_TOKEN_BUDGETS or {}).items()}
+    if name in overrides:
+        return int(overrides[name])
+    for prefix in sorted(overrides, key=len, reverse=True):
+        if name.startswith(prefix):
+            return int(overrides[prefix])
+    if name.startswith("gemini-"):
+        return int(settings.GEMINI_CONTEXT_TOKEN_BUDGET)
+    return int(settings.LLM_CONTEXT_TOKEN_BUDGET)
+
+
+def _excerpt(text: str, max_tokens: int) -> str:
+    """Keep the head and tail of ``text`` within roughly ``max_tokens``."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # Shrink by characters until the estimate fits; wide text needs fewer chars.
+    keep = max(1, max_tokens - estimate_tokens(ELLIPSIS))
+    chars = keep * 4
+    while chars > 2:
+        head = text[: chars * 2 // 3].rstrip()
+        tail = text[len(text) - chars // 3 :].lstrip()
+        candidate = head + ELLIPSIS + tail
+        if estimate_tokens(candidate) <= max_tokens:
+            return candidate
+        chars = chars * 3 // 4
+    return text[:1] + ELLIPSIS
+
+
+def fit_to_budget(
+    system: List[Dict[str, Any]],
+    history: List[Dict[str, Any]],
+    latest: Dict[str, Any],
+    budget: int,
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Assemble ``system + history + [latest]`` within ``budget`` estimated tokens.
+
+    ``history`` is chronological. Returns (messages, stats) where stats has
+    prompt_tokens, token_budget, messages, compressed and dropped.
+    """
+    used = sum(message_tokens(m) for m in system) + message_tokens(latest)
+    compress_to = max(MIN_EXCERPT_TOKENS, int(settings.LLM_CONTEXT_COMPRESSED_TURN_TOKENS))
+    kept: List[Dict[str, Any]] = []
+    compressed = 0
+
+    for message in reversed(history):
+        cost = message_tokens(message)
+        if used + cost <= budget:
+            kept.append(message)
+            used += cost
+            continue
+        room = min(compress_to, budget - used - MESSAGE_OVERHEAD_TOKENS)
+        if room < MIN_EXCERPT_TOKENS:
+            break
+        excerpt = _excerpt(message.get("content") or "", room)
+        kept.append({**message, "content": excerpt})
+        used += estimate_tokens(excerpt) + MESSAGE_OVERHEAD_TOKENS
+        compressed += 1
+
+    kept.reverse()
+    messages = list(system) + kept + [latest]
+    return messages, {
+        "prompt_tokens": used,
+        "token_budget": budget,
+        "messages": len(messages),
+        "compressed": compressed,
+        "dropped": len(history) - len(kept),
+    }
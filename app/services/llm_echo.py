@@ -0,0 +1,60 @@
+# app/services/llm_echo.py
+"""
+Echo detection: small models sometimes answer by repeating the question.
+
+``EchoGuard`` watches the first streamed deltas: text is held back only while
+it still matches the start of the user's message. Once the answer diverges it
+is released unchanged; once it has repeated the first LLM_ECHO_PROBE_CHARS
+(normalized) characters of the question it is flagged, so the caller can
+abort the upstream call and retry with ``NUDGE`` instead of paying for the
+whole echoed completion.
+"""
+from __future__ import annotations
+
+import re
+from typing import List, Optional
+
+from app.core.config import settings
+
+NUDGE = "Do not repeat the user's question. Provide a concise answer now."
+
+_NON_WORD = re.compile(r"\W+")
+
+
+def normalize(text: Optional[str]) -> str:
+    return _NON_WORD.sub("", (text or "").lower())
+
+
+def is_echo(text: str, user_text: str) -> bool:
+    """Whole-completion check, for paths that only see the final text."""
+    answer, question = normalize(text), normalize(user_text)
+    return answer == question or bool(question) and question in answer
+
+
+class EchoGuard:
+    def __init__(self, user_text: str) -> None:
+        probe_chars = max(1, int(settings.LLM_ECHO_PROBE_CHARS))
+        self._target = normalize(user_text)[:probe_chars]
+        self._held: List[str] = []
+        # Nothing to compare against: every delta passes straight through.
+        self.decided = not self._target
+        self.echoed = False
+
+    def feed(self, chunk: str) -> str:
+        """Return the text that may be sent now ("" while undecided)."""
+        if self.decided:
+            return chunk
+        self._held.append(chunk)
+        seen = normalize("".join(self._held))
+        if seen.startswith(self._target):
+            self.decided = self.echoed = True
+            return ""
+        if self._target.startswith(seen):
+            return ""
+        self.decided = True
+        return self.flush()
+
+    def flush(self) -> str:
+        """Release held text; a stream that ended mid-match is not an echo."""
+        held, self._held = "".join(self._held), []
+        return "" if self.echoed else held
@@ -0,0 +1,155 @@
+# app/services/llm_hedge.py
+"""
+Latency-driven hedging between the primary and fallback LLM upstreams.
+
+When LLM_HEDGE_ENABLED is set, a request that has not been answered by the
+primary within the primary's rolling p95 latency also fires the fallback;
+whichever succeeds first wins and the other request is cancelled.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class LatencyWindow:
+    """Rolling window of successful primary response times (seconds)."""
+
+    def __init__(self) -> None:
+        self._samples: Deque[float] = deque()
+
+    def clear(self) -> None:
+        self._samples.clear()
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        while len(self._samples) > max(1, int(settings.LLM_HEDGE_WINDOW)):
+            self._samples.popleft()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(0, min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1))
+        return ordered[rank]
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the primary before firing the fallback."""
+        lower = float(settings.LLM_HEDGE_MIN_DELAY_SECS)
+        upper = max(lower, float(settings.LLM_HEDGE_MAX_DELAY_SECS))
+        observed = self.percentile(float(settings.LLM_HEDGE_PERCENTILE))
+        # Until the window has enough samples, hedge only very slow requests.
+        if observed is None or len(self._samples) < int(settings.LLM_HEDGE_MIN_SAMPLES):
+            return upper
+        return max(lower, min(upper, observed))
+
+
+class HedgeStats:
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self.requests = 0
+        self.hedged = 0
+        self.primary_wins = 0
+        self.fallback_wins = 0
+        self.failures = 0
+
+    def snapshot(self, window: LatencyWindow) -> Dict[str, Any]:
+        return {
+            "enabled": bool(settings.LLM_HEDGE_ENABLED),
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedged / self.requests, 4) if self.requests else 0.0,
+            "primary_wins": self.primary_wins,
+            "fallback_wins": self.fallback_wins,
+            # 헤지된 요청 중 fallback이 먼저 응답한 비율
+            "fallback_win_rate": round(self.fallback_wins / self.hedged, 4) if self.hedged else 0.0,
+            "failures": self.failures,
+            "primary_samples": len(window),
+            "primary_p95_ms": _ms(window.percentile(0.95)),
+            "current_delay_ms": _ms(window.hedge_delay()),
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+primary_latency = LatencyWindow()
+hedge_stats = HedgeStats()
+
+
+async def timed_primary(call: Callable[[], Awaitable[T]]) -> T:
+    """Run one primary attempt and record its latency when it succeeds."""
+    started = time.monotonic()
+    result = await call()
+    primary_latency.record(time.monotonic() - started)
+    return result
+
+
+async def _cancel(*tasks: "asyncio.Future[Any]") -> None:
+    pending = [task for task in tasks if not task.done()]
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def race(
+    primary: Callable[[], Awaitable[T]],
+    fallback: Callable[[], Awaitable[T]],
+    is_failure: Callable[[BaseException], bool],
+    combine: Callable[[BaseException, BaseException], BaseException],
+) -> T:
+    """
+    Start ``primary``; if it has not finished after the hedge delay, start
+    ``fallback`` too and return the first success, cancelling the other.
+
+    ``is_failure`` decides which exceptions let the other request win. If the
+    primary fails before the delay, the fallback starts immediately. When both
+    fail, ``combine(primary_exc, fallback_exc)`` is raised.
+    """
+    hedge_stats.requests += 1
+    primary_task = asyncio.ensure_future(primary())
+    fallback_task: Optional[asyncio.Future] = None
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=primary_latency.hedge_delay())
+        if done and primary_task.exception() is None:
+            return primary_task.result()
+        if done and not is_failure(primary_task.exception()):
+            raise primary_task.exception()
+
+        if not done:
+            hedge_stats.hedged += 1
+        fallback_task = asyncio.ensure_future(fallback())
+        pending = {primary_task, fallback_task}
+        while True:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Prefer the primary when both land in the same tick.
+            for task in sorted(finished, key=lambda t: t is not primary_task):
+                exc = task.exception()
+                if exc is None:
+                    if not done:
+                        if task is primary_task:
+                            hedge_stats.primary_wins += 1
+                        else:
+                            hedge_stats.fallback_wins += 1
+                    return task.result()
+                if not is_failure(exc):
+                    raise exc
+            if not pending:
+                hedge_stats.failures += 1
+                raise combine(primary_task.exception(), fallback_task.exception())
+    finally:
+        await _cancel(primary_task, *([fallback_task] if fallback_task else []))
@@ -0,0 +1,78 @@
+# app/services/llm_profiles.py
+"""
+Named generation profiles: per-purpose model, output and timeout limits.
+
+Utility calls (branch banners, health pings, titles) need a few tokens, not a
+full chat completion. Each call site names a profile and llm_client passes
+its limits upstream: ``GenerateContentConfig`` for Gemini, ``options`` (and
+``think``) for Ollama-style hosts, ``max_tokens``/``temperature`` for
+OpenAI-compatible ones. Unset fields leave the upstream default alone.
+
+Built-in profiles can be tuned, or new ones added, through LLM_PROFILES
+(JSON: {"branch_summary": {"max_output_tokens": 64}}).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, fields, replace
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+CHAT = "chat"
+BRANCH_SUMMARY = "branch_summary"
+CONVERSATION_SUMMARY = "conversation_summary"
+HEALTH = "health"
+TITLE = "title"
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    name: str
+    model: Optional[str] = None  # None: use the caller's model
+    max_output_tokens: Optional[int] = None
+    thinking_budget: Optional[int] = None  # 0 disables thinking where supported
+    temperature: Optional[float] = None
+    timeout_secs: Optional[float] = None  # None: provider default timeout
+
+    def resolve_model(self, model: Optional[str]) -> Optional[str]:
+        return self.model or model
+
+
+_BUILTIN: Dict[str, GenerationProfile] = {
+    CHAT: GenerationProfile(CHAT),
+    # A 20-character banner; the output cap is loose because some models
+    # count any thinking they still do against it.
+    BRANCH_SUMMARY: GenerationProfile(
+        BRANCH_SUMMARY, max_output_tokens=256, thinking_budget=0, temperature=0.2, timeout_secs=20.0
+    ),
+    CONVERSATION_SUMMARY: GenerationProfile(
+        CONVERSATION_SUMMARY, max_output_tokens=1024, thinking_budget=0, temperature=0.2, timeout_secs=60.0
+    ),
+    HEALTH: GenerationProfile(HEALTH, max_output_tokens=8, thinking_budget=0, temperature=0.0, timeout_secs=3.0),
+    TITLE: GenerationProfile(TITLE, max_output_tokens=64, thinking_budget=0, temperature=0.3, timeout_secs=15.0),
+}
+
+_FIELDS = {f.name for f in fields(GenerationProfile)} - {"name"}
+
+
+def get_profile(name: str) -> GenerationProfile:
+    """Built-in profile ``name`` with LLM_PROFILES overrides applied."""
+    overrides: Dict[str, Any] = (settings.LLM_PROFILES or {}).get(name) or {}
+    base = _BUILTIN.get(name)
+    if base is None:
+        if not overrides:
+            raise ValueError(f"Unknown generation profile: {name}")
+        base = GenerationProfile(name)
+    unknown = set(overrides) - _FIELDS
+    if unknown:
+        raise ValueError(f"Unknown fields in LLM_PROFILES[{name!r}]: {', '.join(sorted(unknown))}")
+    return replace(base, **overrides) if overrides else base
+
+
+def describe() -> Dict[str, Dict[str, Any]]:
+    names = list(_BUILTIN) + [name for name in (settings.LLM_PROFILES or {}) if name not in _BUILTIN]
+    result: Dict[str, Dict[str, Any]] = {}
+    for name in names:
+        profile = get_profile(name)
+        result[name] = {field: getattr(profile, field) for field in sorted(_FIELDS)}
+    return result
@@ -0,0 +1,160 @@
+# app/services/llm_warmup.py
+"""
+Keep Ollama models loaded while they are in use.
+
+Ollama unloads a model OLLAMA_KEEP_ALIVE_SECS after its last request (5
+minutes by default), and the next request pays the full load before its
+first token. The warmer loads every configured Ollama model (primary and
+fallback) on startup, then re-pings a model shortly before its keep-alive
+runs out, but only while it has seen traffic within LLM_WARMUP_IDLE_SECS,
+so idle nights still free the VRAM.
+
+Every Ollama answer reports ``load_duration``; the load times seen by
+warm-ups and by real requests are kept per model for /health.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Ollama's own default when keep_alive is not sent.
+DEFAULT_KEEP_ALIVE_SECS = 300.0
+
+Target = Tuple[str, str]  # (provider, model)
+
+
+@dataclass
+class WarmState:
+    provider: str
+    model: str
+    last_request: Optional[float] = None  # monotonic; real traffic only
+    last_touch: Optional[float] = None  # any request, warm-ups included
+    warmups: int = 0
+    warmup_failures: int = 0
+    last_warmup_load_ms: Optional[float] = None
+    last_request_load_ms: Optional[float] = None
+    max_request_load_ms: Optional[float] = None
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            "idle_secs": None if self.last_request is None else round(now - self.last_request, 1),
+            "warmups": self.warmups,
+            "warmup_failures": self.warmup_failures,
+            "last_warmup_load_ms": self.last_warmup_load_ms,
+            "last_request_load_ms": self.last_request_load_ms,
+            "max_request_load_ms": self.max_request_load_ms,
+        }
+
+
+_states: Dict[Target, WarmState] = {}
+
+
+def _state(provider: str, model: str) -> WarmState:
+    state = _states.get((provider, model))
+    if state is None:
+        state = _states[(provider, model)] = WarmState(provider, model)
+    return state
+
+
+def keep_alive_secs() -> float:
+    if settings.OLLAMA_KEEP_ALIVE_SECS is None:
+        return DEFAULT_KEEP_ALIVE_SECS
+    return float(settings.OLLAMA_KEEP_ALIVE_SECS)
+
+
+def load_ms(frame: Any) -> Optional[float]:
+    """``load_duration`` (ns) of an Ollama final frame, in ms."""
+    if not isinstance(frame, dict) or not isinstance(frame.get("load_duration"), int):
+        return None
+    return round(frame["load_duration"] / 1_000_000, 1)
+
+
+def observe(provider: str, model: Optional[str], frame: Any) -> None:
+    """Record a finished Ollama request: it restarts the keep-alive timer."""
+    if not model:
+        return
+    state = _state(provider, model)
+    state.last_request = state.last_touch = time.monotonic()
+    loaded = load_ms(frame)
+    if loaded is not None:
+        state.last_request_load_ms = loaded
+        state.max_request_load_ms = max(loaded, state.max_request_load_ms or 0.0)
+
+
+def due(now: float) -> list[Target]:
+    """Models with recent traffic whose keep-alive ends within the margin."""
+    keep_alive = keep_alive_secs()
+    if keep_alive <= 0:
+        # 0 unloads right away, negative never unloads: nothing to refresh.
+        return []
+    idle_limit = float(settings.LLM_WARMUP_IDLE_SECS)
+    margin = float(settings.LLM_WARMUP_MARGIN_SECS)
+    targets = []
+    for target, state in _states.items():
+        if state.last_request is None or now - state.last_request > idle_limit:
+            continue
+        if now >= (state.last_touch or 0.0) + keep_alive - margin:
+            targets.append(target)
+    return targets
+
+
+async def warm(target: Target, ping: Callable[[str, str], Awaitable[Optional[float]]]) -> None:
+    provider, model = target
+    state = _state(provider, model)
+    try:
+        loaded = await ping(provider, model)
+    except Exception as exc:
+        state.warmup_failures += 1
+        logger.warning("LLM warm-up failed", extra={"provider": provider, "model": model, "error": repr(exc)})
+        return
+    state.warmups += 1
+    state.last_touch = time.monotonic()
+    state.last_warmup_load_ms = loaded
+    logger.info("LLM warm-up", extra={"provider": provider, "model": model, "load_ms": loaded})
+
+
+async def run_warmer(
+    ping: Callable[[str, str], Awaitable[Optional[float]]],
+    targets: Iterable[Target],
+    stop: asyncio.Event,
+) -> None:
+    """
+    Background loop: load ``targets`` once, then every half margin re-ping
+    the models ``due`` for a refresh. ``ping(provider, model)`` returns the
+    load time in ms it observed.
+    """
+    if not settings.LLM_WARMUP_ENABLED or keep_alive_secs() == 0:
+        return
+    for target in targets:
+        if stop.is_set():
+            return
+        await warm(target, ping)
+    interval = max(0.01, float(settings.LLM_WARMUP_MARGIN_SECS) / 2)
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+            return
+        except asyncio.TimeoutError:
+            pass
+        for target in due(time.monotonic()):
+            await warm(target, ping)
+
+
+def snapshot() -> Dict[str, Any]:
+    now = time.monotonic()
+    return {
+        "enabled": settings.LLM_WARMUP_ENABLED,
+        "keep_alive_secs": keep_alive_secs(),
+        "models": {f"{provider}:{model}": state.snapshot(now) for (provider, model), state in _states.items()},
+    }
+
+
+def reset() -> None:
+    _states.clear()
@@ -0,0 +1,105 @@
+# app/services/ollama_context.py
+"""
+Ollama KV-cache reuse for generate-mode threads.
+
+/api/generate answers with a ``context`` token array that covers the prompt
+and the answer. Sending it back with the next prompt lets Ollama continue
+from there, so only the new user message is prefilled instead of the whole
+conversation. The latest array per thread is kept in an LRU and, with
+OLLAMA_CONTEXT_PERSIST, in a reserved message row of the thread too (shared
+by workers, survives restarts).
+
+An entry is reused only when it ends at the message right before the new
+user turn and came from the same model. Anything else starts a fresh
+context, e.g. another writer, a deleted message or an answer from the
+fallback host.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+
+@dataclass
+class ContextSession:
+    """One turn's context: what was sent and what the upstream returned."""
+
+    thread_id: str
+    model: str
+    context: Optional[List[int]] = None
+    returned: Optional[List[int]] = None
+    prompt_eval_count: Optional[int] = None
+    prompt_eval_ms: Optional[float] = None
+
+    @property
+    def reused(self) -> bool:
+        return self.context is not None
+
+    def record(self, frame: Any) -> None:
+        """Take ``context`` and prefill stats from Ollama's final frame."""
+        if not isinstance(frame, dict):
+            return
+        context = frame.get("context")
+        if isinstance(context, list) and context:
+            self.returned = [int(token) for token in context]
+        if isinstance(frame.get("prompt_eval_count"), int):
+            self.prompt_eval_count = frame["prompt_eval_count"]
+        if isinstance(frame.get("prompt_eval_duration"), int):
+            self.prompt_eval_ms = frame["prompt_eval_duration"] / 1_000_000
+
+
+def entry_matches(entry: Any, next_index: int, model: str) -> bool:
+    if not isinstance(entry, dict) or not isinstance(entry.get("context"), list):
+        return False
+    return entry.get("model") == model and entry.get("through_index") == next_index - 1
+
+
+class ContextCache:
+    """LRU of {"model", "through_index", "context"} entries keyed by thread id."""
+
+    def __init__(self) -> None:
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": int(settings.OLLAMA_CONTEXT_CACHE_MAX_THREADS),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def get(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(thread_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(thread_id)
+        return entry
+
+    def put(self, thread_id: str, entry: Dict[str, Any]) -> None:
+        max_entries = int(settings.OLLAMA_CONTEXT_CACHE_MAX_THREADS)
+        if max_entries <= 0:
+            return
+        self._entries[thread_id] = entry
+        self._entries.move_to_end(thread_id)
+        while len(self._entries) > max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def forget(self, thread_id: str) -> None:
+        self._entries.pop(thread_id, None)
+
+
+context_cache = ContextCache()
@@ -0,0 +1,80 @@
+"""
+Access token verification benchmark: remote (/auth/v1/user) vs local (JWKS).
+
+Calls GET /threads against tests/fake_supabase.py with an injected
+per-request Supabase latency, once per SUPABASE_AUTH_VERIFY_MODE, and reports
+the wall time and Supabase round trips per request, plus the cost of the
+verification step alone.
+
+    python -m benchmarks.auth_verification --supabase-ms 20 --iterations 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+from unittest.mock import patch
+
+import httpx
+
+from app.core.config import settings
+from app.db.supabase_auth import authenticate_access_token, jwks_cache
+from app.main import app
+from tests.fake_supabase import FakeSupabase
+
+
+def _p95(timings: List[float]) -> float:
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+async def run(supabase_ms: float, iterations: int) -> None:
+    fake = FakeSupabase(latency=supabase_ms / 1000)
+    fake.add_user("bench@example.com", user_id="bench-owner")
+    token = fake.issue_jwt("bench-owner")
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+
+    print(f"supabase latency {supabase_ms:g} ms, {iterations} iterations\n")
+    print(f"{'mode':8} {'step':14} {'p50 ms':>8} {'p95 ms':>8} {'round trips':>12}")
+    async with fake.installed():
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            for mode in ("remote", "local"):
+                jwks_cache.clear()
+                with patch.object(settings, "SUPABASE_AUTH_VERIFY_MODE", mode):
+                    # Warm up: the first local verification fetches the JWKS.
+                    await authenticate_access_token(token)
+
+                    for step in ("verify", "GET /threads"):
+                        timings: List[float] = []
+                        trips: List[int] = []
+                        for _ in range(iterations):
+                            fake.reset_calls()
+                            started = time.perf_counter()
+                            if step == "verify":
+                                await authenticate_access_token(token)
+                            else:
+                                response = await client.get("/threads", headers=headers)
+                                if response.status_code >= 400:
+                                    raise SystemExit(f"{step} failed: {response.status_code} {response.text}")
+                            timings.append((time.perf_counter() - started) * 1000)
+                            trips.append(len(fake.calls))
+                        print(
+                            f"{mode:8} {step:14} {statistics.median(timings):8.2f} {_p95(timings):8.2f} "
+                            f"{statistics.median(trips):12g}"
+                        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--supabase-ms", type=float, default=20.0, help="latency per Supabase request")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.supabase_ms, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Ollama generate-mode prefill: full transcript vs reused ``context``.
+
+Needs a running Ollama. Plays the same scripted conversation twice through
+/api/generate: once re-sending the whole transcript as the prompt every turn
+(build_ollama_generate_prompt), once sending only the new user message plus
+the ``context`` the previous turn returned (what the chat routes do with
+OLLAMA_CONTEXT_ENABLED). Reports Ollama's prompt_eval_count and
+prompt_eval_duration per turn.
+
+    python -m benchmarks.ollama_context --base-url http://localhost:11434 --model gemma3:270m --turns 6
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.services.llm import build_ollama_generate_prompt
+
+QUESTIONS = [
+    "Give me three ideas for a weekend trip near Seoul.",
+    "Which of those is best in winter?",
+    "What should I pack for it?",
+    "How long does it take to get there by train?",
+    "Suggest a budget for two people.",
+    "Summarize the plan in two sentences.",
+]
+
+
+async def _generate(
+    client: httpx.AsyncClient,
+    model: str,
+    prompt: str,
+    context: Optional[List[int]],
+    max_tokens: int,
+) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {
+        "model": model,
+        "prompt": prompt,
+        "stream": False,
+        "options": {"num_predict": max_tokens, "temperature": 0},
+    }
+    if context:
+        payload["context"] = context
+    response = await client.post("/api/generate", json=payload)
+    response.raise_for_status()
+    return response.json()
+
+
+async def run(base_url: str, model: str, turns: int, max_tokens: int) -> None:
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(turns)]
+    print(f"{model} at {base_url}, {turns} turns, {max_tokens} output tokens per turn\n")
+    print(f"{'turn':>4} {'mode':10} {'prompt tokens':>14} {'prefill ms':>11}")
+    totals: Dict[str, float] = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=300.0) as client:
+        # Warm up: load the model so the first turn is not a cold start.
+        await _generate(client, model, "hi", None, 1)
+
+        for mode in ("transcript", "context"):
+            transcript: List[Dict[str, str]] = []
+            context: Optional[List[int]] = None
+            totals[mode] = 0.0
+            for turn, question in enumerate(questions, start=1):
+                transcript.append({"role": "user", "content": question})
+                if mode == "transcript":
+                    data = await _generate(client, model, build_ollama_generate_prompt(transcript), None, max_tokens)
+                else:
+                    data = await _generate(client, model, question, context, max_tokens)
+                    context = data.get("context")
+                transcript.append({"role": "assistant", "content": data.get("response") or ""})
+                prefill_ms = (data.get("prompt_eval_duration") or 0) / 1_000_000
+                totals[mode] += prefill_ms
+                print(f"{turn:4} {mode:10} {data.get('prompt_eval_count') or 0:14} {prefill_ms:11.1f}")
+
+    print()
+    for mode, total in totals.items():
+        print(f"{mode:10} total prefill {total:9.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:11434")
+    parser.add_argument("--model", default="gemma3:270m")
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--max-tokens", type=int, default=64, help="num_predict per turn")
+    args = parser.parse_args()
+    asyncio.run(run(args.base_url, args.model, args.turns, args.max_tokens))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Offline route latency benchmark.
+
+Runs the real FastAPI app in-process against tests/fake_supabase.py, with
+an injected per-request Supabase latency and a stubbed LLM, and reports the
+wall time and Supabase round trips of each route.
+
+    python -m benchmarks.route_latency --supabase-ms 20 --llm-ms 200 --iterations 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+from unittest.mock import patch
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+from app.repository import thread as repository
+from app.services import llm_client
+from tests.fake_supabase import FakeSupabase
+
+
+ROOT_ID = "00000000-0000-4000-8000-000000000001"
+CHILD_ID = "00000000-0000-4000-8000-000000000002"
+
+
+def seed(fake: FakeSupabase, messages: int) -> str:
+    owner = fake.add_user("bench@example.com", user_id="bench-owner")
+    fake.insert(
+        "threads",
+        {"id": ROOT_ID, "title": "root", "owner_id": "bench-owner", "is_workspace": False},
+        {"id": CHILD_ID, "title": "root", "owner_id": "bench-owner", "is_workspace": False},
+    )
+    fake.insert(
+        "messages",
+        *(
+            {
+                "thread_id": ROOT_ID,
+                "index": index,
+                "role": "user" if index % 2 == 0 else "assistant",
+                "content": f"message {index}",
+            }
+            for index in range(messages)
+        ),
+        {
+            "thread_id": CHILD_ID,
+            "index": repository.BRANCH_META_INDEX,
+            "role": "assistant",
+            "content": repository._encode_branch_metadata(
+                {
+                    "version": 1,
+                    "parent_thread_id": ROOT_ID,
+                    "root_thread_id": ROOT_ID,
+                    "model": "gemini-3.6-flash",
+                    "context_preview": "요약",
+                }
+            ),
+        },
+    )
+    return owner["access_token"]
+
+
+def routes(client: httpx.AsyncClient, headers: Dict[str, str]) -> List[Tuple[str, Callable[[int], Awaitable[httpx.Response]]]]:
+    return [
+        ("GET /threads", lambda n: client.get("/threads", headers=headers)),
+        ("GET /threads/{id}", lambda n: client.get(f"/threads/{ROOT_ID}", headers=headers)),
+        ("GET /threads/{id}/messages", lambda n: client.get(f"/threads/{ROOT_ID}/messages", headers=headers)),
+        ("GET /threads/branches", lambda n: client.get("/threads/branches", headers=headers)),
+        (
+            "POST /threads/{id}/bookmarks",
+            lambda n: client.post(f"/threads/{ROOT_ID}/bookmarks", json={"message_index": 0}, headers=headers),
+        ),
+        (
+            "POST /threads/{id}/chat",
+            lambda n: client.post(f"/threads/{ROOT_ID}/chat", json={"content": f"question {n}"}, headers=headers),
+        ),
+    ]
+
+
+async def run(supabase_ms: float, llm_ms: float, iterations: int, messages: int) -> None:
+    fake = FakeSupabase(latency=supabase_ms / 1000)
+    token = seed(fake, messages)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def fake_generate(model, messages, **kwargs):
+        await asyncio.sleep(llm_ms / 1000)
+        return "benchmark answer"
+
+    transport = httpx.ASGITransport(app=app)
+    with (
+        patch.object(llm_client, "generate", side_effect=fake_generate),
+        # Every iteration would otherwise hit the per-token rate limits.
+        patch.object(settings, "LLM_RATE_LIMIT_PER_MINUTE", 1_000_000),
+    ):
+        async with fake.installed():
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                print(
+                    f"supabase latency {supabase_ms:g} ms, llm latency {llm_ms:g} ms, "
+                    f"{iterations} iterations, {messages} seeded messages\n"
+                )
+                print(f"{'route':32} {'p50 ms':>8} {'p95 ms':>8} {'round trips':>12}")
+                for name, call in routes(client, headers):
+                    timings: List[float] = []
+                    trips: List[int] = []
+                    for n in range(iterations):
+                        fake.reset_calls()
+                        started = time.perf_counter()
+                        response = await call(n)
+                        timings.append((time.perf_counter() - started) * 1000)
+                        trips.append(len(fake.calls))
+                        if response.status_code >= 400:
+                            raise SystemExit(f"{name} failed: {response.status_code} {response.text}")
+                    timings.sort()
+                    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                    print(
+                        f"{name:32} {statistics.median(timings):8.1f} {p95:8.1f} "
+                        f"{statistics.median(trips):12g}"
+                    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--supabase-ms", type=float, default=20.0, help="latency per Supabase request")
+    parser.add_argument("--llm-ms", type=float, default=200.0, help="latency per LLM completion")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=50, help="messages seeded in the benchmark thread")
+    args = parser.parse_args()
+    asyncio.run(run(args.supabase_ms, args.llm_ms, args.iterations, args.messages))
+
+
+if __name__ == "__main__":
+    main()
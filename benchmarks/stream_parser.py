@@ -0,0 +1,114 @@
+"""
+Upstream LLM stream parsing benchmark.
+
+Feeds synthetic multi-megabyte NDJSON (Ollama) and SSE (OpenAI-compatible)
+bodies through an in-memory transport in network-sized chunks and compares
+buffering the whole body before parsing (resp.text + _parse_one_or_stream_json)
+with the incremental parser (_read_llm_response). Reports wall time and peak
+Python heap allocated while parsing.
+
+    python -m benchmarks.stream_parser --sizes-mb 1 4 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from typing import AsyncIterator, Awaitable, Callable, Tuple
+
+import httpx
+
+from app.services import llm_client
+
+CHUNK_BYTES = 64 * 1024
+DELTA = "토큰 stream "
+
+
+def ndjson_body(size_bytes: int) -> bytes:
+    frame = json.dumps({"model": "bench", "response": DELTA, "done": False}, ensure_ascii=False) + "\n"
+    count = max(1, size_bytes // len(frame.encode()))
+    done = json.dumps({"model": "bench", "response": "", "done": True, "done_reason": "stop"}) + "\n"
+    return (frame * count + done).encode()
+
+
+def sse_body(size_bytes: int) -> bytes:
+    frame = "data: " + json.dumps({"choices": [{"delta": {"content": DELTA}}]}, ensure_ascii=False) + "\n\n"
+    count = max(1, size_bytes // len(frame.encode()))
+    return (frame * count + "data: [DONE]\n\n").encode()
+
+
+def transport_for(body: bytes, content_type: str) -> httpx.MockTransport:
+    async def chunks() -> AsyncIterator[bytes]:
+        view = memoryview(body)
+        for start in range(0, len(body), CHUNK_BYTES):
+            yield bytes(view[start : start + CHUNK_BYTES])
+            await asyncio.sleep(0)
+
+    return httpx.MockTransport(
+        lambda request: httpx.Response(200, headers={"content-type": content_type}, content=chunks())
+    )
+
+
+async def buffered(resp: httpx.Response) -> str:
+    await resp.aread()
+    assistant, _ = llm_client._parse_one_or_stream_json(
+        "same_as_primary", resp.text, resp.headers.get("content-type", "")
+    )
+    return assistant
+
+
+async def incremental(resp: httpx.Response) -> str:
+    assistant, _, _ = await llm_client._read_llm_response("same_as_primary", resp)
+    return assistant
+
+
+async def parse_once(
+    body: bytes, content_type: str, parse: Callable[[httpx.Response], Awaitable[str]], trace: bool
+) -> Tuple[float, float, int]:
+    async with httpx.AsyncClient(transport=transport_for(body, content_type)) as client:
+        if trace:
+            tracemalloc.start()
+        started = time.perf_counter()
+        async with client.stream("POST", "https://llm.bench/api/generate") as resp:
+            assistant = await parse(resp)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace else 0
+        if trace:
+            tracemalloc.stop()
+    return elapsed * 1000, peak / (1024 * 1024), len(assistant)
+
+
+async def measure(
+    body: bytes, content_type: str, parse: Callable[[httpx.Response], Awaitable[str]]
+) -> Tuple[float, float, int]:
+    # Time and memory come from separate runs; tracing distorts timings.
+    ms, _, chars = await parse_once(body, content_type, parse, trace=False)
+    _, peak, _ = await parse_once(body, content_type, parse, trace=True)
+    return ms, peak, chars
+
+
+async def run(sizes_mb: list[float]) -> None:
+    print(f"{'body':10} {'size MB':>8} {'parser':12} {'ms':>9} {'peak MB':>9} {'answer chars':>13}")
+    for size_mb in sizes_mb:
+        for name, make, content_type in (
+            ("ndjson", ndjson_body, "application/x-ndjson"),
+            ("sse", sse_body, "text/event-stream"),
+        ):
+            body = make(int(size_mb * 1024 * 1024))
+            for parser_name, parse in (("buffered", buffered), ("incremental", incremental)):
+                ms, peak, chars = await measure(body, content_type, parse)
+                print(f"{name:10} {len(body) / 1048576:8.1f} {parser_name:12} {ms:9.1f} {peak:9.1f} {chars:13d}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1.0, 4.0, 16.0])
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes_mb))
+
+
+if __name__ == "__main__":
+    main()
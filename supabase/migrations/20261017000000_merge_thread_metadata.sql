@@ -0,0 +1,109 @@
+-- Set keys of a thread's hidden metadata marker without rewriting the rest.
+--
+-- The marker is the message at index 2147483647 whose content is
+-- '__BRANCH_META__:' followed by a JSON object. Background jobs (the rolling
+-- conversation summary, branch previews, the Gemini model hint) each own
+-- one or two top-level keys. Rewriting the whole blob from a stale read let
+-- the last writer drop everyone else's keys; this function merges p_patch
+-- into the current object under a row lock instead.
+--
+-- - p_create: when the thread has no (readable) marker, start from the
+--   default root metadata; otherwise do nothing and return null.
+-- - p_order_key: keep a stored key whose p_order_key number is larger than
+--   the incoming value's, so a late job cannot overwrite newer state.
+--
+-- Deleted threads (is_deleted) are never written. Returns the merged
+-- metadata, or null when nothing was written for the reasons above.
+--
+-- SECURITY INVOKER keeps the caller's RLS policies in force.
+
+create or replace function public.merge_thread_metadata(
+  p_thread_id uuid,
+  p_patch jsonb,
+  p_create boolean default true,
+  p_order_key text default null
+)
+returns jsonb
+language plpgsql
+security invoker
+set search_path = public
+as $$
+declare
+  marker_prefix constant text := '__BRANCH_META__:';
+  marker_index constant integer := 2147483647;
+  current_content text;
+  has_marker boolean;
+  metadata jsonb;
+  accepted jsonb := '{}'::jsonb;
+  item record;
+begin
+  if jsonb_typeof(p_patch) <> 'object' then
+    raise exception 'p_patch must be a JSON object' using errcode = '22023';
+  end if;
+
+  perform pg_advisory_xact_lock(hashtextextended('thread-metadata:' || p_thread_id::text, 0));
+
+  select m.content
+    into current_content
+    from public.messages m
+   where m.thread_id = p_thread_id
+     and m.index = marker_index
+   for update;
+  has_marker := found;
+
+  if has_marker and current_content like marker_prefix || '%' then
+    begin
+      metadata := substr(current_content, length(marker_prefix) + 1)::jsonb;
+    exception when others then
+      metadata := null;
+    end;
+  end if;
+
+  if metadata is null or jsonb_typeof(metadata) <> 'object' then
+    if not p_create then
+      return null;
+    end if;
+    metadata := jsonb_build_object(
+      'version', 1,
+      'parent_thread_id', null,
+      'root_thread_id', p_thread_id::text,
+      'context_preview', null
+    );
+  end if;
+
+  if coalesce(metadata -> 'is_deleted', 'false'::jsonb) not in ('false'::jsonb, 'null'::jsonb) then
+    return null;
+  end if;
+
+  for item in select key, value from jsonb_each(p_patch) loop
+    if p_order_key is not null
+       and jsonb_typeof(metadata -> item.key -> p_order_key) = 'number'
+       and (metadata -> item.key ->> p_order_key)::numeric
+           > coalesce((item.value ->> p_order_key)::numeric, -1) then
+      continue;
+    end if;
+    accepted := accepted || jsonb_build_object(item.key, item.value);
+  end loop;
+
+  if accepted = '{}'::jsonb then
+    return metadata;
+  end if;
+  metadata := metadata || accepted;
+
+  if has_marker then
+    update public.messages
+       set role = 'assistant',
+           content = marker_prefix || metadata::text
+     where thread_id = p_thread_id
+       and index = marker_index;
+  else
+    insert into public.messages (thread_id, role, content, index, created_at)
+    values (p_thread_id, 'assistant', marker_prefix || metadata::text, marker_index, now());
+  end if;
+
+  return metadata;
+end;
+$$;
+
+revoke all on function public.merge_thread_metadata(uuid, jsonb, boolean, text) from public;
+grant execute on function public.merge_thread_metadata(uuid, jsonb, boolean, text) to authenticated;
@@ -0,0 +1,48 @@
+-- Keep append_messages below every reserved message index.
+--
+-- Index 2147483646 now holds the persisted Ollama generate-mode context
+-- (OLLAMA_CONTEXT_PERSIST), next to the hidden branch-metadata marker at
+-- 2147483647. Both must be excluded from max(index), or the next append
+-- would land on the marker's index. Apply this before turning on
+-- OLLAMA_CONTEXT_PERSIST.
+
+create or replace function public.append_messages(
+  p_thread_id uuid,
+  p_messages jsonb
+)
+returns setof public.messages
+language plpgsql
+security invoker
+set search_path = public
+as $$
+declare
+  next_index integer;
+begin
+  if jsonb_typeof(p_messages) <> 'array' then
+    raise exception 'p_messages must be a JSON array' using errcode = '22023';
+  end if;
+
+  perform pg_advisory_xact_lock(hashtextextended('messages:' || p_thread_id::text, 0));
+
+  select coalesce(max(m.index), -1) + 1
+    into next_index
+    from public.messages m
+   where m.thread_id = p_thread_id
+     and m.index >= 0
+     and m.index < 2147483646;
+
+  return query
+    insert into public.messages (thread_id, role, content, index, created_at)
+    select p_thread_id,
+           item.value ->> 'role',
+           item.value ->> 'content',
+           next_index + (item.ordinality - 1)::integer,
+           now()
+      from jsonb_array_elements(p_messages) with ordinality as item(value, ordinality)
+     order by item.ordinality
+    returning *;
+end;
+$$;
+
+revoke all on function public.append_messages(uuid, jsonb) from public;
+grant execute on function public.append_messages(uuid, jsonb) to authenticated;
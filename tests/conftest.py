@@ -0,0 +1,25 @@
+import pytest
+
+from app.repository import thread as thread_repository
+from app.services import gemini_cache, generations, llm_admission, llm_breaker, llm_warmup, ollama_context
+
+
+@pytest.fixture(autouse=True)
+def _reset_llm_upstream_state():
+    # Breakers, admission queues and summary caches are process-wide; keep
+    # tests independent.
+    llm_breaker.reset_breakers()
+    llm_admission.reset_controllers()
+    thread_repository.branch_summary_cache.clear()
+    ollama_context.context_cache.clear()
+    llm_warmup.reset()
+    gemini_cache.registry.clear()
+    generations.reset()
+    yield
+    llm_breaker.reset_breakers()
+    llm_admission.reset_controllers()
+    thread_repository.branch_summary_cache.clear()
+    ollama_context.context_cache.clear()
+    llm_warmup.reset()
+    gemini_cache.registry.clear()
+    generations.reset()
@@ -0,0 +1,139 @@
+"""
+In-process stand-in for the slice of the google-genai client this backend uses.
+
+``client.aio.models.generate_content`` / ``generate_content_stream`` answer
+with scripted replies, and ``client.aio.caches`` keeps created
+``CachedContent`` entries with their TTL. Requests that name a cache get its
+contents prepended, like the real API: an unknown or expired cache fails
+with a 404 that names the CachedContent, and a system instruction next to
+``cached_content`` is rejected with a 400. ``usage_metadata`` reports prompt
+tokens (estimated with llm_context) and how many of them came from the cache.
+
+Every request is recorded in ``calls``.
+
+Usage::
+
+    fake = FakeGemini(replies=["첫 답변", "둘째 답변"])
+    with fake.installed():
+        ...  # llm_client builds its Gemini client from the fake
+"""
+
+from __future__ import annotations
+
+import contextlib
+import itertools
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+from unittest.mock import AsyncMock, patch
+
+from app.core.config import settings
+from app.services import llm_client, llm_context
+from app.services.gemini_cache import content_text
+
+
+class FakeGeminiError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"{status_code} {message}")
+        self.status_code = status_code
+
+
+@dataclass
+class FakeCache:
+    name: str
+    model: str
+    contents: List[Any]
+    system_instruction: Optional[str]
+    expires_at: float
+
+
+def _tokens(contents: List[Any], system_instruction: Optional[str] = None) -> int:
+    total = llm_context.estimate_tokens(system_instruction)
+    return total + sum(llm_context.estimate_tokens(content_text(content)) for content in contents)
+
+
+class FakeGemini:
+    def __init__(self, replies: Optional[List[str]] = None):
+        self.replies = list(replies or [])
+        self.caches: Dict[str, FakeCache] = {}
+        self.calls: List[Dict[str, Any]] = []
+        self._ids = itertools.count(1)
+        self.client = SimpleNamespace(
+            aio=SimpleNamespace(
+                models=SimpleNamespace(
+                    generate_content=self._generate_content,
+                    generate_content_stream=self._generate_content_stream,
+                ),
+                caches=SimpleNamespace(create=self._create_cache, delete=self._delete_cache),
+                aclose=AsyncMock(),
+            )
+        )
+
+    @contextlib.contextmanager
+    def installed(self) -> Iterator["FakeGemini"]:
+        with (
+            patch.object(settings, "GEMINI_API_KEY", settings.GEMINI_API_KEY or "test-key"),
+            patch.object(llm_client.genai, "Client", return_value=self.client),
+        ):
+            yield self
+
+    def expire(self, name: str) -> None:
+        self.caches[name].expires_at = 0.0
+
+    def _usage(self, model: str, contents: List[Any], config: Any) -> SimpleNamespace:
+        cached_tokens = 0
+        name = getattr(config, "cached_content", None)
+        if name:
+            cache = self.caches.get(name)
+            if cache is None or cache.expires_at <= time.monotonic():
+                raise FakeGeminiError(404, f"CachedContent not found (or permission denied): {name}")
+            if cache.model != model:
+                raise FakeGeminiError(400, "Model does not match the CachedContent model")
+            if getattr(config, "system_instruction", None):
+                raise FakeGeminiError(400, "system_instruction must be set on the CachedContent")
+            cached_tokens = _tokens(cache.contents, cache.system_instruction)
+        prompt = cached_tokens + _tokens(contents, getattr(config, "system_instruction", None))
+        return SimpleNamespace(prompt_token_count=prompt, cached_content_token_count=cached_tokens or None)
+
+    def _reply(self) -> str:
+        return self.replies.pop(0) if self.replies else "응답"
+
+    async def _generate_content(self, *, model: str, contents: List[Any], config: Any = None) -> SimpleNamespace:
+        self.calls.append({"method": "generate_content", "model": model, "contents": contents, "config": config})
+        usage = self._usage(model, contents, config)
+        return SimpleNamespace(text=self._reply(), usage_metadata=usage)
+
+    async def _generate_content_stream(self, *, model: str, contents: List[Any], config: Any = None) -> Any:
+        self.calls.append({"method": "generate_content_stream", "model": model, "contents": contents, "config": config})
+        usage = self._usage(model, contents, config)
+        words = self._reply().split(" ")
+
+        async def chunks():
+            for i, word in enumerate(words):
+                last = i == len(words) - 1
+                yield SimpleNamespace(
+                    text=word if last else word + " ",
+                    usage_metadata=usage if last else None,
+                )
+
+        return chunks()
+
+    async def _create_cache(self, *, model: str, config: Any) -> SimpleNamespace:
+        self.calls.append({"method": "caches.create", "model": model, "config": config})
+        ttl = float(str(config.ttl).rstrip("s"))
+        name = f"cachedContents/fake-{next(self._ids)}"
+        self.caches[name] = FakeCache(
+            name=name,
+            model=model,
+            contents=list(config.contents),
+            system_instruction=config.system_instruction,
+            expires_at=time.monotonic() + ttl,
+        )
+        usage = SimpleNamespace(total_token_count=_tokens(config.contents, config.system_instruction))
+        return SimpleNamespace(name=name, model=model, usage_metadata=usage)
+
+    async def _delete_cache(self, *, name: str) -> None:
+        self.calls.append({"method": "caches.delete", "name": name})
+        if self.caches.pop(name, None) is None:
+            raise FakeGeminiError(404, f"CachedContent not found: {name}")
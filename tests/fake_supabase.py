@@ -0,0 +1,780 @@
+"""
+In-process stand-in for the Supabase REST (PostgREST) and Auth APIs.
+
+It implements the slice of the PostgREST grammar this backend emits, so
+routes can run end to end against real query strings without network access:
+
+- filters: eq, neq, lt, lte, gt, gte, like, ilike, in.(...), is.null/true/false,
+  any of them negated with ``not.``, and ``or=(...)`` / ``and=(...)`` groups
+- ``select`` projection with embedded resources, e.g. ``messages(count)`` and
+  aliased ``last:messages(content,created_at)``, plus embedded filters/modifiers
+  (``last.index=lt.10``, ``last.order=created_at.desc``, ``last.limit=1``)
+- ``order`` (multiple keys, nullsfirst/nullslast), ``limit``, ``offset``
+- inserts, upserts (``on_conflict`` + ``Prefer: resolution=...``), PATCH and
+  DELETE, honoring ``Prefer: return=representation``
+- ``/rest/v1/rpc/<function>``, with ``append_messages`` and
+  ``merge_thread_metadata`` from supabase/migrations
+- ``/auth/v1/user``, ``/auth/v1/token``, ``/auth/v1/logout``, the admin
+  users endpoint and ``/auth/v1/.well-known/jwks.json``; sessions carry ES256
+  JWTs signed with a per-instance key (see ``issue_jwt``)
+
+Row-level security is not modelled: any known access token may read or
+write any row. Every request is recorded in ``calls`` and may be delayed by a
+configurable latency, which makes the fake usable for round-trip and latency
+benchmarks (see benchmarks/route_latency.py).
+
+Usage::
+
+    fake = FakeSupabase(latency=0.005)
+    user = fake.add_user("owner@example.com")
+    async with fake.installed():
+        ...  # app code talks to the fake through app.db.supabase clients
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from unittest.mock import patch
+from urllib.parse import parse_qsl
+
+import httpx
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from app.core.config import settings
+from app.db import supabase as sb
+from app.db import supabase_auth
+
+
+FAKE_SUPABASE_URL = "https://fake.supabase.local"
+FAKE_ANON_KEY = "fake-anon-key"
+FAKE_SERVICE_ROLE_KEY = "fake-service-role-key"
+
+# Foreign keys used to resolve embedded resources: parent table -> child
+# table -> (child column, parent column).
+RELATIONSHIPS: Dict[str, Dict[str, Tuple[str, str]]] = {
+    "threads": {
+        "messages": ("thread_id", "id"),
+        "thread_members": ("thread_id", "id"),
+        "comments": ("thread_id", "id"),
+        "bookmarks": ("thread_id", "id"),
+    },
+}
+
+# Unique keys enforced on insert (409) and used as the default upsert target.
+UNIQUE_KEYS: Dict[str, List[Tuple[str, ...]]] = {
+    "threads": [("id",)],
+    "comments": [("id",)],
+    "thread_members": [("thread_id", "user_id")],
+    "bookmarks": [("user_id", "thread_id", "message_index")],
+}
+
+# Columns PostgREST would fill from column defaults.
+DEFAULT_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "threads": ("id", "created_at"),
+    "messages": ("id", "created_at"),
+    "comments": ("id", "created_at"),
+    "bookmarks": ("created_at",),
+    "thread_members": ("created_at",),
+}
+
+Latency = Union[float, Callable[[httpx.Request], float]]
+RpcHandler = Callable[["FakeSupabase", Dict[str, Any], Dict[str, Any]], Any]
+
+
+class PostgrestError(Exception):
+    def __init__(self, status: int, code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+@dataclass
+class Call:
+    method: str
+    path: str
+    query: str
+
+    @property
+    def table(self) -> Optional[str]:
+        if self.path.startswith("/rest/v1/"):
+            return self.path[len("/rest/v1/"):]
+        return None
+
+
+@dataclass
+class _Embed:
+    name: str
+    table: str
+    columns: List[Any]
+    count_only: bool = False
+    filters: List[Tuple[str, str]] = field(default_factory=list)
+    order: Optional[str] = None
+    limit: Optional[int] = None
+    offset: int = 0
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _split_top_level(text: str, sep: str = ",") -> List[str]:
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == sep and depth == 0:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    if current:
+        parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _coerce(raw: str, like: Any) -> Any:
+    """Convert a filter literal to the type of the stored value."""
+    if isinstance(like, bool):
+        return raw.lower() == "true"
+    if isinstance(like, int):
+        try:
+            return int(raw)
+        except ValueError:
+            return raw
+    if isinstance(like, float):
+        try:
+            return float(raw)
+        except ValueError:
+            return raw
+    return raw
+
+
+def _like(pattern: str, value: Any, flags: int = 0) -> bool:
+    regex = "^" + ".*".join(re.escape(part) for part in pattern.replace("%", "*").split("*")) + "$"
+    return value is not None and re.match(regex, str(value), flags) is not None
+
+
+def _compare(op: str, value: Any, operand: str) -> bool:
+    if op == "is":
+        lowered = operand.lower()
+        if lowered == "null":
+            return value is None
+        if lowered in ("true", "false"):
+            return value is (lowered == "true")
+        raise PostgrestError(400, "PGRST100", f"invalid is operand: {operand}")
+    if op == "in":
+        if not (operand.startswith("(") and operand.endswith(")")):
+            raise PostgrestError(400, "PGRST100", f"invalid in list: {operand}")
+        items = [item.strip().strip('"') for item in _split_top_level(operand[1:-1])]
+        return value is not None and value in [_coerce(item, value) for item in items]
+    if op == "like":
+        return _like(operand, value)
+    if op == "ilike":
+        return _like(operand, value, re.IGNORECASE)
+    if value is None:
+        return False
+    target = _coerce(operand, value)
+    try:
+        if op == "eq":
+            return value == target
+        if op == "neq":
+            return value != target
+        if op == "lt":
+            return value < target
+        if op == "lte":
+            return value <= target
+        if op == "gt":
+            return value > target
+        if op == "gte":
+            return value >= target
+    except TypeError:
+        return False
+    raise PostgrestError(400, "PGRST100", f"unsupported operator: {op}")
+
+
+def _match_condition(row: Dict[str, Any], column: str, expression: str) -> bool:
+    """Evaluate ``column=<[not.]op.operand>`` against a row."""
+    negate = False
+    if expression.startswith("not."):
+        negate, expression = True, expression[4:]
+    op, _, operand = expression.partition(".")
+    result = _compare(op, row.get(column), operand)
+    return not result if negate else result
+
+
+def _match_group(row: Dict[str, Any], kind: str, body: str) -> bool:
+    """Evaluate an ``or=(...)`` / ``and=(...)`` group of ``col.op.value`` terms."""
+    if not (body.startswith("(") and body.endswith(")")):
+        raise PostgrestError(400, "PGRST100", f"invalid logic tree: {body}")
+    results = []
+    for term in _split_top_level(body[1:-1]):
+        negate = term.startswith("not.")
+        bare = term[4:] if negate else term
+        nested = re.match(r"^(or|and)(\(.*\))$", bare)
+        if nested:
+            result = _match_group(row, nested.group(1), nested.group(2))
+        else:
+            column, _, expression = bare.partition(".")
+            result = _match_condition(row, column, expression)
+        results.append(not result if negate else result)
+    return any(results) if kind == "or" else all(results)
+
+
+def _matches(row: Dict[str, Any], filters: List[Tuple[str, str]]) -> bool:
+    for column, expression in filters:
+        if column in ("or", "and"):
+            if not _match_group(row, column, expression):
+                return False
+        elif not _match_condition(row, column, expression):
+            return False
+    return True
+
+
+def _sort(rows: List[Dict[str, Any]], order: Optional[str]) -> List[Dict[str, Any]]:
+    if not order:
+        return rows
+    for term in reversed(_split_top_level(order)):
+        parts = term.split(".")
+        column = parts[0]
+        descending = "desc" in parts[1:]
+        nulls_first = "nullsfirst" in parts[1:] or ("nullslast" not in parts[1:] and descending)
+        present = [row for row in rows if row.get(column) is not None]
+        missing = [row for row in rows if row.get(column) is None]
+        present.sort(key=lambda row: row[column], reverse=descending)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+
+def _page(rows: List[Dict[str, Any]], limit: Optional[int], offset: int) -> List[Dict[str, Any]]:
+    rows = rows[offset:]
+    return rows if limit is None else rows[:limit]
+
+
+def _parse_select(text: str) -> List[Any]:
+    """Parse ``select`` into column names and _Embed entries."""
+    columns: List[Any] = []
+    for item in _split_top_level(text or "*"):
+        embedded = re.match(r"^(?:(\w+):)?(\w+)\((.*)\)$", item)
+        if embedded:
+            alias, table, inner = embedded.groups()
+            inner_columns = _parse_select(inner)
+            columns.append(
+                _Embed(
+                    name=alias or table,
+                    table=table,
+                    columns=inner_columns,
+                    count_only=inner_columns == ["count"],
+                )
+            )
+        else:
+            columns.append(item.split("::", 1)[0])
+    return columns
+
+
+class FakeSupabase:
+    def __init__(self, latency: Latency = 0.0):
+        self.latency = latency
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.tokens: Dict[str, str] = {}
+        self.passwords: Dict[str, str] = {}
+        self.refresh_tokens: Dict[str, str] = {}
+        self.rpc: Dict[str, RpcHandler] = {
+            "append_messages": _append_messages,
+            "merge_thread_metadata": _merge_thread_metadata,
+        }
+        self.calls: List[Call] = []
+        self._lock = threading.RLock()
+        self.signing_kid = f"fake-{uuid.uuid4().hex[:8]}"
+        self._signing_key: Optional[ec.EllipticCurvePrivateKey] = None
+
+    # ----- seeding and inspection -----
+
+    def add_user(
+        self,
+        email: str,
+        password: str = "password",
+        user_id: Optional[str] = None,
+        access_token: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        user_id = user_id or str(uuid.uuid4())
+        user = {
+            "id": user_id,
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": email,
+            "user_metadata": {},
+            "created_at": _now(),
+        }
+        self.users[user_id] = user
+        self.passwords[email.lower()] = password
+        token = access_token or f"token-{user_id}"
+        self.tokens[token] = user_id
+        return {**user, "access_token": token}
+
+    def issue_jwt(
+        self,
+        user_id: str,
+        expires_in: int = 3600,
+        kid: Optional[str] = None,
+        **claims: Any,
+    ) -> str:
+        """Mint an ES256 access token for ``user_id``, shaped like Supabase Auth's."""
+        user = self.users[user_id]
+        now = int(time.time())
+        payload = {
+            "sub": user_id,
+            "aud": "authenticated",
+            "role": user["role"],
+            "email": user["email"],
+            "user_metadata": user["user_metadata"],
+            "iss": f"{FAKE_SUPABASE_URL}/auth/v1",
+            "iat": now,
+            "exp": now + expires_in,
+            "session_id": uuid.uuid4().hex,
+            **claims,
+        }
+        token = jwt.encode(
+            payload, self.signing_key, algorithm="ES256", headers={"kid": kid or self.signing_kid}
+        )
+        self.tokens[token] = user_id
+        return token
+
+    @property
+    def signing_key(self) -> ec.EllipticCurvePrivateKey:
+        if self._signing_key is None:
+            self._signing_key = ec.generate_private_key(ec.SECP256R1())
+        return self._signing_key
+
+    def jwks(self) -> Dict[str, Any]:
+        key = jwt.algorithms.ECAlgorithm.to_jwk(self.signing_key.public_key(), as_dict=True)
+        return {"keys": [{**key, "kid": self.signing_kid, "alg": "ES256", "use": "sig"}]}
+
+    def insert(self, table: str, *rows: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._store(table, dict(row)) for row in rows]
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        return self.tables.setdefault(table, [])
+
+    def reset_calls(self) -> None:
+        self.calls.clear()
+
+    def call_count(self, method: Optional[str] = None, table: Optional[str] = None) -> int:
+        return sum(
+            1
+            for call in self.calls
+            if (method is None or call.method == method)
+            and (table is None or call.table == table)
+        )
+
+    # ----- transport wiring -----
+
+    def _delay(self, request: httpx.Request) -> float:
+        latency = self.latency(request) if callable(self.latency) else self.latency
+        return max(0.0, float(latency or 0.0))
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(Call(request.method, request.url.path, request.url.query.decode()))
+        with self._lock:
+            try:
+                return self._route(request)
+            except PostgrestError as exc:
+                return httpx.Response(
+                    exc.status,
+                    json={"code": exc.code, "message": exc.message, "details": None, "hint": None},
+                )
+
+    async def _handle_async(self, request: httpx.Request) -> httpx.Response:
+        delay = self._delay(request)
+        if delay:
+            await asyncio.sleep(delay)
+        return self.handle(request)
+
+    def _handle_sync(self, request: httpx.Request) -> httpx.Response:
+        delay = self._delay(request)
+        if delay:
+            time.sleep(delay)
+        return self.handle(request)
+
+    def async_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self._handle_async))
+
+    def sync_client(self) -> httpx.Client:
+        return httpx.Client(transport=httpx.MockTransport(self._handle_sync))
+
+    @contextlib.asynccontextmanager
+    async def installed(self):
+        """
+        Point settings and the pooled app.db.supabase clients at this fake for
+        the duration of the block. Must be entered on the loop that will serve
+        requests. Token and JWKS caches are cleared on the way in and out, so
+        verdicts about another fake's tokens never leak into this one.
+        """
+        await sb.aclose_http_clients()
+        supabase_auth.jwks_cache.clear()
+        supabase_auth.token_cache.clear()
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(patch.object(settings, "SUPABASE_URL", FAKE_SUPABASE_URL))
+            stack.enter_context(patch.object(settings, "SUPABASE_ANON_KEY", FAKE_ANON_KEY))
+            stack.enter_context(
+                patch.object(settings, "SUPABASE_SERVICE_ROLE_KEY", FAKE_SERVICE_ROLE_KEY)
+            )
+            sb._async_client = self.async_client()
+            sb._async_client_loop = asyncio.get_running_loop()
+            sb._sync_client = self.sync_client()
+            try:
+                yield self
+            finally:
+                await sb.aclose_http_clients()
+                supabase_auth.jwks_cache.clear()
+                supabase_auth.token_cache.clear()
+
+    # ----- routing -----
+
+    def _route(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if request.headers.get("apikey") not in (FAKE_ANON_KEY, FAKE_SERVICE_ROLE_KEY):
+            raise PostgrestError(401, "401", "Invalid API key")
+        if path.startswith("/auth/v1/"):
+            return self._route_auth(request, path[len("/auth/v1/"):])
+        if path.startswith("/rest/v1/rpc/"):
+            return self._route_rpc(request, path[len("/rest/v1/rpc/"):])
+        if path.startswith("/rest/v1/"):
+            self._require_user(request)
+            return self._route_rest(request, path[len("/rest/v1/"):])
+        raise PostgrestError(404, "404", f"unknown path {path}")
+
+    def _bearer(self, request: httpx.Request) -> str:
+        header = request.headers.get("authorization") or ""
+        return header[7:].strip() if header.lower().startswith("bearer ") else ""
+
+    def _require_user(self, request: httpx.Request) -> Dict[str, Any]:
+        token = self._bearer(request)
+        if token == FAKE_SERVICE_ROLE_KEY:
+            return {"id": None, "role": "service_role"}
+        user_id = self.tokens.get(token)
+        if not user_id:
+            raise PostgrestError(401, "PGRST301", "JWT expired or invalid")
+        return self.users[user_id]
+
+    # ----- PostgREST -----
+
+    def _parse_query(self, request: httpx.Request):
+        filters: List[Tuple[str, str]] = []
+        embed_params: List[Tuple[str, str, str]] = []
+        select, order, limit, offset, on_conflict = None, None, None, 0, None
+        for key, value in parse_qsl(request.url.query.decode(), keep_blank_values=True):
+            if key == "select":
+                select = value
+            elif key == "order":
+                order = value
+            elif key == "limit":
+                limit = int(value)
+            elif key == "offset":
+                offset = int(value)
+            elif key == "on_conflict":
+                on_conflict = value
+            elif "." in key and key not in ("or", "and"):
+                prefix, _, rest = key.partition(".")
+                embed_params.append((prefix, rest, value))
+            else:
+                filters.append((key, value))
+        columns = _parse_select(select) if select else ["*"]
+        embeds = {entry.name: entry for entry in columns if isinstance(entry, _Embed)}
+        for name, rest, value in embed_params:
+            embed = embeds.get(name)
+            if embed is None:
+                raise PostgrestError(400, "PGRST108", f"'{name}' is not an embedded resource")
+            if rest == "order":
+                embed.order = value
+            elif rest == "limit":
+                embed.limit = int(value)
+            elif rest == "offset":
+                embed.offset = int(value)
+            else:
+                embed.filters.append((rest, value))
+        return columns, filters, order, limit, offset, on_conflict
+
+    def _project(self, table: str, row: Dict[str, Any], columns: List[Any]) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for column in columns:
+            if isinstance(column, _Embed):
+                out[column.name] = self._embed(table, row, column)
+            elif column == "*":
+                out.update(row)
+            else:
+                out[column] = row.get(column)
+        return out
+
+    def _embed(self, parent_table: str, row: Dict[str, Any], embed: _Embed) -> List[Dict[str, Any]]:
+        relation = RELATIONSHIPS.get(parent_table, {}).get(embed.table)
+        if relation is None:
+            raise PostgrestError(400, "PGRST200", f"no relationship {parent_table} -> {embed.table}")
+        child_column, parent_column = relation
+        children = [
+            child
+            for child in self.rows(embed.table)
+            if child.get(child_column) == row.get(parent_column) and _matches(child, embed.filters)
+        ]
+        if embed.count_only:
+            return [{"count": len(children)}]
+        children = _page(_sort(children, embed.order), embed.limit, embed.offset)
+        return [self._project(embed.table, child, embed.columns) for child in children]
+
+    def _returning(self, request: httpx.Request) -> bool:
+        return "return=representation" in (request.headers.get("prefer") or "")
+
+    def _route_rest(self, request: httpx.Request, table: str) -> httpx.Response:
+        columns, filters, order, limit, offset, on_conflict = self._parse_query(request)
+        rows = self.rows(table)
+
+        if request.method == "GET":
+            selected = _page(_sort([row for row in rows if _matches(row, filters)], order), limit, offset)
+            return httpx.Response(200, json=[self._project(table, row, columns) for row in selected])
+
+        if request.method == "POST":
+            payload = json.loads(request.content or b"[]")
+            items = payload if isinstance(payload, list) else [payload]
+            prefer = request.headers.get("prefer") or ""
+            resolution = None
+            if "resolution=merge-duplicates" in prefer:
+                resolution = "merge"
+            elif "resolution=ignore-duplicates" in prefer:
+                resolution = "ignore"
+            target = tuple(on_conflict.split(",")) if on_conflict else None
+            written = [self._write(table, dict(item), resolution, target) for item in items]
+            written = [row for row in written if row is not None]
+            if self._returning(request):
+                return httpx.Response(201, json=[self._project(table, row, columns) for row in written])
+            return httpx.Response(201)
+
+        if request.method == "PATCH":
+            values = json.loads(request.content or b"{}")
+            updated = [row for row in rows if _matches(row, filters)]
+            for row in updated:
+                row.update(values)
+            if self._returning(request):
+                return httpx.Response(200, json=[self._project(table, row, columns) for row in updated])
+            return httpx.Response(204)
+
+        if request.method == "DELETE":
+            if not filters:
+                raise PostgrestError(400, "21000", "DELETE requires a WHERE clause")
+            deleted = [row for row in rows if _matches(row, filters)]
+            self.tables[table] = [row for row in rows if not _matches(row, filters)]
+            if self._returning(request):
+                return httpx.Response(200, json=[self._project(table, row, columns) for row in deleted])
+            return httpx.Response(204)
+
+        raise PostgrestError(405, "405", f"method {request.method} not allowed")
+
+    def _conflict(self, table: str, row: Dict[str, Any], keys: Optional[Tuple[str, ...]]) -> Optional[Dict[str, Any]]:
+        candidates = [keys] if keys else UNIQUE_KEYS.get(table, [])
+        for key in candidates:
+            if any(row.get(column) is None for column in key):
+                continue
+            for existing in self.rows(table):
+                if all(existing.get(column) == row.get(column) for column in key):
+                    return existing
+        return None
+
+    def _write(
+        self,
+        table: str,
+        row: Dict[str, Any],
+        resolution: Optional[str],
+        target: Optional[Tuple[str, ...]],
+    ) -> Optional[Dict[str, Any]]:
+        if target is not None and target not in UNIQUE_KEYS.get(table, []):
+            raise PostgrestError(
+                400,
+                "42P10",
+                "there is no unique or exclusion constraint matching the ON CONFLICT specification",
+            )
+        existing = self._conflict(table, row, target)
+        if existing is not None:
+            if resolution == "merge":
+                existing.update(row)
+                return existing
+            if resolution == "ignore":
+                return None
+            raise PostgrestError(409, "23505", f"duplicate key value violates unique constraint on {table}")
+        return self._store(table, row)
+
+    def _store(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        defaults = DEFAULT_COLUMNS.get(table, ())
+        if "id" in defaults:
+            row.setdefault("id", str(uuid.uuid4()))
+        if "created_at" in defaults:
+            row.setdefault("created_at", _now())
+        self.rows(table).append(row)
+        return row
+
+    def _route_rpc(self, request: httpx.Request, function: str) -> httpx.Response:
+        user = self._require_user(request)
+        handler = self.rpc.get(function)
+        if handler is None or request.method != "POST":
+            raise PostgrestError(
+                404,
+                "PGRST202",
+                f"Could not find the function public.{function} in the schema cache",
+            )
+        params = json.loads(request.content or b"{}")
+        return httpx.Response(200, json=handler(self, params, user))
+
+    # ----- Auth -----
+
+    def _session(self, user_id: str) -> Dict[str, Any]:
+        access_token = self.issue_jwt(user_id)
+        refresh_token = f"refresh-{uuid.uuid4().hex}"
+        self.refresh_tokens[refresh_token] = user_id
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "expires_in": 3600,
+            "refresh_token": refresh_token,
+            "user": self.users[user_id],
+        }
+
+    def _route_auth(self, request: httpx.Request, endpoint: str) -> httpx.Response:
+        if endpoint == "user" and request.method == "GET":
+            user_id = self.tokens.get(self._bearer(request))
+            if not user_id:
+                return httpx.Response(401, json={"code": 401, "msg": "invalid JWT"})
+            return httpx.Response(200, json=self.users[user_id])
+
+        if endpoint == ".well-known/jwks.json" and request.method == "GET":
+            return httpx.Response(200, json=self.jwks())
+
+        if endpoint == "token" and request.method == "POST":
+            body = json.loads(request.content or b"{}")
+            grant = request.url.params.get("grant_type")
+            if grant == "password":
+                email = str(body.get("email") or "").lower()
+                user = next((u for u in self.users.values() if u["email"].lower() == email), None)
+                if user is None or self.passwords.get(email) != body.get("password"):
+                    return httpx.Response(400, json={"error": "invalid_grant"})
+                return httpx.Response(200, json=self._session(user["id"]))
+            if grant == "refresh_token":
+                user_id = self.refresh_tokens.pop(str(body.get("refresh_token") or ""), None)
+                if not user_id:
+                    return httpx.Response(400, json={"error": "invalid_grant"})
+                return httpx.Response(200, json=self._session(user_id))
+            return httpx.Response(400, json={"error": "unsupported_grant_type"})
+
+        if endpoint == "logout" and request.method == "POST":
+            self.tokens.pop(self._bearer(request), None)
+            return httpx.Response(204)
+
+        if endpoint == "admin/users" and request.method == "GET":
+            if self._bearer(request) != FAKE_SERVICE_ROLE_KEY:
+                return httpx.Response(401, json={"msg": "service role required"})
+            users = list(self.users.values())
+            email = request.url.params.get("email")
+            if email:
+                users = [user for user in users if user["email"].lower() == email.lower()]
+            id_filter = request.url.params.get("id")
+            if id_filter:
+                users = [user for user in users if _match_condition(user, "id", id_filter)]
+            return httpx.Response(200, json={"users": users, "aud": "authenticated"})
+
+        return httpx.Response(404, json={"msg": f"unknown auth endpoint {endpoint}"})
+
+
+def _append_messages(fake: FakeSupabase, params: Dict[str, Any], user: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Mirror of public.append_messages (supabase/migrations)."""
+    thread_id = params["p_thread_id"]
+    messages = params["p_messages"]
+    if not isinstance(messages, list):
+        raise PostgrestError(400, "22023", "p_messages must be a JSON array")
+    indexes = [
+        row["index"]
+        for row in fake.rows("messages")
+        if row.get("thread_id") == thread_id
+        and isinstance(row.get("index"), int)
+        and 0 <= row["index"] < 2_147_483_645
+    ]
+    next_index = max(indexes, default=-1) + 1
+    created_at = _now()
+    return [
+        dict(
+            fake._store(
+                "messages",
+                {
+                    "thread_id": thread_id,
+                    "role": message.get("role"),
+                    "content": message.get("content"),
+                    "index": next_index + offset,
+                    "created_at": created_at,
+                },
+            )
+        )
+        for offset, message in enumerate(messages)
+    ]
+
+
+
+def _merge_thread_metadata(fake: FakeSupabase, params: Dict[str, Any], user: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Mirror of public.merge_thread_metadata (supabase/migrations)."""
+    prefix, marker_index = "__BRANCH_META__:", 2_147_483_647
+    thread_id = params["p_thread_id"]
+    patch_values = params["p_patch"]
+    order_key = params.get("p_order_key")
+    if not isinstance(patch_values, dict):
+        raise PostgrestError(400, "22023", "p_patch must be a JSON object")
+    marker = next(
+        (
+            row
+            for row in fake.rows("messages")
+            if row.get("thread_id") == thread_id and row.get("index") == marker_index
+        ),
+        None,
+    )
+    metadata = None
+    content = (marker or {}).get("content")
+    if isinstance(content, str) and content.startswith(prefix):
+        try:
+            metadata = json.loads(content[len(prefix):])
+        except ValueError:
+            metadata = None
+    if not isinstance(metadata, dict):
+        if not params.get("p_create", True):
+            return None
+        metadata = {"version": 1, "parent_thread_id": None, "root_thread_id": thread_id, "context_preview": None}
+    if metadata.get("is_deleted") not in (None, False):
+        return None
+
+    accepted = {}
+    for key, value in patch_values.items():
+        stored = metadata.get(key)
+        if order_key and isinstance(stored, dict) and isinstance(stored.get(order_key), (int, float)):
+            incoming = value.get(order_key) if isinstance(value, dict) else None
+            if stored[order_key] > (-1 if incoming is None else incoming):
+                continue
+        accepted[key] = value
+    if not accepted:
+        return metadata
+    metadata = {**metadata, **accepted}
+    content = prefix + json.dumps(metadata, ensure_ascii=False)
+    if marker is not None:
+        marker.update({"role": "assistant", "content": content})
+    else:
+        fake._store(
+            "messages",
+            {"thread_id": thread_id, "role": "assistant", "content": content, "index": marker_index},
+        )
+    return metadata
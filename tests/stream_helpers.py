@@ -0,0 +1,28 @@
+"""
+Encoders and decoders for the streaming wire formats the tests exercise.
+
+- ``ndjson`` / ``ndjson_frames``: Ollama-style upstream bodies, one JSON
+  object per line (as one blob, or one chunk per frame).
+- ``parse_sse``: the chat stream route's Server-Sent Events, as
+  ``[(event, data), ...]``.
+"""
+
+from __future__ import annotations
+
+import json
+
+
+def ndjson_frames(*frames: dict) -> list[bytes]:
+    return [json.dumps(frame).encode() + b"\n" for frame in frames]
+
+
+def ndjson(*frames: dict) -> bytes:
+    return b"".join(ndjson_frames(*frames))
+
+
+def parse_sse(text: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
@@ -7,8 +7,8 @@ from app.repository import comment as repository
 from app.routes import comment as comment_routes
 
 
-class BranchCommentRepositoryTests(unittest.TestCase):
-    def test_inherited_member_can_access_non_workspace_branch_child(self):
+class BranchCommentRepositoryTests(unittest.IsolatedAsyncioTestCase):
+    async def test_inherited_member_can_access_non_workspace_branch_child(self):
         def select(table, query, access_token):
             if table == "threads":
                 return [
@@ -22,8 +22,8 @@ class BranchCommentRepositoryTests(unittest.TestCase):
                 return [{"thread_id": "child-1"}]
             return []
 
-        with patch.object(repository.sb, "rest_select", side_effect=select):
-            accessible = repository._accessible_thread_ids(
+        with patch.object(repository.sb, "rest_select_async", side_effect=select):
+            accessible = await repository._accessible_thread_ids(
                 "member-1",
                 ["child-1"],
                 "token",
@@ -48,7 +48,7 @@ class BranchCommentRepositoryTests(unittest.TestCase):
         self.assertEqual(decoded["position_x"], 120.5)
         self.assertEqual(decoded["position_y"], 44.0)
 
-    def test_list_branch_comments_ignores_regular_or_invalid_comment_rows(self):
+    async def test_list_branch_comments_ignores_regular_or_invalid_comment_rows(self):
         branch_content = repository._encode_branch_comment("브랜치 메모", 10, 20)
         rows = [
             {
@@ -80,8 +80,8 @@ class BranchCommentRepositoryTests(unittest.TestCase):
                 return rows
             return []
 
-        with patch.object(repository.sb, "rest_select", side_effect=select) as jwt_select:
-            result = repository.list_branch_comments(
+        with patch.object(repository.sb, "rest_select_async", side_effect=select) as jwt_select:
+            result = await repository.list_branch_comments(
                 "owner-1",
                 ["thread-1", "thread-1"],
                 "token",
@@ -99,7 +99,7 @@ class BranchCommentRepositoryTests(unittest.TestCase):
         )
         self.assertEqual(query.count("thread-1"), 1)
 
-    def test_create_branch_comment_uses_authenticated_rest_and_reserved_index(self):
+    async def test_create_branch_comment_uses_authenticated_rest_and_reserved_index(self):
         inserted = []
 
         def select(table, query, access_token):
@@ -111,28 +111,19 @@ class BranchCommentRepositoryTests(unittest.TestCase):
                         "is_workspace": False,
                     }
                 ]
-            if table == "thread_members":
-                return []
-            return [
-                {
-                    "id": "comment-1",
-                    "thread_id": "thread-1",
-                    "user_id": "owner-1",
-                    "content": repository._encode_branch_comment("저장", 30, 40),
-                    "created_at": None,
-                }
-            ]
+            return []
 
-        def insert(table, rows, access_token):
+        def insert(table, rows, access_token, **options):
             inserted.extend(rows)
-            return {}
+            self.assertTrue(options["returning"])
+            return [{**row, "created_at": None} for row in rows]
 
         with (
-            patch.object(repository.sb, "rest_select", side_effect=select),
-            patch.object(repository.sb, "rest_insert", side_effect=insert),
+            patch.object(repository.sb, "rest_select_async", side_effect=select),
+            patch.object(repository.sb, "rest_insert_async", side_effect=insert),
             patch.object(repository, "uuid4", return_value="comment-1"),
         ):
-            result = repository.create_branch_comment(
+            result = await repository.create_branch_comment(
                 "owner-1",
                 "thread-1",
                 "저장",
@@ -143,6 +134,7 @@ class BranchCommentRepositoryTests(unittest.TestCase):
             )
 
         self.assertEqual(result["id"], "comment-1")
+        self.assertEqual(result["content"], "저장")
         self.assertEqual(
             inserted[0]["message_index"],
             repository.BRANCH_COMMENT_MESSAGE_INDEX,
@@ -156,7 +148,7 @@ class BranchCommentRepositoryTests(unittest.TestCase):
         )
         self.assertEqual(inserted_comment["author_id"], "insun")
 
-    def test_comment_author_uses_email_id_without_domain(self):
+    async def test_comment_author_uses_email_id_without_domain(self):
         comments = [
             {"user_id": "owner-1", "author_id": "owner-1"},
             {"user_id": "member-1", "author_id": "member-1"},
@@ -165,7 +157,7 @@ class BranchCommentRepositoryTests(unittest.TestCase):
 
         with patch.object(
             comment_routes,
-            "get_users_by_ids",
+            "get_users_by_ids_async",
             return_value={
                 "member-1": {
                     "id": "member-1",
@@ -173,7 +165,7 @@ class BranchCommentRepositoryTests(unittest.TestCase):
                 }
             },
         ):
-            comment_routes._normalize_comment_authors(comments, user)
+            await comment_routes._normalize_comment_authors(comments, user)
 
         self.assertEqual(comments[0]["author_id"], "owner.name")
         self.assertEqual(comments[1]["author_id"], "team.member")
@@ -198,8 +190,8 @@ class BranchCommentRepositoryTests(unittest.TestCase):
             },
         )
 
-    def test_save_branch_position_updates_only_current_users_reserved_row(self):
-        updated = []
+    async def test_save_branch_position_upserts_only_current_users_reserved_row(self):
+        upserted = []
 
         def select(table, query, access_token):
             if table == "threads":
@@ -210,51 +202,86 @@ class BranchCommentRepositoryTests(unittest.TestCase):
                         "is_workspace": False,
                     }
                 ]
-            if table == "thread_members":
-                return []
-            if "select=id,thread_id,content,created_at" in query:
-                return [
-                    {
-                        "id": "position-1",
-                        "thread_id": "thread-1",
-                        "content": repository._encode_branch_position(10, 20),
-                        "created_at": None,
-                    }
-                ]
             return []
 
-        def update(table, query, values, access_token):
-            updated.append((query, values))
-            return [
-                {
-                    "id": "position-1",
-                    "thread_id": "thread-1",
-                    "content": values["content"],
-                    "created_at": None,
-                }
-            ]
+        def insert(table, rows, access_token, **options):
+            upserted.append((rows, options))
+            return [{**rows[0], "created_at": None}]
 
         with (
-            patch.object(repository.sb, "rest_select", side_effect=select),
-            patch.object(repository.sb, "rest_update", side_effect=update),
+            patch.object(repository.sb, "rest_select_async", side_effect=select),
+            patch.object(repository.sb, "rest_insert_async", side_effect=insert),
         ):
-            result = repository.save_branch_position(
+            result = await repository.save_branch_position(
                 "owner-1",
                 "thread-1",
                 140,
                 260,
                 "token",
             )
+            await repository.save_branch_position(
+                "owner-1",
+                "thread-1",
+                150,
+                270,
+                "token",
+            )
 
         self.assertEqual(result["position_x"], 140)
         self.assertEqual(result["position_y"], 260)
-        self.assertIn("user_id=eq.owner-1", updated[0][0])
-        self.assertIn(
-            f"message_index=eq.{repository.BRANCH_NODE_POSITION_MESSAGE_INDEX}",
-            updated[0][0],
+        (row,), options = upserted[0]
+        self.assertEqual(row["user_id"], "owner-1")
+        self.assertEqual(row["message_index"], repository.BRANCH_NODE_POSITION_MESSAGE_INDEX)
+        self.assertEqual(options["on_conflict"], "id")
+        # Saving the same node again targets the same row.
+        self.assertEqual(upserted[1][0][0]["id"], row["id"])
+        self.assertNotEqual(
+            repository._branch_position_id("member-1", "thread-1"),
+            row["id"],
+        )
+
+    async def test_list_branch_positions_prefers_latest_row_per_thread(self):
+        rows = [
+            {
+                "thread_id": "thread-1",
+                "content": repository._encode_branch_position(1, 2),
+                "created_at": "2026-01-01T00:00:00+00:00",
+            },
+            {
+                "thread_id": "thread-2",
+                "content": repository._encode_branch_position(5, 6),
+                "created_at": "2026-01-02T00:00:00+00:00",
+            },
+            {
+                "thread_id": "thread-1",
+                "content": repository._encode_branch_position(3, 4),
+                "created_at": "2026-01-03T00:00:00+00:00",
+            },
+        ]
+
+        def select(table, query, access_token):
+            if table == "threads":
+                return [
+                    {"id": "thread-1", "owner_id": "owner-1", "is_workspace": False},
+                    {"id": "thread-2", "owner_id": "owner-1", "is_workspace": False},
+                ]
+            if table == "comments":
+                return rows
+            return []
+
+        with patch.object(repository.sb, "rest_select_async", side_effect=select):
+            positions = await repository.list_branch_positions(
+                "owner-1",
+                ["thread-1", "thread-2"],
+                "token",
+            )
+
+        self.assertEqual(
+            [(p["thread_id"], p["position_x"]) for p in positions],
+            [("thread-2", 5.0), ("thread-1", 3.0)],
         )
 
-    def test_reset_branch_positions_is_scoped_to_user_and_requested_threads(self):
+    async def test_reset_branch_positions_is_scoped_to_user_and_requested_threads(self):
         def select(table, query, access_token):
             if table == "threads":
                 return [
@@ -272,10 +299,10 @@ class BranchCommentRepositoryTests(unittest.TestCase):
             return []
 
         with (
-            patch.object(repository.sb, "rest_select", side_effect=select),
-            patch.object(repository.sb, "rest_delete", return_value=2) as delete,
+            patch.object(repository.sb, "rest_select_async", side_effect=select),
+            patch.object(repository.sb, "rest_delete_async", return_value=2) as delete,
         ):
-            deleted = repository.delete_branch_positions(
+            deleted = await repository.delete_branch_positions(
                 "owner-1",
                 ["thread-1", "thread-2"],
                 "token",
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+from app.services import generations, llm_admission, llm_client
+from tests.fake_supabase import FakeSupabase
+from tests.stream_helpers import ndjson, parse_sse
+
+
+THREAD_ID = "55555555-5555-4555-8555-555555555555"
+REQUEST_ID = "req-0001-cancel"
+
+
+class ChatCancellationTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = FakeSupabase()
+        owner = self.fake.add_user("owner@example.com", user_id="cancel-owner")
+        other = self.fake.add_user("other@example.com", user_id="cancel-other")
+        self.headers = {"Authorization": f"Bearer {owner['access_token']}"}
+        self.other_headers = {"Authorization": f"Bearer {other['access_token']}"}
+        self.fake.insert("threads", {"id": THREAD_ID, "title": "대화", "owner_id": "cancel-owner", "is_workspace": False})
+        self.fake.insert("messages", {"thread_id": THREAD_ID, "index": 0, "role": "user", "content": "안녕"})
+        self.fake.insert("messages", {"thread_id": THREAD_ID, "index": 1, "role": "assistant", "content": "반가워요"})
+        self.install = self.fake.installed()
+        await self.install.__aenter__()
+        self.upstream_started = asyncio.Event()
+        self.upstream_closed = False
+
+        async def body(frames):
+            try:
+                for frame in frames:
+                    yield ndjson(frame)
+                self.upstream_started.set()
+                # Never finishes on its own: only a cancel ends it.
+                await asyncio.Event().wait()
+            finally:
+                self.upstream_closed = True
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            frames = [{"message": {"content": "첫 "}, "done": False}] if self.send_partial else []
+            return httpx.Response(200, content=body(frames), headers={"content-type": "application/x-ndjson"})
+
+        self.send_partial = True
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.patches = [
+            patch.object(settings, "LLM_PRIMARY_PATH", "/api/chat"),
+            patch.object(llm_client, "get_llm_http_client", AsyncMock(return_value=client)),
+        ]
+        for p in self.patches:
+            p.start()
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        for p in reversed(self.patches):
+            p.stop()
+        await self.install.__aexit__(None, None, None)
+        await llm_client.aclose_llm_clients()
+
+    def _stored(self) -> list[tuple[int, str, str]]:
+        return sorted((row["index"], row["role"], row["content"]) for row in self.fake.rows("messages"))
+
+    def _chat(self, path: str = "chat/stream") -> "asyncio.Task[httpx.Response]":
+        return asyncio.ensure_future(
+            self.client.post(
+                f"/threads/{THREAD_ID}/{path}",
+                json={"content": "다음 질문", "model": "gemma-test", "request_id": REQUEST_ID},
+                headers=self.headers,
+            )
+        )
+
+    async def _cancel(self, body=None, headers=None) -> httpx.Response:
+        await asyncio.wait_for(self.upstream_started.wait(), timeout=2)
+        return await self.client.post(
+            f"/threads/{THREAD_ID}/chat/{REQUEST_ID}/cancel", json=body, headers=headers or self.headers
+        )
+
+    def _primary_active(self) -> int:
+        return llm_admission.snapshot()["providers"]["primary"]["active"]
+
+    async def test_cancelled_stream_aborts_upstream_and_keeps_partial_text(self):
+        chat = self._chat()
+        # Wait until the first delta reached the route, then stop.
+        await asyncio.wait_for(self.upstream_started.wait(), timeout=2)
+        while not generations.get(REQUEST_ID).parts:
+            await asyncio.sleep(0.01)
+        cancel = await self._cancel({"keep_partial": True})
+        response = await asyncio.wait_for(chat, timeout=2)
+
+        self.assertEqual(cancel.json(), {"ok": True, "request_id": REQUEST_ID, "cancelled": True})
+        self.assertEqual(response.headers["X-Chat-Request-ID"], REQUEST_ID)
+        events = parse_sse(response.text)
+        self.assertEqual([name for name, _ in events], ["delta", "cancelled"])
+        cancelled = events[-1][1]
+        self.assertEqual((cancelled["status"], cancelled["assistant_index"]), ("cancelled", 3))
+        self.assertEqual(self._stored()[-1], (3, "assistant", "첫"))
+        self.assertTrue(self.upstream_closed)
+        self.assertEqual(self._primary_active(), 0)
+        self.assertIsNone(generations.get(REQUEST_ID))
+
+    async def test_cancelled_chat_returns_without_saving_an_answer(self):
+        self.send_partial = False
+        chat = self._chat("chat")
+        cancel = await self._cancel()
+        response = await asyncio.wait_for(chat, timeout=2)
+
+        self.assertEqual(cancel.status_code, 200)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["status"], body["assistant_index"], body["request_id"]), ("cancelled", None, REQUEST_ID))
+        self.assertEqual(self._stored()[-1], (2, "user", "다음 질문"))
+        self.assertTrue(self.upstream_closed)
+        self.assertEqual(self._primary_active(), 0)
+
+    async def test_cancelled_chat_keeps_the_partial_answer_it_streamed_internally(self):
+        chat = self._chat("chat")
+        await asyncio.wait_for(self.upstream_started.wait(), timeout=2)
+        while not generations.get(REQUEST_ID).parts:
+            await asyncio.sleep(0.01)
+        await self._cancel({"keep_partial": True})
+        response = await asyncio.wait_for(chat, timeout=2)
+
+        body = response.json()
+        self.assertEqual((body["status"], body["assistant_index"]), ("cancelled", 3))
+        self.assertEqual(self._stored()[-1], (3, "assistant", "첫"))
+        self.assertTrue(self.upstream_closed)
+
+    async def test_only_the_owner_of_a_running_generation_can_cancel_it(self):
+        chat = self._chat()
+        denied = await self._cancel(headers=self.other_headers)
+        unknown = await self.client.post(f"/threads/{THREAD_ID}/chat/req-unknown-1/cancel", headers=self.headers)
+        self.assertEqual(denied.status_code, 404)
+        self.assertEqual(unknown.json()["detail"]["code"], "GENERATION_NOT_FOUND")
+
+        await self._cancel()
+        await asyncio.wait_for(chat, timeout=2)
+
+
+class DisconnectWatchTests(unittest.IsolatedAsyncioTestCase):
+    async def test_client_disconnect_cancels_the_generation(self):
+        checks = iter([False, False, True])
+
+        async def is_disconnected():
+            return next(checks)
+
+        generation = generations.start("req-disconnect", "thread", "owner", lambda _g: asyncio.Event().wait())
+        with patch.object(settings, "CHAT_DISCONNECT_POLL_SECS", 0.01):
+            await generations.cancel_on_disconnect(generation, is_disconnected)
+
+        with self.assertRaises(asyncio.CancelledError):
+            await generation.task
+        self.assertEqual(generation.cancel_reason, generations.DISCONNECT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+
+from app.core.config import settings
+from app.db import supabase as sb
+from app.db.deps import get_current_user
+from app.main import app
+from app.services import llm_client
+
+
+BACKEND_LATENCY = 0.02
+CONSTRUCT_LATENCY = 0.2
+GENERATE_LATENCY = 0.3
+CONCURRENT_CHATS = 20
+
+
+class FakeMessageStore:
+    """Slow stand-in for the Supabase REST helpers used by the chat path."""
+
+    def __init__(self):
+        self.rows: dict[str, list[dict]] = {}
+
+    @staticmethod
+    def _thread_id(query: str) -> str:
+        for part in query.split("&"):
+            if part.startswith("thread_id=eq.") or part.startswith("id=eq."):
+                return part.split(".", 1)[1]
+        return ""
+
+    async def select(self, table, query, access_token):
+        await asyncio.sleep(BACKEND_LATENCY)
+        thread_id = self._thread_id(query)
+        if table == "threads":
+            return [{"id": thread_id}]
+        rows = self.rows.get(thread_id, [])
+        for part in query.split("&"):
+            if part.startswith("index=eq."):
+                wanted = int(part.split(".", 1)[1])
+                return [dict(row) for row in rows if row["index"] == wanted]
+        return [dict(row) for row in sorted(rows, key=lambda row: row["index"], reverse=True)][:1]
+
+    async def append(self, function, params, access_token):
+        await asyncio.sleep(BACKEND_LATENCY)
+        rows = self.rows.setdefault(params["p_thread_id"], [])
+        inserted = []
+        for message in params["p_messages"]:
+            row = {**message, "index": len(rows), "created_at": "2026-01-01T00:00:00+00:00"}
+            rows.append(row)
+            inserted.append(dict(row))
+        return inserted
+
+
+def _slow_gemini_client(*, api_key):
+    # Mirrors the real SDK: constructing the client does blocking TLS setup.
+    time.sleep(CONSTRUCT_LATENCY)
+
+    async def generate_content(*, model, contents, config):
+        await asyncio.sleep(GENERATE_LATENCY)
+        return SimpleNamespace(text=f"answer to {contents[-1].parts[0].text}")
+
+    async def aclose():
+        return None
+
+    return SimpleNamespace(
+        aio=SimpleNamespace(
+            models=SimpleNamespace(generate_content=generate_content),
+            aclose=aclose,
+        )
+    )
+
+
+class ConcurrentChatTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # Debug-mode task bookkeeping would dominate the timings measured here.
+        asyncio.get_running_loop().set_debug(False)
+        app.dependency_overrides[get_current_user] = lambda: {"id": "owner-1"}
+        self.original_key = settings.GEMINI_API_KEY
+        settings.GEMINI_API_KEY = "test-key"
+
+    async def asyncTearDown(self):
+        app.dependency_overrides.pop(get_current_user, None)
+        settings.GEMINI_API_KEY = self.original_key
+        await sb.aclose_http_clients()
+        await llm_client.aclose_llm_clients()
+
+    async def test_slow_chats_do_not_block_other_endpoints(self):
+        store = FakeMessageStore()
+        transport = httpx.ASGITransport(app=app)
+
+        async def chat(client: httpx.AsyncClient, n: int) -> httpx.Response:
+            return await client.post(
+                f"/threads/thread-{n:04d}-concurrency/chat",
+                json={"content": f"question {n}", "model": "gemma-test"},
+                headers={"Authorization": f"Bearer token-{n}"},
+            )
+
+        async def probe(client: httpx.AsyncClient, done: asyncio.Event) -> list[float]:
+            latencies = []
+            while not done.is_set():
+                started = time.perf_counter()
+                response = await client.get("/health/config")
+                latencies.append(time.perf_counter() - started)
+                self.assertEqual(response.status_code, 200)
+                await asyncio.sleep(0.01)
+            return latencies
+
+        with (
+            patch.object(sb, "rest_select_async", side_effect=store.select),
+            patch.object(sb, "rest_rpc_async", side_effect=store.append),
+            patch.object(llm_client, "_is_gemini_model", return_value=True),
+            patch.object(llm_client.genai, "Client", side_effect=_slow_gemini_client),
+        ):
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                await client.get("/health/config")
+                done = asyncio.Event()
+                prober = asyncio.create_task(probe(client, done))
+                started = time.perf_counter()
+                responses = await asyncio.gather(*(chat(client, n) for n in range(CONCURRENT_CHATS)))
+                elapsed = time.perf_counter() - started
+                done.set()
+                latencies = await prober
+
+        self.assertEqual([r.status_code for r in responses], [200] * CONCURRENT_CHATS)
+        for n, response in enumerate(responses):
+            self.assertEqual(response.json()["assistant_content"], f"answer to question {n}")
+
+        # Serialized, the chats would take CONCURRENT_CHATS * (construct + generate).
+        self.assertLess(elapsed, (CONSTRUCT_LATENCY + GENERATE_LATENCY) * CONCURRENT_CHATS / 2)
+        self.assertGreater(len(latencies), 3)
+        self.assertLess(max(latencies), CONSTRUCT_LATENCY)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import json
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+from app.services import llm_client, llm_echo
+from tests.fake_supabase import FakeSupabase
+from tests.stream_helpers import ndjson, parse_sse
+
+
+THREAD_ID = "11111111-1111-4111-8111-111111111111"
+
+
+class StreamingChatRouteTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = FakeSupabase()
+        owner = self.fake.add_user("owner@example.com", user_id="owner-1")
+        self.headers = {"Authorization": f"Bearer {owner['access_token']}"}
+        self.fake.insert("threads", {"id": THREAD_ID, "title": "대화", "owner_id": "owner-1", "is_workspace": False})
+        self.fake.insert("messages", {"thread_id": THREAD_ID, "index": 0, "role": "user", "content": "안녕"})
+        self.fake.insert("messages", {"thread_id": THREAD_ID, "index": 1, "role": "assistant", "content": "반가워요"})
+        self.install = self.fake.installed()
+        await self.install.__aenter__()
+        self.requests: list[dict] = []
+
+    async def asyncTearDown(self):
+        await self.install.__aexit__(None, None, None)
+        await llm_client.aclose_llm_clients()
+
+    def _upstream(self, *responses: httpx.Response):
+        queue = list(responses)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append({"url": str(request.url), "json": json.loads(request.content)})
+            return queue.pop(0)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return patch.object(llm_client, "get_llm_http_client", AsyncMock(return_value=client))
+
+    async def _post(self, content: str = "다음 질문", model: str = "gemma-test") -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await client.post(
+                f"/threads/{THREAD_ID}/chat/stream",
+                json={"content": content, "model": model},
+                headers=self.headers,
+            )
+
+    def _stored(self) -> list[tuple[int, str, str]]:
+        return sorted((row["index"], row["role"], row["content"]) for row in self.fake.rows("messages"))
+
+    async def test_ollama_ndjson_deltas_are_relayed_and_persisted(self):
+        body = ndjson(
+            {"message": {"role": "assistant", "content": "첫 "}, "done": False},
+            {"message": {"role": "assistant", "content": "답변"}, "done": False},
+            {"message": {"role": "assistant", "content": ""}, "done": True, "done_reason": "stop"},
+            {"message": {"role": "assistant", "content": "무시"}, "done": False},
+        )
+        with (
+            patch.object(settings, "LLM_PRIMARY_PATH", "/api/chat"),
+            self._upstream(httpx.Response(200, content=body, headers={"content-type": "application/x-ndjson"})),
+        ):
+            response = await self._post()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        self.assertTrue(self.requests[0]["json"]["stream"])
+        events = parse_sse(response.text)
+        self.assertEqual([name for name, _ in events], ["delta", "delta", "done"])
+        self.assertEqual("".join(data["content"] for name, data in events if name == "delta"), "첫 답변")
+        self.assertEqual(events[-1][1]["assistant_index"], 3)
+        self.assertEqual(self._stored()[-2:], [(2, "user", "다음 질문"), (3, "assistant", "첫 답변")])
+
+    async def test_openai_compatible_sse_frames_are_parsed(self):
+        frames = [
+            {"choices": [{"delta": {"role": "assistant"}}]},
+            {"choices": [{"delta": {"content": "Hel"}}]},
+            {"choices": [{"delta": {"content": "lo"}}]},
+        ]
+        body = "".join(f"data: {json.dumps(frame)}\n\n" for frame in frames) + "data: [DONE]\n\n"
+        with (
+            patch.object(settings, "LLM_PRIMARY_PATH", "/v1/chat/completions"),
+            self._upstream(httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})),
+        ):
+            chunks = [chunk async for chunk in llm_client.generate_stream("gpt-test", [{"role": "user", "content": "hi"}])]
+
+        self.assertEqual(chunks, ["Hel", "lo"])
+
+    async def test_gemini_uses_generate_content_stream(self):
+        async def chunks():
+            for text in ("제미나이 ", "", "응답"):
+                yield SimpleNamespace(text=text)
+
+        stream_call = AsyncMock(return_value=chunks())
+        client = SimpleNamespace(
+            aio=SimpleNamespace(models=SimpleNamespace(generate_content_stream=stream_call), aclose=AsyncMock())
+        )
+        with (
+            patch.object(settings, "GEMINI_API_KEY", "test-key"),
+            patch.object(llm_client.genai, "Client", return_value=client),
+        ):
+            response = await self._post(model="gemini-3.6-flash")
+
+        events = parse_sse(response.text)
+        self.assertEqual([name for name, _ in events], ["delta", "delta", "done"])
+        self.assertEqual(events[-1][1]["assistant_content"], "제미나이 응답")
+        self.assertEqual(stream_call.await_args.kwargs["model"], "gemini-3.6-flash")
+
+    async def test_failure_before_first_token_is_a_502(self):
+        with (
+            patch.object(settings, "LLM_MAX_RETRIES", 0),
+            patch.object(settings, "LLM_FALLBACK_BASE_URL", None),
+            self._upstream(httpx.Response(503, text="overloaded")),
+        ):
+            response = await self._post()
+
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(response.json()["detail"]["provider"], "primary")
+        self.assertEqual(self._stored()[-1], (2, "user", "다음 질문"))
+
+    async def test_failure_mid_stream_ends_with_error_event_and_saves_nothing(self):
+        body = ndjson(
+            {"message": {"content": "부분 "}, "done": False},
+            {"error": "model crashed"},
+        )
+        with (
+            patch.object(settings, "LLM_PRIMARY_PATH", "/api/chat"),
+            self._upstream(httpx.Response(200, content=body)),
+        ):
+            response = await self._post()
+
+        events = parse_sse(response.text)
+        self.assertEqual([name for name, _ in events], ["delta", "error"])
+        self.assertEqual(events[-1][1]["code"], "LLM_FAILED")
+        self.assertEqual(self._stored()[-1], (2, "user", "다음 질문"))
+
+    async def test_echoed_opening_aborts_and_retries_with_a_nudge(self):
+        echo = ndjson(
+            {"message": {"content": "다음 "}, "done": False},
+            {"message": {"content": "질문?"}, "done": False},
+            {"message": {"content": " 그건 좋은 질문이네요"}, "done": True},
+        )
+        answer = ndjson({"message": {"content": "새 답변"}, "done": False}, {"done": True})
+        with (
+            patch.object(settings, "LLM_PRIMARY_PATH", "/api/chat"),
+            self._upstream(httpx.Response(200, content=echo), httpx.Response(200, content=answer)),
+        ):
+            response = await self._post()
+
+        events = parse_sse(response.text)
+        self.assertEqual([name for name, _ in events], ["delta", "done"])
+        self.assertEqual(events[-1][1]["assistant_content"], "새 답변")
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(self.requests[1]["json"]["messages"][-1], {"role": "system", "content": llm_echo.NUDGE})
+
+    async def test_non_streaming_chat_catches_echo_on_the_first_tokens(self):
+        echo = ndjson({"message": {"content": "다음 질문"}, "done": False}, {"done": True})
+        answer = ndjson({"message": {"content": "답변입니다"}, "done": True})
+        with (
+            patch.object(settings, "LLM_PRIMARY_PATH", "/api/chat"),
+            self._upstream(httpx.Response(200, content=echo), httpx.Response(200, content=answer)),
+        ):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                response = await client.post(
+                    f"/threads/{THREAD_ID}/chat",
+                    json={"content": "다음 질문", "model": "gemma-test"},
+                    headers=self.headers,
+                )
+
+        self.assertEqual(response.json()["assistant_content"], "답변입니다")
+        self.assertTrue(all(request["json"]["stream"] for request in self.requests))
+        self.assertEqual(self._stored()[-1], (3, "assistant", "답변입니다"))
+
+
+    async def test_non_streaming_chat_retries_a_blank_answer(self):
+        blank = ndjson({"message": {"content": " \n"}, "done": False}, {"message": {"content": " "}, "done": True})
+        answer = ndjson({"message": {"content": "답변입니다"}, "done": True})
+        with (
+            patch.object(settings, "LLM_PRIMARY_PATH", "/api/chat"),
+            patch.object(llm_client, "_RETRY_BACKOFFS", [0.0]),
+            self._upstream(httpx.Response(200, content=blank), httpx.Response(200, content=answer)),
+        ):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                response = await client.post(
+                    f"/threads/{THREAD_ID}/chat",
+                    json={"content": "다음 질문", "model": "gemma-test"},
+                    headers=self.headers,
+                )
+
+        self.assertEqual(response.json()["assistant_content"], "답변입니다")
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(self._stored()[-1], (3, "assistant", "답변입니다"))
+
+class EchoGuardTests(unittest.TestCase):
+    def test_matching_prefix_is_held_until_the_answer_diverges(self):
+        guard = llm_echo.EchoGuard("What is Python?")
+
+        self.assertEqual(guard.feed("What "), "")
+        self.assertEqual(guard.feed("is a"), "What is a")
+        self.assertFalse(guard.echoed)
+        self.assertEqual(guard.feed(" language"), " language")
+
+    def test_long_questions_are_flagged_after_the_probe_prefix(self):
+        question = "파이썬으로 " + "아주 " * 40 + "긴 질문"
+        with patch.object(settings, "LLM_ECHO_PROBE_CHARS", 8):
+            guard = llm_echo.EchoGuard(question)
+            guard.feed(question[:6])
+            guard.feed(question[6:12])
+
+        self.assertTrue(guard.echoed)
+        self.assertEqual(guard.flush(), "")
+
+    def test_answer_that_ends_mid_match_is_released(self):
+        guard = llm_echo.EchoGuard("안녕하세요 반가워요")
+
+        self.assertEqual(guard.feed("안녕"), "")
+        self.assertEqual(guard.flush(), "안녕")
+        self.assertFalse(guard.echoed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+from app.repository import thread as repository
+from app.services import background, llm_client
+from tests.fake_supabase import FakeSupabase
+
+
+THREAD_ID = "11111111-1111-4111-8111-111111111111"
+PARENT_ID = "22222222-2222-4222-8222-222222222222"
+
+
+class RollingSummaryTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = FakeSupabase()
+        owner = self.fake.add_user("owner@example.com", user_id="owner-1")
+        self.token = owner["access_token"]
+        self.headers = {"Authorization": f"Bearer {self.token}"}
+        self.fake.insert("threads", {"id": THREAD_ID, "title": "긴 대화", "owner_id": "owner-1", "is_workspace": False})
+        for index in range(60):
+            role = "user" if index % 2 == 0 else "assistant"
+            self.fake.insert("messages", {"thread_id": THREAD_ID, "index": index, "role": role, "content": f"메시지 {index}"})
+        # An existing branch marker must keep its lineage fields.
+        self.fake.insert(
+            "messages",
+            {
+                "thread_id": THREAD_ID,
+                "index": repository.BRANCH_META_INDEX,
+                "role": "assistant",
+                "content": repository._encode_branch_metadata(
+                    {"version": 1, "parent_thread_id": PARENT_ID, "root_thread_id": PARENT_ID, "context_preview": "요약"}
+                ),
+            },
+        )
+        self.summary_prompts: list[str] = []
+        self.chat_prompts: list[list[dict]] = []
+        self.install = self.fake.installed()
+        await self.install.__aenter__()
+        self.patches = [
+            patch.object(settings, "CHAT_SUMMARY_ENABLED", True),
+            patch.object(settings, "CHAT_SUMMARY_RECENT_MESSAGES", 20),
+            patch.object(settings, "CHAT_SUMMARY_MIN_NEW_MESSAGES", 10),
+            patch.object(settings, "CHAT_SUMMARY_BATCH_MESSAGES", 40),
+            patch.object(llm_client, "generate", side_effect=self._generate),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        await background.drain(cancel=True)
+        for p in reversed(self.patches):
+            p.stop()
+        await self.install.__aexit__(None, None, None)
+
+    async def _generate(self, model, messages, priority=None, profile=None, echo_of=None, session=None, thread_id=None, on_delta=None):
+        if "대화 기록을 관리" in messages[0]["content"]:
+            self.summary_prompts.append(messages[-1]["content"])
+            return f"요약 v{len(self.summary_prompts)}"
+        self.chat_prompts.append(messages)
+        return f"답변 {len(self.chat_prompts)}"
+
+    async def _chat(self, content: str) -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await client.post(
+                f"/threads/{THREAD_ID}/chat",
+                json={"content": content, "model": "gemma-test"},
+                headers=self.headers,
+            )
+
+    def _metadata(self) -> dict:
+        marker = next(row for row in self.fake.rows("messages") if row["index"] == repository.BRANCH_META_INDEX)
+        return repository._decode_branch_metadata(marker["content"])
+
+    def _summary_rows(self) -> list:
+        return [row for row in self.fake.rows("messages") if row["index"] == repository.CONVERSATION_SUMMARY_INDEX]
+
+    async def test_summary_is_built_in_background_and_replaces_old_turns(self):
+        first = await self._chat("첫 질문")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()["assistant_index"], 61)
+        await background.drain()
+
+        # The summary has its own row; the marker is left as it was.
+        metadata = self._metadata()
+        self.assertEqual((metadata["parent_thread_id"], metadata["context_preview"]), (PARENT_ID, "요약"))
+        summary = await repository.get_conversation_summary(THREAD_ID, self.token)
+        self.assertEqual(len(self._summary_rows()), 1)
+        # Messages 0..41 left the 20-message window; folded in batches of 40.
+        self.assertEqual((summary["through_index"], summary["text"]), (41, "요약 v2"))
+        self.assertIn("메시지 0", self.summary_prompts[0])
+        self.assertIn("기존 요약:\n요약 v1", self.summary_prompts[1])
+        self.assertIn("메시지 41", self.summary_prompts[1])
+
+        second = await self._chat("두 번째 질문")
+        await background.drain()
+
+        sent = self.chat_prompts[-1]
+        self.assertIn("요약 v2", sent[1]["content"])
+        self.assertEqual(sent[1]["role"], "system")
+        self.assertEqual(sent[2]["content"], "메시지 42")
+        self.assertEqual(sent[-1]["content"], "두 번째 질문")
+        self.assertEqual(second.json()["context"]["summary_through_index"], 41)
+        # Only two more messages left the window: no refresh yet.
+        self.assertEqual(len(self.summary_prompts), 2)
+
+    async def test_short_threads_skip_the_summary_lookup(self):
+        with patch.object(settings, "CHAT_SUMMARY_RECENT_MESSAGES", 100):
+            response = await self._chat("질문")
+        await background.drain()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()["context"]["summary_through_index"])
+        self.assertEqual(self.summary_prompts, [])
+        self.assertEqual(self._summary_rows(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.db import supabase as sb
+from app.db.supabase_users import get_user_id_by_email_async, get_users_by_ids_async
+from app.main import app
+from app.repository import thread as repository
+from app.services import llm_client
+from tests.fake_supabase import FakeSupabase
+
+
+THREAD_ID = "11111111-1111-4111-8111-111111111111"
+OTHER_THREAD_ID = "22222222-2222-4222-8222-222222222222"
+
+
+def _seed(fake: FakeSupabase):
+    owner = fake.add_user("owner@example.com", user_id="owner-1")
+    member = fake.add_user("member@example.com", user_id="member-1")
+    fake.insert(
+        "threads",
+        {"id": THREAD_ID, "title": "첫 대화", "owner_id": "owner-1", "is_workspace": False,
+         "created_at": "2026-01-01T00:00:00+00:00"},
+        {"id": OTHER_THREAD_ID, "title": "공유", "owner_id": "member-1", "is_workspace": True,
+         "created_at": "2026-01-02T00:00:00+00:00"},
+    )
+    fake.insert(
+        "messages",
+        {"thread_id": THREAD_ID, "index": 0, "role": "user", "content": "질문",
+         "created_at": "2026-01-01T00:00:01+00:00"},
+        {"thread_id": THREAD_ID, "index": 1, "role": "assistant", "content": "답변",
+         "created_at": "2026-01-01T00:00:02+00:00"},
+        {"thread_id": THREAD_ID, "index": repository.BRANCH_META_INDEX, "role": "assistant",
+         "content": repository._encode_branch_metadata({"version": 1}),
+         "created_at": "2026-01-01T00:00:03+00:00"},
+    )
+    fake.insert("thread_members", {"thread_id": OTHER_THREAD_ID, "user_id": "owner-1", "role": "member"})
+    return owner, member
+
+
+class FakePostgrestGrammarTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = FakeSupabase()
+        self.owner, _ = _seed(self.fake)
+        self.token = self.owner["access_token"]
+        self.install = self.fake.installed()
+        await self.install.__aenter__()
+
+    async def asyncTearDown(self):
+        await self.install.__aexit__(None, None, None)
+
+    async def test_filters_order_and_paging(self):
+        rows = await sb.rest_select_async(
+            "messages",
+            f"thread_id=eq.{THREAD_ID}&index=gte.0&index=lt.{repository.BRANCH_META_INDEX}"
+            "&index=not.is.null&select=index,content&order=index.desc&limit=1&offset=1",
+            self.token,
+        )
+        self.assertEqual(rows, [{"index": 0, "content": "질문"}])
+
+        rows = await sb.rest_select_async(
+            "threads",
+            f"or=(owner_id.eq.nobody,id.in.({OTHER_THREAD_ID}))&select=id",
+            self.token,
+        )
+        self.assertEqual(rows, [{"id": OTHER_THREAD_ID}])
+
+    async def test_thread_list_uses_embedded_count_and_aliased_last_message(self):
+        threads = await repository.list_threads_for_owner("owner-1", self.token)
+
+        by_id = {row["id"]: row for row in threads}
+        self.assertEqual([row["id"] for row in threads], [OTHER_THREAD_ID, THREAD_ID])
+        self.assertEqual(by_id[THREAD_ID]["message_count"], 2)
+        self.assertEqual(by_id[THREAD_ID]["last_message_preview"], "답변")
+        self.assertEqual(by_id[OTHER_THREAD_ID]["workspace_role"], "member")
+
+    async def test_inserts_conflicts_and_upserts(self):
+        row = {"user_id": "owner-1", "thread_id": THREAD_ID, "message_index": 1}
+        first = await sb.rest_insert_async("bookmarks", [row], self.token, returning=True)
+        with self.assertRaises(httpx.HTTPStatusError) as raised:
+            await sb.rest_insert_async("bookmarks", [row], self.token)
+        again = await sb.rest_insert_async(
+            "bookmarks",
+            [row],
+            self.token,
+            returning=True,
+            on_conflict="user_id,thread_id,message_index",
+            select="message_index,created_at",
+        )
+
+        self.assertEqual(raised.exception.response.status_code, 409)
+        self.assertEqual(again, [{"message_index": 1, "created_at": first[0]["created_at"]}])
+        self.assertEqual(len(self.fake.rows("bookmarks")), 1)
+
+    async def test_update_and_delete_return_representation(self):
+        updated = await sb.rest_update_async(
+            "threads", f"id=eq.{THREAD_ID}&select=id,title", {"title": "새 제목"}, self.token
+        )
+        deleted = await sb.rest_delete_async("messages", f"thread_id=eq.{THREAD_ID}", self.token)
+
+        self.assertEqual(updated, [{"id": THREAD_ID, "title": "새 제목"}])
+        self.assertEqual(deleted, 3)
+
+    async def test_append_rpc_allocates_after_last_visible_index(self):
+        rows = await repository.append_messages(
+            THREAD_ID,
+            [{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"}],
+            self.token,
+        )
+        self.assertEqual([row["index"] for row in rows], [2, 3])
+
+        with self.assertRaises(httpx.HTTPStatusError) as raised:
+            await sb.rest_rpc_async("missing_function", {}, self.token)
+        self.assertEqual(raised.exception.response.json()["code"], "PGRST202")
+
+    async def test_auth_user_and_admin_lookups(self):
+        user = await sb.get_user_from_access_token(self.token)
+        self.assertEqual(user["email"], "owner@example.com")
+        with self.assertRaises(sb.SupabaseAuthError):
+            await sb.get_user_from_access_token("unknown-token")
+
+        self.assertEqual(await get_user_id_by_email_async("MEMBER@example.com"), "member-1")
+        users = await get_users_by_ids_async(["owner-1", "member-1"])
+        self.assertEqual(set(users), {"owner-1", "member-1"})
+
+    async def test_rest_requires_known_token(self):
+        with self.assertRaises(httpx.HTTPStatusError) as raised:
+            await sb.rest_select_async("threads", "select=id", "unknown-token")
+        self.assertEqual(raised.exception.response.status_code, 401)
+
+
+class FakeSupabaseRouteTests(unittest.IsolatedAsyncioTestCase):
+    async def test_routes_run_end_to_end_with_injected_latency(self):
+        fake = FakeSupabase(latency=0.01)
+        owner, _ = _seed(fake)
+        headers = {"Authorization": f"Bearer {owner['access_token']}"}
+        transport = httpx.ASGITransport(app=app)
+
+        async with fake.installed():
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                listed = await client.get("/threads", headers=headers)
+                detail = await client.get(f"/threads/{THREAD_ID}", headers=headers)
+
+                fake.reset_calls()
+                started = time.perf_counter()
+                with patch.object(llm_client, "generate", AsyncMock(return_value="새 답변")):
+                    chat = await client.post(
+                        f"/threads/{THREAD_ID}/chat",
+                        json={"content": "다음 질문"},
+                        headers=headers,
+                    )
+                elapsed = time.perf_counter() - started
+
+        self.assertEqual(listed.status_code, 200)
+        self.assertEqual(len(listed.json()["threads"]), 2)
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual([m["content"] for m in detail.json()["messages"]], ["질문", "답변"])
+
+        self.assertEqual(chat.status_code, 200)
+        self.assertEqual(chat.json()["assistant_index"], 3)
+        # owner check, recent messages, append user, context, append assistant;
+        # the token was validated by the earlier requests and is served from cache.
+        self.assertEqual(len(fake.calls), 5)
+        self.assertEqual(fake.call_count("POST", "rpc/append_messages"), 2)
+        self.assertGreaterEqual(elapsed, 5 * 0.01)
+        stored = [row["content"] for row in fake.rows("messages") if row["index"] in (2, 3)]
+        self.assertEqual(stored, ["다음 질문", "새 답변"])
+
+
+if __name__ == "__main__":
+    unittest.main()
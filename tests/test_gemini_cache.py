@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+from app.services import background, gemini_cache, llm_client
+from tests.fake_gemini import FakeGemini
+from tests.fake_supabase import FakeSupabase
+
+
+THREAD_ID = "44444444-4444-4444-8444-444444444444"
+MODEL = "gemini-3.6-flash"
+
+
+class GeminiContextCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = FakeSupabase()
+        owner = self.fake.add_user("owner@example.com", user_id="gemini-owner")
+        self.headers = {"Authorization": f"Bearer {owner['access_token']}"}
+        self.fake.insert("threads", {"id": THREAD_ID, "title": "긴 대화", "owner_id": "gemini-owner", "is_workspace": False})
+        for index in range(8):
+            role = "user" if index % 2 == 0 else "assistant"
+            content = f"메시지 {index}: " + "긴 설명 " * 60
+            self.fake.insert("messages", {"thread_id": THREAD_ID, "index": index, "role": role, "content": content})
+        self.install = self.fake.installed()
+        await self.install.__aenter__()
+        self.gemini = FakeGemini(replies=["첫 답변", "둘째 답변", "셋째 답변"])
+        self.patches = [
+            self.gemini.installed(),
+            patch.object(settings, "GEMINI_CACHE_ENABLED", True),
+            patch.object(settings, "GEMINI_CACHE_MIN_TOKENS", 200),
+            patch.object(settings, "CHAT_SUMMARY_ENABLED", False),
+        ]
+        for p in self.patches:
+            p.__enter__()
+
+    async def asyncTearDown(self):
+        await background.drain(cancel=True)
+        for p in reversed(self.patches):
+            p.__exit__(None, None, None)
+        await self.install.__aexit__(None, None, None)
+        await llm_client.aclose_llm_clients()
+
+    async def _chat(self, content: str, stream: bool = False) -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        path = f"/threads/{THREAD_ID}/chat" + ("/stream" if stream else "")
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            response = await client.post(path, json={"content": content, "model": MODEL}, headers=self.headers)
+        self.assertEqual(response.status_code, 200, response.text)
+        await background.drain()
+        return response
+
+    def _generations(self) -> list[dict]:
+        return [call for call in self.gemini.calls if call["method"].startswith("generate_content")]
+
+    async def test_next_turn_sends_only_the_tail_after_the_cached_prefix(self):
+        await self._chat("첫 질문")
+        first = self._generations()[0]
+        self.assertIsNone(first["config"].cached_content)
+        self.assertEqual(len(first["contents"]), 9)
+        (name,) = self.gemini.caches
+        self.assertEqual(len(self.gemini.caches[name].contents), 10)
+
+        await self._chat("둘째 질문", stream=True)
+
+        second = self._generations()[1]
+        self.assertEqual(second["config"].cached_content, name)
+        self.assertIsNone(second["config"].system_instruction)
+        self.assertEqual([c.parts[0].text for c in second["contents"]], ["둘째 질문"])
+        stats = gemini_cache.registry.stats()
+        self.assertEqual(stats["hits"], 1)
+        # Turn one was all uncached; turn two re-read the same history from the cache.
+        self.assertGreater(stats["cached_input_tokens"], 1000)
+        self.assertLess(stats["uncached_input_tokens"] - stats["cached_input_tokens"], 100)
+        # The short second turn is not worth a new cache.
+        self.assertEqual(len(self.gemini.caches), 1)
+
+    async def test_expired_handle_falls_back_to_the_full_history(self):
+        await self._chat("첫 질문")
+        (name,) = self.gemini.caches
+        self.gemini.expire(name)
+
+        response = await self._chat("둘째 질문")
+
+        self.assertEqual(response.json()["assistant_content"], "둘째 답변")
+        retried = self._generations()[-1]
+        self.assertIsNone(retried["config"].cached_content)
+        self.assertEqual(len(retried["contents"]), 11)
+        self.assertEqual(gemini_cache.registry.stats()["invalidations"], 1)
+
+    async def test_deleting_the_thread_deletes_its_cache(self):
+        await self._chat("첫 질문")
+        self.assertEqual(len(self.gemini.caches), 1)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            response = await client.delete(f"/threads/{THREAD_ID}", headers=self.headers)
+        await background.drain()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.gemini.caches, {})
+        self.assertIsNone(gemini_cache.registry.peek(THREAD_ID))
+
+    async def test_changed_system_instruction_does_not_use_the_cache(self):
+        await self._chat("첫 질문")
+
+        with patch.object(settings, "LLM_SYSTEM_PROMPT", "다른 지시"):
+            await self._chat("둘째 질문")
+
+        self.assertIsNone(self._generations()[1]["config"].cached_content)
+        self.assertEqual(gemini_cache.registry.stats()["misses"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+from app.services import llm_admission, llm_client
+from app.services.llm_admission import INTERACTIVE, PROBE, SUMMARY
+from tests.fake_supabase import FakeSupabase
+
+
+THREAD_ID = "11111111-1111-4111-8111-111111111111"
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+class AdmissionControllerTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.controller = llm_admission.AdmissionController("primary")
+        self.patches = [
+            patch.object(settings, "LLM_ADMISSION_ENABLED", True),
+            patch.object(settings, "LLM_ADMISSION_PRIMARY_CONCURRENCY", 1),
+            patch.object(settings, "LLM_ADMISSION_QUEUE_SIZE", 2),
+            patch.object(settings, "LLM_ADMISSION_QUEUE_TIMEOUT_SECS", 5.0),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    async def _queue(self, priority: int, admitted: list) -> asyncio.Task:
+        async def wait_turn():
+            token = await self.controller.acquire(priority)
+            admitted.append(priority)
+            return token
+
+        task = asyncio.create_task(wait_turn())
+        await asyncio.sleep(0)
+        return task
+
+    async def test_waiters_are_admitted_by_priority_class(self):
+        holder = await self.controller.acquire(INTERACTIVE)
+        admitted: list[int] = []
+        summary = await self._queue(SUMMARY, admitted)
+        chat = await self._queue(INTERACTIVE, admitted)
+        self.assertEqual(self.controller.snapshot()["queue_depth"], 2)
+
+        self.controller.release(holder)
+        self.controller.release(await chat)
+        self.controller.release(await summary)
+
+        self.assertEqual(admitted, [INTERACTIVE, SUMMARY])
+        stats = self.controller.snapshot()
+        self.assertEqual((stats["active"], stats["admitted"], stats["max_queue_depth"]), (0, 3, 2))
+        self.assertIsNotNone(stats["wait_p95_ms"])
+
+    async def test_full_queue_sheds_lower_priority_waiters_first(self):
+        holder = await self.controller.acquire(INTERACTIVE)
+        admitted: list[int] = []
+        probe = await self._queue(PROBE, admitted)
+        summary = await self._queue(SUMMARY, admitted)
+
+        chat = await self._queue(INTERACTIVE, admitted)
+        with self.assertRaises(llm_admission.Overloaded):
+            await probe
+
+        # Nothing queued ranks below a summary now, so the newcomer is rejected.
+        with self.assertRaises(llm_admission.Overloaded) as raised:
+            await self.controller.acquire(SUMMARY)
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        self.assertEqual(self.controller.shed, 2)
+
+        self.controller.release(holder)
+        self.controller.release(await chat)
+        self.controller.release(await summary)
+        self.assertEqual(admitted, [INTERACTIVE, SUMMARY])
+
+    async def test_queue_wait_is_bounded(self):
+        holder = await self.controller.acquire(INTERACTIVE)
+        with patch.object(settings, "LLM_ADMISSION_QUEUE_TIMEOUT_SECS", 0.01):
+            with self.assertRaises(llm_admission.Overloaded):
+                await self.controller.acquire(INTERACTIVE)
+        self.controller.release(holder)
+
+        stats = self.controller.snapshot()
+        self.assertEqual((stats["timed_out"], stats["queue_depth"], stats["active"]), (1, 0, 0))
+
+    async def test_cancelled_waiter_gives_up_its_place(self):
+        holder = await self.controller.acquire(INTERACTIVE)
+        waiter = await self._queue(INTERACTIVE, [])
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+        self.controller.release(holder)
+        self.assertEqual((self.controller.active, self.controller.snapshot()["queue_depth"]), (0, 0))
+
+
+class OverloadedChatRouteTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = FakeSupabase()
+        owner = self.fake.add_user("owner@example.com", user_id="owner-1")
+        self.headers = {"Authorization": f"Bearer {owner['access_token']}"}
+        self.fake.insert("threads", {"id": THREAD_ID, "title": "대화", "owner_id": "owner-1", "is_workspace": False})
+        self.install = self.fake.installed()
+        await self.install.__aenter__()
+        self.patches = [
+            patch.object(settings, "LLM_FALLBACK_BASE_URL", None),
+            patch.object(settings, "LLM_ADMISSION_ENABLED", True),
+            patch.object(settings, "LLM_ADMISSION_PRIMARY_CONCURRENCY", 1),
+            patch.object(settings, "LLM_ADMISSION_QUEUE_SIZE", 0),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        await self.install.__aexit__(None, None, None)
+        await llm_client.aclose_llm_clients()
+
+    async def test_saturated_upstream_returns_503_with_retry_after(self):
+        controller = llm_admission.get_controller("primary")
+        holder = await controller.acquire(INTERACTIVE)
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                response = await client.post(
+                    f"/threads/{THREAD_ID}/chat",
+                    json={"content": "질문", "model": "gemma-test"},
+                    headers=self.headers,
+                )
+        finally:
+            controller.release(holder)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["detail"]["code"], "LLM_OVERLOADED")
+        self.assertGreaterEqual(int(response.headers["Retry-After"]), 1)
+        self.assertEqual(llm_client.describe_llm_config()["admission"]["providers"]["primary"]["shed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
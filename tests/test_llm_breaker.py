@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.config import settings
+from app.services import llm_admission, llm_breaker, llm_client
+from app.services.llm_client import LLMUpstreamError
+
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+PRIMARY = "https://primary.example.com"
+FALLBACK = "https://fallback.example.com"
+
+
+class CircuitBreakerRoutingTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        llm_breaker.reset_breakers()
+        self.hits: list[str] = []
+        self.primary_status = 503
+        self.patches = [
+            patch.object(settings, "LLM_PRIMARY_BASE_URL", PRIMARY),
+            patch.object(settings, "LLM_FALLBACK_BASE_URL", FALLBACK),
+            patch.object(settings, "LLM_MAX_RETRIES", 0),
+            patch.object(settings, "LLM_HEDGE_ENABLED", False),
+            patch.object(settings, "LLM_BREAKER_ENABLED", True),
+            patch.object(settings, "LLM_BREAKER_FAILURE_THRESHOLD", 2),
+            patch.object(settings, "LLM_BREAKER_OPEN_SECS", 30.0),
+            patch.object(httpx.AsyncClient, "send", autospec=True, side_effect=self._send),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        llm_breaker.reset_breakers()
+        await llm_client.aclose_llm_clients()
+
+    async def _send(self, _client, request, **kwargs):
+        host = "primary" if request.url.host == "primary.example.com" else "fallback"
+        self.hits.append(host)
+        status = self.primary_status if host == "primary" else 200
+        body = {"message": {"role": "assistant", "content": f"{host} answer"}} if status == 200 else {"error": "busy"}
+        return httpx.Response(status, json=body, request=request)
+
+    async def test_primary_opens_after_threshold_and_traffic_skips_it(self):
+        for _ in range(2):
+            self.assertEqual(await llm_client.generate("gemma-test", MESSAGES), "fallback answer")
+        self.assertEqual(llm_breaker.get_breaker("primary").state, llm_breaker.OPEN)
+
+        self.hits.clear()
+        self.assertEqual(await llm_client.generate("gemma-test", MESSAGES), "fallback answer")
+        self.assertEqual(self.hits, ["fallback"])
+        self.assertEqual(llm_breaker.get_breaker("primary").rejected, 1)
+
+    async def test_streaming_also_skips_an_open_primary(self):
+        for _ in range(2):
+            await llm_client.generate("gemma-test", MESSAGES)
+        self.hits.clear()
+
+        chunks = [chunk async for chunk in llm_client.generate_stream("gemma-test", MESSAGES)]
+
+        self.assertEqual("".join(chunks), "fallback answer")
+        self.assertEqual(self.hits, ["fallback"])
+
+    async def test_open_primary_without_fallback_fails_fast(self):
+        for _ in range(2):
+            with patch.object(settings, "LLM_FALLBACK_BASE_URL", None), self.assertRaises(LLMUpstreamError):
+                await llm_client.generate("gemma-test", MESSAGES)
+        self.hits.clear()
+
+        with patch.object(settings, "LLM_FALLBACK_BASE_URL", None), self.assertRaises(LLMUpstreamError) as raised:
+            await llm_client.generate("gemma-test", MESSAGES)
+
+        self.assertEqual((raised.exception.status, raised.exception.code), (503, "CIRCUIT_OPEN"))
+        self.assertEqual(self.hits, [])
+
+    async def test_retries_stop_once_the_breaker_opens(self):
+        with (
+            patch.object(settings, "LLM_MAX_RETRIES", 5),
+            patch.object(llm_client.asyncio, "sleep", AsyncMock()),
+        ):
+            self.assertEqual(await llm_client.generate("gemma-test", MESSAGES), "fallback answer")
+
+        self.assertEqual(self.hits, ["primary", "primary", "fallback"])
+
+    async def test_client_errors_do_not_trip_the_breaker(self):
+        self.primary_status = 400
+        for _ in range(3):
+            with self.assertRaises(LLMUpstreamError):
+                await llm_client.generate("gemma-test", MESSAGES)
+
+        breaker = llm_breaker.get_breaker("primary")
+        self.assertEqual((breaker.state, breaker.consecutive_failures), (llm_breaker.CLOSED, 0))
+
+    async def test_half_open_admits_one_trial_and_success_closes(self):
+        for _ in range(2):
+            await llm_client.generate("gemma-test", MESSAGES)
+        breaker = llm_breaker.get_breaker("primary")
+
+        with patch.object(settings, "LLM_BREAKER_OPEN_SECS", 0.0):
+            self.assertTrue(breaker.allow_request())
+            self.assertEqual(breaker.state, llm_breaker.HALF_OPEN)
+            self.assertFalse(breaker.allow_request())
+
+            breaker.record_failure(503, "LLM_FAILED")
+            self.assertEqual(breaker.state, llm_breaker.OPEN)
+
+            self.primary_status = 200
+            self.hits.clear()
+            self.assertEqual(await llm_client.generate("gemma-test", MESSAGES), "primary answer")
+
+        self.assertEqual(self.hits, ["primary"])
+        self.assertEqual(breaker.state, llm_breaker.CLOSED)
+
+    async def test_half_open_trial_shed_by_admission_is_released(self):
+        for _ in range(2):
+            await llm_client.generate("gemma-test", MESSAGES)
+        breaker = llm_breaker.get_breaker("primary")
+        controller = llm_admission.get_controller("primary")
+
+        with (
+            patch.object(settings, "LLM_BREAKER_OPEN_SECS", 0.0),
+            patch.object(settings, "LLM_FALLBACK_BASE_URL", None),
+            patch.object(settings, "LLM_ADMISSION_ENABLED", True),
+            patch.object(settings, "LLM_ADMISSION_PRIMARY_CONCURRENCY", 1),
+            patch.object(settings, "LLM_ADMISSION_QUEUE_SIZE", 0),
+        ):
+            holder = await controller.acquire(llm_admission.INTERACTIVE)
+            try:
+                with self.assertRaises(LLMUpstreamError) as raised:
+                    await llm_client.generate("gemma-test", MESSAGES)
+            finally:
+                controller.release(holder)
+            self.assertEqual(raised.exception.code, "LLM_OVERLOADED")
+            self.assertFalse(breaker.trial_in_flight)
+
+            self.primary_status = 200
+            self.hits.clear()
+            self.assertEqual(await llm_client.generate("gemma-test", MESSAGES), "primary answer")
+
+        self.assertEqual(self.hits, ["primary"])
+        self.assertEqual(breaker.state, llm_breaker.CLOSED)
+
+    async def test_prober_closes_a_recovered_primary(self):
+        for _ in range(2):
+            await llm_client.generate("gemma-test", MESSAGES)
+        self.primary_status = 200
+        stop = asyncio.Event()
+
+        with patch.object(settings, "LLM_BREAKER_PROBE_INTERVAL_SECS", 0.01):
+            prober = asyncio.create_task(llm_breaker.run_prober(llm_client.probe_upstream, stop))
+            for _ in range(100):
+                if llm_breaker.get_breaker("primary").state == llm_breaker.CLOSED:
+                    break
+                await asyncio.sleep(0.01)
+            stop.set()
+            await prober
+
+        self.assertEqual(llm_breaker.get_breaker("primary").state, llm_breaker.CLOSED)
+
+    async def test_health_check_reports_breaker_state(self):
+        for _ in range(2):
+            await llm_client.generate("gemma-test", MESSAGES)
+
+        report = await llm_client.health_check()
+
+        self.assertIn("breakers", report)
+        self.assertEqual(set(report["breakers"]), {"primary", "fallback", "gemini"})
+        self.assertEqual(report["breakers"]["fallback"]["state"], "closed")
+        self.assertEqual(report["breakers"]["primary"]["times_opened"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,6 +7,9 @@ from app.services import llm_client
 
 
 class GeminiClientTests(IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        await llm_client.aclose_llm_clients()
+
     async def test_generate_dispatches_gemini_messages(self):
         original_key = settings.GEMINI_API_KEY
         settings.GEMINI_API_KEY = "test-key"
@@ -41,6 +44,9 @@ class GeminiClientTests(IsolatedAsyncioTestCase):
         self.assertEqual(call["model"], "gemini-3.6-flash")
         self.assertEqual([item.role for item in call["contents"]], ["user", "model", "user"])
         self.assertEqual(call["config"].system_instruction, "Be concise.")
+        # The pooled client stays open for the next request until shutdown.
+        async_client.aclose.assert_not_awaited()
+        await llm_client.aclose_llm_clients()
         async_client.aclose.assert_awaited_once()
 
     async def test_generate_requires_server_api_key(self):
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.config import settings
+from app.services import llm_client
+
+
+def _gemini_client(text: str = "answer"):
+    return SimpleNamespace(
+        aio=SimpleNamespace(
+            models=SimpleNamespace(generate_content=AsyncMock(return_value=SimpleNamespace(text=text))),
+            aclose=AsyncMock(),
+        )
+    )
+
+
+class PooledLLMClientTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        await llm_client.aclose_llm_clients()
+
+    async def test_gemini_client_is_built_once_and_rebuilt_on_key_rotation(self):
+        first, second = _gemini_client(), _gemini_client()
+        messages = [{"role": "user", "content": "Hello"}]
+
+        with (
+            patch.object(settings, "GEMINI_API_KEY", "key-1"),
+            patch.object(llm_client.genai, "Client", side_effect=[first, second]) as factory,
+        ):
+            await asyncio.gather(*(llm_client.generate("gemini-3.6-flash", messages) for _ in range(5)))
+            self.assertEqual(factory.call_count, 1)
+
+            with patch.object(settings, "GEMINI_API_KEY", "key-2"):
+                await llm_client.generate("gemini-3.6-flash", messages)
+
+        self.assertEqual(factory.call_count, 2)
+        self.assertEqual(factory.call_args.kwargs, {"api_key": "key-2"})
+        first.aio.aclose.assert_awaited_once()
+        second.aio.aclose.assert_not_awaited()
+
+    async def test_upstream_http_clients_are_reused_per_base_url_and_verify_flag(self):
+        primary = await llm_client.get_llm_http_client("https://llm.example.com/", True)
+
+        self.assertIs(await llm_client.get_llm_http_client("https://llm.example.com", True), primary)
+        unverified = await llm_client.get_llm_http_client("https://llm.example.com", False)
+        self.assertIsNot(unverified, primary)
+
+        await llm_client.aclose_llm_clients()
+        self.assertTrue(primary.is_closed)
+        self.assertTrue(unverified.is_closed)
+        self.assertIsNot(await llm_client.get_llm_http_client("https://llm.example.com", True), primary)
+
+    async def test_post_reuses_pooled_client_across_retries_and_closes_stale_upstreams(self):
+        responses = [
+            httpx.Response(503, text="busy"),
+            httpx.Response(200, json={"message": {"role": "assistant", "content": "pong"}}),
+        ]
+        seen_clients = []
+
+        async def send(self_client, request, **kwargs):
+            seen_clients.append(self_client)
+            response = responses.pop(0)
+            response.request = request
+            return response
+
+        with (
+            patch.object(settings, "LLM_PRIMARY_BASE_URL", "https://primary.example.com"),
+            patch.object(settings, "LLM_FALLBACK_BASE_URL", None),
+            patch.object(settings, "LLM_PRIMARY_PATH", "/api/chat"),
+            patch.object(settings, "LLM_MAX_RETRIES", 1),
+            patch.object(httpx.AsyncClient, "send", autospec=True, side_effect=send),
+            patch.object(llm_client.asyncio, "sleep", AsyncMock()),
+        ):
+            result = await llm_client.generate("gemma-test", [{"role": "user", "content": "ping"}])
+            pooled = seen_clients[0]
+
+            with patch.object(settings, "LLM_PRIMARY_BASE_URL", "https://moved.example.com"):
+                moved = await llm_client.get_llm_http_client("https://moved.example.com", True)
+
+        self.assertEqual(result, "pong")
+        self.assertEqual(len(seen_clients), 2)
+        self.assertIs(seen_clients[1], pooled)
+        self.assertIsNot(moved, pooled)
+        self.assertTrue(pooled.is_closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
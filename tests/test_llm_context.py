@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+from app.services import llm_client, llm_context
+from tests.fake_supabase import FakeSupabase
+
+
+THREAD_ID = "11111111-1111-4111-8111-111111111111"
+SYSTEM = [{"role": "system", "content": "Be helpful."}]
+
+
+def _turn(role: str, content: str) -> dict:
+    return {"role": role, "content": content}
+
+
+class TokenEstimateTests(unittest.TestCase):
+    def test_hangul_counts_per_character_and_latin_per_four(self):
+        self.assertEqual(llm_context.estimate_tokens("안녕하세요"), 5)
+        self.assertEqual(llm_context.estimate_tokens("a" * 400), 100)
+        self.assertEqual(llm_context.estimate_tokens(""), 0)
+
+    def test_budget_prefers_model_overrides(self):
+        with (
+            patch.object(settings, "LLM_CONTEXT_TOKEN_BUDGET", 1000),
+            patch.object(settings, "GEMINI_CONTEXT_TOKEN_BUDGET", 9000),
+            patch.object(settings, "LLM_CONTEXT_TOKEN_BUDGETS", {"gemma3": 2000, "gemma3:27b": 8000}),
+        ):
+            self.assertEqual(llm_context.token_budget("gemma3:27b"), 8000)
+            self.assertEqual(llm_context.token_budget("gemma3:4b"), 2000)
+            self.assertEqual(llm_context.token_budget("gemini-3.6-flash"), 9000)
+            self.assertEqual(llm_context.token_budget("llama3"), 1000)
+
+
+class FitToBudgetTests(unittest.TestCase):
+    def test_everything_fits_verbatim(self):
+        history = [_turn("user", "질문"), _turn("assistant", "답변")]
+        latest = _turn("user", "다음")
+
+        messages, stats = llm_context.fit_to_budget(SYSTEM, history, latest, 1000)
+
+        self.assertEqual(messages, SYSTEM + history + [latest])
+        self.assertEqual((stats["compressed"], stats["dropped"], stats["messages"]), (0, 0, 4))
+        self.assertEqual(stats["prompt_tokens"], sum(llm_context.message_tokens(m) for m in messages))
+
+    def test_old_document_is_compressed_and_newest_turns_stay_verbatim(self):
+        document = "head " + "x" * 40_000 + " tail"
+        history = [
+            _turn("user", document),
+            _turn("assistant", "요약했어요"),
+            _turn("user", "고마워"),
+            _turn("assistant", "천만에요"),
+        ]
+        latest = _turn("user", "그럼 결론은?")
+
+        with patch.object(settings, "LLM_CONTEXT_COMPRESSED_TURN_TOKENS", 100):
+            messages, stats = llm_context.fit_to_budget(SYSTEM, history, latest, 400)
+
+        self.assertEqual(messages[2:], history[1:] + [latest])
+        excerpt = messages[1]["content"]
+        self.assertTrue(excerpt.startswith("head "))
+        self.assertTrue(excerpt.endswith(" tail"))
+        self.assertIn("중략", excerpt)
+        self.assertLessEqual(llm_context.estimate_tokens(excerpt), 100)
+        self.assertEqual((stats["compressed"], stats["dropped"]), (1, 0))
+        self.assertLessEqual(stats["prompt_tokens"], 400)
+
+    def test_turns_that_do_not_fit_even_compressed_are_dropped(self):
+        history = [_turn("user", "y" * 4000) for _ in range(5)] + [_turn("assistant", "최근 답변")]
+        latest = _turn("user", "질문")
+
+        messages, stats = llm_context.fit_to_budget(SYSTEM, history, latest, 50)
+
+        self.assertEqual(messages, SYSTEM + [history[-1], latest])
+        self.assertEqual((stats["compressed"], stats["dropped"]), (0, 5))
+
+    def test_new_message_is_always_sent(self):
+        latest = _turn("user", "z" * 10_000)
+
+        messages, stats = llm_context.fit_to_budget(SYSTEM, [_turn("assistant", "이전")], latest, 50)
+
+        self.assertEqual(messages[-1], latest)
+        self.assertEqual(stats["dropped"], 1)
+        self.assertGreater(stats["prompt_tokens"], 50)
+
+
+class ChatContextRouteTests(unittest.IsolatedAsyncioTestCase):
+    async def test_chat_sends_budgeted_prompt_and_reports_its_size(self):
+        fake = FakeSupabase()
+        owner = fake.add_user("owner@example.com", user_id="owner-1")
+        fake.insert("threads", {"id": THREAD_ID, "title": "문서", "owner_id": "owner-1", "is_workspace": False})
+        fake.insert("messages", {"thread_id": THREAD_ID, "index": 0, "role": "user", "content": "문서 " * 20_000})
+        fake.insert("messages", {"thread_id": THREAD_ID, "index": 1, "role": "assistant", "content": "읽었어요"})
+        generate = AsyncMock(return_value="결론입니다")
+
+        async with fake.installed():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                with (
+                    patch.object(settings, "LLM_CONTEXT_TOKEN_BUDGET", 1000),
+                    patch.object(llm_client, "generate", generate),
+                ):
+                    response = await client.post(
+                        f"/threads/{THREAD_ID}/chat",
+                        json={"content": "결론은?", "model": "gemma-test"},
+                        headers={"Authorization": f"Bearer {owner['access_token']}"},
+                    )
+
+        self.assertEqual(response.status_code, 200)
+        context = response.json()["context"]
+        self.assertEqual(context["token_budget"], 1000)
+        self.assertEqual(context["compressed"], 1)
+        self.assertLessEqual(context["prompt_tokens"], 1000)
+
+        sent = generate.await_args.kwargs["messages"]
+        self.assertEqual(sum(llm_context.message_tokens(m) for m in sent), context["prompt_tokens"])
+        self.assertEqual([m["content"] for m in sent[-2:]], ["읽었어요", "결론은?"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from app.core.config import settings
+from app.services import llm_client, llm_hedge
+from app.services.llm_client import LLMUpstreamError
+
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+class HedgedGenerateTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        llm_hedge.primary_latency.clear()
+        llm_hedge.hedge_stats.clear()
+        self.calls: list[str] = []
+        self.cancelled: list[str] = []
+        self.behaviour = {}
+        self.patches = [
+            patch.object(settings, "LLM_HEDGE_ENABLED", True),
+            patch.object(settings, "LLM_FALLBACK_BASE_URL", "https://fallback.example.com"),
+            patch.object(settings, "LLM_HEDGE_MIN_DELAY_SECS", 0.0),
+            patch.object(settings, "LLM_HEDGE_MAX_DELAY_SECS", 0.05),
+            patch.object(settings, "LLM_MAX_RETRIES", 0),
+            patch.object(llm_client, "_post_llm", side_effect=self._post_llm),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        llm_hedge.primary_latency.clear()
+        llm_hedge.hedge_stats.clear()
+
+    async def _post_llm(self, provider, **kwargs):
+        self.calls.append(provider)
+        delay, outcome = self.behaviour[provider]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(provider)
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def test_slow_primary_is_hedged_and_loser_cancelled(self):
+        self.behaviour = {"primary": (5.0, "primary answer"), "fallback": (0.01, "fallback answer")}
+
+        result = await llm_client.generate("gemma-test", MESSAGES)
+
+        self.assertEqual(result, "fallback answer")
+        self.assertEqual(self.cancelled, ["primary"])
+        stats = llm_hedge.hedge_stats.snapshot(llm_hedge.primary_latency)
+        self.assertEqual((stats["hedged"], stats["fallback_wins"], stats["primary_wins"]), (1, 1, 0))
+        self.assertEqual(stats["fallback_win_rate"], 1.0)
+
+    async def test_primary_that_answers_before_threshold_is_not_hedged(self):
+        self.behaviour = {"primary": (0.0, "primary answer"), "fallback": (0.0, "fallback answer")}
+
+        result = await llm_client.generate("gemma-test", MESSAGES)
+
+        self.assertEqual(result, "primary answer")
+        self.assertEqual(self.calls, ["primary"])
+        self.assertEqual(len(llm_hedge.primary_latency), 1)
+        self.assertEqual(llm_hedge.hedge_stats.snapshot(llm_hedge.primary_latency)["hedge_rate"], 0.0)
+
+    async def test_hedged_primary_can_still_win(self):
+        self.behaviour = {"primary": (0.08, "primary answer"), "fallback": (5.0, "fallback answer")}
+
+        result = await llm_client.generate("gemma-test", MESSAGES)
+
+        self.assertEqual(result, "primary answer")
+        self.assertEqual(self.cancelled, ["fallback"])
+        self.assertEqual(llm_hedge.hedge_stats.primary_wins, 1)
+
+    async def test_fast_primary_failure_goes_straight_to_fallback(self):
+        self.behaviour = {
+            "primary": (0.0, LLMUpstreamError(provider="primary", status=503, message="busy")),
+            "fallback": (0.0, "fallback answer"),
+        }
+
+        self.assertEqual(await llm_client.generate("gemma-test", MESSAGES), "fallback answer")
+        self.assertEqual(llm_hedge.hedge_stats.hedged, 0)
+
+    async def test_both_failing_raises_combined_error(self):
+        self.behaviour = {
+            "primary": (0.1, LLMUpstreamError(provider="primary", status=504, message="timeout")),
+            "fallback": (0.0, LLMUpstreamError(provider="fallback", status=503, message="busy")),
+        }
+
+        with self.assertRaises(LLMUpstreamError) as raised:
+            await llm_client.generate("gemma-test", MESSAGES)
+
+        self.assertEqual(raised.exception.code, "LLM_FAILED")
+        self.assertIn("primary status=504, fallback status=503", str(raised.exception))
+        self.assertEqual(llm_hedge.hedge_stats.failures, 1)
+
+    async def test_non_retryable_primary_error_is_not_hedged_away(self):
+        self.behaviour = {
+            "primary": (0.0, LLMUpstreamError(provider="primary", status=400, message="bad request")),
+            "fallback": (0.0, "fallback answer"),
+        }
+
+        with self.assertRaises(LLMUpstreamError) as raised:
+            await llm_client.generate("gemma-test", MESSAGES)
+
+        self.assertEqual(raised.exception.status, 400)
+        self.assertEqual(self.calls, ["primary"])
+
+
+class LatencyWindowTests(unittest.TestCase):
+    def test_delay_tracks_p95_within_bounds(self):
+        window = llm_hedge.LatencyWindow()
+        with (
+            patch.object(settings, "LLM_HEDGE_MIN_SAMPLES", 10),
+            patch.object(settings, "LLM_HEDGE_MIN_DELAY_SECS", 0.5),
+            patch.object(settings, "LLM_HEDGE_MAX_DELAY_SECS", 20.0),
+            patch.object(settings, "LLM_HEDGE_WINDOW", 100),
+        ):
+            self.assertEqual(window.hedge_delay(), 20.0)
+            for n in range(1, 101):
+                window.record(n / 10)
+            self.assertAlmostEqual(window.hedge_delay(), 9.5)
+
+            for _ in range(100):
+                window.record(0.1)
+            self.assertEqual(len(window), 100)
+            self.assertEqual(window.hedge_delay(), 0.5)
+
+    def test_metrics_are_exposed_in_llm_config(self):
+        config = llm_client.describe_llm_config()
+        self.assertIn("hedge_rate", config["hedging"])
+        self.assertIn("fallback_win_rate", config["hedging"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import json
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.config import settings
+from app.services import llm_client, llm_profiles
+
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+PRIMARY = "https://primary.example.com"
+FALLBACK = "https://fallback.example.com"
+
+
+class ProfileLookupTests(unittest.TestCase):
+    def test_overrides_apply_on_top_of_builtin_profiles(self):
+        with patch.object(
+            settings,
+            "LLM_PROFILES",
+            {"branch_summary": {"max_output_tokens": 32, "model": "gemini-lite"}, "digest": {"temperature": 0.5}},
+        ):
+            summary = llm_profiles.get_profile(llm_profiles.BRANCH_SUMMARY)
+            self.assertEqual((summary.max_output_tokens, summary.thinking_budget), (32, 0))
+            self.assertEqual(summary.resolve_model("gemini-3.6-flash"), "gemini-lite")
+            self.assertEqual(llm_profiles.get_profile("digest").temperature, 0.5)
+            self.assertIn("digest", llm_profiles.describe())
+
+        chat = llm_profiles.get_profile(llm_profiles.CHAT)
+        self.assertIsNone(chat.max_output_tokens)
+        self.assertEqual(chat.resolve_model("gemma-test"), "gemma-test")
+
+    def test_unknown_profiles_and_fields_are_rejected(self):
+        with self.assertRaises(ValueError):
+            llm_profiles.get_profile("nope")
+        with patch.object(settings, "LLM_PROFILES", {"title": {"max_tokens": 5}}):
+            with self.assertRaises(ValueError):
+                llm_profiles.get_profile(llm_profiles.TITLE)
+
+
+class HttpProfilePayloadTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.payloads: list[tuple[str, dict, httpx.Timeout]] = []
+        self.patches = [
+            patch.object(settings, "LLM_PRIMARY_BASE_URL", PRIMARY),
+            patch.object(settings, "LLM_FALLBACK_BASE_URL", FALLBACK),
+            patch.object(settings, "LLM_FALLBACK_KIND", "openai_compatible"),
+            patch.object(settings, "LLM_MAX_RETRIES", 0),
+            patch.object(settings, "LLM_HEDGE_ENABLED", False),
+            patch.object(httpx.AsyncClient, "send", autospec=True, side_effect=self._send),
+        ]
+        for p in self.patches:
+            p.start()
+        self.primary_status = 200
+
+    async def asyncTearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        await llm_client.aclose_llm_clients()
+
+    async def _send(self, _client, request, **kwargs):
+        host = "primary" if request.url.host == "primary.example.com" else "fallback"
+        self.payloads.append((host, json.loads(request.content), request.extensions["timeout"]))
+        if host == "primary" and self.primary_status != 200:
+            return httpx.Response(self.primary_status, json={"error": "busy"}, request=request)
+        body = {"message": {"role": "assistant", "content": f"{host} answer"}}
+        if host == "fallback":
+            body = {"choices": [{"message": {"role": "assistant", "content": "fallback answer"}}]}
+        return httpx.Response(200, json=body, request=request)
+
+    async def test_profile_limits_reach_ollama_options_and_openai_fields(self):
+        self.primary_status = 503
+        result = await llm_client.generate("gemma-test", MESSAGES, profile=llm_profiles.TITLE)
+
+        self.assertEqual(result, "fallback answer")
+        (_, primary, timeout), (_, fallback, _) = self.payloads
+        self.assertEqual(primary["options"], {"num_predict": 64, "temperature": 0.3})
+        self.assertIs(primary["think"], False)
+        self.assertEqual(timeout["read"], 15.0)
+        self.assertEqual((fallback["max_tokens"], fallback["temperature"]), (64, 0.3))
+        self.assertNotIn("options", fallback)
+
+    async def test_chat_profile_leaves_upstream_defaults_alone(self):
+        await llm_client.generate("gemma-test", MESSAGES)
+
+        (_, payload, timeout), = self.payloads
+        self.assertNotIn("options", payload)
+        self.assertNotIn("think", payload)
+        self.assertEqual(timeout["read"], float(settings.LLM_READ_TIMEOUT))
+
+    async def test_health_ping_asks_for_a_handful_of_tokens(self):
+        await llm_client.probe_upstream("primary")
+
+        (_, payload, timeout), = self.payloads
+        self.assertEqual(payload["options"]["num_predict"], 8)
+        self.assertEqual(timeout["read"], 3.0)
+
+
+class GeminiProfileConfigTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        await llm_client.aclose_llm_clients()
+
+    async def test_branch_summary_profile_bounds_gemini_output_and_thinking(self):
+        generate_content = AsyncMock(return_value=SimpleNamespace(text="요약"))
+        client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content), aclose=AsyncMock()))
+
+        with (
+            patch.object(settings, "GEMINI_API_KEY", "test-key"),
+            patch.object(settings, "LLM_PROFILES", {"branch_summary": {"model": "gemini-3.6-flash-lite"}}),
+            patch.object(llm_client.genai, "Client", return_value=client),
+        ):
+            result = await llm_client.generate(
+                "gemini-3.6-flash", MESSAGES, profile=llm_profiles.BRANCH_SUMMARY
+            )
+
+        self.assertEqual(result, "요약")
+        call = generate_content.await_args.kwargs
+        self.assertEqual(call["model"], "gemini-3.6-flash-lite")
+        self.assertEqual(call["config"].max_output_tokens, 256)
+        self.assertEqual(call["config"].temperature, 0.2)
+        self.assertEqual(call["config"].thinking_config.thinking_budget, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
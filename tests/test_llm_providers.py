@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.config import settings
+from app.services import llm_client
+from app.services.llm_client import LLMUpstreamError
+
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+class ModelRoutingTests(unittest.TestCase):
+    def test_gemini_prefix_and_overrides_route_models(self):
+        self.assertEqual(llm_client.resolve_route("gemini-3.6-flash"), llm_client.GEMINI_ROUTE)
+        self.assertEqual(llm_client.resolve_route("gemma3:270m"), llm_client.UPSTREAM_ROUTE)
+
+        with patch.object(settings, "LLM_MODEL_ROUTES", {"gemma3": "gemini", "gemma3:270m": "upstream"}):
+            self.assertEqual(llm_client.resolve_route("gemma3:27b"), llm_client.GEMINI_ROUTE)
+            self.assertEqual(llm_client.resolve_route("gemma3:270m"), llm_client.UPSTREAM_ROUTE)
+
+        with patch.object(settings, "LLM_MODEL_ROUTES", {"gemma3": "nowhere"}):
+            with self.assertRaises(RuntimeError):
+                llm_client.resolve_route("gemma3:27b")
+
+    def test_routes_are_matched_once_per_model(self):
+        llm_client.resolve_route("llama3")
+        llm_client._route_cache["llama3"] = llm_client.GEMINI_ROUTE
+        # Later lookups use the cached answer instead of scanning the table.
+        self.assertEqual(llm_client.resolve_route("llama3"), llm_client.GEMINI_ROUTE)
+
+        with patch.object(settings, "LLM_MODEL_ROUTES", {"mistral": "upstream"}):
+            # A changed table invalidates the cache.
+            self.assertEqual(llm_client.resolve_route("llama3"), llm_client.UPSTREAM_ROUTE)
+
+
+class OpenAICompatibleProviderTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests: list[httpx.Request] = []
+        self.responses: list[httpx.Response] = []
+        self.patches = [
+            patch.object(settings, "LLM_PRIMARY_BASE_URL", "https://vllm.example.com"),
+            patch.object(settings, "LLM_PRIMARY_PATH", "/v1/chat/completions"),
+            patch.object(settings, "LLM_PRIMARY_KIND", "openai_compatible"),
+            patch.object(settings, "LLM_OPENAI_API_KEY", "sk-test"),
+            patch.object(settings, "LLM_FALLBACK_BASE_URL", None),
+            patch.object(settings, "LLM_MAX_RETRIES", 0),
+            patch.object(settings, "LLM_HEDGE_ENABLED", False),
+        ]
+        for p in self.patches:
+            p.start()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            return self.responses.pop(0)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.patches.append(patch.object(llm_client, "get_llm_http_client", AsyncMock(return_value=client)))
+        self.patches[-1].start()
+
+    async def asyncTearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        await llm_client.aclose_llm_clients()
+
+    async def test_streaming_deltas_come_from_the_sdk(self):
+        frames = [
+            {"id": "c1", "object": "chat.completion.chunk", "created": 0, "model": "m", "choices": [{"index": 0, "delta": {"role": "assistant"}}]},
+            {"id": "c1", "object": "chat.completion.chunk", "created": 0, "model": "m", "choices": [{"index": 0, "delta": {"content": "Hel"}}]},
+            {"id": "c1", "object": "chat.completion.chunk", "created": 0, "model": "m", "choices": [{"index": 0, "delta": {"content": "lo"}}]},
+        ]
+        body = "".join(f"data: {json.dumps(frame)}\n\n" for frame in frames) + "data: [DONE]\n\n"
+        self.responses.append(httpx.Response(200, text=body, headers={"content-type": "text/event-stream"}))
+
+        chunks = [chunk async for chunk in llm_client.generate_stream("qwen-test", MESSAGES)]
+
+        self.assertEqual(chunks, ["Hel", "lo"])
+        request = self.requests[0]
+        self.assertEqual(request.url.path, "/v1/chat/completions")
+        self.assertEqual(request.headers["Authorization"], "Bearer sk-test")
+        self.assertIn("X-Request-ID", request.headers)
+        self.assertTrue(json.loads(request.content)["stream"])
+
+    async def test_status_errors_are_classified_like_other_upstreams(self):
+        self.responses.append(httpx.Response(404, json={"error": {"message": "model not found"}}))
+
+        with self.assertRaises(LLMUpstreamError) as raised:
+            await llm_client.generate("qwen-test", MESSAGES)
+
+        self.assertEqual((raised.exception.status, raised.exception.code), (404, "MODEL_NOT_AVAILABLE"))
+        self.assertEqual(raised.exception.provider, "primary")
+
+    async def test_whole_completion_and_empty_answers(self):
+        self.responses.append(
+            httpx.Response(200, json={"id": "c2", "object": "chat.completion", "created": 0, "model": "m", "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "pong"}}]})
+        )
+        self.responses.append(
+            httpx.Response(200, json={"id": "c3", "object": "chat.completion", "created": 0, "model": "m", "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": " "}}]})
+        )
+
+        self.assertEqual(await llm_client.generate("qwen-test", MESSAGES), "pong")
+        with self.assertRaises(LLMUpstreamError) as raised:
+            await llm_client.generate("qwen-test", MESSAGES)
+        self.assertEqual(raised.exception.code, "EMPTY_COMPLETION")
+
+
+class ProviderRegistryTests(unittest.IsolatedAsyncioTestCase):
+    async def test_registered_provider_serves_hosts_of_its_kind(self):
+        class CannedProvider(llm_client.LLMProvider):
+            kind = "canned"
+
+            async def complete(self, upstream, model, messages, **kwargs):
+                return f"{upstream.name}:{model}:{messages[-1]['content']}"
+
+            async def stream(self, upstream, model, messages, **kwargs):
+                yield await self.complete(upstream, model, messages, **kwargs)
+
+        llm_client.register_provider(CannedProvider())
+        try:
+            with (
+                patch.object(settings, "LLM_PRIMARY_KIND", "canned"),
+                patch.object(settings, "LLM_HEDGE_ENABLED", False),
+            ):
+                result = await llm_client.generate("gemma-test", MESSAGES)
+                self.assertIn("canned", llm_client.describe_llm_config()["providers"])
+        finally:
+            llm_client._providers.pop("canned", None)
+
+        self.assertEqual(result, "primary:gemma-test:ping")
+
+    def test_providers_must_implement_complete_and_stream(self):
+        class HalfProvider(llm_client.LLMProvider):
+            kind = "half"
+
+            async def complete(self, upstream, model, messages, **kwargs):
+                return ""
+
+        with self.assertRaises(TypeError):
+            HalfProvider()
+
+    def test_unknown_kind_is_a_configuration_error(self):
+        with patch.object(settings, "LLM_PRIMARY_KIND", "carrier-pigeon"):
+            with self.assertRaises(RuntimeError):
+                llm_client.get_provider("same_as_primary")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import json
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.config import settings
+from app.services import llm_client
+from tests.stream_helpers import ndjson_frames
+
+
+class IncrementalStreamParserTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        await llm_client.aclose_llm_clients()
+
+    async def _read(self, chunks, content_type: str = "", kind: str = "same_as_primary"):
+        self.consumed = 0
+
+        async def body():
+            for chunk in chunks:
+                self.consumed += 1
+                yield chunk
+
+        headers = {"content-type": content_type} if content_type else {}
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, headers=headers, content=body()))
+        async with httpx.AsyncClient(transport=transport) as client:
+            async with client.stream("POST", "https://llm.example.com/api/generate") as resp:
+                return await llm_client._read_llm_response(kind, resp)
+
+    async def test_ndjson_deltas_are_joined_and_reading_stops_at_done(self):
+        chunks = ndjson_frames(
+            {"response": "Hel", "done": False},
+            {"response": "lo", "done": False},
+            {"response": "", "done": True, "done_reason": "stop"},
+        ) + [b'{"response": "trailing", "done": false}\n'] * 1000
+
+        assistant, debug, head = await self._read(chunks, "application/x-ndjson")
+
+        self.assertEqual(assistant, "Hello")
+        self.assertEqual((debug["parsed_frames"], debug["done"], debug["done_reason"]), (3, True, "stop"))
+        self.assertLess(self.consumed, 10)
+        self.assertTrue(head.startswith('{"response": "Hel"'))
+
+    async def test_frames_split_across_network_chunks(self):
+        raw = b"".join(
+            ndjson_frames({"message": {"content": "가나"}}, {"message": {"content": "다"}, "done": True})
+        )
+        # Split inside a multi-byte character and inside a JSON object.
+        chunks = [raw[i : i + 7] for i in range(0, len(raw), 7)]
+
+        assistant, _, _ = await self._read(chunks)
+
+        self.assertEqual(assistant, "가나다")
+
+    async def test_sse_and_single_json_bodies_match_buffered_parser(self):
+        sse = "".join(
+            f"data: {json.dumps(frame)}\n\n"
+            for frame in (
+                {"choices": [{"delta": {"role": "assistant"}}]},
+                {"choices": [{"delta": {"content": "A"}}]},
+                {"choices": [{"delta": {"content": "B"}}]},
+            )
+        ) + "data: [DONE]\n\n"
+        pretty = json.dumps({"message": {"role": "assistant", "content": "single"}}, indent=2)
+        cases = [
+            (sse, "text/event-stream"),
+            (pretty, ""),
+            (pretty, "application/json"),
+            (json.dumps({"response": "one line"}), "text/plain"),
+        ]
+        for text, content_type in cases:
+            with self.subTest(content_type=content_type, text=text[:20]):
+                assistant, _, _ = await self._read([text.encode()], content_type)
+                expected, _ = llm_client._parse_one_or_stream_json("same_as_primary", text, content_type)
+                self.assertEqual(assistant, expected)
+
+    async def test_unparsable_body_still_raises(self):
+        with self.assertRaises(ValueError):
+            await self._read([b"<html>bad gateway</html>\n"], "text/html")
+
+    async def test_post_llm_reports_empty_streams_as_empty_completion(self):
+        body = b"".join(ndjson_frames({"response": "", "done": False}, {"response": "", "done": True}))
+
+        async def send(self_client, request, **kwargs):
+            return httpx.Response(200, content=body, headers={"content-type": "application/x-ndjson"}, request=request)
+
+        with (
+            patch.object(settings, "LLM_MAX_RETRIES", 0),
+            patch.object(settings, "LLM_FALLBACK_BASE_URL", None),
+            patch.object(httpx.AsyncClient, "send", autospec=True, side_effect=send),
+            patch.object(llm_client.asyncio, "sleep", AsyncMock()),
+        ):
+            with self.assertRaises(llm_client.LLMUpstreamError) as raised:
+                await llm_client.generate("gemma-test", [{"role": "user", "content": "ping"}])
+
+        self.assertEqual(raised.exception.code, "EMPTY_COMPLETION")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.config import settings
+from app.services import llm_client, llm_warmup
+
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+class KeepAliveTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests: list[dict] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            payload = json.loads(request.content)
+            self.requests.append({"path": request.url.path, "json": payload})
+            if "messages" not in payload and "prompt" not in payload:
+                return httpx.Response(200, json={"done": True, "done_reason": "load", "load_duration": 2_500_000_000})
+            return httpx.Response(200, json={"message": {"content": "pong"}, "done": True, "load_duration": 40_000_000})
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.patches = [
+            patch.object(settings, "LLM_PRIMARY_PATH", "/api/chat"),
+            patch.object(settings, "LLM_FALLBACK_BASE_URL", "https://fallback.example.com"),
+            patch.object(settings, "LLM_FALLBACK_KIND", "openai_compatible"),
+            patch.object(settings, "LLM_HEDGE_ENABLED", False),
+            patch.object(settings, "OLLAMA_KEEP_ALIVE_SECS", 900),
+            patch.object(llm_client, "get_llm_http_client", AsyncMock(return_value=client)),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        await llm_client.aclose_llm_clients()
+
+    async def test_keep_alive_is_sent_and_load_times_are_observed(self):
+        await llm_client.generate("gemma-test", MESSAGES)
+
+        self.assertEqual(self.requests[0]["json"]["keep_alive"], 900)
+        model = llm_warmup.snapshot()["models"]["primary:gemma-test"]
+        self.assertEqual(model["last_request_load_ms"], 40.0)
+        self.assertEqual(model["warmups"], 0)
+
+    async def test_warm_up_loads_without_generating(self):
+        # Only Ollama hosts are warmed; the OpenAI-compatible fallback is not.
+        self.assertEqual(llm_client.warmup_targets(), [("primary", settings.LLM_MODEL)])
+
+        await llm_warmup.warm(("primary", "gemma-test"), llm_client.warm_model)
+
+        (request,) = self.requests
+        self.assertEqual(request["path"], "/api/chat")
+        self.assertEqual(request["json"], {"model": "gemma-test", "stream": False, "keep_alive": 900})
+        model = llm_warmup.snapshot()["models"]["primary:gemma-test"]
+        self.assertEqual((model["warmups"], model["last_warmup_load_ms"]), (1, 2500.0))
+        # A startup warm-up is not traffic: it does not keep the model loaded.
+        self.assertEqual(llm_warmup.due(float("inf")), [])
+
+
+class WarmerScheduleTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.patches = [
+            patch.object(settings, "OLLAMA_KEEP_ALIVE_SECS", 60),
+            patch.object(settings, "LLM_WARMUP_IDLE_SECS", 600.0),
+            patch.object(settings, "LLM_WARMUP_MARGIN_SECS", 10.0),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    async def test_models_with_recent_traffic_are_refreshed_before_expiry(self):
+        llm_warmup.observe("primary", "gemma-test", {"load_duration": 0})
+        state = llm_warmup._states[("primary", "gemma-test")]
+        start = state.last_request
+
+        self.assertEqual(llm_warmup.due(start + 30), [])
+        self.assertEqual(llm_warmup.due(start + 50), [("primary", "gemma-test")])
+        # No requests for longer than LLM_WARMUP_IDLE_SECS: let it unload.
+        self.assertEqual(llm_warmup.due(start + 601), [])
+
+        with patch.object(settings, "OLLAMA_KEEP_ALIVE_SECS", -1):
+            self.assertEqual(llm_warmup.due(start + 50), [])
+
+    async def test_warmer_loads_targets_then_refreshes_due_models(self):
+        pings: list[tuple[str, str]] = []
+        refreshed = asyncio.Event()
+
+        async def ping(provider, model):
+            pings.append((provider, model))
+            if len(pings) == 2:
+                refreshed.set()
+            return 12.5
+
+        stop = asyncio.Event()
+        with patch.object(settings, "LLM_WARMUP_MARGIN_SECS", 0.02), patch.object(settings, "OLLAMA_KEEP_ALIVE_SECS", 0.03):
+            llm_warmup.observe("primary", "gemma-test", None)
+            task = asyncio.create_task(llm_warmup.run_warmer(ping, [("fallback", "gemma-big")], stop))
+            await asyncio.wait_for(refreshed.wait(), timeout=1)
+            stop.set()
+            await task
+
+        self.assertEqual(pings[:2], [("fallback", "gemma-big"), ("primary", "gemma-test")])
+        self.assertEqual(llm_warmup.snapshot()["models"]["primary:gemma-test"]["last_warmup_load_ms"], 12.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
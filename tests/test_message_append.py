@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.repository import thread as repository
+
+
+def _rpc_missing():
+    request = httpx.Request("POST", "https://project.example.supabase.co/rest/v1/rpc/append_messages")
+    response = httpx.Response(404, json={"code": "PGRST202"}, request=request)
+    return httpx.HTTPStatusError("not found", request=request, response=response)
+
+
+class MessageAppendTests(unittest.IsolatedAsyncioTestCase):
+    def tearDown(self):
+        repository._append_rpc_missing = False
+
+    async def test_chat_turn_append_is_one_round_trip(self):
+        rpc = AsyncMock(
+            return_value=[
+                {
+                    "thread_id": "thread-1",
+                    "index": "7",
+                    "role": "user",
+                    "content": "질문",
+                    "created_at": "2026-01-01T00:00:00+00:00",
+                }
+            ]
+        )
+        with (
+            patch.object(repository.sb, "rest_rpc_async", rpc),
+            patch.object(repository.sb, "rest_select_async") as select,
+            patch.object(repository.sb, "rest_insert_async") as insert,
+        ):
+            row = await repository.insert_and_fetch_message("thread-1", "user", "  질문 ", "token")
+
+        self.assertEqual(row["index"], 7)
+        self.assertEqual(row["content"], "질문")
+        rpc.assert_awaited_once_with(
+            "append_messages",
+            {"p_thread_id": "thread-1", "p_messages": [{"role": "user", "content": "질문"}]},
+            "token",
+        )
+        select.assert_not_called()
+        insert.assert_not_called()
+
+    async def test_add_messages_sends_batch_in_order(self):
+        rpc = AsyncMock(
+            return_value=[
+                {"index": 4, "role": "assistant", "content": "답"},
+                {"index": 3, "role": "user", "content": "질문"},
+            ]
+        )
+        with (
+            patch.object(repository, "_can_access_thread", AsyncMock(return_value=True)),
+            patch.object(repository.sb, "rest_rpc_async", rpc),
+        ):
+            owned, added = await repository.add_messages_to_thread(
+                "owner-1",
+                "thread-1",
+                [{"role": "USER", "content": "질문"}, {"role": "bot", "content": "답"}],
+                "token",
+            )
+
+        self.assertEqual((owned, added), (True, 2))
+        self.assertEqual(
+            rpc.await_args.args[1]["p_messages"],
+            [{"role": "user", "content": "질문"}, {"role": "assistant", "content": "답"}],
+        )
+
+    async def test_missing_rpc_falls_back_and_is_remembered(self):
+        rpc = AsyncMock(side_effect=_rpc_missing())
+        select = AsyncMock(return_value=[{"index": 2}])
+        insert = AsyncMock(return_value={})
+        with (
+            patch.object(repository.sb, "rest_rpc_async", rpc),
+            patch.object(repository.sb, "rest_select_async", select),
+            patch.object(repository.sb, "rest_insert_async", insert),
+        ):
+            first = await repository.insert_and_fetch_message("thread-1", "user", "하나", "token")
+            await repository.insert_and_fetch_message("thread-1", "assistant", "둘", "token")
+
+        self.assertEqual(first["index"], 3)
+        self.assertEqual(insert.await_args_list[0].args[1][0]["index"], 3)
+        self.assertEqual(rpc.await_count, 1)
+        self.assertEqual(insert.await_count, 2)
+
+    async def test_other_rpc_errors_propagate(self):
+        request = httpx.Request("POST", "https://project.example.supabase.co/rest/v1/rpc/append_messages")
+        error = httpx.HTTPStatusError(
+            "forbidden",
+            request=request,
+            response=httpx.Response(403, request=request),
+        )
+        with patch.object(repository.sb, "rest_rpc_async", AsyncMock(side_effect=error)):
+            with self.assertRaises(httpx.HTTPStatusError):
+                await repository.insert_and_fetch_message("thread-1", "user", "질문", "token")
+
+        self.assertFalse(repository._append_rpc_missing)
+
+
+if __name__ == "__main__":
+    unittest.main()
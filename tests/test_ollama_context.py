@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+from app.repository import thread as repository
+from app.services import background, llm_client
+from app.services.ollama_context import ContextCache, context_cache
+from tests.fake_supabase import FakeSupabase
+from tests.stream_helpers import ndjson
+
+
+THREAD_ID = "33333333-3333-4333-8333-333333333333"
+
+
+def _answer(text: str, context: list[int]) -> httpx.Response:
+    body = ndjson(
+        {"response": text, "done": False},
+        {"response": "", "done": True, "context": context, "prompt_eval_count": 4, "prompt_eval_duration": 2_000_000},
+    )
+    return httpx.Response(200, content=body, headers={"content-type": "application/x-ndjson"})
+
+
+class OllamaContextReuseTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = FakeSupabase()
+        owner = self.fake.add_user("owner@example.com", user_id="context-owner")
+        self.token = owner["access_token"]
+        self.headers = {"Authorization": f"Bearer {self.token}"}
+        self.fake.insert("threads", {"id": THREAD_ID, "title": "대화", "owner_id": "context-owner", "is_workspace": False})
+        self.install = self.fake.installed()
+        await self.install.__aenter__()
+        self.requests: list[dict] = []
+        self.responses: list[httpx.Response] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(json.loads(request.content))
+            return self.responses.pop(0)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.patches = [
+            patch.object(settings, "LLM_PRIMARY_PATH", "/api/generate"),
+            patch.object(settings, "OLLAMA_CONTEXT_ENABLED", True),
+            patch.object(llm_client, "get_llm_http_client", AsyncMock(return_value=client)),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        await background.drain(cancel=True)
+        for p in reversed(self.patches):
+            p.stop()
+        await self.install.__aexit__(None, None, None)
+        await llm_client.aclose_llm_clients()
+
+    async def _chat(self, content: str, model: str = "gemma-test") -> dict:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            response = await client.post(
+                f"/threads/{THREAD_ID}/chat",
+                json={"content": content, "model": model},
+                headers=self.headers,
+            )
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    async def test_second_turn_sends_the_context_the_first_returned(self):
+        self.responses += [_answer("첫 답변", [1, 2, 3]), _answer("둘째 답변", [1, 2, 3, 4, 5])]
+
+        first = await self._chat("첫 질문")
+        second = await self._chat("둘째 질문")
+
+        self.assertNotIn("context", self.requests[0])
+        self.assertEqual(self.requests[1]["context"], [1, 2, 3])
+        self.assertEqual(self.requests[1]["prompt"], "둘째 질문")
+        self.assertFalse(first["context"]["ollama_context_reused"])
+        self.assertTrue(second["context"]["ollama_context_reused"])
+        self.assertEqual(
+            context_cache.get(THREAD_ID), {"model": "gemma-test", "through_index": 3, "context": [1, 2, 3, 4, 5]}
+        )
+
+    async def test_stale_or_foreign_context_starts_fresh(self):
+        self.fake.insert("messages", {"thread_id": THREAD_ID, "index": 0, "role": "user", "content": "안녕"})
+        self.fake.insert("messages", {"thread_id": THREAD_ID, "index": 1, "role": "assistant", "content": "반가워요"})
+        # Written before another client added a turn: it ends at index 0, not 1.
+        context_cache.put(THREAD_ID, {"model": "gemma-test", "through_index": 0, "context": [9]})
+        self.responses += [_answer("답변", [7]), _answer("답변", [8])]
+
+        await self._chat("질문")
+        self.assertNotIn("context", self.requests[0])
+
+        # Same position, different model.
+        await self._chat("또 질문", model="llama-test")
+        self.assertNotIn("context", self.requests[1])
+
+    async def test_persisted_context_survives_a_cold_cache(self):
+        self.responses += [_answer("첫 답변", [1, 2, 3]), _answer("둘째 답변", [4])]
+
+        with patch.object(settings, "OLLAMA_CONTEXT_PERSIST", True):
+            await self._chat("첫 질문")
+            await background.drain()
+            context_cache.clear()
+            await self._chat("둘째 질문")
+            await background.drain()
+
+        self.assertEqual(self.requests[1]["context"], [1, 2, 3])
+        stored = await repository.get_ollama_context(THREAD_ID, self.token)
+        self.assertEqual(stored, {"model": "gemma-test", "through_index": 3, "context": [4]})
+        # The token array stays out of the marker every thread listing reads,
+        # and the second turn was appended below its reserved row.
+        indexes = sorted(row["index"] for row in self.fake.rows("messages"))
+        self.assertEqual(indexes, [0, 1, 2, 3, repository.OLLAMA_CONTEXT_INDEX])
+
+    async def test_newer_context_is_stored_after_a_running_store(self):
+        release = asyncio.Event()
+        stored: list[int] = []
+
+        async def store(through_index: int) -> None:
+            await release.wait()
+            stored.append(through_index)
+
+        key = f"ollama-context:{THREAD_ID}"
+        background.spawn_latest(key, lambda: store(1))
+        await asyncio.sleep(0)  # the first store is now running
+        for through_index in (3, 5):
+            background.spawn_latest(key, lambda i=through_index: store(i))
+        release.set()
+        await background.drain()
+
+        # The running store finishes, the superseded one is skipped.
+        self.assertEqual(stored, [1, 5])
+
+    async def test_chat_mode_hosts_never_get_a_context(self):
+        self.responses.append(_answer("답변", [1]))
+
+        with patch.object(settings, "LLM_PRIMARY_PATH", "/api/chat"):
+            result = await self._chat("질문")
+
+        self.assertNotIn("context", self.requests[0])
+        self.assertIsNone(result["context"]["ollama_context_reused"])
+        self.assertIsNone(context_cache.get(THREAD_ID))
+
+
+class ContextCacheTests(unittest.TestCase):
+    def test_least_recently_used_thread_is_evicted(self):
+        cache = ContextCache()
+        with patch.object(settings, "OLLAMA_CONTEXT_CACHE_MAX_THREADS", 2):
+            cache.put("a", {"context": [1]})
+            cache.put("b", {"context": [2]})
+            cache.get("a")
+            cache.put("c", {"context": [3]})
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {"context": [1]})
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
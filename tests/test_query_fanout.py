@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+from app.repository import thread as repository
+from app.repository.concurrency import gather_queries
+
+
+class GatherQueriesTests(unittest.IsolatedAsyncioTestCase):
+    async def test_results_keep_argument_order_and_respect_limit(self):
+        in_flight = 0
+        peak = 0
+
+        async def query(value, delay):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(delay)
+            in_flight -= 1
+            return value
+
+        results = await gather_queries(
+            *(query(n, 0.01 * (5 - n)) for n in range(5)),
+            limit=2,
+        )
+
+        self.assertEqual(results, [0, 1, 2, 3, 4])
+        self.assertEqual(peak, 2)
+
+    async def test_failure_cancels_pending_queries(self):
+        finished = []
+
+        async def slow():
+            await asyncio.sleep(1)
+            finished.append("slow")
+
+        async def broken():
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            await gather_queries(slow(), broken(), slow(), limit=2)
+        await asyncio.sleep(0)
+
+        self.assertEqual(finished, [])
+
+
+class ThreadDetailFanoutTests(unittest.IsolatedAsyncioTestCase):
+    async def test_detail_wall_time_tracks_slowest_read(self):
+        async def select(table, query, access_token):
+            await asyncio.sleep(0.1)
+            if table == "threads":
+                return [
+                    {
+                        "id": "thread-1",
+                        "title": "제목",
+                        "created_at": "2026-01-01T00:00:00+00:00",
+                        "is_workspace": False,
+                        "owner_id": "owner-1",
+                    }
+                ]
+            if table == "thread_members":
+                return []
+            if "select=content" in query:
+                return []
+            return [
+                {
+                    "index": 0,
+                    "role": "user",
+                    "content": "질문",
+                    "created_at": "2026-01-01T00:00:00+00:00",
+                }
+            ]
+
+        with patch.object(repository.sb, "rest_select_async", side_effect=select) as selected:
+            started = time.perf_counter()
+            thread = await repository.get_thread_detail("owner-1", "thread-1", "token")
+            elapsed = time.perf_counter() - started
+
+        self.assertEqual(thread["messages"][0]["content"], "질문")
+        self.assertTrue(thread["can_rename"])
+        self.assertEqual(selected.await_count, 4)
+        self.assertLess(elapsed, 0.25)
+
+
+if __name__ == "__main__":
+    unittest.main()
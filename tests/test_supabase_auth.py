@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+import httpx
+import jwt
+
+from app.core.config import settings
+from app.db import supabase as sb
+from app.db.supabase_auth import (
+    TokenValidationCache,
+    authenticate_access_token,
+    jwks_cache,
+    token_cache,
+    verify_access_token_locally,
+)
+from app.repository import auth as auth_repository
+from app.main import app
+from tests.fake_supabase import FAKE_SUPABASE_URL, FakeSupabase
+
+
+def _calls_to(fake: FakeSupabase, path: str) -> int:
+    return sum(1 for call in fake.calls if call.path == path)
+
+
+class LocalVerificationTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        jwks_cache.clear()
+        self.fake = FakeSupabase()
+        self.user = self.fake.add_user("owner@example.com", user_id="owner-1")
+        self.install = self.fake.installed()
+        await self.install.__aenter__()
+        self.mode = patch.object(settings, "SUPABASE_AUTH_VERIFY_MODE", "local")
+        self.mode.start()
+
+    async def asyncTearDown(self):
+        self.mode.stop()
+        await self.install.__aexit__(None, None, None)
+        jwks_cache.clear()
+
+    async def test_es256_token_is_verified_without_calling_auth_user(self):
+        token = self.fake.issue_jwt("owner-1")
+
+        first = await authenticate_access_token(token)
+        second = await authenticate_access_token(token)
+
+        self.assertEqual(first["id"], "owner-1")
+        self.assertEqual(first["email"], "owner@example.com")
+        self.assertEqual(second, first)
+        self.assertEqual(_calls_to(self.fake, "/auth/v1/user"), 0)
+        # The key set is fetched once and reused.
+        self.assertEqual(_calls_to(self.fake, "/auth/v1/.well-known/jwks.json"), 1)
+
+    async def test_expired_and_foreign_tokens_are_rejected(self):
+        expired = self.fake.issue_jwt("owner-1", expires_in=-60)
+        wrong_audience = self.fake.issue_jwt("owner-1", aud="service")
+        wrong_issuer = self.fake.issue_jwt("owner-1", iss="https://other.supabase.co/auth/v1")
+
+        for token in (expired, wrong_audience, wrong_issuer):
+            with self.assertRaises(sb.SupabaseAuthError):
+                await authenticate_access_token(token)
+        with self.assertRaises(sb.SupabaseAuthError):
+            await authenticate_access_token("not-a-jwt")
+        self.assertEqual(_calls_to(self.fake, "/auth/v1/user"), 0)
+
+    async def test_unknown_kid_falls_back_to_remote_validation(self):
+        token = self.fake.issue_jwt("owner-1", kid="rotated-key")
+
+        user = await authenticate_access_token(token)
+        await authenticate_access_token(token)
+
+        self.assertEqual(user["id"], "owner-1")
+        # The remote verdict is cached, and the second kid miss is inside the
+        # refresh interval, so neither endpoint is called again.
+        self.assertEqual(_calls_to(self.fake, "/auth/v1/user"), 1)
+        self.assertEqual(_calls_to(self.fake, "/auth/v1/.well-known/jwks.json"), 1)
+
+    async def test_hs256_uses_secret_or_defers_to_remote(self):
+        claims = {
+            "sub": "owner-1",
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": "owner@example.com",
+            "iss": f"{FAKE_SUPABASE_URL}/auth/v1",
+            "exp": int(time.time()) + 3600,
+        }
+        token = jwt.encode(claims, "x" * 32, algorithm="HS256")
+        self.fake.tokens[token] = "owner-1"
+
+        self.assertIsNone(await verify_access_token_locally(token))
+        self.assertEqual((await authenticate_access_token(token))["id"], "owner-1")
+        self.assertEqual(_calls_to(self.fake, "/auth/v1/user"), 1)
+
+        with patch.object(settings, "SUPABASE_JWT_SECRET", "x" * 32):
+            self.assertEqual((await authenticate_access_token(token))["id"], "owner-1")
+            forged = jwt.encode(claims, "y" * 32, algorithm="HS256")
+            with self.assertRaises(sb.SupabaseAuthError):
+                await authenticate_access_token(forged)
+        self.assertEqual(_calls_to(self.fake, "/auth/v1/user"), 1)
+
+    async def test_remote_mode_keeps_calling_auth_user(self):
+        token = self.fake.issue_jwt("owner-1")
+        with patch.object(settings, "SUPABASE_AUTH_VERIFY_MODE", "remote"):
+            await authenticate_access_token(token)
+        self.assertEqual(_calls_to(self.fake, "/auth/v1/user"), 1)
+
+    async def test_jwks_refresh_failure_keeps_previous_keys(self):
+        token = self.fake.issue_jwt("owner-1")
+        await authenticate_access_token(token)
+
+        with (
+            patch.object(self.fake, "jwks", side_effect=RuntimeError("down")),
+            patch.object(settings, "SUPABASE_JWKS_TTL_SECS", 0.0),
+        ):
+            user = await authenticate_access_token(token)
+
+        self.assertEqual(user["id"], "owner-1")
+        self.assertEqual(_calls_to(self.fake, "/auth/v1/user"), 0)
+
+    async def test_protected_route_authenticates_locally(self):
+        token = self.fake.issue_jwt("owner-1")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            response = await client.get("/threads", headers={"Authorization": f"Bearer {token}"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(_calls_to(self.fake, "/auth/v1/user"), 0)
+
+
+class TokenValidationCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = FakeSupabase(latency=0.02)
+        self.fake.add_user("owner@example.com", user_id="owner-1")
+        self.install = self.fake.installed()
+        await self.install.__aenter__()
+
+    async def asyncTearDown(self):
+        await self.install.__aexit__(None, None, None)
+
+    async def test_concurrent_lookups_share_one_upstream_call(self):
+        token = self.fake.issue_jwt("owner-1")
+
+        users = await asyncio.gather(*(authenticate_access_token(token) for _ in range(8)))
+        again = await authenticate_access_token(token)
+
+        self.assertEqual({user["id"] for user in users}, {"owner-1"})
+        self.assertEqual(again["id"], "owner-1")
+        self.assertEqual(_calls_to(self.fake, "/auth/v1/user"), 1)
+        stats = token_cache.stats()
+        self.assertEqual((stats["misses"], stats["coalesced"], stats["hits"]), (1, 7, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 8 / 9, places=3)
+
+    async def test_ttl_is_capped_by_token_expiry(self):
+        expired = self.fake.issue_jwt("owner-1", expires_in=-60)
+
+        await authenticate_access_token(expired)
+        await authenticate_access_token(expired)
+
+        self.assertEqual(_calls_to(self.fake, "/auth/v1/user"), 2)
+        self.assertEqual(token_cache.stats()["entries"], 0)
+
+    async def test_rejections_are_negatively_cached_but_outages_are_not(self):
+        for _ in range(2):
+            with self.assertRaises(sb.SupabaseAuthError):
+                await authenticate_access_token("revoked-token")
+        self.assertEqual(_calls_to(self.fake, "/auth/v1/user"), 1)
+        self.assertEqual(token_cache.stats()["negative_hits"], 1)
+
+        cache = TokenValidationCache()
+        calls = []
+
+        async def unavailable(token):
+            calls.append(token)
+            raise sb.SupabaseAuthError("Supabase /auth/v1/user 호출 실패: 502", status_code=502)
+
+        for _ in range(2):
+            with self.assertRaises(sb.SupabaseAuthError):
+                await cache.get_or_validate("token", unavailable)
+        self.assertEqual(len(calls), 2)
+
+    async def test_least_recently_used_entries_are_evicted(self):
+        tokens = [self.fake.issue_jwt("owner-1") for _ in range(3)]
+        with patch.object(settings, "SUPABASE_TOKEN_CACHE_MAX_ENTRIES", 2):
+            await authenticate_access_token(tokens[0])
+            await authenticate_access_token(tokens[1])
+            await authenticate_access_token(tokens[0])
+            await authenticate_access_token(tokens[2])  # evicts tokens[1]
+            self.fake.reset_calls()
+            await authenticate_access_token(tokens[0])
+            await authenticate_access_token(tokens[1])
+
+        self.assertEqual(_calls_to(self.fake, "/auth/v1/user"), 1)
+        self.assertGreaterEqual(token_cache.stats()["evictions"], 1)
+
+    async def test_logout_drops_the_cached_verdict(self):
+        token = self.fake.issue_jwt("owner-1")
+        await authenticate_access_token(token)
+
+        await asyncio.to_thread(auth_repository.revoke_if_possible, token)
+
+        with self.assertRaises(sb.SupabaseAuthError):
+            await authenticate_access_token(token)
+
+    async def test_health_endpoint_reports_cache_stats(self):
+        token = self.fake.issue_jwt("owner-1")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            headers = {"Authorization": f"Bearer {token}"}
+            await client.get("/health/auth", headers=headers)
+            response = await client.get("/health/auth", headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()["token_cache"]
+        self.assertEqual((stats["misses"], stats["hits"]), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
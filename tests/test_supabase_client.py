@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.config import settings
+from app.db import supabase as sb
+
+
+class PooledSupabaseClientTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        await sb.aclose_http_clients()
+
+    async def test_async_helpers_share_one_pooled_client(self):
+        first = sb.get_async_http_client()
+        second = sb.get_async_http_client()
+        self.assertIs(first, second)
+
+        response = httpx.Response(
+            200,
+            json=[{"id": "thread-1"}],
+            request=httpx.Request("GET", "https://project.example.supabase.co"),
+        )
+        with (
+            patch.object(settings, "SUPABASE_URL", "https://project.example.supabase.co"),
+            patch.object(settings, "SUPABASE_ANON_KEY", "anon-key"),
+            patch.object(first, "get", new=AsyncMock(return_value=response)) as get,
+        ):
+            rows = await sb.rest_select_async("threads", "select=id", "token")
+            await sb.rest_select_async("threads", "select=id", "token")
+
+        self.assertEqual(rows, [{"id": "thread-1"}])
+        self.assertEqual(get.await_count, 2)
+        url = get.await_args.args[0]
+        self.assertEqual(url, "https://project.example.supabase.co/rest/v1/threads?select=id")
+        self.assertEqual(get.await_args.kwargs["headers"]["Authorization"], "Bearer token")
+
+    async def test_close_releases_clients_and_next_call_reopens(self):
+        sync_client = sb.get_http_client()
+        async_client = sb.get_async_http_client()
+
+        await sb.aclose_http_clients()
+
+        self.assertTrue(sync_client.is_closed)
+        self.assertTrue(async_client.is_closed)
+        self.assertIsNot(sb.get_http_client(), sync_client)
+        self.assertIsNot(sb.get_async_http_client(), async_client)
+
+    async def test_status_errors_surface_as_httpx_errors(self):
+        client = sb.get_async_http_client()
+        response = httpx.Response(
+            409,
+            request=httpx.Request("POST", "https://project.example.supabase.co"),
+        )
+        with (
+            patch.object(settings, "SUPABASE_URL", "https://project.example.supabase.co"),
+            patch.object(settings, "SUPABASE_ANON_KEY", "anon-key"),
+            patch.object(client, "post", new=AsyncMock(return_value=response)),
+        ):
+            with self.assertRaises(httpx.HTTPStatusError) as raised:
+                await sb.rest_insert_async("bookmarks", [{}], "token")
+
+        self.assertEqual(raised.exception.response.status_code, 409)
+
+
+class LoopChangeTests(unittest.TestCase):
+    def tearDown(self):
+        asyncio.run(sb.aclose_http_clients())
+
+    def test_client_of_a_finished_loop_is_closed_when_replaced(self):
+        async def client():
+            return sb.get_async_http_client()
+
+        old = asyncio.run(client())
+
+        async def next_loop():
+            new = sb.get_async_http_client()
+            await sb.aclose_http_clients()
+            return new
+
+        new = asyncio.run(next_loop())
+        self.assertIsNot(new, old)
+        self.assertTrue(old.is_closed)
+
+    def test_client_of_a_running_loop_is_closed_on_that_loop(self):
+        other = asyncio.new_event_loop()
+        thread = threading.Thread(target=other.run_forever, daemon=True)
+        thread.start()
+        try:
+
+            async def client():
+                return sb.get_async_http_client()
+
+            old = asyncio.run_coroutine_threadsafe(client(), other).result(timeout=2)
+            new = asyncio.run(client())
+            deadline = time.monotonic() + 2
+            while not old.is_closed and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            other.call_soon_threadsafe(other.stop)
+            thread.join(timeout=2)
+            other.close()
+
+        self.assertIsNot(new, old)
+        self.assertTrue(old.is_closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import asyncio
 import unittest
 from unittest.mock import AsyncMock, patch
 
+import httpx
+
+from app.main import app
 from app.repository import thread as repository
+from app.services import background
+from tests.fake_supabase import FakeSupabase
 
 
 class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
@@ -45,15 +51,13 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
             inserted.append((table, rows))
             return {}
 
+        generate = AsyncMock(return_value="핵심 맥락을 요약했습니다.")
         with (
-            patch.object(repository.sb, "rest_select", side_effect=select),
-            patch.object(repository.sb, "rest_insert", side_effect=insert),
+            patch.object(repository.sb, "rest_select_async", side_effect=select),
+            patch.object(repository.sb, "rest_insert_async", side_effect=insert),
+            patch.object(repository.sb, "rest_update_async", return_value=[]),
             patch.object(repository, "uuid4", return_value="child-thread"),
-            patch.object(
-                repository.llm_client,
-                "generate",
-                new=AsyncMock(return_value="핵심 맥락을 요약했습니다."),
-            ),
+            patch.object(repository.llm_client, "generate", new=generate),
         ):
             result = await repository.create_thread_branch(
                 owner_id="owner-1",
@@ -61,6 +65,9 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
                 access_token="token",
                 requested_model="gemini-2.5-flash",
             )
+            # The LLM summary is not on the request path.
+            generate.assert_not_awaited()
+            await background.drain()
 
         self.assertEqual(result["thread_id"], "child-thread")
         self.assertEqual(result["title"], "원본")
@@ -80,12 +87,15 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(metadata["parent_thread_id"], "parent-thread")
         self.assertEqual(metadata["model"], "gemini-2.5-flash")
         self.assertEqual(metadata["context_preview"], result["context_preview"])
+        self.assertTrue(result["context_preview_provisional"])
+        self.assertTrue(metadata["context_preview_provisional"])
         self.assertEqual(len(child_message_insert), 1)
+        generate.assert_awaited_once()
 
     async def test_create_branch_rejects_non_owner(self):
         with patch.object(
             repository.sb,
-            "rest_select",
+            "rest_select_async",
             return_value=[{"id": "parent-thread", "title": "원본", "owner_id": "someone-else"}],
         ):
             with self.assertRaises(repository.BranchForbiddenError):
@@ -136,8 +146,9 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
 
         generate = AsyncMock(return_value="핵심 맥락")
         with (
-            patch.object(repository.sb, "rest_select", side_effect=select),
-            patch.object(repository.sb, "rest_insert", side_effect=insert),
+            patch.object(repository.sb, "rest_select_async", side_effect=select),
+            patch.object(repository.sb, "rest_insert_async", side_effect=insert),
+            patch.object(repository.sb, "rest_update_async", return_value=[{"index": repository.BRANCH_META_INDEX}]),
             patch.object(repository, "uuid4", return_value="child-thread"),
             patch.object(repository.llm_client, "generate", new=generate),
         ):
@@ -147,6 +158,7 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
                 access_token="token",
                 requested_model="gemini-3.6-flash",
             )
+            await background.drain()
 
         self.assertEqual(result["thread_id"], "child-thread")
         self.assertEqual(generate.await_args.kwargs["model"], "gemini-3.6-flash")
@@ -197,8 +209,9 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
             return {}
 
         with (
-            patch.object(repository.sb, "rest_select", side_effect=select),
-            patch.object(repository.sb, "rest_insert", side_effect=insert),
+            patch.object(repository.sb, "rest_select_async", side_effect=select),
+            patch.object(repository.sb, "rest_insert_async", side_effect=insert),
+            patch.object(repository.sb, "rest_update_async", return_value=[]),
             patch.object(repository, "uuid4", return_value="workspace-child"),
             patch.object(
                 repository.llm_client,
@@ -238,8 +251,8 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
             return []
 
         with (
-            patch.object(repository.sb, "rest_select", side_effect=select),
-            patch.object(repository.sb, "rest_insert") as insert,
+            patch.object(repository.sb, "rest_select_async", side_effect=select),
+            patch.object(repository.sb, "rest_insert_async") as insert,
         ):
             with self.assertRaises(repository.BranchModelError):
                 await repository.create_thread_branch(
@@ -250,16 +263,16 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
                 )
             insert.assert_not_called()
 
-    def test_update_thread_title_requires_owner_and_trims_title(self):
+    async def test_update_thread_title_requires_owner_and_trims_title(self):
         with (
             patch.object(
                 repository.sb,
-                "rest_select",
+                "rest_select_async",
                 return_value=[{"id": "thread-id"}],
             ),
-            patch.object(repository.sb, "rest_update") as update,
+            patch.object(repository.sb, "rest_update_async") as update,
         ):
-            title = repository.update_thread_title(
+            title = await repository.update_thread_title(
                 owner_id="owner-1",
                 thread_id="thread-id",
                 title="  새 이름  ",
@@ -270,12 +283,12 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
         update.assert_called_once()
         self.assertEqual(update.call_args.args[2], {"title": "새 이름"})
 
-    def test_update_thread_title_masks_non_owner_as_missing(self):
+    async def test_update_thread_title_masks_non_owner_as_missing(self):
         with (
-            patch.object(repository.sb, "rest_select", return_value=[]),
-            patch.object(repository.sb, "rest_update") as update,
+            patch.object(repository.sb, "rest_select_async", return_value=[]),
+            patch.object(repository.sb, "rest_update_async") as update,
         ):
-            title = repository.update_thread_title(
+            title = await repository.update_thread_title(
                 owner_id="owner-1",
                 thread_id="thread-id",
                 title="새 이름",
@@ -285,7 +298,7 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
         self.assertIsNone(title)
         update.assert_not_called()
 
-    def test_branch_tree_returns_only_lineages_and_nests_children(self):
+    async def test_branch_tree_returns_only_lineages_and_nests_children(self):
         root_meta = repository._encode_branch_metadata(
             {
                 "version": 1,
@@ -355,10 +368,10 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
             return []
 
         with (
-            patch.object(repository.sb, "rest_select", side_effect=select),
+            patch.object(repository.sb, "rest_select_async", side_effect=select),
             patch.object(repository, "_ensure_tutorial_branch"),
         ):
-            roots = repository.list_branch_trees("owner-1", "token")
+            roots = await repository.list_branch_trees("owner-1", "token")
 
         self.assertEqual([node["thread_id"] for node in roots], ["root"])
         self.assertEqual(roots[0]["children"][0]["thread_id"], "child")
@@ -367,7 +380,7 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
             "grandchild",
         )
 
-    def test_workspace_member_sees_complete_tree_but_only_root_is_workspace(self):
+    async def test_workspace_member_sees_complete_tree_but_only_root_is_workspace(self):
         root_meta = repository._encode_branch_metadata(
             {
                 "version": 1,
@@ -419,10 +432,10 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
             return []
 
         with (
-            patch.object(repository.sb, "rest_select", side_effect=select),
+            patch.object(repository.sb, "rest_select_async", side_effect=select),
             patch.object(repository, "_ensure_tutorial_branch"),
         ):
-            roots = repository.list_branch_trees("member-1", "token")
+            roots = await repository.list_branch_trees("member-1", "token")
 
         self.assertEqual([root["id"] for root in roots], ["root"])
         self.assertTrue(roots[0]["is_workspace"])
@@ -432,12 +445,12 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
         self.assertFalse(roots[0]["children"][0]["is_workspace"])
         self.assertIsNone(roots[0]["children"][0]["workspace_role"])
 
-    def test_message_context_query_excludes_hidden_marker(self):
-        with patch.object(repository.sb, "rest_select", return_value=[]) as select:
-            repository.list_recent_messages("thread-id", 10, "token")
+    async def test_message_context_query_excludes_hidden_marker(self):
+        with patch.object(repository.sb, "rest_select_async", return_value=[]) as select:
+            await repository.list_recent_messages("thread-id", 10, "token")
         self.assertIn("index=gte.0", select.call_args.args[1])
 
-    def test_delete_root_removes_entire_branch_lineage(self):
+    async def test_delete_root_removes_entire_branch_lineage(self):
         root_metadata = {
             "parent_thread_id": None,
             "root_thread_id": "root",
@@ -457,7 +470,7 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
         with (
             patch.object(
                 repository.sb,
-                "rest_select",
+                "rest_select_async",
                 return_value=[
                     {
                         "id": "root",
@@ -482,7 +495,7 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
                 return_value=1,
             ) as hard_delete,
         ):
-            deleted = repository.delete_thread_by_id(
+            deleted = await repository.delete_thread_by_id(
                 "owner-1",
                 "root",
                 "token",
@@ -494,7 +507,7 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
             {"root", "child", "grandchild"},
         )
 
-    def test_delete_non_leaf_keeps_a_tombstone_node(self):
+    async def test_delete_non_leaf_keeps_a_tombstone_node(self):
         metadata = {
             "parent_thread_id": "root",
             "root_thread_id": "root",
@@ -502,7 +515,7 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
         with (
             patch.object(
                 repository.sb,
-                "rest_select",
+                "rest_select_async",
                 return_value=[
                     {
                         "id": "middle",
@@ -528,10 +541,10 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
                 },
             ),
             patch.object(repository, "_persist_thread_metadata") as persist,
-            patch.object(repository.sb, "rest_delete", return_value=1) as delete,
+            patch.object(repository.sb, "rest_delete_async", return_value=1) as delete,
             patch.object(repository, "_hard_delete_thread") as hard_delete,
         ):
-            deleted = repository.delete_thread_by_id(
+            deleted = await repository.delete_thread_by_id(
                 "owner-1",
                 "middle",
                 "token",
@@ -545,7 +558,7 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
         )
         hard_delete.assert_not_called()
 
-    def test_delete_leaf_removes_the_physical_thread(self):
+    async def test_delete_leaf_removes_the_physical_thread(self):
         metadata = {
             "parent_thread_id": "root",
             "root_thread_id": "root",
@@ -553,7 +566,7 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
         with (
             patch.object(
                 repository.sb,
-                "rest_select",
+                "rest_select_async",
                 return_value=[
                     {
                         "id": "leaf",
@@ -578,7 +591,7 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
                 return_value=1,
             ) as hard_delete,
         ):
-            deleted = repository.delete_thread_by_id(
+            deleted = await repository.delete_thread_by_id(
                 "owner-1",
                 "leaf",
                 "token",
@@ -588,5 +601,218 @@ class ThreadBranchRepositoryTests(unittest.IsolatedAsyncioTestCase):
         hard_delete.assert_called_once_with("leaf", "token")
 
 
+class AsyncBranchSummaryRouteTests(unittest.IsolatedAsyncioTestCase):
+    async def test_branch_returns_before_summary_and_marker_is_patched_later(self):
+        parent_id = "33333333-3333-4333-8333-333333333333"
+        fake = FakeSupabase()
+        owner = fake.add_user("owner@example.com", user_id="owner-1")
+        headers = {"Authorization": f"Bearer {owner['access_token']}"}
+        fake.insert("threads", {"id": parent_id, "title": "원본", "owner_id": "owner-1", "is_workspace": False})
+        fake.insert("messages", {"thread_id": parent_id, "index": 0, "role": "user", "content": "여행 계획 도와줘"})
+        fake.insert("messages", {"thread_id": parent_id, "index": 1, "role": "assistant", "content": "어디로 가시나요?"})
+        release = asyncio.Event()
+
+        async def slow_summary(model, messages, priority=None, profile=None):
+            await release.wait()
+            return "여행 계획 논의"
+
+        transport = httpx.ASGITransport(app=app)
+        async with fake.installed():
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                with patch.object(repository.llm_client, "generate", side_effect=slow_summary):
+                    created = await client.post(
+                        f"/threads/{parent_id}/branch", json={"model": "gemini-3.6-flash"}, headers=headers
+                    )
+                    self.assertEqual(created.status_code, 200)
+                    body = created.json()
+                    self.assertTrue(body["context_preview_provisional"])
+                    self.assertEqual(body["context_preview"], "어디로 가시나요?")
+
+                    release.set()
+                    await background.drain()
+
+                trees = await client.get("/threads/branches", headers=headers)
+
+        child = body["thread_id"]
+        marker = next(
+            row
+            for row in fake.rows("messages")
+            if row["thread_id"] == child and row["index"] == repository.BRANCH_META_INDEX
+        )
+        metadata = repository._decode_branch_metadata(marker["content"])
+        self.assertEqual(metadata["context_preview"], "여행 계획 논의")
+        self.assertFalse(metadata["context_preview_provisional"])
+        self.assertEqual(metadata["parent_thread_id"], parent_id)
+
+        nodes = [node for root in trees.json()["roots"] for node in root["children"]]
+        node = next(node for node in nodes if node["thread_id"] == child)
+        self.assertEqual((node["context_preview"], node["context_preview_provisional"]), ("여행 계획 논의", False))
+
+    async def test_finalized_preview_survives_the_first_chat_model_hint(self):
+        parent_id = "88888888-8888-4888-8888-888888888888"
+        fake = FakeSupabase()
+        owner = fake.add_user("owner@example.com", user_id="owner-1")
+        fake.insert("threads", {"id": parent_id, "title": "원본", "owner_id": "owner-1", "is_workspace": False})
+        fake.insert("messages", {"thread_id": parent_id, "index": 0, "role": "user", "content": "여행 계획 도와줘"})
+        child = None
+
+        def child_marker():
+            return next(
+                row
+                for row in fake.rows("messages")
+                if row["thread_id"] == child and row["index"] == repository.BRANCH_META_INDEX
+            )
+
+        def first_chat_lands_first(write):
+            # The branch's first chat stores its model hint just before the
+            # background finalize writes.
+            async def wrapped(*args, **kwargs):
+                if child and "gemini-3.6-pro" not in child_marker()["content"] and child in str(args):
+                    metadata = repository._decode_branch_metadata(child_marker()["content"])
+                    child_marker()["content"] = repository._encode_branch_metadata({**metadata, "model": "gemini-3.6-pro"})
+                return await write(*args, **kwargs)
+
+            return wrapped
+
+        async def summary(model, messages, priority=None, profile=None):
+            return "여행 계획 논의"
+
+        async with fake.installed():
+            with (
+                patch.object(repository.llm_client, "generate", side_effect=summary),
+                patch.object(repository.sb, "rest_update_async", first_chat_lands_first(repository.sb.rest_update_async)),
+                patch.object(repository.sb, "rest_rpc_async", first_chat_lands_first(repository.sb.rest_rpc_async)),
+            ):
+                created = await repository.create_thread_branch(
+                    "owner-1", parent_id, owner["access_token"], "gemini-3.6-flash"
+                )
+                child = created["thread_id"]
+                await background.drain()
+
+        metadata = repository._decode_branch_metadata(child_marker()["content"])
+        self.assertEqual((metadata["context_preview"], metadata["context_preview_provisional"]), ("여행 계획 논의", False))
+        self.assertEqual(metadata["model"], "gemini-3.6-pro")
+
+
+
+class BranchSummaryCacheTests(unittest.IsolatedAsyncioTestCase):
+    PARENT_ID = "44444444-4444-4444-8444-444444444444"
+
+    async def asyncSetUp(self):
+        self.fake = FakeSupabase()
+        owner = self.fake.add_user("owner@example.com", user_id="owner-1")
+        self.headers = {"Authorization": f"Bearer {owner['access_token']}"}
+        self.fake.insert("threads", {"id": self.PARENT_ID, "title": "원본", "owner_id": "owner-1", "is_workspace": False})
+        self.fake.insert("messages", {"thread_id": self.PARENT_ID, "index": 0, "role": "user", "content": "여행 계획 도와줘"})
+        self.fake.insert("messages", {"thread_id": self.PARENT_ID, "index": 1, "role": "assistant", "content": "어디로 가시나요?"})
+        self.release = asyncio.Event()
+        self.generate = AsyncMock(side_effect=self._summary)
+
+    async def _summary(self, model, messages, priority=None, profile=None):
+        await self.release.wait()
+        return f"요약 {self.generate.await_count}"
+
+    async def _branch(self, client: httpx.AsyncClient) -> dict:
+        response = await client.post(
+            f"/threads/{self.PARENT_ID}/branch", json={"model": "gemini-3.6-flash"}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _metadata(self, thread_id: str) -> dict:
+        marker = next(
+            row
+            for row in self.fake.rows("messages")
+            if row["thread_id"] == thread_id and row["index"] == repository.BRANCH_META_INDEX
+        )
+        return repository._decode_branch_metadata(marker["content"])
+
+    async def test_fan_out_shares_one_summary_and_later_branches_reuse_it(self):
+        transport = httpx.ASGITransport(app=app)
+        async with self.fake.installed():
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                with patch.object(repository.llm_client, "generate", self.generate):
+                    first = [await self._branch(client) for _ in range(3)]
+                    self.release.set()
+                    await background.drain()
+
+                    later = await self._branch(client)
+
+        self.generate.assert_awaited_once()
+        for body in first:
+            self.assertTrue(body["context_preview_provisional"])
+            self.assertEqual(self._metadata(body["thread_id"])["context_preview"], "요약 1")
+        self.assertEqual((later["context_preview"], later["context_preview_provisional"]), ("요약 1", False))
+
+        stored = self._metadata(self.PARENT_ID)[repository.BRANCH_SUMMARY_KEY]
+        self.assertEqual((stored["last_index"], stored["preview"]), (1, "요약 1"))
+        stats = repository.branch_summary_cache.stats()
+        self.assertEqual((stats["misses"], stats["coalesced"], stats["hits"]), (1, 2, 1))
+
+    async def test_persisted_summary_survives_restart_until_parent_changes(self):
+        self.release.set()
+        transport = httpx.ASGITransport(app=app)
+        async with self.fake.installed():
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                with patch.object(repository.llm_client, "generate", self.generate):
+                    await self._branch(client)
+                    await background.drain()
+
+                    # A fresh worker only has the parent's marker.
+                    repository.branch_summary_cache.clear()
+                    reused = await self._branch(client)
+                    self.generate.assert_awaited_once()
+
+                    self.fake.insert(
+                        "messages", {"thread_id": self.PARENT_ID, "index": 2, "role": "user", "content": "부산으로"}
+                    )
+                    moved_on = await self._branch(client)
+                    await background.drain()
+
+        self.assertEqual((reused["context_preview"], reused["context_preview_provisional"]), ("요약 1", False))
+        self.assertTrue(moved_on["context_preview_provisional"])
+        self.assertEqual(self.generate.await_count, 2)
+        stored = self._metadata(self.PARENT_ID)[repository.BRANCH_SUMMARY_KEY]
+        self.assertEqual((stored["last_index"], stored["preview"]), (2, "요약 2"))
+        self.assertEqual(stored["model"], repository.llm_client.resolve_gemini_model("gemini-3.6-flash"))
+
+    async def test_stored_summary_is_only_replaced_by_a_later_parent_state(self):
+        self.fake.insert(
+            "messages",
+            {
+                "thread_id": self.PARENT_ID,
+                "index": repository.BRANCH_META_INDEX,
+                "role": "assistant",
+                "content": repository._encode_branch_metadata(repository._default_thread_metadata(self.PARENT_ID)),
+            },
+        )
+        model = repository.llm_client.resolve_gemini_model("gemini-3.6-flash")
+        token = self.headers["Authorization"].split(" ", 1)[1]
+        async with self.fake.installed():
+            await repository._remember_branch_summary((self.PARENT_ID, 0, model), "첫 요약", token)
+            await repository._remember_branch_summary((self.PARENT_ID, 1, model), "둘째 요약", token)
+            # A slow job for an older parent state must not win.
+            await repository._remember_branch_summary((self.PARENT_ID, 0, model), "늦은 요약", token)
+
+        stored = self._metadata(self.PARENT_ID)[repository.BRANCH_SUMMARY_KEY]
+        self.assertEqual((stored["last_index"], stored["preview"]), (1, "둘째 요약"))
+
+    async def test_failed_summary_is_not_cached(self):
+        self.generate.side_effect = RuntimeError("upstream down")
+        transport = httpx.ASGITransport(app=app)
+        async with self.fake.installed():
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                with patch.object(repository.llm_client, "generate", self.generate):
+                    created = await self._branch(client)
+                    await background.drain()
+                    retried = await self._branch(client)
+                    await background.drain()
+
+        self.assertFalse(self._metadata(created["thread_id"])["context_preview_provisional"])
+        self.assertTrue(retried["context_preview_provisional"])
+        self.assertNotIn(repository.BRANCH_SUMMARY_KEY, self._metadata(self.PARENT_ID))
+        self.assertEqual(repository.branch_summary_cache.stats()["entries"], 0)
+
+
 if __name__ == "__main__":
     unittest.main()
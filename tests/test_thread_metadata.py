@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from app.db import supabase as sb
+from app.repository import thread as repository
+from tests.fake_supabase import FakeSupabase
+
+
+THREAD_ID = "66666666-6666-4666-8666-666666666666"
+ROOT_ID = "77777777-7777-4777-8777-777777777777"
+
+
+class ThreadMetadataMergeTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = FakeSupabase(latency=0.002)
+        owner = self.fake.add_user("owner@example.com", user_id="metadata-owner")
+        self.token = owner["access_token"]
+        self.fake.insert("threads", {"id": THREAD_ID, "title": "대화", "owner_id": "metadata-owner", "is_workspace": False})
+        self._write_marker({"version": 1, "parent_thread_id": ROOT_ID, "root_thread_id": ROOT_ID, "context_preview": "요약"})
+        self.install = self.fake.installed()
+        await self.install.__aenter__()
+        repository._merge_rpc_missing = False
+
+    async def asyncTearDown(self):
+        repository._merge_rpc_missing = False
+        await self.install.__aexit__(None, None, None)
+
+    def _marker(self):
+        return next(
+            (
+                row
+                for row in self.fake.rows("messages")
+                if row["thread_id"] == THREAD_ID and row["index"] == repository.BRANCH_META_INDEX
+            ),
+            None,
+        )
+
+    def _write_marker(self, metadata: dict) -> None:
+        content = repository._encode_branch_metadata(metadata)
+        marker = self._marker()
+        if marker is None:
+            self.fake.insert(
+                "messages",
+                {"thread_id": THREAD_ID, "index": repository.BRANCH_META_INDEX, "role": "assistant", "content": content},
+            )
+        else:
+            marker["content"] = content
+
+    def _metadata(self) -> dict:
+        return repository._decode_branch_metadata(self._marker()["content"])
+
+    async def _concurrent_writers(self):
+        summary = {"last_index": 30, "model": "gemma-test", "preview": "요약", "updated_at": "now"}
+        await asyncio.gather(
+            repository.remember_thread_model("metadata-owner", THREAD_ID, "gemini-2.5-flash", self.token),
+            repository._merge_thread_metadata(
+                THREAD_ID, {repository.BRANCH_SUMMARY_KEY: summary}, self.token, order_key="last_index"
+            ),
+            repository._merge_thread_metadata(
+                THREAD_ID, {"context_preview": "새 요약", "context_preview_provisional": False}, self.token, create=False
+            ),
+        )
+
+    def assert_every_key_survived(self):
+        metadata = self._metadata()
+        self.assertEqual(metadata["root_thread_id"], ROOT_ID)
+        self.assertEqual(metadata["model"], "gemini-2.5-flash")
+        self.assertEqual(metadata[repository.BRANCH_SUMMARY_KEY]["last_index"], 30)
+        self.assertEqual((metadata["context_preview"], metadata["context_preview_provisional"]), ("새 요약", False))
+
+    async def test_concurrent_writers_keep_each_others_keys(self):
+        await self._concurrent_writers()
+
+        self.assert_every_key_survived()
+        self.assertEqual(self.fake.call_count("PATCH", "messages"), 0)
+
+    async def test_older_state_does_not_replace_newer(self):
+        newer = {"last_index": 40, "model": "gemma-test", "preview": "최신", "updated_at": "later"}
+        older = {"last_index": 30, "model": "gemma-test", "preview": "이전", "updated_at": "earlier"}
+        await repository._merge_thread_metadata(
+            THREAD_ID, {repository.BRANCH_SUMMARY_KEY: newer}, self.token, order_key="last_index"
+        )
+        kept = await repository._merge_thread_metadata(
+            THREAD_ID, {repository.BRANCH_SUMMARY_KEY: older}, self.token, order_key="last_index"
+        )
+
+        self.assertEqual(kept[repository.BRANCH_SUMMARY_KEY]["preview"], "최신")
+        self.assertEqual(self._metadata()[repository.BRANCH_SUMMARY_KEY]["preview"], "최신")
+
+    async def test_deleted_or_unmarked_threads_are_not_written(self):
+        self._write_marker({"version": 1, "root_thread_id": THREAD_ID, "is_deleted": True})
+        deleted = await repository._merge_thread_metadata(THREAD_ID, {"model": "gemini-2.5-flash"}, self.token)
+        self.fake.tables["messages"] = []
+        unmarked = await repository._merge_thread_metadata(
+            THREAD_ID, {"context_preview": "요약"}, self.token, create=False
+        )
+
+        self.assertIsNone(deleted)
+        self.assertIsNone(unmarked)
+        self.assertEqual(self.fake.rows("messages"), [])
+
+    async def test_fallback_retries_when_another_writer_got_in_first(self):
+        del self.fake.rpc["merge_thread_metadata"]
+        select = sb.rest_select_async
+        interleaved = False
+
+        async def select_then_race(table, query, access_token):
+            nonlocal interleaved
+            rows = await select(table, query, access_token)
+            if not interleaved and f"index=eq.{repository.BRANCH_META_INDEX}" in query:
+                # Another worker rewrites the marker between our read and PATCH.
+                interleaved = True
+                self._write_marker({**self._metadata(), "model": "gemini-2.5-flash"})
+            return rows
+
+        with patch.object(sb, "rest_select_async", side_effect=select_then_race):
+            merged = await repository._merge_thread_metadata(
+                THREAD_ID, {"context_preview": "새 요약"}, self.token, create=False
+            )
+
+        self.assertTrue(repository._merge_rpc_missing)
+        self.assertEqual(self.fake.call_count("PATCH", "messages"), 2)
+        self.assertEqual((merged["model"], merged["context_preview"]), ("gemini-2.5-flash", "새 요약"))
+        self.assertEqual(self._metadata(), merged)
+
+    async def test_fallback_keeps_concurrent_keys(self):
+        del self.fake.rpc["merge_thread_metadata"]
+
+        await self._concurrent_writers()
+
+        self.assert_every_key_survived()
+
+
+
+class ConversationSummaryRowTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = FakeSupabase()
+        owner = self.fake.add_user("owner@example.com", user_id="summary-owner")
+        self.token = owner["access_token"]
+        self.fake.insert("threads", {"id": THREAD_ID, "title": "대화", "owner_id": "summary-owner", "is_workspace": False})
+        self.install = self.fake.installed()
+        await self.install.__aenter__()
+
+    async def asyncTearDown(self):
+        await self.install.__aexit__(None, None, None)
+
+    def _rows(self):
+        return [row for row in self.fake.rows("messages") if row["index"] == repository.CONVERSATION_SUMMARY_INDEX]
+
+    async def _store(self, text: str, through_index: int):
+        summary = {"text": text * 1500, "through_index": through_index, "updated_at": "now"}
+        return await repository._store_conversation_summary(THREAD_ID, summary, self.token)
+
+    async def test_summary_lives_in_its_own_row(self):
+        await self._store("가", 30)
+        await self._store("나", 40)
+
+        self.assertEqual(len(self._rows()), 1)
+        stored = await repository.get_conversation_summary(THREAD_ID, self.token)
+        self.assertEqual((stored["text"][0], stored["through_index"]), ("나", 40))
+        # The write is guarded by the row's stamp, not its (long) content.
+        patches = [call.query for call in self.fake.calls if call.method == "PATCH"]
+        self.assertEqual(len(patches), 1)
+        self.assertLess(len(patches[0]), 512)
+
+    async def test_older_summary_does_not_replace_newer(self):
+        await self._store("나", 40)
+        kept = await self._store("가", 30)
+
+        self.assertEqual(kept["through_index"], 40)
+        self.assertEqual((await repository.get_conversation_summary(THREAD_ID, self.token))["through_index"], 40)
+
+    async def test_store_rereads_after_a_concurrent_write(self):
+        await self._store("가", 30)
+        select = sb.rest_select_async
+        interleaved = False
+
+        async def select_then_race(table, query, access_token):
+            nonlocal interleaved
+            rows = await select(table, query, access_token)
+            if not interleaved:
+                # Another worker stores a newer summary between our read and PATCH.
+                interleaved = True
+                row = self._rows()[0]
+                row["content"] = row["content"].replace('"through_index":30', '"through_index":50')
+                row["created_at"] = "2099-01-01T00:00:00+00:00"
+            return rows
+
+        with patch.object(sb, "rest_select_async", side_effect=select_then_race):
+            kept = await self._store("나", 40)
+
+        self.assertEqual(kept["through_index"], 50)
+        self.assertEqual((await repository.get_conversation_summary(THREAD_ID, self.token))["through_index"], 50)
+
+if __name__ == "__main__":
+    unittest.main()
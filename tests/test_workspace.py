@@ -9,12 +9,12 @@ from app.routes import thread as thread_routes
 from app.schemas.workspace import WorkspaceMembersIn
 
 
-class WorkspaceRouteTests(unittest.TestCase):
-    def test_child_thread_cannot_be_converted_to_workspace(self):
+class WorkspaceRouteTests(unittest.IsolatedAsyncioTestCase):
+    async def test_child_thread_cannot_be_converted_to_workspace(self):
         with (
             patch.object(
                 thread_routes.sb,
-                "rest_select",
+                "rest_select_async",
                 return_value=[
                     {
                         "id": "child-thread",
@@ -26,7 +26,7 @@ class WorkspaceRouteTests(unittest.TestCase):
             patch.object(thread_routes, "is_branch_root", return_value=False),
         ):
             with self.assertRaises(HTTPException) as raised:
-                thread_routes.convert_to_workspace(
+                await thread_routes.convert_to_workspace(
                     thread_id="child-thread",
                     payload=WorkspaceMembersIn(emails=[]),
                     user={"id": "owner-1"},
@@ -39,7 +39,7 @@ class WorkspaceRouteTests(unittest.TestCase):
             "WORKSPACE_ROOT_ONLY",
         )
 
-    def test_new_root_member_access_is_inherited_by_existing_descendants(self):
+    async def test_new_root_member_access_is_inherited_by_existing_descendants(self):
         inserted = []
 
         def select(table, query, access_token):
@@ -70,9 +70,9 @@ class WorkspaceRouteTests(unittest.TestCase):
             return {}
 
         with (
-            patch.object(thread_routes.sb, "rest_select", side_effect=select),
-            patch.object(thread_routes.sb, "rest_insert", side_effect=insert),
-            patch.object(thread_routes.sb, "rest_update"),
+            patch.object(thread_routes.sb, "rest_select_async", side_effect=select),
+            patch.object(thread_routes.sb, "rest_insert_async", side_effect=insert),
+            patch.object(thread_routes.sb, "rest_update_async"),
             patch.object(thread_routes, "is_branch_root", return_value=True),
             patch.object(
                 thread_routes,
@@ -81,11 +81,11 @@ class WorkspaceRouteTests(unittest.TestCase):
             ),
             patch.object(
                 thread_routes,
-                "get_user_id_by_email",
+                "get_user_id_by_email_async",
                 return_value="member-1",
             ),
         ):
-            result = thread_routes.convert_to_workspace(
+            result = await thread_routes.convert_to_workspace(
                 thread_id="root-thread",
                 payload=WorkspaceMembersIn(emails=["member@example.com"]),
                 user={"id": "owner-1"},
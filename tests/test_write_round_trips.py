@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import json
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from app.core.config import settings
+from app.db import supabase as sb
+from app.repository import comment as comment_repository
+from app.repository import thread as thread_repository
+
+
+class RecordingPostgrest:
+    """Answers PostgREST requests for one owned thread and records each call."""
+
+    def __init__(self):
+        self.requests: list[httpx.Request] = []
+        # Set to make bookmark inserts hit an existing row (ignore-duplicates).
+        self.existing_bookmark = None
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        table = request.url.path.rsplit("/", 1)[-1]
+        if request.method == "GET":
+            if table == "threads":
+                return httpx.Response(
+                    200,
+                    json=[{"id": "thread-1", "owner_id": "owner-1", "is_workspace": False}],
+                )
+            if table == "messages":
+                return httpx.Response(200, json=[{"index": 0}])
+            if table == "bookmarks" and self.existing_bookmark:
+                return httpx.Response(200, json=[self.existing_bookmark])
+            return httpx.Response(200, json=[])
+
+        body = json.loads(request.content)
+        if table == "append_messages":
+            rows = [
+                {**message, "thread_id": body["p_thread_id"], "index": 1, "created_at": "now"}
+                for message in body["p_messages"]
+            ]
+            return httpx.Response(200, json=rows)
+        if "return=representation" not in request.headers.get("prefer", ""):
+            return httpx.Response(201)
+        if table == "bookmarks" and self.existing_bookmark:
+            return httpx.Response(201, json=[])
+        return httpx.Response(201, json=[{**row, "created_at": "now"} for row in body])
+
+    def writes(self) -> list[httpx.Request]:
+        return [request for request in self.requests if request.method != "GET"]
+
+
+class WriteRoundTripTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.backend = RecordingPostgrest()
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(self.backend))
+        for patcher in (
+            patch.object(settings, "SUPABASE_URL", "https://project.example.supabase.co"),
+            patch.object(settings, "SUPABASE_ANON_KEY", "anon-key"),
+            patch.object(sb, "get_async_http_client", return_value=self.client),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    def assert_single_write_without_reselect(self):
+        writes = self.backend.writes()
+        self.assertEqual(len(writes), 1)
+        self.assertIs(self.backend.requests[-1], writes[0])
+        return writes[0]
+
+    async def test_create_branch_comment(self):
+        comment = await comment_repository.create_branch_comment(
+            "owner-1", "thread-1", "메모", 1, 2, "token"
+        )
+
+        write = self.assert_single_write_without_reselect()
+        self.assertEqual(len(self.backend.requests), 3)
+        self.assertIn("return=representation", write.headers["prefer"])
+        self.assertEqual(comment["content"], "메모")
+
+    async def test_save_branch_position(self):
+        position = await comment_repository.save_branch_position(
+            "owner-1", "thread-1", 10, 20, "token"
+        )
+
+        write = self.assert_single_write_without_reselect()
+        self.assertEqual(len(self.backend.requests), 3)
+        self.assertEqual(write.url.params["on_conflict"], "id")
+        self.assertIn("resolution=merge-duplicates", write.headers["prefer"])
+        self.assertEqual((position["position_x"], position["position_y"]), (10.0, 20.0))
+
+    async def test_add_thread_bookmark(self):
+        owned, bookmark = await thread_repository.add_thread_bookmark(
+            "owner-1", "thread-1", 0, "token"
+        )
+
+        write = self.assert_single_write_without_reselect()
+        self.assertEqual(len(self.backend.requests), 3)
+        self.assertEqual(write.url.params["on_conflict"], "user_id,thread_id,message_index")
+        self.assertIn("resolution=ignore-duplicates", write.headers["prefer"])
+        self.assertTrue(owned)
+        self.assertEqual(bookmark["created_at"], "now")
+
+    async def test_repeated_bookmark_reads_back_the_existing_row(self):
+        self.backend.existing_bookmark = {"thread_id": "thread-1", "message_index": 0, "created_at": "earlier"}
+        owned, bookmark = await thread_repository.add_thread_bookmark(
+            "owner-1", "thread-1", 0, "token"
+        )
+
+        self.assertEqual(len(self.backend.writes()), 1)
+        self.assertEqual(len(self.backend.requests), 4)
+        self.assertEqual(self.backend.requests[-1].method, "GET")
+        self.assertTrue(owned)
+        self.assertEqual(bookmark["created_at"], "earlier")
+
+    async def test_chat_turn_message_append(self):
+        row = await thread_repository.insert_and_fetch_message(
+            "thread-1", "user", "질문", "token"
+        )
+
+        self.assert_single_write_without_reselect()
+        self.assertEqual(len(self.backend.requests), 1)
+        self.assertEqual(row["index"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()